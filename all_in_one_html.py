@@ -1,14 +1,15 @@
 # -*- coding: utf-8 -*-
 # all_in_one_html.py - 모든 분석을 HTML 하나로!
 
-import os
 import json
 from datetime import datetime
-from openai import OpenAI
-from anthropic import Anthropic
 
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-anthropic_client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+from llm_gateway import gateway
+from review_sampler import select_reviews
+
+# 🔥 심층 분석 리뷰 예산 (기존: 부정 30개 × 300자 + 긍정 30개 × 200자)
+DEEP_TOKEN_BUDGET = 9000
+DEEP_SENTIMENT_SHARES = {'부정': 0.55, '긍정': 0.35, '중립': 0.10}
 
 
 def deep_analyze_reviews(target_reviews, target_store):
@@ -32,17 +33,21 @@ def deep_analyze_reviews(target_reviews, target_store):
         count = len(by_rating[rating])
         print(f"      {'★' * rating}: {count}개")
     
-    # 부정 리뷰 우선
-    negative_reviews = by_rating[1] + by_rating[2] + by_rating[3][:10]
-    positive_reviews = by_rating[5][:30] + by_rating[4][:20]
+    # 🔥 부정 리뷰 우선 - 토큰 예산 안에서 별점/주제/최신순 골고루 (별점 1-3점은 부정으로 분류됨)
+    sampled = select_reviews(
+        target_reviews, DEEP_TOKEN_BUDGET, max_chars=300,
+        shares=DEEP_SENTIMENT_SHARES, label='심층 분석 리뷰'
+    )
+    negative_reviews = [r for r in sampled if r['sentiment'] != '긍정']
+    positive_reviews = [r for r in sampled if r['sentiment'] == '긍정']
     
     review_text = "## 🚨 부정/중립 리뷰 (우선 분석)\n\n"
-    for i, r in enumerate(negative_reviews[:30], 1):
-        review_text += f"[리뷰#{i}] ★{int(r.get('rating', 0))} - {r['content'][:300]}\n\n"
+    for i, r in enumerate(negative_reviews, 1):
+        review_text += f"[리뷰#{i}] ★{int(r.get('rating', 0))} - {r['content']}\n\n"
     
     review_text += "\n## ✅ 긍정 리뷰\n\n"
-    for i, r in enumerate(positive_reviews[:30], 31):
-        review_text += f"[리뷰#{i}] ★{int(r.get('rating', 0))} - {r['content'][:200]}\n\n"
+    for i, r in enumerate(positive_reviews, len(negative_reviews) + 1):
+        review_text += f"[리뷰#{i}] ★{int(r.get('rating', 0))} - {r['content']}\n\n"
     
     prompt = f"""당신은 레스토랑 컨설턴트입니다. 아래 리뷰를 **철저히** 분석하세요.
 
@@ -97,7 +102,8 @@ def deep_analyze_reviews(target_reviews, target_store):
 """
     
     try:
-        response = openai_client.chat.completions.create(
+        response = gateway.chat(
+            stage='deep_analyze',
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "당신은 비판적 사고를 하는 컨설턴트입니다. 단점을 놓치지 마세요!"},
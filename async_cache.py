@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# async_cache.py - TTL + LRU 캐시와 single-flight (같은 키 동시 요청은 1번만 실행)
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class SingleFlight:
+    """
+    같은 키로 동시에 들어온 비동기 작업을 하나로 합침
+
+    먼저 온 호출이 작업을 띄우고, 나중에 온 호출은 같은 결과를 기다림
+    (기다리던 쪽이 취소돼도 작업 자체는 계속 - asyncio.shield)
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    def __contains__(self, key):
+        return key in self._tasks
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # 아무도 안 기다린 예외 경고 방지
+
+
+class TTLCache:
+    """
+    만료 시간 + 최대 개수(LRU) 캐시
+
+    - get/set은 스레드 안전 (FastAPI 스레드풀에서 불러도 됨)
+    - get_or_load: 없으면 loader 실행, 동시 요청은 single-flight로 합침
+    - None 결과는 저장하지 않음 (일시 오류를 캐시하지 않기 위해)
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()   # key → (expires_at, value)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def keys(self):
+        """현재 키 목록 (만료 여부는 보지 않음)"""
+        with self._lock:
+            return list(self._data)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    async def get_or_load(self, key, loader, ttl=None):
+        """
+        캐시 조회 → 없으면 await loader() 결과 저장
+
+        Returns:
+            (value, cached) - cached는 캐시에서 바로 꺼냈는지 여부
+        """
+        value = self.get(key, self._MISSING)
+        if value is not self._MISSING:
+            return value, True
+
+        async def load():
+            result = await loader()
+            if result is not None:
+                self.set(key, result, ttl)
+            return result
+
+        return await self._flight.do(key, load), False
+
+    def stats_text(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"캐시 {len(self)}개 / 적중률 {rate:.0f}% ({self.hits}/{total})"
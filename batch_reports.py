@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# batch_reports.py - 여러 가게 하이브리드 리포트 일괄 생성 (LLM 호출을 단계별로 모아 배치 API로 - 비용 50%, 대신 결과까지 수 분~수 시간)
+
+import argparse
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from competitor_search import find_competitors_smart
+from hybrid_insight_engine import generate_hybrid_report
+from llm_batch import (
+    AnthropicBatchClient, BatchRoute, OpenAIBatchClient,
+    ANTHROPIC_BASE_URL, BATCH_DIR, OPENAI_BASE_URL, POLL_SECONDS, SETTLE_SECONDS
+)
+from llm_gateway import batch_mode
+from llm_usage import usage_ledger
+from log_config import LOG_LEVEL, log_context, setup_logging
+from mvp_analyzer import get_reviews_from_db
+from review_preprocessor import generate_review_stats, compare_review_stats
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = 'seoul_industry_reviews.db'
+MAX_STORES = 2000       # 동시에 돌리는 가게 수 상한 (가게마다 작업 스레드 1개가 배치 결과를 기다림 - 대기 중인 스레드는 싸다)
+
+
+# ==================== 입력 준비 (DB) ====================
+
+def build_inputs(place_id: str, db_file: str = DB_FILE) -> Optional[Dict]:
+    """
+    가게 하나의 generate_hybrid_report 입력 (master_analyzer STEP 3~4와 같은 구성, 크롤링 대신 DB)
+
+    Returns:
+        kwargs dict (가게가 없거나 리뷰가 없으면 None)
+    """
+    conn = sqlite3.connect(db_file, timeout=30)
+    row = conn.execute(
+        "SELECT place_id, name, district, industry FROM stores WHERE place_id = ?", (place_id,)
+    ).fetchone()
+    conn.close()
+    if not row:
+        logger.warning(f"   ⚠️  {place_id}: stores에 없음")
+        return None
+
+    target_store = {'place_id': row[0], 'name': row[1], 'district': row[2], 'industry': row[3]}
+    target_reviews = get_reviews_from_db(place_id)
+    if not target_reviews:
+        logger.warning(f"   ⚠️  {target_store['name']}: 리뷰 없음")
+        return None
+
+    competitors = [
+        comp for comp in find_competitors_smart(
+            db_path=db_file, user_area=target_store['district'],
+            user_industry=target_store['industry'], limit=5
+        )
+        if comp.place_id != place_id
+    ]
+    competitor_reviews = {comp.place_id: get_reviews_from_db(comp.place_id) for comp in competitors}
+
+    our_stats = generate_review_stats(target_reviews, target_store['name'])
+    comp_stats_list = [
+        generate_review_stats(competitor_reviews[comp.place_id], comp.name)
+        for comp in competitors if competitor_reviews[comp.place_id]
+    ]
+    comparison = compare_review_stats(our_stats, comp_stats_list) if comp_stats_list else None
+
+    return {
+        'target_store': target_store,
+        'target_reviews': target_reviews,
+        'competitors': competitors,
+        'competitor_reviews': competitor_reviews,
+        'statistical_comparison': comparison,
+    }
+
+
+def load_place_ids(path: str) -> List[str]:
+    """place_id 목록 파일 (한 줄에 하나, #은 주석)"""
+    place_ids = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                place_ids.append(line)
+    return place_ids
+
+
+# ==================== 일괄 생성 ====================
+
+async def _run_all(route: BatchRoute, inputs: List[Dict], max_stores: int) -> List[Dict]:
+    """
+    가게 파이프라인을 전부 동시에 띄움 → 같은 단계 호출이 한 라운드로 모임
+
+    예전처럼 묶음(wave)을 하나씩 끝내면 묶음마다 4단계 이상 배치 왕복이 직렬로 쌓임
+    → 전부 한 번에 띄우고, max_stores를 넘으면 자리가 나는 대로 다음 가게가 들어옴
+      (늦게 들어온 가게의 1단계 요청은 앞선 가게들의 다음 단계 요청과 같은 라운드에 실림)
+    """
+    slots = asyncio.Semaphore(max_stores)
+
+    async def run(kwargs):
+        name = kwargs['target_store']['name']
+        async with slots:
+            try:
+                with log_context(place_id=kwargs['target_store']['place_id'], store=name):
+                    html = await generate_hybrid_report(**kwargs)
+            except Exception as e:
+                logger.error(f"   ❌ {name}: {e}")
+                return {'place_id': kwargs['target_store']['place_id'], 'name': name, 'status': 'error', 'message': str(e)}
+        status = 'success' if html else 'failed'
+        return {'place_id': kwargs['target_store']['place_id'], 'name': name, 'status': status, 'message': None}
+
+    with batch_mode(route):
+        return await asyncio.gather(*[run(kwargs) for kwargs in inputs])
+
+
+def generate_reports(
+    place_ids: List[str],
+    route: BatchRoute,
+    max_stores: int = MAX_STORES,
+    db_file: str = DB_FILE
+) -> List[Dict]:
+    """
+    가게 목록 리포트 일괄 생성
+
+    모든 가게 파이프라인을 동시에 돌리고, 각 단계(GPT 분류 → 검증 → 추출 → Claude)의
+    호출은 route가 provider별 배치 파일 하나로 모아 제출함 (가게 수와 관계없이 라운드 ≈ 단계 수)
+    """
+    inputs, results = [], []
+    for place_id in dict.fromkeys(place_ids):
+        kwargs = build_inputs(place_id, db_file)
+        if kwargs:
+            inputs.append(kwargs)
+        else:
+            results.append({'place_id': place_id, 'name': None, 'status': 'skipped', 'message': "입력 없음"})
+
+    coordinator = threading.Thread(target=route.serve, name='llm-batch', daemon=True)
+    coordinator.start()
+    started = time.monotonic()
+
+    async def run():
+        # 가게마다 작업 스레드가 배치 결과를 기다리므로 기본 스레드풀(코어 수 + 4)로는 부족
+        concurrent = max(1, min(max_stores, len(inputs)))
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrent + 4))
+        logger.info(f"🚀 가게 {len(inputs)}개 동시 실행 (최대 {concurrent}개)")
+        results.extend(await _run_all(route, inputs, concurrent))
+
+    try:
+        asyncio.run(run())
+    finally:
+        route.stop()
+        coordinator.join()
+
+    elapsed = time.monotonic() - started
+    ok = sum(1 for r in results if r['status'] == 'success')
+    requests = sum(r['requests'] for r in route.rounds)
+    logger.info(f"✅ 완료: {ok}/{len(results)}개 ({elapsed / 60:.1f}분, 배치 라운드 {len(route.rounds)}회, 요청 {requests}개)")
+    return results
+
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="하이브리드 리포트 일괄 생성 (배치 API)")
+    parser.add_argument('place_ids', nargs='*', help="place_id 목록")
+    parser.add_argument('--file', help="place_id 목록 파일 (한 줄에 하나)")
+    parser.add_argument('--max-stores', type=int, default=MAX_STORES, help="동시에 돌리는 가게 수 상한")
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS, help="배치 상태 확인 간격(초)")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help="새 요청이 이 시간 동안 없으면 배치 제출(초)")
+    parser.add_argument('--openai-base-url', default=OPENAI_BASE_URL)
+    parser.add_argument('--anthropic-base-url', default=ANTHROPIC_BASE_URL)
+    parser.add_argument('--batch-dir', default=BATCH_DIR, help="제출한 배치 파일 보관 폴더")
+    parser.add_argument('--stub', action='store_true',
+                        help="로컬 대역 서버로 실행 (batch_stub_server - 파일 형식/흐름 확인용, 응답은 빈 JSON)")
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--log-level', default=LOG_LEVEL, help="DEBUG면 가게/호출별 로그까지")
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    place_ids = list(args.place_ids)
+    if args.file:
+        place_ids += load_place_ids(args.file)
+    if not place_ids:
+        parser.error("place_id 또는 --file 필요")
+
+    stub = None
+    openai_url, anthropic_url = args.openai_base_url, args.anthropic_base_url
+    if args.stub:
+        from batch_stub_server import StubBatchServer
+        stub = StubBatchServer(delay=1.0).start()
+        openai_url = anthropic_url = stub.url
+        print(f"🧪 대역 서버: {stub.url}")
+
+    route = BatchRoute(
+        clients=[OpenAIBatchClient(openai_url), AnthropicBatchClient(anthropic_url)],
+        batch_dir=args.batch_dir, settle=args.settle, poll_interval=args.poll
+    )
+    try:
+        results = generate_reports(place_ids, route, max_stores=args.max_stores, db_file=args.db)
+    finally:
+        if stub:
+            stub.stop()
+
+    statuses = {}
+    for r in results:
+        statuses[r['status']] = statuses.get(r['status'], 0) + 1
+    print("📊 " + " / ".join(f"{k} {v}" for k, v in sorted(statuses.items())))
+
+    cost = sum(total['cost_usd'] for stage, total in usage_ledger.summary().items() if stage.endswith('@batch'))
+    print(f"💰 배치 추정 비용: ${cost:.4f} (대화형 대비 50%)")
+    for r in route.rounds:
+        print(f"   📦 라운드 {r['round']}: {', '.join(r['stages'])} - 요청 {r['requests']}개, "
+              f"실패 {r['failed']}개, {r['seconds']}초")
+
+
+if __name__ == "__main__":
+    main()
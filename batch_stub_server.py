@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+# batch_stub_server.py - 배치 API 로컬 대역 서버 (OpenAI Batch / Anthropic Message Batches 파일 형식 그대로, 실제 LLM 호출 없음)
+
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_usage import count_tokens
+
+OPENAI_ENDPOINTS = ('/v1/chat/completions',)
+CUSTOM_ID = re.compile(r'^[a-zA-Z0-9_-]{1,64}$')
+
+
+def default_responder(provider, body):
+    """요청 body → 응답 텍스트 (기본: 빈 JSON 객체)"""
+    return '{}'
+
+
+def _prompt_tokens(body):
+    text = json.dumps([body.get('system'), body.get('messages')], ensure_ascii=False)
+    return count_tokens(text, body.get('model', 'gpt-4o'))
+
+
+class StubBatchServer:
+    """
+    배치 API 대역
+
+    - OpenAI: POST /v1/files (multipart, purpose=batch) → POST /v1/batches → GET /v1/batches/{id}
+              → GET /v1/files/{output_file_id|error_file_id}/content
+    - Anthropic: POST /v1/messages/batches → GET /v1/messages/batches/{id} → GET results_url
+    - 제출 후 delay초가 지나야 완료 상태가 됨 (폴링 경로 확인용)
+    - responder(provider, body)가 응답 텍스트를 만듦 - 예외를 던지면 그 요청은 에러 줄로
+
+    사용:
+        with StubBatchServer(responder=...) as server:
+            OpenAIBatchClient(server.url) ...
+    """
+
+    def __init__(self, responder=None, delay=0.0, host='127.0.0.1', port=0):
+        self.responder = responder or default_responder
+        self.delay = delay
+        self.files = {}         # file_id → bytes
+        self.batches = {}       # batch_id → dict (내부 상태 포함)
+        self.requests = []      # 받은 (provider, custom_id, body) - 검증용
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _new_id(self, prefix):
+        return f'{prefix}_{next(self._ids):06d}'
+
+    # ==================== OpenAI ====================
+
+    def upload_file(self, content_type, raw):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8') + raw
+        )
+        fields = {part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+                  for part in message.iter_parts()}
+        if fields.get('purpose', b'').strip() != b'batch' or 'file' not in fields:
+            return 400, {'error': {'message': "purpose=batch와 file 필드가 필요합니다"}}
+        with self._lock:
+            file_id = self._new_id('file')
+            self.files[file_id] = fields['file']
+        return 200, {'id': file_id, 'object': 'file', 'purpose': 'batch', 'bytes': len(fields['file'])}
+
+    def create_openai_batch(self, payload):
+        content = self.files.get(payload.get('input_file_id'))
+        if content is None:
+            return 404, {'error': {'message': "input_file_id 없음"}}
+        if payload.get('endpoint') not in OPENAI_ENDPOINTS or payload.get('completion_window') != '24h':
+            return 400, {'error': {'message': "endpoint / completion_window 오류"}}
+
+        lines, errors, seen = [], [], set()
+        for number, raw in enumerate(content.decode('utf-8').splitlines(), 1):
+            if not raw.strip():
+                continue
+            try:
+                line = json.loads(raw)
+            except json.JSONDecodeError:
+                errors.append(f'{number}번째 줄: JSON 아님')
+                continue
+            if line.get('custom_id') in seen or not line.get('custom_id'):
+                errors.append(f'{number}번째 줄: custom_id 없음/중복')
+            elif line.get('method') != 'POST' or line.get('url') != payload['endpoint']:
+                errors.append(f'{number}번째 줄: method/url 불일치')
+            elif not (line.get('body') or {}).get('model'):
+                errors.append(f'{number}번째 줄: body.model 없음')
+            seen.add(line.get('custom_id'))
+            lines.append(line)
+
+        with self._lock:
+            batch_id = self._new_id('batch')
+            self.batches[batch_id] = {
+                'id': batch_id, 'object': 'batch', 'endpoint': payload['endpoint'],
+                'input_file_id': payload['input_file_id'], 'completion_window': '24h',
+                'status': 'failed' if errors else 'in_progress',
+                'errors': {'data': [{'message': e} for e in errors]} if errors else None,
+                'output_file_id': None, 'error_file_id': None,
+                'request_counts': {'total': len(lines), 'completed': 0, 'failed': 0},
+                'created_at': int(time.time()),
+                '_ready_at': time.monotonic() + self.delay, '_lines': lines,
+            }
+            return 200, self._public(self.batches[batch_id])
+
+    def get_openai_batch(self, batch_id):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None or batch.get('object') != 'batch':
+                return 404, {'error': {'message': "batch 없음"}}
+            if batch['status'] == 'in_progress' and time.monotonic() >= batch['_ready_at']:
+                self._complete_openai(batch)
+            return 200, self._public(batch)
+
+    def _complete_openai(self, batch):
+        output, failed = [], []
+        for line in batch['_lines']:
+            body = line['body']
+            self.requests.append(('openai', line['custom_id'], body))
+            request_id = self._new_id('req')
+            try:
+                text = self.responder('openai', body)
+            except Exception as e:
+                failed.append({'id': request_id, 'custom_id': line['custom_id'], 'response': None,
+                               'error': {'code': 'server_error', 'message': str(e)}})
+                continue
+            prompt_tokens = _prompt_tokens(body)
+            completion_tokens = count_tokens(text, body['model'])
+            output.append({'id': request_id, 'custom_id': line['custom_id'], 'error': None, 'response': {
+                'status_code': 200, 'request_id': request_id,
+                'body': {
+                    'id': self._new_id('chatcmpl'), 'object': 'chat.completion', 'model': body['model'],
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                              'total_tokens': prompt_tokens + completion_tokens},
+                },
+            }})
+        for key, rows in (('output_file_id', output), ('error_file_id', failed)):
+            if rows:
+                file_id = self._new_id('file')
+                self.files[file_id] = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in rows).encode('utf-8')
+                batch[key] = file_id
+        batch['request_counts'].update(completed=len(output), failed=len(failed))
+        batch['status'] = 'completed'
+
+    # ==================== Anthropic ====================
+
+    def create_anthropic_batch(self, payload):
+        requests = payload.get('requests') or []
+        seen = set()
+        for request in requests:
+            custom_id = request.get('custom_id') or ''
+            params = request.get('params') or {}
+            if not CUSTOM_ID.match(custom_id) or custom_id in seen:
+                return 400, {'type': 'error', 'error': {'type': 'invalid_request_error',
+                                                       'message': f"custom_id 오류: {custom_id!r}"}}
+            if not all(params.get(key) for key in ('model', 'max_tokens', 'messages')):
+                return 400, {'type': 'error', 'error': {'type': 'invalid_request_error',
+                                                       'message': f"{custom_id}: model/max_tokens/messages 필요"}}
+            seen.add(custom_id)
+        if not requests:
+            return 400, {'type': 'error', 'error': {'type': 'invalid_request_error', 'message': "requests 비어 있음"}}
+
+        with self._lock:
+            batch_id = self._new_id('msgbatch')
+            self.batches[batch_id] = {
+                'id': batch_id, 'type': 'message_batch', 'processing_status': 'in_progress',
+                'request_counts': {'processing': len(requests), 'succeeded': 0, 'errored': 0,
+                                   'canceled': 0, 'expired': 0},
+                'results_url': None, 'ended_at': None,
+                '_ready_at': time.monotonic() + self.delay, '_lines': requests, '_results': None,
+            }
+            return 200, self._public(self.batches[batch_id])
+
+    def get_anthropic_batch(self, batch_id, base_url):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None or batch.get('type') != 'message_batch':
+                return 404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': "batch 없음"}}
+            if batch['processing_status'] == 'in_progress' and time.monotonic() >= batch['_ready_at']:
+                self._complete_anthropic(batch)
+                batch['results_url'] = f'{base_url}/v1/messages/batches/{batch_id}/results'
+            return 200, self._public(batch)
+
+    def _complete_anthropic(self, batch):
+        results = []
+        counts = batch['request_counts']
+        for request in batch['_lines']:
+            params = request['params']
+            self.requests.append(('anthropic', request['custom_id'], params))
+            try:
+                text = self.responder('anthropic', params)
+            except Exception as e:
+                counts['errored'] += 1
+                results.append({'custom_id': request['custom_id'], 'result': {
+                    'type': 'errored', 'error': {'type': 'error', 'error': {'type': 'api_error', 'message': str(e)}}}})
+                continue
+            counts['succeeded'] += 1
+            results.append({'custom_id': request['custom_id'], 'result': {'type': 'succeeded', 'message': {
+                'id': self._new_id('msg'), 'type': 'message', 'role': 'assistant', 'model': params['model'],
+                'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn',
+                'usage': {'input_tokens': _prompt_tokens(params),
+                          'output_tokens': count_tokens(text, params['model'])},
+            }}})
+        counts['processing'] = 0
+        batch['_results'] = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in results).encode('utf-8')
+        batch['processing_status'] = 'ended'
+        batch['ended_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+    # ==================== HTTP ====================
+
+    @staticmethod
+    def _public(batch):
+        return {key: value for key, value in batch.items() if not key.startswith('_')}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, content_type='application/json'):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def do_POST(self):
+                raw = self._body()
+                if self.path == '/v1/files':
+                    return self._send(*server.upload_file(self.headers.get('Content-Type', ''), raw))
+                try:
+                    payload = json.loads(raw or b'{}')
+                except json.JSONDecodeError:
+                    return self._send(400, {'error': {'message': "JSON 아님"}})
+                if self.path == '/v1/batches':
+                    return self._send(*server.create_openai_batch(payload))
+                if self.path == '/v1/messages/batches':
+                    return self._send(*server.create_anthropic_batch(payload))
+                self._send(404, {'error': {'message': f"없는 경로: {self.path}"}})
+
+            def do_GET(self):
+                base_url = f"http://{self.headers.get('Host') or server.url[7:]}"
+                match = re.fullmatch(r'/v1/files/([\w-]+)/content', self.path)
+                if match:
+                    content = server.files.get(match.group(1))
+                    if content is None:
+                        return self._send(404, {'error': {'message': "file 없음"}})
+                    return self._send(200, content, 'application/jsonl')
+                match = re.fullmatch(r'/v1/batches/([\w-]+)', self.path)
+                if match:
+                    return self._send(*server.get_openai_batch(match.group(1)))
+                match = re.fullmatch(r'/v1/messages/batches/([\w-]+)/results', self.path)
+                if match:
+                    batch = server.batches.get(match.group(1)) or {}
+                    if batch.get('_results') is None:
+                        return self._send(404, {'type': 'error', 'error': {'type': 'not_found_error',
+                                                                           'message': "결과 없음"}})
+                    return self._send(200, batch['_results'], 'application/binary')
+                match = re.fullmatch(r'/v1/messages/batches/([\w-]+)', self.path)
+                if match:
+                    return self._send(*server.get_anthropic_batch(match.group(1), base_url))
+                self._send(404, {'error': {'message': f"없는 경로: {self.path}"}})
+
+        return Handler
+
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="배치 API 로컬 대역 서버 (응답은 모두 '{}')")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=2.0, help="제출 후 완료까지 걸리는 시간(초)")
+    args = parser.parse_args()
+
+    server = StubBatchServer(delay=args.delay, port=args.port)
+    print(f"🧪 배치 대역 서버: {server.url} (완료 지연 {args.delay}초)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
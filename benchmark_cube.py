@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+# benchmark_cube.py - 업종 × 지역 × 오픈 기간 벤치마크 큐브 (백분위 미리 계산, 변경 피드로 증분 갱신)
+
+import bisect
+import json
+import sqlite3
+import time
+from datetime import datetime
+
+from review_preprocessor import generate_review_stats, get_industry_key
+from review_extractor import normalize_visit_date
+from instagram_analyzer import NaverPlaceDiagnostics
+from change_feed import ChangeFeed, KIND_STORE, KIND_REVIEWS
+
+DB_FILE = 'seoul_industry_reviews.db'
+ALL = '*'                       # 롤업 칸 (전체 지역 / 전체 기간 / 전체 업종)
+PERCENTILE_STEPS = 20           # 0, 5, ..., 100 백분위 (21개 경계값)
+MIN_SAMPLES = 20                # 이보다 가게가 적은 칸은 상위 롤업으로 대체
+CRAWL_REVIEW_CAP = 100          # 크롤러 리뷰 수집 상한 (turbo_crawler.TARGET_REVIEWS, mvp_analyzer는 150)
+ROLLUP_REFRESH_SECONDS = 6 * 3600   # 넓은 롤업 칸(지역 전체/업종 전체) 재계산 주기 - 증분 sync마다 하면 거의 전체 스캔
+CUBE_RELOAD_SECONDS = 600       # 서버가 들고 있는 큐브를 DB에서 다시 읽는 주기 (갱신은 별도 프로세스)
+TOPICS = ['맛', '서비스', '가성비', '양', '분위기', '청결']
+RATES = ['재방문율', '추천율', '대기_언급률']
+
+METRICS = (['review_count', 'reply_rate', 'photo_rate']
+           + [f'score:{t}' for t in TOPICS]
+           + [f'rate:{r}' for r in RATES])
+
+
+# ==================== 가게 단위 지표 ====================
+
+def period_bucket(review_dates, now=None, total_review_count=None):
+    """
+    오픈 기간 버킷 ('0-6' / '6-24' / '24+')
+
+    오픈일이 없어서 가장 오래된 수집 리뷰 날짜로 추정
+    리뷰가 수집 상한까지 찼거나 네이버 총개수보다 적게 모였으면 가장 오래된 리뷰를 못 본 것
+    → 기간을 모르는 것으로 보고 ALL (잘린 리뷰로 추정하면 오래된 인기 가게가 '0-6'에 들어감)
+    """
+    if len(review_dates) >= CRAWL_REVIEW_CAP or (total_review_count or 0) > len(review_dates):
+        return ALL
+    now = now or datetime.now()
+    parsed = [normalize_visit_date(d, now) for d in review_dates if d]
+    parsed = [d for d in parsed if d]
+    if not parsed:
+        return ALL
+    months = (now - datetime.strptime(min(parsed), '%Y.%m.%d')).days / 30.4
+    if months < 6:
+        return '0-6'
+    if months < 24:
+        return '6-24'
+    return '24+'
+
+
+def compute_store_metrics(total_review_count, industry, reviews):
+    """
+    가게 1개 지표 (진단과 같은 정의 사용)
+
+    total_review_count: 네이버 방문자 리뷰 총개수 (stores.total_review_count, 모르면 None)
+        수집 리뷰 수(stores.review_count)는 크롤러 상한에서 잘려서 진단에 쓰는 실제 총개수와 비교할 수 없음
+        → 총개수를 모르는 가게는 review_count 분포에서 제외
+    reviews: [{'date', 'content'}, ...]
+    """
+    metrics = {}
+    if total_review_count:
+        metrics['review_count'] = float(total_review_count)
+    if reviews:
+        naver = NaverPlaceDiagnostics().extract_data_for_diagnosis(reviews)
+        metrics['reply_rate'] = naver['reply_rate']
+        metrics['photo_rate'] = naver['photo_reviews'] / len(reviews)
+
+        stats = generate_review_stats(reviews, industry=industry)
+        for topic in TOPICS:
+            metrics[f'score:{topic}'] = stats['scores'][topic]['score']
+        for rate in RATES:
+            metrics[f'rate:{rate}'] = float(stats['rates'][rate].rstrip('%')) / 100
+    return metrics
+
+
+# ==================== 백분위 ====================
+
+def quantile_breakpoints(values, steps=PERCENTILE_STEPS):
+    """정렬된 값에서 0~100% 경계값 (선형 보간)"""
+    values = sorted(values)
+    n = len(values)
+    points = []
+    for i in range(steps + 1):
+        pos = (n - 1) * i / steps
+        lo = int(pos)
+        hi = min(lo + 1, n - 1)
+        points.append(values[lo] + (values[hi] - values[lo]) * (pos - lo))
+    return points
+
+
+def percentile_rank(breakpoints, value):
+    """값이 분포의 몇 백분위인지 (0~100, 경계값 21개 이진 탐색 → 상수 시간)"""
+    steps = len(breakpoints) - 1
+    if value <= breakpoints[0]:
+        return 0.0
+    if value >= breakpoints[-1]:
+        return 100.0
+    i = bisect.bisect_right(breakpoints, value) - 1
+    lo, hi = breakpoints[i], breakpoints[i + 1]
+    frac = (value - lo) / (hi - lo) if hi > lo else 0.5
+    return (i + frac) * 100 / steps
+
+
+# ==================== 큐브 ====================
+
+class BenchmarkCube:
+    """
+    벤치마크 큐브
+
+    - store_metrics: 가게별 지표 (변경된 가게만 다시 계산)
+    - benchmark_cube: (업종키, 지역, 기간, 지표) → 가게 수 + 백분위 경계값
+    - 조회는 메모리 dict + 경계값 이진 탐색 (원본 리뷰 조회 없음)
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.cells = {}  # (industry_key, district, bucket, metric) → (n, breakpoints)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS store_metrics (
+                place_id TEXT PRIMARY KEY,
+                industry_key TEXT NOT NULL,
+                district TEXT NOT NULL,
+                period_bucket TEXT NOT NULL,
+                metrics TEXT NOT NULL,
+                computed_at REAL
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_store_metrics_cell
+            ON store_metrics (industry_key, district, period_bucket)
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS benchmark_cube (
+                industry_key TEXT NOT NULL,
+                district TEXT NOT NULL,
+                period_bucket TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                breakpoints TEXT NOT NULL,
+                updated_at REAL,
+                PRIMARY KEY (industry_key, district, period_bucket, metric)
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    # ==================== 조회 ====================
+
+    def load(self):
+        conn = self._connect()
+        rows = conn.execute("""
+            SELECT industry_key, district, period_bucket, metric, n, breakpoints
+            FROM benchmark_cube
+        """).fetchall()
+        conn.close()
+        self.cells = {
+            (ik, d, b, m): (n, json.loads(points))
+            for ik, d, b, m, n, points in rows
+        }
+        return len(self.cells)
+
+    def lookup(self, metric, industry=None, district=None, bucket=None):
+        """
+        가장 구체적인 칸부터 찾고, 표본이 부족하면 상위 롤업으로
+
+        Returns:
+            (n, breakpoints, (industry_key, district, bucket)) 또는 None
+        """
+        ik = (get_industry_key(industry) or industry) if industry else ALL
+        district = district or ALL
+        bucket = bucket or ALL
+        for key in ((ik, district, bucket), (ik, district, ALL), (ik, ALL, bucket),
+                    (ik, ALL, ALL), (ALL, ALL, bucket), (ALL, ALL, ALL)):
+            cell = self.cells.get(key + (metric,))
+            if cell and cell[0] >= MIN_SAMPLES:
+                return cell[0], cell[1], key
+        return None
+
+    def percentile(self, metric, value, industry=None, district=None, bucket=None):
+        """동종 가게 중 몇 백분위인지 (데이터 없으면 None)"""
+        found = self.lookup(metric, industry, district, bucket)
+        if not found:
+            return None
+        return percentile_rank(found[1], value)
+
+    def median(self, metric, industry=None, district=None, bucket=None):
+        found = self.lookup(metric, industry, district, bucket)
+        return found[1][len(found[1]) // 2] if found else None
+
+    # ==================== 갱신 ====================
+
+    def _load_stores(self, conn, place_ids=None):
+        """가게 정보 + 리뷰 (place_ids가 None이면 전체)"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(stores)")}
+        total = 'total_review_count' if 'total_review_count' in columns else 'NULL'
+        sql = f"SELECT place_id, industry, district, {total} FROM stores"
+        params = []
+        if place_ids is not None:
+            sql += f" WHERE place_id IN ({','.join('?' * len(place_ids))})"
+            params = list(place_ids)
+        stores = conn.execute(sql, params).fetchall()
+
+        reviews = {}
+        for start in range(0, len(stores), 500):
+            chunk = [s[0] for s in stores[start:start + 500]]
+            rows = conn.execute(f"""
+                SELECT place_id, date, content FROM reviews
+                WHERE place_id IN ({','.join('?' * len(chunk))})
+            """, chunk).fetchall()
+            for place_id, date, content in rows:
+                reviews.setdefault(place_id, []).append({'date': date, 'content': content or ''})
+        return stores, reviews
+
+    def refresh_stores(self, place_ids=None):
+        """
+        가게 지표 다시 계산 → 영향받은 업종 × 지역 칸만 백분위 재계산
+
+        지역 전체/업종 전체 롤업은 여기서 안 건드림 (rebuild_rollups - 전체 재계산 때와 sync 주기마다)
+
+        Returns: 갱신된 칸 수
+        """
+        now = datetime.now()
+        conn = self._connect()
+        stores, reviews = self._load_stores(conn, place_ids)
+
+        affected = set()
+        rows = []
+        for place_id, industry, district, total_review_count in stores:
+            store_reviews = reviews.get(place_id, [])
+            ik = get_industry_key(industry) or industry or ALL
+            bucket = period_bucket([r['date'] for r in store_reviews], now, total_review_count)
+            metrics = compute_store_metrics(total_review_count, industry, store_reviews)
+            rows.append((place_id, ik, district or ALL, bucket, json.dumps(metrics), time.time()))
+            affected.add((ik, district or ALL, bucket))
+
+        # 예전 칸에서 빠진 가게도 반영되도록 이전 칸까지 포함
+        if place_ids is not None and stores:
+            ids = [s[0] for s in stores]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                affected.update(conn.execute(f"""
+                    SELECT industry_key, district, period_bucket FROM store_metrics
+                    WHERE place_id IN ({','.join('?' * len(chunk))})
+                """, chunk).fetchall())
+
+        conn.executemany("""
+            INSERT INTO store_metrics (place_id, industry_key, district, period_bucket, metrics, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(place_id) DO UPDATE SET
+                industry_key = excluded.industry_key,
+                district = excluded.district,
+                period_bucket = excluded.period_bucket,
+                metrics = excluded.metrics,
+                computed_at = excluded.computed_at
+        """, rows)
+        conn.commit()
+
+        # 영향받은 칸 + 같은 업종 × 지역의 기간 전체 칸 (인덱스로 그 지역 가게만 읽음)
+        targets = set()
+        for ik, district, bucket in affected:
+            targets.update({(ik, district, bucket), (ik, district, ALL)})
+
+        for key in targets:
+            self._rebuild_cell(conn, key)
+        conn.commit()
+        conn.close()
+
+        self.load()
+        return len(targets)
+
+    def rebuild_rollups(self):
+        """
+        넓은 롤업 칸 (업종 × 지역 전체, 전체 업종) 재계산 - store_metrics 한 번만 읽어서 전부
+
+        Returns: 갱신된 칸 수
+        """
+        values = {}
+        conn = self._connect()
+        for ik, _, bucket, metrics_json in conn.execute(
+            "SELECT industry_key, district, period_bucket, metrics FROM store_metrics"
+        ):
+            metrics = json.loads(metrics_json)
+            for key in {(ik, ALL, bucket), (ik, ALL, ALL), (ALL, ALL, bucket), (ALL, ALL, ALL)}:
+                cell = values.setdefault(key, {m: [] for m in METRICS})
+                for metric, value in metrics.items():
+                    if metric in cell:
+                        cell[metric].append(value)
+
+        conn.execute("DELETE FROM benchmark_cube WHERE district = ?", (ALL,))
+        for key, cell in values.items():
+            self._write_cell(conn, key, cell)
+        conn.commit()
+        conn.close()
+
+        self.load()
+        return len(values)
+
+    def rollups_age(self):
+        """마지막 롤업 재계산 후 지난 시간 (초, 없으면 None)"""
+        conn = self._connect()
+        row = conn.execute("""
+            SELECT MAX(updated_at) FROM benchmark_cube
+            WHERE industry_key = ? AND district = ? AND period_bucket = ?
+        """, (ALL, ALL, ALL)).fetchone()
+        conn.close()
+        return time.time() - row[0] if row and row[0] else None
+
+    def _rebuild_cell(self, conn, key):
+        ik, district, bucket = key
+        where, params = [], []
+        for column, value in (('industry_key', ik), ('district', district), ('period_bucket', bucket)):
+            if value != ALL:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT metrics FROM store_metrics"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+
+        values = {m: [] for m in METRICS}
+        for (metrics_json,) in conn.execute(sql, params):
+            for metric, value in json.loads(metrics_json).items():
+                if metric in values:
+                    values[metric].append(value)
+        self._write_cell(conn, key, values)
+
+    def _write_cell(self, conn, key, values):
+        """칸 하나의 지표별 백분위 저장 (값이 없는 지표는 삭제)"""
+        ik, district, bucket = key
+        now = time.time()
+        for metric, metric_values in values.items():
+            if not metric_values:
+                conn.execute("""
+                    DELETE FROM benchmark_cube
+                    WHERE industry_key = ? AND district = ? AND period_bucket = ? AND metric = ?
+                """, (ik, district, bucket, metric))
+                continue
+            conn.execute("""
+                INSERT INTO benchmark_cube (industry_key, district, period_bucket, metric, n, breakpoints, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(industry_key, district, period_bucket, metric) DO UPDATE SET
+                    n = excluded.n, breakpoints = excluded.breakpoints, updated_at = excluded.updated_at
+            """, (ik, district, bucket, metric, len(metric_values),
+                  json.dumps(quantile_breakpoints(metric_values)), now))
+
+    def rebuild_all(self):
+        """전체 재계산 (최초 1회)"""
+        conn = self._connect()
+        conn.execute("DELETE FROM benchmark_cube")
+        conn.execute("DELETE FROM store_metrics")
+        conn.commit()
+        conn.close()
+        return self.refresh_stores(None) + self.rebuild_rollups()
+
+    def sync(self, feed=None, limit=500):
+        """변경 피드에서 새 가게/리뷰 변경분만 반영 (롤업은 ROLLUP_REFRESH_SECONDS마다)"""
+        feed = feed or ChangeFeed('benchmark_cube', self.db_file, kinds=[KIND_STORE, KIND_REVIEWS])
+        updated = 0
+        while True:
+            rows = feed.poll(limit)
+            if not rows:
+                break
+            place_ids = list(dict.fromkeys(place_id for _, place_id, _ in rows))
+            updated += self.refresh_stores(place_ids)
+            feed.commit(rows[-1][0])
+
+        age = self.rollups_age()
+        if updated and (age is None or age >= ROLLUP_REFRESH_SECONDS):
+            updated += self.rebuild_rollups()
+        return updated
+
+
+# ==================== 공유 인스턴스 ====================
+
+_cube = None
+_cube_loaded_at = 0.0
+
+
+def get_benchmark_cube(db_file=DB_FILE):
+    """
+    진단에서 쓰는 큐브 (CUBE_RELOAD_SECONDS마다 DB에서 다시 로드, 비어 있으면 None)
+
+    갱신(sync)은 별도 프로세스라 서버는 주기적으로 다시 읽어야 새 분포가 반영됨
+    """
+    global _cube, _cube_loaded_at
+    if _cube is None or time.monotonic() - _cube_loaded_at >= CUBE_RELOAD_SECONDS:
+        _cube_loaded_at = time.monotonic()  # 실패해도 다음 주기까지는 재시도 안 함
+        try:
+            cube = _cube or BenchmarkCube(db_file)
+            cube.load()
+            _cube = cube
+        except sqlite3.Error as e:
+            print(f"⚠️  벤치마크 큐브 로드 실패: {e}")
+    return _cube if _cube and _cube.cells else None
+
+
+if __name__ == "__main__":
+    import sys
+
+    cube = BenchmarkCube()
+    started = time.perf_counter()
+    if '--full' in sys.argv or not cube.load():
+        # 피드 커서를 먼저 만들어야 재계산 도중 들어온 변경도 다음 sync에서 잡힘
+        ChangeFeed('benchmark_cube', DB_FILE, kinds=[KIND_STORE, KIND_REVIEWS])
+        cells = cube.rebuild_all()
+        print(f"✅ 전체 재계산: {cells:,}개 칸 ({time.perf_counter() - started:.1f}초)")
+    else:
+        cells = cube.sync()
+        print(f"✅ 증분 갱신: {cells:,}개 칸 ({time.perf_counter() - started:.1f}초)")
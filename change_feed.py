@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+# change_feed.py - stores 변경 피드 (트리거로 유지되는 outbox + 카운터 + 소비자 커서)
+
+import asyncio
+import sqlite3
+import time
+
+DB_FILE = 'seoul_industry_reviews.db'
+RETENTION_SECONDS = 7 * 24 * 3600   # 이보다 오래된 변경은 소비 여부와 상관없이 정리
+PRUNE_EVERY = 100                   # 커서 커밋 100번마다 정리
+
+# 변경 종류
+KIND_STORE = 'store'        # 새 가게
+KIND_ADDRESS = 'address'    # 주소가 새로 생김 (좌표 없음 → 지오코딩 대상)
+KIND_COORDS = 'coords'      # 좌표가 새로 생김
+KIND_REVIEWS = 'reviews'    # 리뷰 수 변경 (재크롤링)
+
+# 트리거 안에서 쓰는 조건식 (0/1)
+_HAS_ADDRESS = "({row}.address IS NOT NULL AND {row}.address != '')"
+_HAS_COORDS = "({row}.latitude IS NOT NULL AND {row}.longitude IS NOT NULL)"
+_NEEDS_GEO = f"({_HAS_ADDRESS} AND NOT {_HAS_COORDS})"
+
+
+def _flags(row):
+    return {
+        'address': _HAS_ADDRESS.format(row=row),
+        'coords': _HAS_COORDS.format(row=row),
+        'needs': _NEEDS_GEO.format(row=row),
+    }
+
+
+def _counter_updates(sign, row):
+    """카운터 증감 SQL (sign: '+' / '-')"""
+    f = _flags(row)
+    return f"""
+        UPDATE store_counters SET value = value {sign} 1 WHERE name = 'total';
+        UPDATE store_counters SET value = value {sign} {f['address']} WHERE name = 'with_address';
+        UPDATE store_counters SET value = value {sign} {f['coords']} WHERE name = 'with_coords';
+        UPDATE store_counters SET value = value {sign} {f['needs']} WHERE name = 'needs_geocoding';
+    """
+
+
+def _trigger_sql():
+    new, old = _flags('NEW'), _flags('OLD')
+    now = "CAST(strftime('%s', 'now') AS REAL)"
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stores_feed_insert AFTER INSERT ON stores
+        BEGIN
+            {_counter_updates('+', 'NEW')}
+            INSERT INTO store_changes (place_id, kind, changed_at)
+            VALUES (NEW.place_id, '{KIND_STORE}', {now});
+            INSERT INTO store_changes (place_id, kind, changed_at)
+            SELECT NEW.place_id, '{KIND_ADDRESS}', {now} WHERE {new['needs']};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stores_feed_delete AFTER DELETE ON stores
+        BEGIN
+            {_counter_updates('-', 'OLD')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stores_feed_location
+        AFTER UPDATE OF address, latitude, longitude ON stores
+        BEGIN
+            UPDATE store_counters SET value = value + {new['address']} - {old['address']} WHERE name = 'with_address';
+            UPDATE store_counters SET value = value + {new['coords']} - {old['coords']} WHERE name = 'with_coords';
+            UPDATE store_counters SET value = value + {new['needs']} - {old['needs']} WHERE name = 'needs_geocoding';
+            INSERT INTO store_changes (place_id, kind, changed_at)
+            SELECT NEW.place_id, '{KIND_ADDRESS}', {now}
+            WHERE {new['needs']} AND (NOT {old['address']} OR NEW.address != OLD.address);
+            INSERT INTO store_changes (place_id, kind, changed_at)
+            SELECT NEW.place_id, '{KIND_COORDS}', {now}
+            WHERE {new['coords']} AND NOT {old['coords']};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stores_feed_reviews
+        AFTER UPDATE OF review_count ON stores
+        WHEN NEW.review_count IS NOT OLD.review_count
+        BEGIN
+            INSERT INTO store_changes (place_id, kind, changed_at)
+            VALUES (NEW.place_id, '{KIND_REVIEWS}', {now});
+        END
+        """,
+    ]
+
+
+def install_change_feed(db_file=DB_FILE):
+    """
+    변경 피드 테이블/트리거 설치 (여러 번 호출해도 안전)
+
+    카운터는 최초 설치 때 한 번만 전체 스캔으로 채우고 이후엔 트리거가 유지
+    Returns: 설치 여부 (stores 테이블이 없으면 False)
+    """
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stores'"
+        ).fetchone()
+        if not exists:
+            return False
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS store_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                place_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                changed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS store_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS change_cursors (
+                consumer TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL,
+                updated_at REAL
+            )
+        """)
+
+        initialized = conn.execute("SELECT COUNT(*) FROM store_counters").fetchone()[0]
+        if not initialized:
+            f = _flags('stores')
+            total, with_address, with_coords, needs = conn.execute(f"""
+                SELECT COUNT(*), COALESCE(SUM({f['address']}), 0),
+                       COALESCE(SUM({f['coords']}), 0), COALESCE(SUM({f['needs']}), 0)
+                FROM stores
+            """).fetchone()
+            conn.executemany(
+                "INSERT INTO store_counters (name, value) VALUES (?, ?)",
+                [('total', total), ('with_address', with_address),
+                 ('with_coords', with_coords), ('needs_geocoding', needs)]
+            )
+
+        for sql in _trigger_sql():
+            conn.execute(sql)
+        conn.execute("COMMIT")
+        return True
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def read_counters(db_file=DB_FILE):
+    """트리거가 유지하는 카운터 (stores 스캔 없음)"""
+    conn = sqlite3.connect(db_file, timeout=30)
+    rows = conn.execute("SELECT name, value FROM store_counters").fetchall()
+    conn.close()
+    return dict(rows)
+
+
+class ChangeFeed:
+    """
+    변경 피드 소비자
+
+    - 소비자 이름별 커서(last_seq)를 DB에 저장 → 재시작해도 이어서 읽음
+    - poll()로 가져가고, 처리가 끝난 seq를 commit()
+    - 새 소비자는 현재 끝에서 시작 (과거분은 소비자가 한 번 스캔으로 따라잡기)
+    """
+
+    def __init__(self, consumer, db_file=DB_FILE, kinds=None):
+        self.consumer = consumer
+        self.db_file = db_file
+        self.kinds = tuple(kinds) if kinds else None
+        self._commits = 0
+        install_change_feed(db_file)
+        self.last_seq = self._load_cursor()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def head(self):
+        """현재 마지막 seq"""
+        conn = self._connect()
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM store_changes").fetchone()[0]
+        conn.close()
+        return seq
+
+    def _load_cursor(self):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT last_seq FROM change_cursors WHERE consumer = ?", (self.consumer,)
+        ).fetchone()
+        conn.close()
+        if row:
+            return row[0]
+        seq = self.head()
+        self.commit(seq)
+        return seq
+
+    def poll(self, limit=500):
+        """커서 이후 변경 [(seq, place_id, kind), ...] (커서는 commit 전까지 그대로)"""
+        sql = "SELECT seq, place_id, kind FROM store_changes WHERE seq > ?"
+        params = [self.last_seq]
+        if self.kinds:
+            sql += f" AND kind IN ({','.join('?' * len(self.kinds))})"
+            params.extend(self.kinds)
+        sql += " ORDER BY seq LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        rows = conn.execute(sql, params).fetchall()
+        conn.close()
+        return rows
+
+    def commit(self, seq):
+        """seq까지 처리 완료 기록"""
+        self.last_seq = max(getattr(self, 'last_seq', 0), seq)
+        conn = self._connect()
+        conn.execute("""
+            INSERT INTO change_cursors (consumer, last_seq, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(consumer) DO UPDATE SET
+                last_seq = excluded.last_seq, updated_at = excluded.updated_at
+        """, (self.consumer, self.last_seq, time.time()))
+        conn.commit()
+        conn.close()
+
+        self._commits += 1
+        if self._commits % PRUNE_EVERY == 0:
+            self.prune()
+
+    def skip_to_head(self):
+        """지금까지 변경은 건너뜀 (전체 스캔으로 따라잡은 직후)"""
+        self.commit(self.head())
+
+    def prune(self):
+        """모든 소비자가 읽은 변경 + 보관 기간 지난 변경 삭제"""
+        conn = self._connect()
+        min_seq = conn.execute("SELECT MIN(last_seq) FROM change_cursors").fetchone()[0] or 0
+        cursor = conn.execute(
+            "DELETE FROM store_changes WHERE seq <= ? OR changed_at < ?",
+            (min_seq, time.time() - RETENTION_SECONDS)
+        )
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+
+    async def follow(self, interval=1.0, limit=500):
+        """
+        변경 묶음을 계속 넘겨주는 async generator
+
+        넘겨준 묶음은 다음 묶음을 요청할 때 commit (처리 중 죽으면 그 묶음부터 다시)
+        """
+        while True:
+            rows = self.poll(limit)
+            if not rows:
+                await asyncio.sleep(interval)
+                continue
+            yield rows
+            self.commit(rows[-1][0])
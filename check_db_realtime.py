@@ -4,39 +4,40 @@
 import sqlite3
 import time
 
+from change_feed import install_change_feed
+
 DB_FILE = 'seoul_industry_reviews.db'
 
 print("실시간 DB 모니터링 (Ctrl+C로 종료)\n")
 
-prev_with_address = 0
-prev_with_coords = 0
+# 🔥 트리거가 유지하는 카운터만 읽음 (stores COUNT(*) 스캔 없음)
+install_change_feed(DB_FILE)
+
+prev_with_address = None
+prev_with_coords = None
+prev_seq = None
 
 while True:
     try:
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         
-        # 전체 가게
-        cursor.execute("SELECT COUNT(*) FROM stores")
-        total = cursor.fetchone()[0]
+        cursor.execute("SELECT name, value FROM store_counters")
+        counters = dict(cursor.fetchall())
         
-        # 주소 있음
-        cursor.execute("SELECT COUNT(*) FROM stores WHERE address IS NOT NULL AND address != ''")
-        with_address = cursor.fetchone()[0]
+        # 마지막 확인 이후 변경 이벤트 수 (PK 범위 조회)
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM store_changes")
+        head_seq = cursor.fetchone()[0]
         
-        # 좌표 있음
-        cursor.execute("SELECT COUNT(*) FROM stores WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
-        with_coords = cursor.fetchone()[0]
+        conn.close()
         
-        # 주소 있고 좌표 없음
-        cursor.execute("""
-            SELECT COUNT(*) FROM stores 
-            WHERE address IS NOT NULL AND address != ''
-              AND (latitude IS NULL OR longitude IS NULL)
-        """)
-        needs_geocoding = cursor.fetchone()[0]
+        total = counters.get('total', 0)
+        with_address = counters.get('with_address', 0)
+        with_coords = counters.get('with_coords', 0)
+        needs_geocoding = counters.get('needs_geocoding', 0)
         
-        conn.close()
+        if prev_with_address is None:
+            prev_with_address, prev_with_coords, prev_seq = with_address, with_coords, head_seq
         
         # 변화량
         address_delta = with_address - prev_with_address
@@ -47,10 +48,12 @@ while True:
               f"전체:{total} | "
               f"주소:{with_address}(+{address_delta}) | "
               f"좌표:{with_coords}(+{coords_delta}) | "
-              f"대기중:{needs_geocoding}")
+              f"대기중:{needs_geocoding} | "
+              f"변경:+{head_seq - prev_seq}")
         
         prev_with_address = with_address
         prev_with_coords = with_coords
+        prev_seq = head_seq
         
         time.sleep(3)  # 3초마다 확인
         
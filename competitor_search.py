@@ -9,13 +9,11 @@ from dataclasses import dataclass
 from enum import Enum
 from math import radians, sin, cos, sqrt, atan2
 
+from tracing import traced
+
 # ==================== 로깅 설정 ====================
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S'
-)
+# 핸들러/레벨은 진입점에서 log_config.setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -518,6 +516,7 @@ def normalize_area(user_input: str) -> str:
 
 # ==================== 텍스트 기반 경쟁사 검색 (원본!) ====================
 
+@traced('db.find_competitors')
 def find_competitors_smart(
     db_path: str,
     user_area: str,
@@ -531,9 +530,7 @@ def find_competitors_smart(
 ) -> List[CompetitorScore]:
     """텍스트 기반 경쟁사 검색 (원본 900줄 로직!)"""
     
-    logger.info("="*60)
     logger.info("🔍 텍스트 기반 경쟁사 검색")
-    logger.info("="*60)
     
     if not user_area or not user_industry:
         logger.error("❌ 지역 또는 업종이 비어있습니다")
@@ -640,8 +637,8 @@ def find_competitors_smart(
     
     logger.info(f"✅ 경쟁사 {len(top_competitors)}개 발견!")
     for i, comp in enumerate(top_competitors, 1):
-        logger.info(f"   {i}. {comp.name} ({comp.district}, {comp.industry})")
-        logger.info(f"      └─ Score: {comp.competition_score:.3f}")
+        logger.debug(f"   {i}. {comp.name} ({comp.district}, {comp.industry})")
+        logger.debug(f"      └─ Score: {comp.competition_score:.3f}")
     
     return top_competitors
 
@@ -758,6 +755,7 @@ def find_competitors_by_distance(
 
 # ==================== 🎯 전략적 경쟁사 검색 (신규!) ====================
 
+@traced('db.find_competitors_diversified')
 def find_competitors_diversified(
     db_path: str,
     target_lat: Optional[float],
@@ -782,21 +780,18 @@ def find_competitors_diversified(
     - 2개: 업종 우선 (지역 30%, 업종 70%)
     - 1개: 균형 (지역 50%, 업종 50%)
     """
-    print("="*60)
-    print("🎯 전략적 경쟁사 검색 (하이브리드 + 품질 관리)")
-    print("="*60)
-    print(f"📊 품질 기준: 업종≥{min_similarity_cutoff:.2f}, 거리≤{max_distance}km, 종합≥{min_competition_score:.2f}")
+    logger.info("🎯 전략적 경쟁사 검색 (하이브리드 + 품질 관리)")
+    logger.debug(f"📊 품질 기준: 업종≥{min_similarity_cutoff:.2f}, 거리≤{max_distance}km, 종합≥{min_competition_score:.2f}")
     
     final_competitors = []
     seen_place_ids = set()
     
     # 좌표 있으면 거리 기반
     if target_lat and target_lng:
-        print(f"\n✅ 좌표 있음: ({target_lat:.6f}, {target_lng:.6f})")
-        print("   → 실제 거리 기반 정밀 검색!")
+        logger.debug(f"✅ 좌표 있음: ({target_lat:.6f}, {target_lng:.6f}) → 실제 거리 기반 정밀 검색!")
         
         # 전략 1: 위치 우선
-        print("\n📍 전략 1: 위치 우선 (지역 70%, 업종 30%)")
+        logger.debug("📍 전략 1: 위치 우선 (지역 70%, 업종 30%)")
         location_focused = find_competitors_by_distance(
             db_path, target_lat, target_lng, user_industry,
             limit=20, max_distance=max_distance,
@@ -808,18 +803,18 @@ def find_competitors_diversified(
         count = 0
         for comp in location_focused:
             if comp.competition_score < min_competition_score:
-                print(f"   ⚠️  [품질미달] {comp.name} - 점수 {comp.competition_score:.3f}")
+                logger.debug(f"   ⚠️  [품질미달] {comp.name} - 점수 {comp.competition_score:.3f}")
                 continue
             
             if comp.place_id not in seen_place_ids and count < 2:
                 comp.match_type = f"위치우선 {comp.match_type}"
                 final_competitors.append(comp)
                 seen_place_ids.add(comp.place_id)
-                print(f"   ✅ {comp.name} - {comp.match_type} (점수:{comp.competition_score:.3f})")
+                logger.debug(f"   ✅ {comp.name} - {comp.match_type} (점수:{comp.competition_score:.3f})")
                 count += 1
         
         # 전략 2: 업종 우선
-        print("\n🍴 전략 2: 업종 우선 (지역 30%, 업종 70%)")
+        logger.debug("🍴 전략 2: 업종 우선 (지역 30%, 업종 70%)")
         industry_focused = find_competitors_by_distance(
             db_path, target_lat, target_lng, user_industry,
             limit=20, max_distance=max_distance,
@@ -831,18 +826,18 @@ def find_competitors_diversified(
         count = 0
         for comp in industry_focused:
             if comp.competition_score < min_competition_score:
-                print(f"   ⚠️  [품질미달] {comp.name} - 점수 {comp.competition_score:.3f}")
+                logger.debug(f"   ⚠️  [품질미달] {comp.name} - 점수 {comp.competition_score:.3f}")
                 continue
             
             if comp.place_id not in seen_place_ids and count < 2:
                 comp.match_type = f"업종우선 {comp.match_type}"
                 final_competitors.append(comp)
                 seen_place_ids.add(comp.place_id)
-                print(f"   ✅ {comp.name} - {comp.match_type} (점수:{comp.competition_score:.3f})")
+                logger.debug(f"   ✅ {comp.name} - {comp.match_type} (점수:{comp.competition_score:.3f})")
                 count += 1
         
         # 전략 3: 균형
-        print("\n⚖️  전략 3: 균형 (지역 50%, 업종 50%)")
+        logger.debug("⚖️  전략 3: 균형 (지역 50%, 업종 50%)")
         balanced = find_competitors_by_distance(
             db_path, target_lat, target_lng, user_industry,
             limit=20, max_distance=max_distance,
@@ -853,26 +848,26 @@ def find_competitors_diversified(
         
         for comp in balanced:
             if comp.competition_score < min_competition_score:
-                print(f"   ⚠️  [품질미달] {comp.name} - 점수 {comp.competition_score:.3f}")
+                logger.debug(f"   ⚠️  [품질미달] {comp.name} - 점수 {comp.competition_score:.3f}")
                 continue
             
             if comp.place_id not in seen_place_ids:
                 comp.match_type = f"균형 {comp.match_type}"
                 final_competitors.append(comp)
                 seen_place_ids.add(comp.place_id)
-                print(f"   ✅ {comp.name} - {comp.match_type} (점수:{comp.competition_score:.3f})")
+                logger.debug(f"   ✅ {comp.name} - {comp.match_type} (점수:{comp.competition_score:.3f})")
                 break
     else:
-        print("\n⚠️  좌표 없음 → 텍스트 기반 검색으로 전환")
+        logger.info("⚠️  좌표 없음 → 텍스트 기반 검색으로 전환")
     
     # 5개 안 나왔으면 텍스트 기반 보충
     if len(final_competitors) < 5:
         needed = 5 - len(final_competitors)
         
         if target_lat and target_lng:
-            print(f"\n🔄 품질 기준 통과 {len(final_competitors)}개 → 부족한 {needed}개를 텍스트 기반으로 보충")
+            logger.debug(f"🔄 품질 기준 통과 {len(final_competitors)}개 → 부족한 {needed}개를 텍스트 기반으로 보충")
         else:
-            print(f"\n🔄 좌표 없음 → 5개 전체를 텍스트 기반으로 검색")
+            logger.debug(f"🔄 좌표 없음 → 5개 전체를 텍스트 기반으로 검색")
         
         text_based = find_competitors_smart(
             db_path, user_area, user_industry,
@@ -887,23 +882,21 @@ def find_competitors_diversified(
                 comp.match_type = f"텍스트기반 ({comp.district})"
                 final_competitors.append(comp)
                 seen_place_ids.add(comp.place_id)
-                print(f"   ✅ [보충] {comp.name} - {comp.district} (점수:{comp.competition_score:.3f})")
+                logger.debug(f"   ✅ [보충] {comp.name} - {comp.district} (점수:{comp.competition_score:.3f})")
                 count += 1
     
     # 최종 결과
-    print("\n" + "="*60)
-    print(f"✅ 최종 경쟁사 {len(final_competitors)}개 선정!")
-    print("="*60)
+    logger.info(f"✅ 최종 경쟁사 {len(final_competitors)}개 선정!")
     
     for i, comp in enumerate(final_competitors, 1):
         strategy = comp.match_type.split()[0] if ' ' in comp.match_type else comp.match_type
-        print(f"{i}. [{strategy}] {comp.name}")
-        print(f"   └─ {comp.district}, {comp.industry} | "
-              f"업종:{comp.industry_similarity:.2f}, "
-              f"종합:{comp.competition_score:.3f}")
+        logger.debug(f"{i}. [{strategy}] {comp.name}")
+        logger.debug(f"   └─ {comp.district}, {comp.industry} | "
+                     f"업종:{comp.industry_similarity:.2f}, "
+                     f"종합:{comp.competition_score:.3f}")
     
     if len(final_competitors) < 5:
-        print(f"\n⚠️  주의: {5 - len(final_competitors)}개 부족 (기준을 만족하는 경쟁사가 적음)")
+        logger.warning(f"⚠️  주의: {5 - len(final_competitors)}개 부족 (기준을 만족하는 경쟁사가 적음)")
     
     return final_competitors
 
@@ -911,6 +904,9 @@ def find_competitors_diversified(
 # ==================== 테스트 ====================
 
 if __name__ == "__main__":
+    from log_config import setup_logging
+    setup_logging()
+
     print("\n🧪 테스트: 청담동 프랑스 음식점")
     
     competitors = find_competitors_diversified(
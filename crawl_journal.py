@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# crawl_journal.py - 크롤링 진행 상황 append-only 저널 (turbo_progress.json 스냅샷 + .journal)
+
+import json
+import os
+from pathlib import Path
+
+PROGRESS_FILE = "turbo_progress.json"
+COMPACT_EVERY = 500  # 저널 500줄마다 스냅샷으로 압축
+
+
+class CrawlJournal:
+    """
+    크롤링 진행 저널
+
+    - 이벤트 1건 = 저널 1줄 append (O(1), 전체 파일 재작성 없음)
+    - 완료 쿼리는 set으로 관리 (O(1) 조회)
+    - COMPACT_EVERY줄마다 스냅샷(turbo_progress.json)을 원자적으로 교체 후 저널 비움
+    - 재시작 시 스냅샷 + 저널 재생으로 복구 (잘린 마지막 줄은 무시)
+    """
+
+    def __init__(self, snapshot_file=PROGRESS_FILE, journal_file=None,
+                 compact_every=COMPACT_EVERY, durable=False):
+        self.snapshot_file = Path(snapshot_file)
+        self.journal_file = Path(journal_file or f"{snapshot_file}.journal")
+        self.compact_every = compact_every
+        self.durable = durable  # True면 매 줄 fsync (정전 대비)
+
+        self.completed_queries = set()
+        self.new_stores_count = 0
+        self.total_reviews = 0
+
+        self._seq = 0           # 마지막으로 기록한 이벤트 번호
+        self._snapshot_seq = 0  # 스냅샷에 반영된 이벤트 번호
+        self._fh = None
+
+    # ==================== 복구 ====================
+
+    def load(self):
+        """스냅샷 읽고 저널 재생"""
+        if self.snapshot_file.exists():
+            try:
+                with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                self.completed_queries = set(snapshot.get('completed_queries', []))
+                self.new_stores_count = snapshot.get('new_stores_count', 0)
+                self.total_reviews = snapshot.get('total_reviews', 0)
+                self._snapshot_seq = self._seq = snapshot.get('last_seq', 0)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  스냅샷 로드 실패 (저널만 재생): {e}")
+
+        replayed = 0
+        if self.journal_file.exists():
+            valid_bytes = 0
+            with open(self.journal_file, 'rb') as f:
+                for raw in f:
+                    try:
+                        event = json.loads(raw.decode('utf-8'))
+                    except ValueError:
+                        break  # 크래시로 잘린 마지막 줄
+                    valid_bytes += len(raw)
+                    if event.get('n', 0) <= self._snapshot_seq:
+                        continue  # 이미 스냅샷에 반영됨 (압축 도중 크래시)
+                    self._apply(event)
+                    self._seq = event['n']
+                    replayed += 1
+
+            # 잘린 꼬리를 잘라내야 이어서 append한 줄이 깨지지 않음
+            if valid_bytes < self.journal_file.stat().st_size:
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(valid_bytes)
+
+        return replayed
+
+    def _apply(self, event):
+        if 'q' in event:
+            self.completed_queries.add(event['q'])
+        elif 's' in event:
+            self.new_stores_count += 1
+            self.total_reviews += event.get('r', 0)
+
+    # ==================== 기록 ====================
+
+    def _append(self, event):
+        self._seq += 1
+        event['n'] = self._seq
+        self._apply(event)
+
+        if self._fh is None:
+            self._fh = open(self.journal_file, 'a', encoding='utf-8')
+        self._fh.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._fh.flush()
+        if self.durable:
+            os.fsync(self._fh.fileno())
+
+        if self._seq - self._snapshot_seq >= self.compact_every:
+            self.compact()
+
+    def mark_query_done(self, query):
+        self._append({'q': query})
+
+    def record_store(self, place_id, review_count, query=None):
+        # query는 작업 장부(LedgerShard)와 인터페이스를 맞추기 위한 인자 (저널은 가게 단위만 기록)
+        self._append({'s': place_id, 'r': review_count})
+
+    def is_done(self, query):
+        return query in self.completed_queries
+
+    # ==================== 압축 ====================
+
+    def compact(self):
+        """현재 상태를 스냅샷으로 원자적 교체 후 저널 비우기"""
+        snapshot = {
+            'completed_queries': sorted(self.completed_queries),
+            'new_stores_count': self.new_stores_count,
+            'total_reviews': self.total_reviews,
+            'last_seq': self._seq
+        }
+
+        tmp_file = self.snapshot_file.with_name(self.snapshot_file.name + '.tmp')
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+        except OSError as e:
+            print(f"⚠️  스냅샷 저장 실패 (저널 유지): {e}")
+            return False
+
+        self._snapshot_seq = self._seq
+
+        # 스냅샷이 확정된 뒤에만 저널을 비움 (last_seq로 중복 재생 방지)
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        open(self.journal_file, 'w', encoding='utf-8').close()
+        return True
+
+    def close(self):
+        self.compact()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# crawl_supervisor.py - 크롤러 샤드 프로세스 N개 실행/감시 (공유 작업 장부 기반)
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+from work_ledger import WorkLedger, LEDGER_FILE
+
+DEFAULT_PROCESSES = max(1, (os.cpu_count() or 2) // 2)  # 프로세스마다 브라우저 여러 개라 코어 절반
+MAX_RESTARTS = 5        # 샤드 1개당 재시작 한도
+POLL_SECONDS = 5
+
+
+def shard_main(shard_id, ledger_file, workers):
+    """자식 프로세스 진입점 (Windows spawn에서도 pickle 가능하도록 모듈 최상위)"""
+    import turbo_crawler
+    asyncio.run(turbo_crawler.run_shard(shard_id, ledger_file, workers))
+
+
+def _spawn(shard_id, ledger_file, workers):
+    process = multiprocessing.Process(
+        target=shard_main, args=(shard_id, ledger_file, workers),
+        name=f"crawler-shard-{shard_id}"
+    )
+    process.start()
+    return process
+
+
+def print_stats(ledger):
+    stats = ledger.stats()
+    parts = [f"{status} {info['count']:,}" for status, info in sorted(stats.items())]
+    done = stats.get('done', {})
+    print(f"📊 장부: {' / '.join(parts) or '비어 있음'} | "
+          f"신규 가게 {done.get('new_stores', 0):,} / 리뷰 {done.get('reviews', 0):,}")
+
+
+def supervise(processes, workers, ledger_file):
+    """
+    샤드 프로세스 감시
+
+    - 비정상 종료한 샤드는 장부에 남은 작업이 있으면 재시작
+      (죽은 샤드가 쥐고 있던 임대는 만료되면 다른 샤드가 가져감)
+    - 모든 샤드가 정상 종료하면 끝
+    """
+    ledger = WorkLedger(ledger_file)
+    shards = {i: _spawn(i, ledger_file, workers) for i in range(processes)}
+    restarts = {i: 0 for i in shards}
+    last_stats = 0
+
+    try:
+        while shards:
+            time.sleep(POLL_SECONDS)
+
+            for shard_id, process in list(shards.items()):
+                if process.is_alive():
+                    continue
+
+                process.join()
+                del shards[shard_id]
+
+                if process.exitcode == 0:
+                    print(f"✅ 샤드 {shard_id} 종료")
+                    continue
+
+                print(f"💥 샤드 {shard_id} 비정상 종료 (exit {process.exitcode})")
+                if restarts[shard_id] >= MAX_RESTARTS:
+                    print(f"   ⛔ 재시작 한도 초과 - 샤드 {shard_id} 중단")
+                elif ledger.has_open_work():
+                    restarts[shard_id] += 1
+                    print(f"   🔄 재시작 ({restarts[shard_id]}/{MAX_RESTARTS})")
+                    shards[shard_id] = _spawn(shard_id, ledger_file, workers)
+
+            if time.time() - last_stats >= 60:
+                print_stats(ledger)
+                last_stats = time.time()
+    except KeyboardInterrupt:
+        print("\n⏹️  중단 - 샤드 종료 중...")
+        for process in shards.values():
+            process.terminate()
+        for process in shards.values():
+            process.join()
+
+    print_stats(ledger)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="터보 크롤러 멀티 프로세스 실행기")
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help=f"샤드 프로세스 수 (기본 {DEFAULT_PROCESSES})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="프로세스당 워커 수 (기본 turbo_crawler.PARALLEL_WORKERS)")
+    parser.add_argument('--ledger', default=os.environ.get('CRAWL_LEDGER_FILE', LEDGER_FILE),
+                        help="작업 장부 경로 (여러 서버가 공유하려면 같은 경로 지정)")
+    parser.add_argument('--no-seed', action='store_true',
+                        help="장부 등록 생략 (다른 서버가 이미 등록한 장부에 합류)")
+    parser.add_argument('--seed-only', action='store_true',
+                        help="장부 등록만 하고 종료")
+    args = parser.parse_args()
+
+    import turbo_crawler
+    workers = args.workers or turbo_crawler.PARALLEL_WORKERS
+
+    print(f"""
+╔══════════════════════════════════════════════════════╗
+║   🛰️ 크롤러 슈퍼바이저                               ║
+║   - 프로세스 {args.processes}개 × 워커 {workers}개
+║   - 장부: {args.ledger}
+╚══════════════════════════════════════════════════════╝
+    """)
+
+    if not args.no_seed:
+        seeded = turbo_crawler.seed_ledger(args.ledger)
+        print(f"📋 장부 등록: {seeded:,}개 셀")
+
+    if args.seed_only:
+        print_stats(WorkLedger(args.ledger))
+        return
+
+    supervise(args.processes, workers, args.ledger)
+
+
+if __name__ == "__main__":
+    main()
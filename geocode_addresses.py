@@ -1,88 +1,150 @@
 # -*- coding: utf-8 -*-
 # geocode_addresses.py - DB 주소로 카카오 지오코딩 (병렬 처리)
 
+import logging
 import sqlite3
 import os
 import re
+import time
 import asyncio
 import aiohttp
 from dotenv import load_dotenv
 
+from geocode_cache import ADDRESS_METHODS, GeocodeCache, normalize_address
+from rate_limiter import AdaptiveRateLimiter
+from change_feed import ChangeFeed, KIND_ADDRESS
+from record_replay import recorder
+
 # .env 파일 로드
 load_dotenv()
 
+# 가게별 진행 로그는 동시 처리 중에 나오므로 logger로 (핸들러/레벨은 진입점에서 log_config.setup_logging())
+logger = logging.getLogger(__name__)
+
 DB_FILE = 'seoul_industry_reviews.db'
 KAKAO_REST_API_KEY = os.getenv('KAKAO_REST_API_KEY', '')
 
+# 로컬 가짜 지오코더로 테스트할 때 바꿔 끼움 (예: http://127.0.0.1:8081)
+KAKAO_API_BASE = os.getenv('KAKAO_API_BASE', 'https://dapi.kakao.com').rstrip('/')
+KAKAO_ADDRESS_URL = f"{KAKAO_API_BASE}/v2/local/search/address.json"
+KAKAO_KEYWORD_URL = f"{KAKAO_API_BASE}/v2/local/search/keyword.json"
 
-async def geocode_address_kakao_async(session, address: str, store_name: str = None):
-    """카카오 지오코딩 API로 주소 → 좌표 변환 (비동기)"""
+# 파이프라인 설정
+GEOCODE_RATE = float(os.getenv('KAKAO_GEOCODE_RATE', '10'))  # 초당 API 호출 수
+GEOCODE_CONCURRENCY = 20    # 동시 처리 가게 수
+QUEUE_SIZE = 200            # 생산자 → 소비자 대기열 크기
+WRITE_BATCH = 50            # 좌표 일괄 저장 단위
+WRITE_INTERVAL = 2.0        # 덜 찼어도 이 간격(초)마다 저장
+MAX_THROTTLE_RETRIES = 5    # 429 재시도 한도 (가게 1개당)
+FEED_INTERVAL = 1.0         # 실시간 모드 변경 피드 확인 간격 (초)
+
+
+class KakaoRateLimited(Exception):
+    """카카오 API 429 (요청 한도 초과)"""
+
+    def __init__(self, retry_after=None):
+        super().__init__(f"429 Too Many Requests (retry_after={retry_after})")
+        self.retry_after = retry_after
+
+
+class KakaoAPIError(Exception):
+    """카카오 API 200 아닌 응답 (401 키 오류 / 403 / 5xx 장애) - '없는 주소'와 구분"""
+
+    def __init__(self, status):
+        super().__init__(f"카카오 API 응답 {status}")
+        self.status = status
+
+
+async def _kakao_first_coords(session, url, headers, query, limiter=None):
+    """카카오 로컬 검색 첫 결과 좌표 (결과 없으면 None, 200 아니면 KakaoAPIError)"""
+    if limiter:
+        await limiter.acquire()
+    
+    kakao = recorder.session('kakao_local', session)  # RECORD_REPLAY 녹화/재생 (off면 세션 그대로)
+    async with kakao.get(url, headers=headers, params={"query": query}, timeout=5) as response:
+        if response.status == 429:
+            retry_after = response.headers.get('Retry-After')
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise KakaoRateLimited(retry_after)
+        
+        if limiter:
+            limiter.on_success()
+        
+        if response.status != 200:
+            raise KakaoAPIError(response.status)  # 빈 결과로 취급하면 실패 캐시에 잘못 남음
+        
+        data = await response.json()
+        documents = data.get('documents', [])
+        if documents:
+            first = documents[0]
+            return float(first['y']), float(first['x'])
+    return None
+
+
+async def geocode_address_kakao_detailed(session, address: str, store_name: str = None, limiter=None):
+    """
+    카카오 지오코딩 (주소 → 좌표 + 찾은 방법)
+    
+    Returns:
+        (lat, lng, method) - method: 'address' / 'keyword' / 'simplified'
+        못 찾으면 (None, None, None), 타임아웃/오류면 (None, None, 'error')
+    
+    Raises:
+        KakaoRateLimited: 429 (호출자가 속도를 줄이고 재시도)
+    """
     if not address or not KAKAO_REST_API_KEY:
-        print(f"      ⚠️ API 키 없음")
-        return None, None
+        logger.warning("⚠️ API 키 없음")
+        return None, None, 'error'
+    
+    headers = {
+        "Authorization": f"KakaoAK {KAKAO_REST_API_KEY}"
+    }
     
     try:
         # 방법 1: 주소 검색 API 시도
-        url = "https://dapi.kakao.com/v2/local/search/address.json"
-        headers = {
-            "Authorization": f"KakaoAK {KAKAO_REST_API_KEY}"
-        }
-        params = {"query": address}
-        
-        async with session.get(url, headers=headers, params=params, timeout=5) as response:
-            if response.status == 200:
-                data = await response.json()
-                documents = data.get('documents', [])
-                
-                if documents and len(documents) > 0:
-                    first = documents[0]
-                    lat = float(first['y'])
-                    lng = float(first['x'])
-                    return lat, lng
+        coords = await _kakao_first_coords(session, KAKAO_ADDRESS_URL, headers, address, limiter)
+        if coords:
+            return coords[0], coords[1], 'address'
         
         # 방법 2: 실패하면 키워드 검색 (가게명 + 주소)
         if store_name:
-            url = "https://dapi.kakao.com/v2/local/search/keyword.json"
-            params = {"query": f"{store_name} {address}"}
-            
-            async with session.get(url, headers=headers, params=params, timeout=5) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    documents = data.get('documents', [])
-                    
-                    if documents and len(documents) > 0:
-                        first = documents[0]
-                        lat = float(first['y'])
-                        lng = float(first['x'])
-                        print(f"      💡 키워드 검색으로 발견!")
-                        return lat, lng
+            coords = await _kakao_first_coords(session, KAKAO_KEYWORD_URL, headers, f"{store_name} {address}", limiter)
+            if coords:
+                logger.debug("💡 키워드 검색으로 발견: %s", address)
+                return coords[0], coords[1], 'keyword'
         
         # 방법 3: 주소 일부만으로 재시도 (건물번호 제거)
         simplified = re.sub(r'\s+\d+$', '', address)
         
         if simplified != address:
-            params = {"query": simplified}
-            async with session.get("https://dapi.kakao.com/v2/local/search/address.json", headers=headers, params=params, timeout=5) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    documents = data.get('documents', [])
-                    
-                    if documents and len(documents) > 0:
-                        first = documents[0]
-                        lat = float(first['y'])
-                        lng = float(first['x'])
-                        print(f"      💡 단순화된 주소로 발견!")
-                        return lat, lng
+            coords = await _kakao_first_coords(session, KAKAO_ADDRESS_URL, headers, simplified, limiter)
+            if coords:
+                logger.debug("💡 단순화된 주소로 발견: %s", address)
+                return coords[0], coords[1], 'simplified'
         
-        print(f"      ⚠️ 모든 방법 실패")
-        return None, None
+        logger.debug("⚠️ 모든 방법 실패: %s", address)
+        return None, None, None
     
+    except KakaoRateLimited:
+        raise
+    except KakaoAPIError as e:
+        logger.warning("⚠️ %s: %s", e, address)
+        return None, None, 'error'
     except asyncio.TimeoutError:
-        print(f"      ⚠️ 타임아웃")
-        return None, None
+        logger.warning("⚠️ 타임아웃: %s", address)
+        return None, None, 'error'
     except Exception as e:
-        print(f"      ⚠️ 오류: {e}")
-        return None, None
+        logger.warning("⚠️ 오류: %s (%s)", e, address)
+        return None, None, 'error'
+
+
+async def geocode_address_kakao_async(session, address: str, store_name: str = None):
+    """카카오 지오코딩 API로 주소 → 좌표 변환 (비동기)"""
+    lat, lng, _ = await geocode_address_kakao_detailed(session, address, store_name)
+    return lat, lng
 
 
 def get_stores_with_address_no_coords():
@@ -113,59 +175,271 @@ def get_stores_with_address_no_coords():
     return stores
 
 
-def batch_update_coords(results):
-    """배치로 좌표 일괄 저장"""
-    if not results:
+def batch_update_coords(results, db_file=None):
+    """배치로 좌표 일괄 저장 (executemany, 트랜잭션 1번)"""
+    rows = [
+        (result['latitude'], result['longitude'], result['place_id'])
+        for result in results or []
+        if result and result.get('latitude') and result.get('longitude')
+    ]
+    if not rows:
         return 0
     
     try:
-        conn = sqlite3.connect(DB_FILE, timeout=30)
-        cursor = conn.cursor()
-        
-        for result in results:
-            if result and result.get('latitude') and result.get('longitude'):
-                cursor.execute("""
-                    UPDATE stores
-                    SET latitude = ?, longitude = ?
-                    WHERE place_id = ?
-                """, (result['latitude'], result['longitude'], result['place_id']))
-        
+        conn = sqlite3.connect(db_file or DB_FILE, timeout=30)
+        conn.executemany("""
+            UPDATE stores
+            SET latitude = ?, longitude = ?
+            WHERE place_id = ?
+        """, rows)
         conn.commit()
         conn.close()
-        return len([r for r in results if r and r.get('latitude')])
+        return len(rows)
         
     except Exception as e:
         print(f"\n❌ 배치 저장 실패: {e}")
         return 0
 
 
-async def geocode_single_store(session, store, index, total):
-    """단일 가게 지오코딩"""
+async def geocode_single_store(session, store, index, total, cache=None, geocode_fn=None):
+    """
+    단일 가게 지오코딩 (캐시 우선)
+    
+    geocode_fn(session, address, store_name) → (lat, lng, method) 로 바꿔 끼울 수 있음 (테스트용 가짜 지오코더)
+    """
     place_id = store['place_id']
     name = store['name']
     address = store['address']
     district = store['district']
     
-    print(f"[{index}/{total}] 📍 {name} ({district})")
-    print(f"   주소: {address}")
+    logger.debug("[%s/%s] 📍 %s (%s) 주소: %s", index, total, name, district, address)
+    
+    # 🔥 캐시 먼저 (같은 건물/도로명 주소는 API 호출 없음)
+    # 캐시는 SQLite 동기 호출 → 스레드에서 (이벤트 루프에서 하면 다른 가게 요청이 전부 멈춤)
+    cached = await asyncio.to_thread(cache.lookup, address, name) if cache else None
+    if cached:
+        latitude, longitude, method = cached
+        if latitude is None:
+            logger.debug("⏭️  최근 실패한 주소 (재시도 대기): %s", address)
+            return None
+        logger.debug("♻️  캐시 좌표: (%.6f, %.6f) [%s] %s", latitude, longitude, method, name)
+        return {
+            'place_id': place_id,
+            'latitude': latitude,
+            'longitude': longitude,
+            'method': method
+        }
     
     # 지오코딩 (가게명도 함께 전달)
-    print(f"   🌍 좌표 변환 중...")
-    latitude, longitude = await geocode_address_kakao_async(session, address, name)
+    geocode_fn = geocode_fn or geocode_address_kakao_detailed
+    latitude, longitude, method = await geocode_fn(session, address, name)
     
     if not latitude or not longitude:
-        print(f"      ❌ 좌표 변환 실패")
+        if cache and method is None:
+            await asyncio.to_thread(cache.store_negative, address, name)  # 일시 오류('error')는 캐시하지 않음
+        logger.debug("❌ 좌표 변환 실패: %s (%s)", name, address)
         return None
     
-    print(f"      ✅ 좌표: ({latitude:.6f}, {longitude:.6f})")
+    if cache:
+        await asyncio.to_thread(cache.store, address, latitude, longitude, method, name)
+    
+    logger.debug("✅ 좌표: (%.6f, %.6f) %s", latitude, longitude, name)
     
     return {
         'place_id': place_id,
         'latitude': latitude,
-        'longitude': longitude
+        'longitude': longitude,
+        'method': method
     }
 
 
+
+
+# ==================== 스트리밍 파이프라인 ====================
+
+class CoordWriter:
+    """좌표를 모아서 executemany로 일괄 저장 (WRITE_BATCH개 또는 WRITE_INTERVAL초마다)"""
+    
+    def __init__(self, db_file=None, batch_size=WRITE_BATCH, interval=WRITE_INTERVAL):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.interval = interval
+        self.buffer = []
+        self.saved = 0
+        self._full = asyncio.Event()
+    
+    def add(self, result):
+        self.buffer.append(result)
+        if len(self.buffer) >= self.batch_size:
+            self._full.set()
+    
+    async def flush(self):
+        rows, self.buffer = self.buffer, []
+        self._full.clear()
+        if rows:
+            saved = await asyncio.to_thread(batch_update_coords, rows, self.db_file)
+            self.saved += saved
+            print(f"   💾 좌표 저장: {saved}개 (누적 {self.saved}개)")
+    
+    async def run(self, stop):
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+        await self.flush()
+
+
+def get_stores_needing_coords(place_ids):
+    """place_id 목록 중 아직 좌표가 필요한 가게 (변경 피드 → 가게 정보)"""
+    if not place_ids:
+        return []
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    placeholders = ','.join('?' * len(place_ids))
+    rows = conn.execute(f"""
+        SELECT place_id, name, address, district
+        FROM stores
+        WHERE place_id IN ({placeholders})
+          AND address IS NOT NULL 
+          AND address != ''
+          AND (latitude IS NULL OR longitude IS NULL)
+    """, place_ids).fetchall()
+    conn.close()
+    return [
+        {'place_id': row[0], 'name': row[1], 'address': row[2], 'district': row[3]}
+        for row in rows
+    ]
+
+
+async def feed_new_stores(feed, interval=FEED_INTERVAL):
+    """
+    실시간 모드 생산자
+    
+    시작할 때 한 번만 전체 조회로 따라잡고, 이후엔 변경 피드의 '주소 생김' 이벤트만 읽음
+    (stores 전체를 주기적으로 다시 스캔하지 않음)
+    """
+    feed.skip_to_head()  # 스캔 전에 커서를 옮겨야 스캔 도중 생긴 변경도 놓치지 않음
+    backlog = get_stores_with_address_no_coords()
+    if backlog:
+        print(f"\n🔍 밀린 가게: {len(backlog)}개")
+    for store in backlog:
+        yield store
+    
+    async for rows in feed.follow(interval):
+        place_ids = list(dict.fromkeys(place_id for _, place_id, _ in rows))
+        stores = get_stores_needing_coords(place_ids)
+        if stores:
+            print(f"\n🔍 새로 발견: {len(stores)}개")
+        for store in stores:
+            yield store
+
+
+async def geocode_pipeline(source, session=None, cache=None, geocode_fn=None, limiter=None,
+                           concurrency=GEOCODE_CONCURRENCY, db_file=None):
+    """
+    스트리밍 지오코딩
+    
+    생산자 → 크기 제한 큐 → 소비자 N개 (토큰 버킷으로 API 속도 고정, 429면 감속) → 일괄 저장
+    느린 요청 하나가 다른 가게를 붙잡지 않음 (배치 단위 대기 없음)
+    
+    Args:
+        source: 가게 dict 목록 또는 async iterable (실시간 모드는 끝나지 않음)
+        geocode_fn: (session, address, store_name) → (lat, lng, method), 기본은 카카오
+    
+    Returns:
+        통계 dict
+    """
+    limiter = limiter or AdaptiveRateLimiter(GEOCODE_RATE)
+    if geocode_fn is None:
+        async def geocode_fn(session, address, store_name):
+            return await geocode_address_kakao_detailed(session, address, store_name, limiter=limiter)
+    
+    total = len(source) if hasattr(source, '__len__') else '∞'
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    writer = CoordWriter(db_file)
+    inflight = {}  # 정규화 주소 → Future (같은 주소 동시 조회는 1번으로)
+    stats = {'queued': 0, 'success': 0, 'fail': 0, 'throttled': 0, 'coalesced': 0}
+    
+    async def produce():
+        index = 0
+        if hasattr(source, '__aiter__'):
+            async for store in source:
+                index += 1
+                await queue.put((index, store))
+        else:
+            for store in source:
+                index += 1
+                await queue.put((index, store))
+        stats['queued'] = index
+        for _ in range(concurrency):
+            await queue.put(None)
+    
+    async def geocode_one(index, store):
+        key = normalize_address(store['address']) or store['place_id']
+        shared = inflight.get(key)
+        if shared is not None:
+            result = await shared
+            # 주소 검색으로 찾은 좌표만 공유 (키워드 결과/실패는 가게명에 따라 다름 → 이 가게로 다시)
+            if result and result.get('method') in ADDRESS_METHODS:
+                stats['coalesced'] += 1
+                return {**result, 'place_id': store['place_id']}
+        
+        future = asyncio.get_running_loop().create_future()
+        inflight[key] = future
+        result = None
+        try:
+            for _ in range(MAX_THROTTLE_RETRIES + 1):
+                try:
+                    result = await geocode_single_store(session, store, index, total, cache, geocode_fn)
+                    break
+                except KakaoRateLimited as e:
+                    stats['throttled'] += 1
+                    new_rate = limiter.on_throttle(e.retry_after)
+                    logger.warning("🐢 429 → 초당 %.1f회로 감속 후 재시도", new_rate)
+            return result
+        finally:
+            if inflight.get(key) is future:
+                del inflight[key]
+            future.set_result(result)
+    
+    async def consume():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, store = item
+            try:
+                result = await geocode_one(index, store)
+            except Exception as e:
+                logger.warning("❌ 오류: %s (%s)", e, store.get('name'))
+                result = None
+            
+            if result:
+                stats['success'] += 1
+                writer.add(result)
+            else:
+                stats['fail'] += 1
+    
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession()
+    
+    stop = asyncio.Event()
+    writer_task = asyncio.create_task(writer.run(stop))
+    try:
+        await asyncio.gather(produce(), *[consume() for _ in range(concurrency)])
+    finally:
+        stop.set()
+        await writer_task
+        if own_session:
+            await session.close()
+    
+    stats['saved'] = writer.saved
+    stats['rate'] = limiter.rate
+    return stats
+
+
 async def main():
     """메인 실행 함수"""
     print("\n" + "="*60)
@@ -190,136 +464,69 @@ async def main():
     # 실시간 모드 선택
     mode = input(f"\n실행 모드를 선택하세요:\n  1. 일회성 (현재 좌표 없는 것만)\n  2. 실시간 감지 (계속 확인하면서 처리)\n선택 (1/2, 기본값=1): ").strip()
     
+    cache = GeocodeCache(DB_FILE)
+    
     if mode == '2':
         print("\n⚡ 실시간 감지 모드 - 크롤링이 주소 추가하면 자동으로 지오코딩!")
+        print(f"⚡ 초당 {GEOCODE_RATE:.0f}회 / 동시 {GEOCODE_CONCURRENCY}개")
         print("💡 종료하려면 Ctrl+C\n")
         
-        total_processed = 0
-        
-        async with aiohttp.ClientSession() as session:
-            while True:
-                # 주기적으로 DB 재조회
-                stores = get_stores_with_address_no_coords()
-                
-                if not stores:
-                    print(f"[{total_processed}개 완료] 대기 중... (10초 후 재확인)")
-                    await asyncio.sleep(10)
-                    continue
-                
-                print(f"\n🔍 새로 발견: {len(stores)}개")
-                
-                # 병렬 처리
-                parallel_count = 10
-                success_count = 0
-                fail_count = 0
-                
-                for batch_start in range(0, len(stores), parallel_count):
-                    batch = stores[batch_start:batch_start + parallel_count]
-                    
-                    tasks = []
-                    for i, store in enumerate(batch):
-                        index = total_processed + batch_start + i + 1
-                        task = geocode_single_store(session, store, index, total_processed + len(stores))
-                        tasks.append(task)
-                    
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-                    
-                    valid_results = []
-                    for result in results:
-                        if isinstance(result, Exception):
-                            fail_count += 1
-                        elif result:
-                            valid_results.append(result)
-                        else:
-                            fail_count += 1
-                    
-                    if valid_results:
-                        saved = batch_update_coords(valid_results)
-                        success_count += saved
-                    
-                    await asyncio.sleep(0.5)
-                
-                total_processed += success_count
-                print(f"✅ 배치 완료: +{success_count}개 (총 {total_processed}개)")
-                
-                # 10초 대기 후 재확인
-                await asyncio.sleep(10)
+        feed = ChangeFeed('geocoder', DB_FILE, kinds=[KIND_ADDRESS])
+        await geocode_pipeline(feed_new_stores(feed), cache=cache)
+        return
+    
+    # 일회성 모드
+    stores = get_stores_with_address_no_coords()
+    
+    if not stores:
+        print("\n✅ 모든 가게에 좌표가 있습니다!")
+        return
     
+    print(f"\n📊 좌표 없는 가게: {len(stores):,}개")
+    print(f"⚡ 스트리밍 처리: 초당 {GEOCODE_RATE:.0f}회 / 동시 {GEOCODE_CONCURRENCY}개")
+    print(f"⚠️  예상 소요 시간: 최대 약 {len(stores) / GEOCODE_RATE / 60:.1f}분 (캐시 적중 시 더 빠름)")
+    
+    limit_input = input(f"\n몇 개까지 업데이트하시겠습니까? (전체=all, 기본값=100): ").strip()
+    
+    if limit_input == '':
+        limit = 100
+    elif limit_input.lower() == 'all':
+        limit = len(stores)
     else:
-        # 기존 일회성 모드
-        stores = get_stores_with_address_no_coords()
-        
-        if not stores:
-            print("\n✅ 모든 가게에 좌표가 있습니다!")
-            return
-        
-        print(f"\n📊 좌표 없는 가게: {len(stores):,}개")
-        
-        parallel_count = 10
-        print(f"⚡ 병렬 처리: {parallel_count}개씩 동시 실행")
-        print(f"⚠️  예상 소요 시간: 약 {len(stores) * 1 / 60 / parallel_count:.1f}분")
-        
-        limit_input = input(f"\n몇 개까지 업데이트하시겠습니까? (전체=all, 기본값=100): ").strip()
-        
-        if limit_input == '':
+        try:
+            limit = int(limit_input)
+        except:
             limit = 100
-        elif limit_input.lower() == 'all':
-            limit = len(stores)
-        else:
-            try:
-                limit = int(limit_input)
-            except:
-                limit = 100
-        
-        stores = stores[:limit]
-        
-        print(f"\n🚀 {len(stores)}개 가게 지오코딩 시작! (병렬 {parallel_count}개)\n")
-        
-        success_count = 0
-        fail_count = 0
-        
-        async with aiohttp.ClientSession() as session:
-            for batch_start in range(0, len(stores), parallel_count):
-                batch = stores[batch_start:batch_start + parallel_count]
-                
-                tasks = []
-                for i, store in enumerate(batch):
-                    index = batch_start + i + 1
-                    task = geocode_single_store(session, store, index, len(stores))
-                    tasks.append(task)
-                
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                valid_results = []
-                for result in results:
-                    if isinstance(result, Exception):
-                        print(f"\n      ❌ 오류: {result}")
-                        fail_count += 1
-                    elif result:
-                        valid_results.append(result)
-                    else:
-                        fail_count += 1
-                
-                if valid_results:
-                    saved = batch_update_coords(valid_results)
-                    success_count += saved
-                    print(f"\n   💾 배치 저장 완료: {saved}개\n")
-                
-                if batch_start + parallel_count < len(stores):
-                    await asyncio.sleep(0.5)
-        
-        print("\n" + "="*60)
-        print("✅ 지오코딩 완료!")
-        print("="*60)
-        print(f"   성공: {success_count}개")
-        print(f"   실패: {fail_count}개")
-        print(f"   총: {success_count + fail_count}개")
-        
-        if success_count + fail_count > 0:
-            print(f"   성공률: {success_count/(success_count+fail_count)*100:.1f}%")
-        
-        print("="*60)
+    
+    stores = stores[:limit]
+    
+    print(f"\n🚀 {len(stores)}개 가게 지오코딩 시작!\n")
+    
+    started = time.perf_counter()
+    stats = await geocode_pipeline(stores, cache=cache)
+    elapsed = time.perf_counter() - started
+    
+    success_count = stats['success']
+    fail_count = stats['fail']
+    
+    print("\n" + "="*60)
+    print("✅ 지오코딩 완료!")
+    print("="*60)
+    print(f"   성공: {success_count}개 (저장 {stats['saved']}개)")
+    print(f"   실패: {fail_count}개")
+    print(f"   총: {success_count + fail_count}개 ({elapsed:.1f}초)")
+    print(f"   {cache.stats_text()} / 같은 주소 합침 {stats['coalesced']}")
+    if stats['throttled']:
+        print(f"   429: {stats['throttled']}회 (최종 초당 {stats['rate']:.1f}회)")
+    
+    if success_count + fail_count > 0:
+        print(f"   성공률: {success_count/(success_count+fail_count)*100:.1f}%")
+    
+    print("="*60)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    from log_config import setup_logging
+    setup_logging()
+
+    asyncio.run(main())
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# geocode_cache.py - 정규화 주소 → 좌표 캐시 (SQLite, 실패 결과는 retry_after까지 보관)
+
+import re
+import sqlite3
+import time
+import unicodedata
+
+DB_FILE = 'seoul_industry_reviews.db'
+NEGATIVE_RETRY_SECONDS = 7 * 24 * 3600   # 못 찾은 주소는 1주 뒤 재시도
+ADDRESS_METHODS = ('address', 'simplified')  # 주소만으로 찾은 결과 (가게명 무관 → 같은 주소 가게끼리 공유)
+
+# 시/도 표기 통일
+_REGION_ALIASES = {
+    '서울특별시': '서울',
+    '서울시': '서울',
+}
+
+
+def normalize_address(address):
+    """
+    같은 건물/도로명 주소를 같은 키로
+
+    "서울특별시  강남구 테헤란로 123 (역삼동) 2층" → "서울 강남구 테헤란로 123"
+    """
+    if not address:
+        return ''
+
+    text = unicodedata.normalize('NFKC', address).strip()
+    text = re.sub(r'\([^)]*\)', ' ', text)                           # (역삼동), (지하)
+    text = re.sub(r'(지하\s*)?\d+\s*층.*$', '', text)                # 2층, 지하1층 이하
+    text = re.sub(r'\s(B\d+|\d+\s*호|[A-Z]?\d+-?\d*\s*호).*$', '', text)  # B1, 101호
+    text = text.replace(',', ' ')
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    parts = text.split(' ')
+    if parts and parts[0] in _REGION_ALIASES:
+        parts[0] = _REGION_ALIASES[parts[0]]
+    return ' '.join(parts)
+
+
+def cache_key(address, store_name=None):
+    """
+    가게명에 따라 달라지는 결과(키워드 검색 성공, 모든 방법 실패)용 키
+
+    "서울 강남구 테헤란로 123#스타벅스 역삼점" - 가게명 없으면 주소 키와 같음
+    """
+    key = normalize_address(address)
+    if not key or not store_name:
+        return key
+    name = re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', store_name)).strip()
+    return f"{key}#{name}" if name else key
+
+
+class GeocodeCache:
+    """
+    지오코딩 결과 캐시
+
+    - 성공: (위도, 경도, 방법) 영구 보관
+      주소 검색(address/simplified)은 주소 키, 키워드 검색(가게명 + 주소)은 주소#가게명 키
+      (같은 건물의 다른 가게에 키워드 결과를 쓰면 엉뚱한 가게 좌표가 됨)
+    - 실패(모든 방법으로 못 찾음): 주소#가게명 키로, retry_after 전까지는 API 호출 생략
+      (키워드 검색은 가게명마다 다르므로 한 가게가 실패해도 같은 주소의 다른 가게는 시도)
+    - 타임아웃/네트워크 오류는 캐시하지 않음
+    """
+
+    def __init__(self, db_file=DB_FILE, negative_retry_seconds=NEGATIVE_RETRY_SECONDS):
+        self.db_file = db_file
+        self.negative_retry_seconds = negative_retry_seconds
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                address_key TEXT PRIMARY KEY,
+                latitude REAL,
+                longitude REAL,
+                method TEXT,
+                updated_at REAL NOT NULL,
+                retry_after REAL
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    # ==================== 조회 ====================
+
+    def _rows(self, keys, now):
+        """키 목록 조회 → {key: (lat, lng, method)} (만료 안 된 실패 캐시는 (None, None, None))"""
+        found = {}
+        conn = self._connect()
+        for start in range(0, len(keys), 500):  # SQLite 변수 개수 제한
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(f"""
+                SELECT address_key, latitude, longitude, method, retry_after
+                FROM geocode_cache WHERE address_key IN ({placeholders})
+            """, chunk).fetchall()
+
+            for key, lat, lng, method, retry_after in rows:
+                if lat is not None and lng is not None:
+                    found[key] = (lat, lng, method)
+                elif retry_after and retry_after > now:
+                    found[key] = (None, None, None)
+        conn.close()
+        return found
+
+    def _count(self, result):
+        if result is None:
+            self.misses += 1
+        elif result[0] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+
+    def lookup_many(self, addresses, now=None):
+        """
+        주소 목록 일괄 조회 (가게명 없이 - 주소 검색 결과만)
+
+        Returns:
+            {address_key: (lat, lng, method)} - 실패 캐시는 (None, None, None)
+            만료된 실패 캐시/미등록 주소/키워드 검색 결과는 결과에 없음
+        """
+        now = now or time.time()
+        keys = sorted({normalize_address(a) for a in addresses if a})
+        found = {
+            key: value for key, value in self._rows(keys, now).items()
+            if value[0] is None or value[2] in ADDRESS_METHODS
+        }
+        for key in keys:
+            self._count(found.get(key))
+        return found
+
+    def lookup(self, address, store_name=None, now=None):
+        """
+        가게 하나 조회
+
+        주소 검색 결과(주소 키)가 있으면 그것, 없으면 이 가게명의 키워드 결과/실패 캐시
+        """
+        if not store_name:
+            return self.lookup_many([address], now).get(normalize_address(address))
+
+        address_key, named_key = normalize_address(address), cache_key(address, store_name)
+        rows = self._rows([address_key, named_key], now or time.time())
+        shared = rows.get(address_key)
+        if shared and shared[0] is not None and shared[2] in ADDRESS_METHODS:
+            result = shared
+        else:
+            result = rows.get(named_key)
+        self._count(result)
+        return result
+
+    # ==================== 저장 ====================
+
+    def store(self, address, latitude, longitude, method, store_name=None):
+        key = normalize_address(address) if method in ADDRESS_METHODS else cache_key(address, store_name)
+        self._upsert(key, latitude, longitude, method, None)
+
+    def store_negative(self, address, store_name=None, retry_seconds=None):
+        retry_seconds = retry_seconds or self.negative_retry_seconds
+        self._upsert(cache_key(address, store_name), None, None, None, time.time() + retry_seconds)
+
+    def _upsert(self, key, latitude, longitude, method, retry_after):
+        if not key:
+            return
+        conn = self._connect()
+        conn.execute("""
+            INSERT INTO geocode_cache (address_key, latitude, longitude, method, updated_at, retry_after)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(address_key) DO UPDATE SET
+                latitude = excluded.latitude,
+                longitude = excluded.longitude,
+                method = excluded.method,
+                updated_at = excluded.updated_at,
+                retry_after = excluded.retry_after
+        """, (key, latitude, longitude, method, time.time(), retry_after))
+        conn.commit()
+        conn.close()
+
+    def stats_text(self):
+        return f"캐시 적중 {self.hits} / 실패 캐시 {self.negative_hits} / 신규 {self.misses}"
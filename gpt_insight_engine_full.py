@@ -2,16 +2,14 @@
 # gpt_insight_engine.py - GPT 기반 인사이트 생성 (실전 인사이트 강화 + 사장님 버전)
 
 import os
-import json
 from datetime import datetime
-from openai import OpenAI
+
+from llm_gateway import gateway
 
 api_key = os.getenv('OPENAI_API_KEY')
 if not api_key:
     raise ValueError("⚠️ OPENAI_API_KEY 환경변수가 설정되지 않았습니다!")
 
-client = OpenAI(api_key=api_key)
-
 
 # ==================== 사장님용 간소화 리포트 ====================
 
@@ -587,10 +585,16 @@ class InsightAnalyzer:
         self.temperature = temperature
         self.max_tokens = max_tokens
     
-    def analyze(self, prompt):
-        """GPT 분석 실행"""
+    def analyze(self, prompt, on_field=None):
+        """
+        GPT 분석 실행 (스트리밍 - 최상위 필드가 닫힐 때마다 on_field(key, value))
+        
+        길이 제한으로 잘리면 완성된 필드는 두고 나머지만 이어서 요청
+        """
         try:
-            response = client.chat.completions.create(
+            return gateway.stream_json(
+                stage='insight_report',
+                on_field=on_field,
                 model=self.model,
                 messages=[
                     {
@@ -647,8 +651,6 @@ class InsightAnalyzer:
                 response_format={"type": "json_object"}
             )
             
-            return json.loads(response.choices[0].message.content)
-            
         except Exception as e:
             print(f"❌ GPT 분석 실패: {e}")
             return None
@@ -733,7 +735,7 @@ def generate_insight_report(target_store, target_reviews, competitors,
     
     # GPT 분석
     analyzer = InsightAnalyzer(model="gpt-4o", temperature=0.0, max_tokens=8000)
-    result = analyzer.analyze(prompt)
+    result = analyzer.analyze(prompt, on_field=lambda key, _: print(f"   ✅ {key} 수신"))
     
     if not result:
         return "❌ 분석 실패"
@@ -4,34 +4,68 @@
 import os
 import json
 import asyncio
+import contextvars
 import re
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openai import OpenAI
-from anthropic import Anthropic
 
-# API 클라이언트
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-anthropic_client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+from llm_gateway import batch_active, gateway, PRIORITY_LOW
+from llm_usage import count_tokens
+from prompt_generator import anthropic_system_blocks
+from review_sampler import select_reviews
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 🔥 리뷰 샘플 토큰 예산 (기존: 앞 150개 × 200자 ≈ 2만 토큰)
+CLASSIFY_TOKEN_BUDGET = 12000       # 1단계 분류에 넣을 우리 가게 리뷰
+CLASSIFY_MAX_CHARS = 200            # 1단계 분류에 넣을 리뷰 하나 최대 글자 수
+COMPETITOR_TOKEN_BUDGET = 500       # Claude에 넣을 경쟁사 1곳당 리뷰
+
+# 🔥 전체 리뷰 map-reduce 모드 ('sample': 샘플 3단계 / 'mapreduce': 전체 / 'auto': 샘플 예산에 다 안 들어가면 전체)
+# auto 기준은 리뷰 수가 아니라 토큰 - 크롤링 150개(mvp_analyzer.TARGET_REVIEWS)라도 리뷰가 길면
+# CLASSIFY_TOKEN_BUDGET을 넘어 샘플 경로에서 일부가 빠지므로 그때부터 전체 분석
+REVIEW_ANALYSIS_MODE = os.getenv('REVIEW_ANALYSIS_MODE', 'auto')
+MAPREDUCE_CHUNK_TOKENS = 20000      # 청크 하나에 넣을 리뷰 토큰
+MAPREDUCE_CONCURRENCY = int(os.getenv('MAPREDUCE_CONCURRENCY', '32'))
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2}
+
+# 청크마다 이름이 달라지면 합칠 수 없으므로 측면 이름은 이 목록에서만 고르게 함
+ASPECTS = [
+    '맛', '양', '가격', '서비스', '대기', '속도', '분위기', '청결',
+    '음식 온도', '메뉴 구성', '주차/접근성', '예약', '포장/배달', '기타'
+]
+
+
+def _notify(on_progress, message, **data):
+    """진행 콜백 호출 (없으면 무시)"""
+    if on_progress is not None:
+        on_progress(message, **data)
 
 
 # ==================== STEP 1: GPT-4o 3단계 전처리 ====================
 
-def preprocess_with_gpt(target_store, target_reviews, competitors, competitor_reviews, statistical_comparison):
-    """GPT-4o: 3단계 전처리 (1:분류 → 2:부정 재검증 → 3:추출)"""
+def preprocess_with_gpt(target_store, target_reviews, competitors, competitor_reviews, statistical_comparison,
+                        on_progress=None):
+    """
+    GPT-4o: 3단계 전처리 (1:분류 → 2:부정 재검증 → 3:추출)
+
+    on_progress(message, **data): 단계가 끝날 때마다 (작업 진행 이벤트용, 작업 스레드에서 호출됨)
+    """
     
-    print(f"\n{'='*60}")
-    print(f"⚡ STEP 1: GPT-4o 전처리 (3단계 검증)")
-    print(f"{'='*60}")
+    logger.info(f"⚡ STEP 1: GPT-4o 전처리 (3단계 검증)")
     
-    # 150개 리뷰
-    sample_reviews = target_reviews[:150]
-    print(f"   📝 분석 리뷰: {len(sample_reviews)}개")
+    # 🔥 토큰 예산 안에서 감정/주제/최신순 골고루 (앞에서부터 자르지 않음)
+    sample_reviews = select_reviews(target_reviews, CLASSIFY_TOKEN_BUDGET, max_chars=CLASSIFY_MAX_CHARS, label='우리 가게 리뷰')
+    logger.debug(f"   📝 분석 리뷰: {len(sample_reviews)}개")
     
     # ========== 1단계: 리뷰별 긍/부정 분류 (넓게) ==========
-    print(f"\n   🔍 1단계: 긍정/부정 분류 (부정 넓게 잡기)...")
+    logger.debug(f"   🔍 1단계: 긍정/부정 분류 (부정 넓게 잡기)...")
     
     reviews_for_classification = "\n".join([
-        f"[리뷰#{i+1}] {r['content'][:200]}" 
+        f"[리뷰#{i+1}] {r['content']}" 
         for i, r in enumerate(sample_reviews)
     ])
     
@@ -70,7 +104,8 @@ def preprocess_with_gpt(target_store, target_reviews, competitors, competitor_re
     
     try:
         # 1단계 실행
-        response_1 = openai_client.chat.completions.create(
+        classification_result = gateway.stream_json(
+            stage='gpt_classify',
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "리뷰 분석 전문가. 부정 신호를 놓치지 마세요."},
@@ -81,16 +116,14 @@ def preprocess_with_gpt(target_store, target_reviews, competitors, competitor_re
             response_format={"type": "json_object"}
         )
         
-        classification_result = json.loads(response_1.choices[0].message.content)
         summary = classification_result.get('요약', {})
         
-        print(f"      ✅ 1단계 완료")
-        print(f"         부정: {summary.get('부정', 0)}개")
-        print(f"         긍정: {summary.get('긍정', 0)}개")
-        print(f"         중립: {summary.get('중립', 0)}개")
+        logger.info(f"      ✅ 1단계 완료 (부정 {summary.get('부정', 0)}개, "
+                    f"긍정 {summary.get('긍정', 0)}개, 중립 {summary.get('중립', 0)}개)")
+        _notify(on_progress, '🔍 리뷰 분류 완료 (1/3)', negative=summary.get('부정', 0))
         
         # ========== 2단계: 부정 리뷰만 재검증 (오탐 제거!) ==========
-        print(f"\n   🛡️  2단계: 부정 리뷰 재검증 (오탐 제거)...")
+        logger.debug(f"   🛡️  2단계: 부정 리뷰 재검증 (오탐 제거)...")
         
         classified_reviews = classification_result.get('분류결과', [])
         negative_reviews_for_verification = []
@@ -163,7 +196,8 @@ def preprocess_with_gpt(target_store, target_reviews, competitors, competitor_re
 **규칙**: 50개 중 1개 오탐도 안됨! 확실한 부정만 남기기!
 """
         
-        response_2 = openai_client.chat.completions.create(
+        verification_result = gateway.stream_json(
+            stage='gpt_verify',
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "엄격한 검증자. 오탐을 절대 허용하지 마세요."},
@@ -174,15 +208,14 @@ def preprocess_with_gpt(target_store, target_reviews, competitors, competitor_re
             response_format={"type": "json_object"}
         )
         
-        verification_result = json.loads(response_2.choices[0].message.content)
         verification_summary = verification_result.get('요약', {})
         
-        print(f"      ✅ 2단계 완료")
-        print(f"         진짜 부정: {verification_summary.get('진짜부정', 0)}개")
-        print(f"         오탐 제거: {verification_summary.get('오탐제거', 0)}개")
+        logger.info(f"      ✅ 2단계 완료 (진짜 부정 {verification_summary.get('진짜부정', 0)}개, "
+                    f"오탐 제거 {verification_summary.get('오탐제거', 0)}개)")
+        _notify(on_progress, '🛡️ 부정 리뷰 재검증 완료 (2/3)', verified=verification_summary.get('진짜부정', 0))
         
         # ========== 3단계: 검증된 부정으로 장단점 추출 ==========
-        print(f"\n   📊 3단계: 장단점 추출...")
+        logger.debug(f"   📊 3단계: 장단점 추출...")
         
         # 최종 부정/긍정 리스트 생성
         verified_negatives = []
@@ -241,10 +274,11 @@ def preprocess_with_gpt(target_store, target_reviews, competitors, competitor_re
   ]
 }}
 
-**규칙**: 비율 = (count / 150) * 100, 리뷰 번호 필수
+**규칙**: 비율 = (count / {len(sample_reviews)}) * 100, 리뷰 번호 필수
 """
         
-        response_3 = openai_client.chat.completions.create(
+        result = gateway.stream_json(
+            stage='gpt_extract',
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "리뷰 분석 전문가. JSON만 출력."},
@@ -255,79 +289,215 @@ def preprocess_with_gpt(target_store, target_reviews, competitors, competitor_re
             response_format={"type": "json_object"}
         )
         
-        result = json.loads(response_3.choices[0].message.content)
-        print(f"      ✅ 3단계 완료")
-        print(f"         🔴 치명적 단점: {len(result.get('치명적_단점', []))}개")
-        print(f"         ⚠️  일반 단점: {len(result.get('단점', []))}개")
-        print(f"         ✅ 장점: {len(result.get('장점', []))}개")
+        logger.info(f"      ✅ 3단계 완료 (치명적 단점 {len(result.get('치명적_단점', []))}개, "
+                    f"일반 단점 {len(result.get('단점', []))}개, 장점 {len(result.get('장점', []))}개)")
+        _notify(on_progress, '📊 장단점 추출 완료 (3/3)')
         
         return result
         
     except Exception as e:
-        print(f"   ❌ GPT 전처리 실패: {e}")
+        logger.error(f"   ❌ GPT 전처리 실패: {e}")
         return {"치명적_단점": [], "단점": [], "장점": []}
 
 
-# ==================== STEP 2: Claude 인사이트 (4가지 경쟁 전략) ====================
+# ==================== STEP 1 (전체 리뷰): map-reduce 모드 ====================
 
-def analyze_with_claude(preprocessed, target_store, competitors, competitor_reviews, statistical_comparison):
-    """Claude: 4가지 경쟁 전략 도출"""
-    
-    print(f"\n{'='*60}")
-    print(f"🧠 STEP 2: Claude 4가지 경쟁 전략")
-    print(f"{'='*60}")
-    
-    # 경쟁사 샘플 리뷰
-    comp_summary = []
-    for comp in competitors[:3]:
-        comp_revs = competitor_reviews.get(comp.place_id, [])[:3]
-        if comp_revs:
-            comp_summary.append(f"**{comp.name}**\n" + "\n".join([
-                f"- {r['content'][:150]}" for r in comp_revs
-            ]))
-    
-    comp_text = "\n\n".join(comp_summary)
-    
-    # 통계 요약
-    stats_text = ""
-    if statistical_comparison:
-        stats_text = "## 📊 통계 비교 (우리 vs 경쟁사)\n\n"
-        
-        if '우리의_강점' in statistical_comparison:
-            stats_text += "### ✅ 우리가 경쟁사보다 잘하는 것\n\n"
-            for topic, stat in list(statistical_comparison['우리의_강점'].items())[:3]:
-                stats_text += f"- **{topic}**: 우리 {stat['our']['rate']*100:.1f}% vs 경쟁사 {stat['comp']['rate']*100:.1f}% (✅ +{stat['gap']*100:.1f}%p 우위)\n"
-            stats_text += "\n"
-        
-        if '우리의_약점' in statistical_comparison:
-            stats_text += "### ⚠️ 우리가 경쟁사보다 부족한 것\n\n"
-            for topic, stat in list(statistical_comparison['우리의_약점'].items())[:3]:
-                stats_text += f"- **{topic}**: 우리 {stat['our']['rate']*100:.1f}% vs 경쟁사 {stat['comp']['rate']*100:.1f}% (⚠️ -{abs(stat['gap'])*100:.1f}%p 열위)\n"
-            stats_text += "\n"
-    
-    # 프롬프트
-    prompt = f"""🚨 외식업 전략 컨설턴트입니다. **4가지 경쟁 전략**을 도출하세요.
+def _chunk_reviews(reviews, chunk_tokens):
+    """리뷰 → 토큰 예산별 청크 [(리뷰 번호, 본문), ...] (번호는 전체 기준 1부터)"""
+    chunks, current, used = [], [], 0
+    for review_id, review in enumerate(reviews, 1):
+        content = (review.get('content') or '').strip()[:300]
+        if not content:
+            continue
+        tokens = count_tokens(content) + 8
+        if current and used + tokens > chunk_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append((review_id, content))
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
 
-🔥 CRITICAL: 
-1. 3단계 검증을 거친 데이터 (오탐 제거됨)
-2. 절대 지어내지 마세요
-3. 실제 리뷰만 사용
 
-## 우리 가게 ({target_store['name']})
+def _map_chunk(chunk, target_store):
+    """청크 하나: 분류 + 측면 추출 (부정은 1·2단계 기준을 한 번에 - 확실한 것만)"""
+    review_lines = "\n".join(f"[리뷰#{review_id}] {content}" for review_id, content in chunk)
+    prompt = f"""{target_store['name']} 리뷰 {len(chunk)}개를 측면별로 분류하세요.
 
-### 🔴 치명적 단점
-{json.dumps(preprocessed.get('치명적_단점', []), ensure_ascii=False, indent=2)}
+## 부정 판단
+- 명확한 불만만 ("맛없", "불친절", "비싸", "미지근", "더럽", "오래 기다" 등)
+- "~해주세요ㅠㅠ", "그나마", "그럭저럭" 같은 완곡한 불만도 부정
+- 긍정 문맥의 단어("웨이팅 있어도 맛있어요")는 부정 아님
 
-### ⚠️ 일반 단점
-{json.dumps(preprocessed.get('단점', []), ensure_ascii=False, indent=2)}
+## 측면 (반드시 이 목록에서만)
+{', '.join(ASPECTS)}
 
-### ✅ 장점
-{json.dumps(preprocessed.get('장점', []), ensure_ascii=False, indent=2)}
+## 리뷰
+{review_lines}
 
-{stats_text}
+## JSON 출력
+{{
+  "부정": [
+    {{"aspect": "음식 온도", "severity": "high", "review_ids": [5, 12], "impact": "재방문 의사 타격"}}
+  ],
+  "긍정": [
+    {{"aspect": "맛", "review_ids": [3, 7, 9]}}
+  ]
+}}
 
-## 경쟁사 샘플 리뷰
-{comp_text}
+severity: high(재방문 포기/강한 불만) / medium / low. 리뷰 번호는 위 번호 그대로.
+"""
+    response = gateway.chat(
+        stage='gpt_map',
+        priority=PRIORITY_LOW,
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": "리뷰 분석 전문가. JSON만 출력."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.0,
+        max_tokens=3000,
+        response_format={"type": "json_object"}
+    )
+    return json.loads(response.choices[0].message.content)
+
+
+def _reduce_aspects(partials, texts, total):
+    """
+    청크 결과 합치기 (LLM 없이 - 같은 입력이면 항상 같은 결과)
+
+    측면별 리뷰 번호 합집합 → count/percentage, 예시는 번호 순 앞 3개,
+    severity는 가장 높은 값, high이면서 2건 이상이면 치명적 단점
+    """
+    merged = {'부정': {}, '긍정': {}}
+    for partial in partials:
+        for polarity in ('부정', '긍정'):
+            for item in partial.get(polarity, []) or []:
+                aspect = item.get('aspect') if item.get('aspect') in ASPECTS else '기타'
+                ids = {i for i in item.get('review_ids', []) if isinstance(i, int) and i in texts}
+                if not ids:
+                    continue
+                entry = merged[polarity].setdefault(aspect, {'ids': set(), 'severity': 'low', 'impacts': {}})
+                entry['ids'] |= ids
+                severity = item.get('severity', 'medium')
+                if SEVERITY_RANK.get(severity, 1) > SEVERITY_RANK[entry['severity']]:
+                    entry['severity'] = severity
+                if item.get('impact'):
+                    entry['impacts'][item['impact']] = entry['impacts'].get(item['impact'], 0) + len(ids)
+
+    def build(aspect, entry):
+        ids = sorted(entry['ids'])
+        return {
+            'aspect': aspect,
+            'count': len(ids),
+            'percentage': round(len(ids) / max(total, 1) * 100, 1),
+            'samples': [f"[리뷰#{i}] {texts[i][:80]}" for i in ids[:3]],
+        }
+
+    result = {"치명적_단점": [], "단점": [], "장점": []}
+    for aspect, entry in merged['부정'].items():
+        item = build(aspect, entry)
+        if entry['severity'] == 'high' and item['count'] >= 2:
+            impacts = sorted(entry['impacts'].items(), key=lambda kv: (-kv[1], kv[0]))
+            item.update(severity='high', impact=impacts[0][0] if impacts else '')
+            result['치명적_단점'].append(item)
+        else:
+            result['단점'].append(item)
+    for aspect, entry in merged['긍정'].items():
+        result['장점'].append(build(aspect, entry))
+
+    for key in result:
+        result[key].sort(key=lambda item: (-item['count'], item['aspect']))
+    return result
+
+
+async def preprocess_with_gpt_mapreduce(target_store, target_reviews, concurrency=MAPREDUCE_CONCURRENCY,
+                                        on_progress=None):
+    """
+    전체 리뷰 분석 (map-reduce)
+
+    청크별 분류·추출을 동시에 돌리고(concurrency 제한) 결과를 규칙대로 합침
+    → preprocess_with_gpt와 같은 {치명적_단점, 단점, 장점} 구조
+    """
+    logger.info(f"⚡ STEP 1: GPT-4o 전체 리뷰 map-reduce")
+
+    chunks = _chunk_reviews(target_reviews, MAPREDUCE_CHUNK_TOKENS)
+    texts = {review_id: content for chunk in chunks for review_id, content in chunk}
+    if batch_active():
+        concurrency = max(len(chunks), 1)   # 배치 모드: 청크 전체를 한 라운드에 제출
+    logger.debug(f"   📝 분석 리뷰: {len(texts)}개 → 청크 {len(chunks)}개 (동시 {concurrency}개)")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    # 기본 스레드풀(코어 수 + 4)로는 동시 호출 수가 막히므로 map 전용 풀
+    executor = ThreadPoolExecutor(max_workers=min(concurrency, len(chunks)) or 1)
+
+    done = [0]
+
+    async def run(chunk):
+        async with semaphore:
+            try:
+                # run_in_executor는 contextvar를 안 넘기므로 복사해서 실행 (배치 모드 유지)
+                context = contextvars.copy_context()
+                return await loop.run_in_executor(executor, context.run, _map_chunk, chunk, target_store)
+            except Exception as e:
+                logger.warning(f"   ⚠️  청크 실패 (리뷰#{chunk[0][0]}~{chunk[-1][0]}): {e}")
+                return None
+            finally:
+                done[0] += 1
+                _notify(on_progress, f'⚡ 전체 리뷰 분석 {done[0]}/{len(chunks)}', chunks_done=done[0], chunks=len(chunks))
+
+    try:
+        partials = await asyncio.gather(*[run(chunk) for chunk in chunks])
+    finally:
+        executor.shutdown(wait=False)
+    failed = sum(1 for p in partials if p is None)
+    if failed == len(partials):
+        logger.error(f"   ❌ map 단계 전체 실패")
+        return {"치명적_단점": [], "단점": [], "장점": []}
+
+    result = _reduce_aspects([p for p in partials if p], texts, len(texts))
+    logger.info(f"   ✅ map-reduce 완료 ({time.perf_counter() - started:.1f}초, 실패 청크 {failed}개) - "
+                f"치명적 단점 {len(result['치명적_단점'])}개, 일반 단점 {len(result['단점'])}개, "
+                f"장점 {len(result['장점'])}개")
+    return result
+
+
+def _exceeds_sample_budget(target_reviews):
+    """리뷰 전체가 1단계 분류 예산(CLASSIFY_TOKEN_BUDGET)에 안 들어가는지 (= 샘플 경로면 일부가 빠짐)"""
+    lines = [
+        f"[리뷰#{i}] {(review.get('content') or '').strip()[:CLASSIFY_MAX_CHARS]}"
+        for i, review in enumerate(target_reviews, 1)
+    ]
+    return count_tokens('\n'.join(lines)) > CLASSIFY_TOKEN_BUDGET
+
+
+async def preprocess_reviews(target_store, target_reviews, competitors, competitor_reviews,
+                             statistical_comparison, mode=None, on_progress=None):
+    """STEP 1 진입점 - 모드에 따라 샘플 3단계 검증 또는 전체 map-reduce"""
+    mode = mode or REVIEW_ANALYSIS_MODE
+    if mode == 'mapreduce' or (mode == 'auto' and _exceeds_sample_budget(target_reviews)):
+        return await preprocess_with_gpt_mapreduce(target_store, target_reviews, on_progress=on_progress)
+    return await asyncio.to_thread(
+        preprocess_with_gpt, target_store, target_reviews, competitors,
+        competitor_reviews, statistical_comparison, on_progress
+    )
+
+
+# ==================== STEP 2: Claude 인사이트 (4가지 경쟁 전략) ====================
+
+# 🔥 Claude 전략 분석 지시문 + 출력 형식 - 가게마다 같은 내용이라 cache_control 블록으로 보냄
+# (가게별 값을 넣으면 캐시가 깨짐 - 가게 데이터는 analyze_with_claude의 user 메시지로)
+CLAUDE_STRATEGY_SYSTEM = """외식업 전략 컨설턴트. 4가지 경쟁 전략 필수 도출. JSON만 출력.
+
+🚨 **4가지 경쟁 전략**을 도출하세요.
+
+🔥 CRITICAL: 
+1. 3단계 검증을 거친 데이터 (오탐 제거됨)
+2. 절대 지어내지 마세요
+3. 실제 리뷰만 사용
 
 ---
 
@@ -355,93 +525,93 @@ def analyze_with_claude(preprocessed, target_store, competitors, competitor_revi
 
 ## JSON 출력 (4가지 전략 필수!)
 
-{{
+{
   "후킹_문구": "⚠️ 음식 온도 관리 실패로 고객 5명 불만",
   
   "치명적_단점_상세": [
-    {{
+    {
       "aspect": "음식 온도 관리",
       "severity": "high",
       "description": "음식이 미지근하거나 식어서 제공",
       "reviews": ["[리뷰#1] 커피가 미지근", "[리뷰#5] 음식 식어서"],
       "action": "즉시: 주방 온도계 + 10분 내 서빙 규칙"
-    }}
+    }
   ],
   
-  "우리_장점_파이": {{"맛": 43.3, "분위기": 21.3}},
+  "우리_장점_파이": {"맛": 43.3, "분위기": 21.3},
   
-  "우리_단점": {{
+  "우리_단점": {
     "is_many": true,
-    "pie_data": {{"가격": 5.3, "대기": 2.7}},
+    "pie_data": {"가격": 5.3, "대기": 2.7},
     "list_data": [
-      {{"aspect": "가격", "count": 8, "percentage": 5.3, "reviews": ["[리뷰#20] 비싸요"]}}
+      {"aspect": "가격", "count": 8, "percentage": 5.3, "reviews": ["[리뷰#20] 비싸요"]}
     ]
-  }},
+  },
   
-  "경쟁_전략": {{
+  "경쟁_전략": {
     "긴급_개선": [
-      {{
+      {
         "aspect": "주차 편의성",
         "priority": "high",
-        "our_weakness": {{
+        "our_weakness": {
           "description": "우리는 주차 불편 불만 많음",
           "reviews": ["[리뷰#15] 주차 어려워요"],
           "mention_rate": 8.7
-        }},
-        "competitor_strength": {{
+        },
+        "competitor_strength": {
           "description": "경쟁사는 주차 편리 칭찬 많음",
           "reviews": ["경쟁사A: 주차 편해요"],
           "mention_rate": 15.3
-        }},
+        },
         "action": "🚨 긴급: 제휴 주차장 확보",
         "impact": "고객 유입 20% 증가 예상"
-      }}
+      }
     ],
     
     "차별화_포인트": [
-      {{
+      {
         "aspect": "서빙 속도",
-        "our_strength": {{
+        "our_strength": {
           "description": "우리는 빠른 서빙 칭찬 많음",
           "reviews": ["[리뷰#8] 음식 빨리 나와요"],
           "mention_rate": 12.0
-        }},
-        "competitor_weakness": {{
+        },
+        "competitor_weakness": {
           "description": "경쟁사는 느린 서비스 불만 많음",
           "reviews": ["경쟁사A: 음식 늦게 나옴"],
           "mention_rate": 18.7
-        }},
+        },
         "marketing_message": "💎 '5분 안에 나오는 OO' 슬로건 활용",
         "channel": "인스타그램 릴스"
-      }}
+      }
     ],
     
     "배울_점": [
-      {{
+      {
         "aspect": "메뉴 다양성",
-        "competitor_strength": {{
+        "competitor_strength": {
           "description": "경쟁사는 선택지 많음",
           "reviews": ["경쟁사A: 메뉴 다양해요"]
-        }},
+        },
         "our_status": "우리는 메뉴 언급 거의 없음",
         "suggestion": "📚 시즌 메뉴 2개 추가",
         "timeline": "2개월 내"
-      }}
+      }
     ],
     
     "시장_공통약점": [
-      {{
+      {
         "aspect": "웨이팅 관리",
-        "competitor_weakness": {{
+        "competitor_weakness": {
           "description": "경쟁사들 긴 대기시간 공통 불만",
           "reviews": ["경쟁사A: 1시간 대기"],
           "mention_rate": 22.3
-        }},
+        },
         "opportunity": "🎯 예약 시스템 도입 시 시장 선점 가능",
         "action": "네이버 예약 도입"
-      }}
+      }
     ]
-  }},
+  },
   
   "체크리스트": [
     "🚨 주차 제휴 3곳 확보 (긴급)",
@@ -449,51 +619,102 @@ def analyze_with_claude(preprocessed, target_store, competitors, competitor_revi
     "📚 시즌 메뉴 2개 테스트",
     "🎯 네이버 예약 도입"
   ]
-}}
+}
 
 **규칙**: 4가지 전략 모두 작성, 실제 리뷰만 사용
 """
+
+
+def analyze_with_claude(preprocessed, target_store, competitors, competitor_reviews, statistical_comparison,
+                        on_field=None):
+    """
+    Claude: 4가지 경쟁 전략 도출
+
+    on_field(key, value): 최상위 필드가 닫히는 즉시 호출 (스트리밍 - HTML 섹션 미리 렌더링용)
+    """
+    
+    logger.info(f"🧠 STEP 2: Claude 4가지 경쟁 전략")
+    
+    # 경쟁사 샘플 리뷰
+    comp_summary = []
+    for comp in competitors[:3]:
+        comp_revs = select_reviews(
+            competitor_reviews.get(comp.place_id, []), COMPETITOR_TOKEN_BUDGET,
+            max_chars=150, label=comp.name
+        )
+        if comp_revs:
+            comp_summary.append(f"**{comp.name}**\n" + "\n".join([
+                f"- [{r['sentiment']}] {r['content']}" for r in comp_revs
+            ]))
+    
+    comp_text = "\n\n".join(comp_summary)
+    
+    # 통계 요약
+    stats_text = ""
+    if statistical_comparison:
+        stats_text = "## 📊 통계 비교 (우리 vs 경쟁사)\n\n"
+        
+        if '우리의_강점' in statistical_comparison:
+            stats_text += "### ✅ 우리가 경쟁사보다 잘하는 것\n\n"
+            for topic, stat in list(statistical_comparison['우리의_강점'].items())[:3]:
+                stats_text += f"- **{topic}**: 우리 {stat['our']['rate']*100:.1f}% vs 경쟁사 {stat['comp']['rate']*100:.1f}% (✅ +{stat['gap']*100:.1f}%p 우위)\n"
+            stats_text += "\n"
+        
+        if '우리의_약점' in statistical_comparison:
+            stats_text += "### ⚠️ 우리가 경쟁사보다 부족한 것\n\n"
+            for topic, stat in list(statistical_comparison['우리의_약점'].items())[:3]:
+                stats_text += f"- **{topic}**: 우리 {stat['our']['rate']*100:.1f}% vs 경쟁사 {stat['comp']['rate']*100:.1f}% (⚠️ -{abs(stat['gap'])*100:.1f}%p 열위)\n"
+            stats_text += "\n"
+    
+    # 프롬프트 (가게별 데이터만 - 지시문/출력 형식은 CLAUDE_STRATEGY_SYSTEM 캐시 블록)
+    prompt = f"""## 우리 가게 ({target_store['name']})
+
+### 🔴 치명적 단점
+{json.dumps(preprocessed.get('치명적_단점', []), ensure_ascii=False, indent=2)}
+
+### ⚠️ 일반 단점
+{json.dumps(preprocessed.get('단점', []), ensure_ascii=False, indent=2)}
+
+### ✅ 장점
+{json.dumps(preprocessed.get('장점', []), ensure_ascii=False, indent=2)}
+
+{stats_text}
+
+## 경쟁사 샘플 리뷰
+{comp_text}
+
+위 데이터로 4가지 전략 JSON을 출력하세요.
+"""
     
     try:
-        response = anthropic_client.messages.create(
+        # 🔥 스트리밍 - ```json 펜스는 파서가 건너뜀
+        result = gateway.stream_json(
+            stage='claude_insight',
+            on_field=on_field,
             model="claude-sonnet-4-5-20250929",
             max_tokens=10000,
             temperature=0.0,
-            system="외식업 전략 컨설턴트. 4가지 경쟁 전략 필수 도출. JSON만 출력.",
+            system=anthropic_system_blocks(CLAUDE_STRATEGY_SYSTEM),
             messages=[{"role": "user", "content": prompt}]
         )
         
-        content = response.content[0].text
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0].strip()
-        
-        result = json.loads(content)
-        print(f"   ✅ 인사이트 생성 완료")
-        print(f"      🚨 긴급 개선: {len(result.get('경쟁_전략', {}).get('긴급_개선', []))}개")
-        print(f"      💎 차별화: {len(result.get('경쟁_전략', {}).get('차별화_포인트', []))}개")
-        print(f"      📚 배울 점: {len(result.get('경쟁_전략', {}).get('배울_점', []))}개")
-        print(f"      🎯 시장 기회: {len(result.get('경쟁_전략', {}).get('시장_공통약점', []))}개")
+        strategies = result.get('경쟁_전략', {})
+        logger.info(f"   ✅ 인사이트 생성 완료 (긴급 개선 {len(strategies.get('긴급_개선', []))}개, "
+                    f"차별화 {len(strategies.get('차별화_포인트', []))}개, "
+                    f"배울 점 {len(strategies.get('배울_점', []))}개, "
+                    f"시장 기회 {len(strategies.get('시장_공통약점', []))}개)")
         
         return result
         
     except Exception as e:
-        print(f"   ❌ Claude 분석 실패: {e}")
+        logger.error(f"   ❌ Claude 분석 실패: {e}")
         return None
 
 
 # ==================== STEP 3: HTML 리포트 ====================
 
-def generate_visual_report(preprocessed, claude_result, target_store, competitors):
-    """HTML 리포트 (4가지 전략 시각화)"""
-    
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-    
-    hooking = claude_result.get('후킹_문구', '⚠️ 즉시 개선이 필요한 단점 발견')
-    
-    # 치명적 단점
-    critical_weaknesses = claude_result.get('치명적_단점_상세', [])
+def _render_critical(critical_weaknesses):
+    """🚨 치명적 단점 섹션"""
     critical_html = ""
     if critical_weaknesses:
         critical_html = """
@@ -525,11 +746,11 @@ def generate_visual_report(preprocessed, claude_result, target_store, competitor
 """
         critical_html += "        </div>"
     
-    # 장점 파이
-    strengths_pie = claude_result.get('우리_장점_파이', {})
-    
-    # 단점
-    weaknesses = claude_result.get('우리_단점', {})
+    return critical_html
+
+
+def _render_weaknesses(weaknesses):
+    """⚠️ 단점 목록 (많으면 파이 차트 자리 포함)"""
     is_many = weaknesses.get('is_many', False)
     
     weaknesses_html = ""
@@ -596,11 +817,13 @@ def generate_visual_report(preprocessed, claude_result, target_store, competitor
 """
         weaknesses_html += "        </div>"
     
-    # 🔥 NEW: 4가지 경쟁 전략
+    return weaknesses_html
+
+
+def _render_strategies(strategies):
+    """🔥 4가지 경쟁 전략 섹션"""
     strategy_html = ""
-    if '경쟁_전략' in claude_result:
-        strategies = claude_result['경쟁_전략']
-        
+    if strategies is not None:
         strategy_html = """
         <div class="section strategy-section">
             <h2>🎯 4가지 경쟁 전략</h2>
@@ -794,8 +1017,11 @@ def generate_visual_report(preprocessed, claude_result, target_store, competitor
         
         strategy_html += "        </div>"
     
-    # 체크리스트
-    checklist = claude_result.get('체크리스트', [])
+    return strategy_html
+
+
+def _render_checklist(checklist):
+    """✅ 2주 긴급 체크리스트"""
     checklist_html = """
         <div class="section">
             <h2>✅ 2주 긴급 체크리스트</h2>
@@ -813,6 +1039,53 @@ def generate_visual_report(preprocessed, claude_result, target_store, competitor
         </div>
 """
     
+    return checklist_html
+
+
+# Claude 응답 최상위 필드 → (섹션 렌더러, 필드가 없을 때 값)
+SECTION_RENDERERS = {
+    '치명적_단점_상세': (_render_critical, []),
+    '우리_단점': (_render_weaknesses, {}),
+    '경쟁_전략': (_render_strategies, None),
+    '체크리스트': (_render_checklist, []),
+}
+
+
+def render_section(key, value):
+    """필드 하나의 HTML 섹션 (렌더러 없는 필드면 None) - 스트리밍 중 필드가 닫히는 즉시 호출"""
+    if key not in SECTION_RENDERERS:
+        return None
+    renderer, _ = SECTION_RENDERERS[key]
+    return renderer(value)
+
+
+def generate_visual_report(preprocessed, claude_result, target_store, competitors, sections=None):
+    """
+    HTML 리포트 (4가지 전략 시각화)
+
+    sections: 스트리밍 중 미리 렌더링한 섹션 {필드: html} - 없는 섹션만 여기서 렌더링
+    """
+    
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+    
+    hooking = claude_result.get('후킹_문구', '⚠️ 즉시 개선이 필요한 단점 발견')
+    
+    sections = dict(sections or {})
+    for key, (renderer, default) in SECTION_RENDERERS.items():
+        if key not in sections:
+            sections[key] = renderer(claude_result.get(key, default))
+    critical_html = sections['치명적_단점_상세']
+    weaknesses_html = sections['우리_단점']
+    strategy_html = sections['경쟁_전략']
+    checklist_html = sections['체크리스트']
+    
+    # 장점 파이
+    strengths_pie = claude_result.get('우리_장점_파이', {})
+    
+    # 단점 (차트 스크립트용)
+    weaknesses = claude_result.get('우리_단점', {})
+    is_many = weaknesses.get('is_many', False)
+    
     # HTML 전체
     html = f"""<!DOCTYPE html>
 <html lang="ko">
@@ -1099,42 +1372,47 @@ def generate_visual_report(preprocessed, claude_result, target_store, competitor
 # ==================== 메인 실행 ====================
 
 async def generate_hybrid_report(target_store, target_reviews, competitors, 
-                                 competitor_reviews, statistical_comparison=None):
-    """하이브리드 리포트 생성 (3단계 검증 + 4가지 경쟁 전략)"""
+                                 competitor_reviews, statistical_comparison=None, on_progress=None):
+    """
+    하이브리드 리포트 생성 (3단계 검증 + 4가지 경쟁 전략)
+
+    on_progress(message, **data): 단계/필드가 끝날 때마다 (작업 스레드에서 호출될 수 있음)
+    """
     
-    print(f"\n{'='*60}")
-    print(f"🚀 하이브리드 인사이트 시스템")
-    print(f"{'='*60}")
-    print(f"   ✅ GPT 3단계 검증 (오탐 제거)")
-    print(f"   🎯 Claude 4가지 경쟁 전략")
-    print(f"      1. 긴급 개선 (우리 약점 × 경쟁사 강점)")
-    print(f"      2. 차별화 포인트 (우리 강점 × 경쟁사 약점)")
-    print(f"      3. 배울 점 (경쟁사 강점)")
-    print(f"      4. 시장 기회 (경쟁사 약점)")
+    logger.info(f"🚀 하이브리드 인사이트 시스템: {target_store['name']} (GPT 3단계 검증 + Claude 4가지 경쟁 전략)")
     
-    # STEP 1: GPT 전처리
-    preprocessed = preprocess_with_gpt(
-        target_store, target_reviews, competitors, 
-        competitor_reviews, statistical_comparison
-    )
+    # STEP 1: GPT 전처리 (리뷰가 많으면 전체 map-reduce)
+    with span('insight.preprocess', reviews=len(target_reviews)):
+        preprocessed = await preprocess_reviews(
+            target_store, target_reviews, competitors, 
+            competitor_reviews, statistical_comparison, on_progress=on_progress
+        )
     
-    # STEP 2: Claude 인사이트
-    claude_result = analyze_with_claude(
-        preprocessed, target_store, competitors, 
-        competitor_reviews, statistical_comparison
-    )
+    # STEP 2: Claude 인사이트 (🔥 스트리밍 - 필드가 닫히는 대로 HTML 섹션 렌더링)
+    sections = {}
+    
+    def on_field(key, value):
+        html = render_section(key, value)
+        if html is not None:
+            sections[key] = html
+        _notify(on_progress, f'🧠 인사이트: {key} 완료', field=key)
+    
+    with span('insight.claude'):
+        claude_result = await asyncio.to_thread(
+            analyze_with_claude, preprocessed, target_store, competitors,
+            competitor_reviews, statistical_comparison, on_field
+        )
     
     if not claude_result:
         return None
     
     # STEP 3: HTML 리포트
-    print(f"\n{'='*60}")
-    print(f"📊 STEP 3: HTML 리포트 생성")
-    print(f"{'='*60}")
+    logger.info(f"📊 STEP 3: HTML 리포트 생성")
     
-    html_report = generate_visual_report(
-        preprocessed, claude_result, target_store, competitors
-    )
+    with span('insight.html'):
+        html_report = generate_visual_report(
+            preprocessed, claude_result, target_store, competitors, sections=sections
+        )
     
     # 파일 저장
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -1143,14 +1421,12 @@ async def generate_hybrid_report(target_store, target_reviews, competitors,
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             f.write(html_report)
-        print(f"   ✅ 리포트 저장: {filename}")
-        print(f"   🔥 후킹: {claude_result.get('후킹_문구', '')[:50]}...")
-        print(f"   🚨 치명적 단점: {len(claude_result.get('치명적_단점_상세', []))}개")
-        print(f"   🎯 경쟁 전략: 4가지 도출 완료")
-        print(f"   💡 브라우저로 열어보세요!")
+        logger.info(f"   ✅ 리포트 저장: {filename}")
+        logger.debug(f"   🔥 후킹: {claude_result.get('후킹_문구', '')[:50]}...")
+        logger.debug(f"   🚨 치명적 단점: {len(claude_result.get('치명적_단점_상세', []))}개")
         
         return html_report
         
     except Exception as e:
-        print(f"   ❌ 파일 저장 실패: {e}")
+        logger.error(f"   ❌ 파일 저장 실패: {e}")
         return None
\ No newline at end of file
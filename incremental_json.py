@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# incremental_json.py - 스트리밍 JSON 파서 (최상위 필드가 닫히는 즉시 넘겨줌 + 잘린 응답 감지)
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_PREFIX_CHARS = 200  # '{' 전에 허용하는 글자 수 (```json 펜스, 짧은 머리말)
+
+
+class JSONStreamError(ValueError):
+    """JSON이 아닌 응답 - 스트림을 바로 끊기 위해 던짐"""
+
+
+class IncompleteJSON(ValueError):
+    """
+    응답이 끝났는데 최상위 객체가 닫히지 않음 (길이 제한으로 잘림 등)
+
+    fields: 그때까지 완성된 최상위 필드
+    """
+
+    def __init__(self, message, fields=None):
+        super().__init__(message)
+        self.fields = fields or {}
+
+
+class StreamingJSONParser:
+    """
+    최상위 JSON 객체를 조각조각 받아서 필드 값이 닫힐 때마다 on_field(key, value) 호출
+
+    - 앞쪽 펜스/머리말은 건너뛰고, 객체가 닫힌 뒤 내용은 무시
+    - 문법이 깨지면 JSONStreamError (호출자가 스트림을 끊어 출력 토큰 낭비를 막음)
+    - on_field 안의 에러는 경고만 찍고 계속 (렌더링 실패가 LLM 호출을 죽이지 않게)
+
+    사용:
+        parser = StreamingJSONParser(on_field=lambda k, v: ...)
+        for piece in stream: parser.feed(piece)
+        result = parser.result()   # 안 닫혔으면 IncompleteJSON
+    """
+
+    def __init__(self, on_field=None):
+        self.on_field = on_field
+        self.fields = {}
+        self.complete = False
+        self._text = ''
+        self._pos = 0
+        self._state = 'start'
+        self._start = 0         # 현재 키/값 시작 위치
+        self._key = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def text(self):
+        return self._text
+
+    def feed(self, piece):
+        """조각 추가 → 이번 조각으로 닫힌 필드 키 목록"""
+        self._text += piece
+        closed = []
+        text = self._text
+        while self._pos < len(text) and not self.complete:
+            ch = text[self._pos]
+            state = self._state
+
+            if state == 'start':
+                if ch == '{':
+                    self._state = 'key_or_end'
+                elif self._pos >= MAX_PREFIX_CHARS:
+                    raise JSONStreamError(f"JSON 객체가 시작되지 않음: {text[:80]!r}")
+
+            elif state in ('key_or_end', 'key'):
+                if ch == '"':
+                    self._start = self._pos
+                    self._state = 'key_string'
+                elif ch == '}' and state == 'key_or_end':
+                    self.complete = True
+                elif not ch.isspace():
+                    self._fail(ch)
+
+            elif state == 'key_string':
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._key = json.loads(text[self._start:self._pos + 1])
+                    self._state = 'colon'
+
+            elif state == 'colon':
+                if ch == ':':
+                    self._state = 'value'
+                elif not ch.isspace():
+                    self._fail(ch)
+
+            elif state == 'value':
+                if not ch.isspace():
+                    self._start = self._pos
+                    if ch in '{[':
+                        self._depth = 1
+                        self._state = 'nested'
+                    elif ch == '"':
+                        self._state = 'string'
+                    else:
+                        self._state = 'scalar'
+
+            elif state == 'nested':
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif ch == '\\':
+                        self._escape = True
+                    elif ch == '"':
+                        self._in_string = False
+                elif ch == '"':
+                    self._in_string = True
+                elif ch in '{[':
+                    self._depth += 1
+                elif ch in '}]':
+                    self._depth -= 1
+                    if self._depth == 0:
+                        closed.append(self._emit(text[self._start:self._pos + 1]))
+
+            elif state == 'string':
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    closed.append(self._emit(text[self._start:self._pos + 1]))
+
+            elif state == 'scalar':
+                if ch in ',}' or ch.isspace():
+                    closed.append(self._emit(text[self._start:self._pos]))
+                    continue    # 구분자는 after_value에서 다시 처리
+
+            elif state == 'after_value':
+                if ch == ',':
+                    self._state = 'key'
+                elif ch == '}':
+                    self.complete = True
+                elif not ch.isspace():
+                    self._fail(ch)
+
+            self._pos += 1
+        return closed
+
+    def _fail(self, ch):
+        raise JSONStreamError(f"JSON 문법 오류 ({self._pos}번째 글자 {ch!r}, 상태 {self._state})")
+
+    def _emit(self, raw):
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(f"'{self._key}' 값 파싱 실패: {e}") from e
+        key = self._key
+        self.fields[key] = value
+        self._state = 'after_value'
+        if self.on_field is not None:
+            try:
+                self.on_field(key, value)
+            except Exception as e:
+                logger.warning("⚠️  '%s' 필드 처리 실패: %s", key, e)
+        return key
+
+    def result(self):
+        """완성된 객체 dict (아직 안 닫혔으면 IncompleteJSON)"""
+        if not self.complete:
+            raise IncompleteJSON(f"JSON 객체가 닫히지 않음 (완성 필드 {len(self.fields)}개)", dict(self.fields))
+        return dict(self.fields)
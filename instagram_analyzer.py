@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 # instagram_analyzer.py - Instagram & Naver Place 진단 (스티브 잡스 톤)
 
+import logging
 import os
-import requests
+import asyncio
+import random
+import aiohttp
 from typing import Dict, List, Optional
 from datetime import datetime
 import re
@@ -10,33 +13,180 @@ from collections import Counter
 import statistics
 import sqlite3
 
+from async_cache import TTLCache
+from record_replay import recorder
+
+logger = logging.getLogger(__name__)
+
+GRAPH_API_BASE = os.getenv("INSTAGRAM_GRAPH_API_BASE", "https://graph.facebook.com/v21.0")
+REQUEST_TIMEOUT = 10            # 초
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0              # 재시도 대기 1s → 2s → 4s (+ 지터)
+ACCOUNT_CACHE_TTL = 24 * 3600   # 같은 계정은 하루 동안 API 재호출 없음
+DEFAULT_MEDIA_LIMIT = 30
+MEDIA_PAGE_SIZE = 50            # 더 깊은 기록 요청 시 페이지당 게시물 수
+RATE_LIMIT_CODES = {4, 17, 32, 613}  # Graph API 호출 한도 초과 에러 코드
+
+MEDIA_FIELDS = "caption,like_count,comments_count,media_type,timestamp"
+
+# 🔥 계정 응답 캐시 (ig_username 기준, 프로세스 전체 공유)
+account_cache = TTLCache(maxsize=2048, ttl=ACCOUNT_CACHE_TTL)
+
+_sessions = {}  # 이벤트 루프별 공유 세션 (커넥션 풀 재사용)
+
+
+class InstagramAPIError(Exception):
+    """Graph API 호출 실패 (재시도 후에도)"""
+
+
+class _RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def get_graph_session() -> aiohttp.ClientSession:
+    """현재 이벤트 루프의 공유 세션 (없으면 생성)"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300)
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_graph_session():
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session and not session.closed:
+        await session.close()
+
+
+class InstagramGraphClient:
+    """
+    Instagram Graph API 비동기 클라이언트
+    
+    - 공유 세션 (커넥션 재사용) + 타임아웃
+    - 429/5xx/호출 한도 에러는 지수 백오프로 재시도
+    - business_discovery 응답은 ig_username 기준 TTL 캐시
+    - media_limit > 30이면 커서로 다음 페이지를 이어서 가져옴
+    """
+    
+    def __init__(self, access_token: str, user_id: str, base_url: str = GRAPH_API_BASE,
+                 cache: Optional[TTLCache] = None, limiter=None):
+        self.access_token = access_token
+        self.user_id = user_id
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache if cache is not None else account_cache
+        self.limiter = limiter  # rate_limiter.TokenBucket (여러 계정 일괄 진단 시 공유 호출 예산)
+        self.calls = 0
+    
+    async def _request(self, params: Dict) -> Dict:
+        url = f"{self.base_url}/{self.user_id}"
+        params = {**params, "access_token": self.access_token}
+        
+        for attempt in range(MAX_RETRIES + 1):
+            if self.limiter:
+                await self.limiter.acquire()
+            self.calls += 1
+            try:
+                session = recorder.session('instagram', get_graph_session())
+                async with session.get(url, params=params) as response:
+                    retry_after = response.headers.get('Retry-After')
+                    retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+                    
+                    if response.status == 429 or response.status >= 500:
+                        raise _RetryableError(f"HTTP {response.status}", retry_after)
+                    
+                    data = await response.json(content_type=None)
+                    if response.status >= 400:
+                        error = (data or {}).get('error', {})
+                        if error.get('code') in RATE_LIMIT_CODES:
+                            raise _RetryableError(error.get('message', 'rate limited'), retry_after)
+                        raise InstagramAPIError(error.get('message') or f"HTTP {response.status}")
+                    return data
+            
+            except (_RetryableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, _RetryableError) and hasattr(self.limiter, 'on_throttle'):
+                    self.limiter.on_throttle(e.retry_after)
+                if attempt == MAX_RETRIES:
+                    raise InstagramAPIError(f"재시도 {MAX_RETRIES}회 실패: {e}") from e
+                delay = getattr(e, 'retry_after', None) or BACKOFF_BASE * (2 ** attempt) + random.uniform(0, 0.5)
+                logger.warning(f"   ⏳ Instagram API 재시도 {attempt + 1}/{MAX_RETRIES} ({delay:.1f}초 후): {e}")
+                await asyncio.sleep(delay)
+    
+    def _fields(self, ig_username: str, limit: int, after: Optional[str] = None) -> str:
+        media = f"media.after({after}).limit({limit})" if after else f"media.limit({limit})"
+        return (f"business_discovery.username({ig_username})"
+                f"{{followers_count,media_count,{media}{{{MEDIA_FIELDS}}}}}")
+    
+    async def _fetch_account(self, ig_username: str, media_limit: int) -> Optional[Dict]:
+        page_size = media_limit if media_limit <= DEFAULT_MEDIA_LIMIT else MEDIA_PAGE_SIZE
+        data = await self._request({"fields": self._fields(ig_username, min(page_size, media_limit))})
+        account = data.get('business_discovery')
+        if not account:
+            return None
+        
+        # 🔥 더 깊은 기록: 커서로 다음 페이지 (페이지마다 이전 커서가 필요해 순서대로)
+        media = account.setdefault('media', {'data': []})
+        items = media.setdefault('data', [])
+        after = media.get('paging', {}).get('cursors', {}).get('after')
+        
+        while after and len(items) < media_limit:
+            page = await self._request({
+                "fields": self._fields(ig_username, min(MEDIA_PAGE_SIZE, media_limit - len(items)), after)
+            })
+            page_media = (page.get('business_discovery') or {}).get('media', {})
+            page_items = page_media.get('data', [])
+            if not page_items:
+                break
+            items.extend(page_items)
+            after = page_media.get('paging', {}).get('cursors', {}).get('after')
+        
+        media.pop('paging', None)
+        del items[media_limit:]
+        return account
+    
+    async def get_account_data(self, ig_username: str, media_limit: int = DEFAULT_MEDIA_LIMIT) -> Optional[Dict]:
+        """계정 데이터 (캐시 → 없으면 API, 동시 요청은 1번만 호출)"""
+        key = (ig_username.lower().lstrip('@'), media_limit)
+        
+        # 더 깊게 받아둔 캐시가 있으면 잘라서 재사용
+        for cached_limit in sorted(k[1] for k in self.cache.keys() if k[0] == key[0] and k[1] > media_limit):
+            deeper = self.cache.get((key[0], cached_limit))
+            if deeper:
+                logger.debug(f"   ♻️  Instagram 캐시 사용: @{key[0]}")
+                media = deeper.get('media', {}).get('data', [])
+                return {**deeper, 'media': {'data': media[:media_limit]}}
+        
+        account, cached = await self.cache.get_or_load(
+            key, lambda: self._fetch_account(key[0], media_limit)
+        )
+        if cached:
+            logger.debug(f"   ♻️  Instagram 캐시 사용: @{key[0]}")
+        return account
+
 
 class InstagramDiagnostics:
     """Instagram Business Discovery API"""
     
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, user_id: str = "", client: Optional[InstagramGraphClient] = None):
         self.access_token = access_token
-        self.base_url = "https://graph.facebook.com/v21.0"
+        self.base_url = GRAPH_API_BASE
+        self.client = client or InstagramGraphClient(access_token, user_id)
     
-    def get_account_data(self, ig_username: str, user_id: str) -> Optional[Dict]:
+    async def get_account_data(self, ig_username: str, user_id: str = None,
+                               media_limit: int = DEFAULT_MEDIA_LIMIT) -> Optional[Dict]:
         """계정 데이터 가져오기"""
         try:
-            url = f"{self.base_url}/{user_id}"
-            params = {
-                "fields": f"business_discovery.username({ig_username})"
-                          "{followers_count,media_count,"
-                          "media.limit(30){caption,like_count,comments_count,"
-                          "media_type,timestamp}}",
-                "access_token": self.access_token
-            }
-            
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            return response.json().get('business_discovery')
+            if user_id and user_id != self.client.user_id:
+                self.client = InstagramGraphClient(self.access_token, user_id)
+            return await self.client.get_account_data(ig_username, media_limit)
         
         except Exception as e:
-            print(f"❌ Instagram API 오류: {e}")
+            logger.error(f"❌ Instagram API 오류: {e}")
             return None
     
     def extract_data_for_diagnosis(self, account_data: Dict) -> Dict:
@@ -149,8 +299,8 @@ def diagnose_instagram(data: Dict, open_period: str) -> Dict:
         reels_action = "유지하십시오"
         reels_urgency = "✅"
     
-    # 4. 일관성
-    consistency = calculate_consistency(data['post_dates'])
+    # 4. 일관성 (일괄 진단은 미리 계산해서 넘김)
+    consistency = data.get('consistency') or calculate_consistency(data['post_dates'])
     
     if consistency == 'consistent':
         consistency_msg = "일관성이 있습니다. 좋습니다."
@@ -226,7 +376,7 @@ class NaverPlaceDiagnostics:
             return reviews
         
         except Exception as e:
-            print(f"❌ DB 오류: {e}")
+            logger.error(f"❌ DB 오류: {e}")
             return []
     
     def extract_data_for_diagnosis(self, reviews: List[Dict]) -> Dict:
@@ -255,7 +405,36 @@ class NaverPlaceDiagnostics:
                sum(1 for k in ['감사드립니다', '감사합니다'] if k in text) >= 2
 
 
-def diagnose_naver_place(data: Dict, open_period: str) -> Dict:
+def peer_benchmark(metric: str, value: float, industry: str = None,
+                   district: str = None, open_period: str = None) -> Optional[Dict]:
+    """
+    동종 업계(업종 × 지역 × 오픈 기간) 대비 위치 - 벤치마크 큐브 조회
+    
+    Returns:
+        {'percentile', 'median', 'n'} 또는 None (큐브 없음/표본 부족)
+    """
+    from benchmark_cube import get_benchmark_cube, percentile_rank
+    
+    cube = get_benchmark_cube()
+    if cube is None:
+        return None
+    found = cube.lookup(metric, industry, district, open_period)
+    if not found:
+        return None
+    n, points, _ = found
+    return {'percentile': percentile_rank(points, value), 'median': points[len(points) // 2], 'n': n}
+
+
+def _grade_by_percentile(percentile: float):
+    """백분위 → (상태 아이콘, 한 줄 평가)"""
+    if percentile < 25:
+        return "🔴", "매우 부족"
+    if percentile < 50:
+        return "🟡", "부족"
+    return "✅", "양호"
+
+
+def diagnose_naver_place(data: Dict, open_period: str, industry: str = None, district: str = None) -> Dict:
     """
     Naver Place 진단 (날짜 없는 버전)
     
@@ -263,12 +442,17 @@ def diagnose_naver_place(data: Dict, open_period: str) -> Dict:
         data: {
             'total_reviews': 12,
             'photo_reviews': 3,
-            'reply_rate': 0.25
+            'reply_rate': 0.25,
+            'place_total': 350      # 선택 - 네이버 방문자 리뷰 총개수 (stores.total_review_count)
         }
         open_period: '0-6' / '6-24' / '24+'
+        industry / district: 있으면 벤치마크 큐브로 동종 업계와 비교 (없으면 고정 기준)
+            큐브의 review_count는 실제 총개수 분포라 place_total이 있을 때만 비교
+            (total_reviews는 수집 상한에서 잘린 개수)
     """
     
     total = data['total_reviews']
+    place_total = data.get('place_total')
     
     # 1. 오픈 기간별 목표
     if open_period == '0-6':
@@ -284,8 +468,14 @@ def diagnose_naver_place(data: Dict, open_period: str) -> Dict:
         timeline = "2년 넘었습니다"
         monthly_goal = 20
     
-    # 2. 평가
-    if total == 0:
+    # 2. 평가 (🔥 동종 업계 분포가 있으면 백분위로)
+    peer = peer_benchmark('review_count', place_total, industry, district, open_period) if place_total else None
+    if peer:
+        expected = max(1, round(peer['median']))
+        icon, grade = _grade_by_percentile(peer['percentile'])
+        status = f"{icon} {grade}"
+        message = f"동종 {peer['n']:,}곳 중 상위 {100 - peer['percentile']:.0f}%입니다."
+    elif total == 0:
         status = "🔴 위험"
         message = "리뷰가 없습니다. 즉시 행동하십시오."
     elif total < expected * 0.3:
@@ -363,15 +553,14 @@ async def run_instagram_diagnosis(
     ig_username: str,
     open_period: str,
     access_token: str,
-    user_id: str
+    user_id: str,
+    media_limit: int = DEFAULT_MEDIA_LIMIT
 ) -> Optional[Dict]:
-    """Instagram 진단 실행"""
-    print(f"\n{'='*60}")
-    print(f"📱 Instagram 진단: @{ig_username}")
-    print(f"{'='*60}")
+    """Instagram 진단 실행 (media_limit > 30이면 더 깊은 게시물 기록까지)"""
+    logger.info(f"📱 Instagram 진단: @{ig_username}")
     
-    analyzer = InstagramDiagnostics(access_token)
-    account_data = analyzer.get_account_data(ig_username, user_id)
+    analyzer = InstagramDiagnostics(access_token, user_id)
+    account_data = await analyzer.get_account_data(ig_username, media_limit=media_limit)
     
     if not account_data:
         return None
@@ -388,19 +577,33 @@ def run_naver_place_diagnosis(
     db_path: str = 'seoul_industry_reviews.db'
 ) -> Optional[Dict]:
     """Naver Place 진단 실행"""
-    print(f"\n{'='*60}")
-    print(f"📍 Naver Place 진단: {place_id}")
-    print(f"{'='*60}")
+    logger.info(f"📍 Naver Place 진단: {place_id}")
     
     analyzer = NaverPlaceDiagnostics(db_path)
     reviews = analyzer.get_reviews_from_db(place_id)
     
     if not reviews:
-        print("❌ 리뷰 데이터 없음")
+        logger.warning("❌ 리뷰 데이터 없음")
         return None
     
     data = analyzer.extract_data_for_diagnosis(reviews)
-    result = diagnose_naver_place(data, open_period)
+    
+    # 업종/지역/실제 리뷰 총개수는 DB 가게 정보에서 (벤치마크 비교용)
+    industry = district = None
+    try:
+        conn = sqlite3.connect(db_path)
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(stores)")}
+        total = 'total_review_count' if 'total_review_count' in columns else 'NULL'
+        row = conn.execute(
+            f"SELECT industry, district, {total} FROM stores WHERE place_id = ?", (place_id,)
+        ).fetchone()
+        conn.close()
+        if row:
+            industry, district, data['place_total'] = row
+    except sqlite3.Error:
+        pass
+    
+    result = diagnose_naver_place(data, open_period, industry, district)
     
     return result
 
@@ -410,7 +613,9 @@ def run_naver_place_diagnosis(
 def diagnose_naver_place_from_counts(
     total_reviews: int,
     blog_reviews: int,
-    open_period: str
+    open_period: str,
+    industry: str = None,
+    district: str = None
 ) -> Dict:
     """
     mvp_analyzer에서 추출한 리뷰 개수로 진단
@@ -419,6 +624,7 @@ def diagnose_naver_place_from_counts(
         total_reviews: 네이버 플레이스 리뷰 수 (메타 태그)
         blog_reviews: 블로그 리뷰 수 (메타 태그)
         open_period: '0-6' / '6-24' / '24+'
+        industry / district: 있으면 플레이스 리뷰는 동종 업계 백분위로 평가
     """
     
     # 오픈 기간별 목표
@@ -435,8 +641,13 @@ def diagnose_naver_place_from_counts(
         expected_blog = 100
         timeline = "2년 넘었습니다"
     
-    # 플레이스 리뷰 평가
-    if total_reviews < expected_place * 0.3:
+    # 플레이스 리뷰 평가 (🔥 동종 업계 분포 우선)
+    peer = peer_benchmark('review_count', total_reviews, industry, district, open_period)
+    if peer:
+        place_status, _ = _grade_by_percentile(peer['percentile'])
+        place_msg = (f"플레이스: {total_reviews}개 (동종 {peer['n']:,}곳 중 상위 "
+                     f"{100 - peer['percentile']:.0f}%, 중앙값 {peer['median']:.0f}개)")
+    elif total_reviews < expected_place * 0.3:
         place_status = "🔴"
         place_msg = f"플레이스: {total_reviews}개 (목표의 {int(total_reviews/expected_place*100)}%)"
     elif total_reviews < expected_place * 0.7:
@@ -493,7 +704,8 @@ def diagnose_naver_place_from_counts(
 # ==================== CLI 테스트 ====================
 
 if __name__ == "__main__":
-    import asyncio
+    from log_config import setup_logging
+    setup_logging()
     
     print("""
 ╔══════════════════════════════════════════════════════════════╗
@@ -512,9 +724,14 @@ if __name__ == "__main__":
             print("❌ .env 파일에 Instagram API 키 필요")
         else:
             username = input("Instagram 계정명: ").strip()
-            result = asyncio.run(run_instagram_diagnosis(
-                username, open_period, ACCESS_TOKEN, USER_ID
-            ))
+            
+            async def run_once():
+                try:
+                    return await run_instagram_diagnosis(username, open_period, ACCESS_TOKEN, USER_ID)
+                finally:
+                    await close_graph_session()
+            
+            result = asyncio.run(run_once())
             
             if result:
                 print(result['message'])
@@ -529,5 +746,7 @@ if __name__ == "__main__":
     elif choice == "3":
         total = int(input("네이버 플레이스 리뷰 수: "))
         blog = int(input("블로그 리뷰 수: "))
-        result = diagnose_naver_place_from_counts(total, blog, open_period)
+        industry = input("업종 (비교용, 없으면 엔터): ").strip() or None
+        district = input("지역 (비교용, 없으면 엔터): ").strip() or None
+        result = diagnose_naver_place_from_counts(total, blog, open_period, industry, district)
         print(result['message'])
\ No newline at end of file
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+# instagram_batch.py - 여러 Instagram 계정 일괄 진단 (공유 호출 예산 + 벡터화 지표 계산 + DB 저장)
+
+import argparse
+import asyncio
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from instagram_analyzer import (
+    InstagramGraphClient, diagnose_instagram, close_graph_session, DEFAULT_MEDIA_LIMIT
+)
+from log_config import LOG_LEVEL, setup_logging
+from rate_limiter import AdaptiveRateLimiter
+
+load_dotenv()
+
+DB_FILE = 'seoul_industry_reviews.db'
+CALLS_PER_HOUR = int(os.getenv('INSTAGRAM_CALLS_PER_HOUR', '3600'))  # 앱 호출 한도에 맞게 조정
+BURST = 10              # 순간 허용 호출 수
+CONCURRENCY = 10        # 동시 요청 계정 수
+DAY = 86400
+
+
+# ==================== 벡터화 지표 계산 ====================
+
+def _post_time_matrix(accounts: List[Dict]):
+    """계정별 게시물 시각/릴스 여부 → (계정 × 게시물) 배열 (빈 칸은 NaT/False)"""
+    rows = []
+    for account in accounts:
+        media = account.get('media', {}).get('data', [])
+        # "2024-10-05T12:00:00+0000" → 앞 19자 (기존 코드처럼 시간대는 무시)
+        stamps = [(m['timestamp'][:19], m.get('media_type') == 'VIDEO')
+                  for m in media if m.get('timestamp')]
+        rows.append(stamps)
+
+    width = max((len(r) for r in rows), default=0) or 1
+    times = np.full((len(rows), width), np.datetime64('NaT'), dtype='datetime64[s]')
+    reels = np.zeros((len(rows), width), dtype=bool)
+    for i, stamps in enumerate(rows):
+        if stamps:
+            times[i, :len(stamps)] = np.array([t for t, _ in stamps], dtype='datetime64[s]')
+            reels[i, :len(stamps)] = [v for _, v in stamps]
+    return times, reels
+
+
+def consistency_batch(times: np.ndarray) -> List[str]:
+    """
+    calculate_consistency의 벡터화 버전
+
+    게시 간격(일, 내림)의 표본 표준편차 < 7 → 'consistent', 게시물 3개 미만 → 'unknown'
+    """
+    if times.size == 0:
+        return []
+
+    ordered = np.sort(times, axis=1)  # NaT는 뒤로
+    valid = ~np.isnat(ordered)
+    seconds = np.where(valid, ordered.astype('int64'), 0).astype(float)
+    seconds[~valid] = np.nan
+
+    intervals = np.floor(np.diff(seconds, axis=1) / DAY)  # 한쪽이라도 NaN이면 NaN
+    has = ~np.isnan(intervals)
+    n = has.sum(axis=1)
+
+    filled = np.where(has, intervals, 0.0)
+    mean = filled.sum(axis=1) / np.maximum(n, 1)
+    sq = np.where(has, (intervals - mean[:, None]) ** 2, 0.0).sum(axis=1)
+    std = np.sqrt(sq / np.maximum(n - 1, 1))
+
+    counts = valid.sum(axis=1)
+    return [
+        'unknown' if c < 3 else ('consistent' if s < 7 else 'inconsistent')
+        for c, s in zip(counts, std)
+    ]
+
+
+def extract_batch(accounts: Dict[str, Dict], now: Optional[datetime] = None) -> Dict[str, Dict]:
+    """
+    InstagramDiagnostics.extract_data_for_diagnosis + calculate_consistency를 전 계정 한 번에
+
+    Returns:
+        {username: diagnose_instagram 입력 dict (consistency 포함)}
+    """
+    names = list(accounts)
+    if not names:
+        return {}
+
+    times, reels = _post_time_matrix([accounts[u] for u in names])
+    now64 = np.datetime64((now or datetime.now()).replace(microsecond=0), 's')
+
+    valid = ~np.isnat(times)
+    age_days = np.floor((now64 - times).astype('timedelta64[s]').astype(float) / DAY)
+    recent = valid & (np.nan_to_num(age_days, nan=np.inf) <= 30)
+
+    recent_posts = recent.sum(axis=1)
+    recent_reels = (recent & reels).sum(axis=1)
+    consistency = consistency_batch(times)
+
+    return {
+        username: {
+            'followers': accounts[username].get('followers_count', 0),
+            'media_count': accounts[username].get('media_count', 0),
+            'recent_30d_posts': int(recent_posts[i]),
+            'recent_30d_reels': int(recent_reels[i]),
+            'post_dates': [],
+            'consistency': consistency[i],
+        }
+        for i, username in enumerate(names)
+    }
+
+
+# ==================== DB ====================
+
+def init_results_table(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS instagram_diagnoses (
+            username TEXT NOT NULL,
+            run_date TEXT NOT NULL,
+            open_period TEXT,
+            followers INTEGER,
+            media_count INTEGER,
+            recent_30d_posts INTEGER,
+            recent_30d_reels INTEGER,
+            consistency TEXT,
+            status TEXT NOT NULL,
+            message TEXT,
+            diagnosed_at TEXT,
+            PRIMARY KEY (username, run_date)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+def save_results(results: List[Dict], db_file=DB_FILE):
+    """진단 결과 일괄 저장 (같은 날 재실행하면 덮어씀)"""
+    init_results_table(db_file)
+    now = datetime.now()
+    rows = [
+        (r['username'], now.strftime('%Y-%m-%d'), r['open_period'],
+         r.get('followers'), r.get('media_count'), r.get('recent_30d_posts'),
+         r.get('recent_30d_reels'), r.get('consistency'), r['status'],
+         r.get('message'), now.isoformat())
+        for r in results
+    ]
+    conn = sqlite3.connect(db_file, timeout=30)
+    conn.executemany("""
+        INSERT INTO instagram_diagnoses
+        (username, run_date, open_period, followers, media_count, recent_30d_posts,
+         recent_30d_reels, consistency, status, message, diagnosed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(username, run_date) DO UPDATE SET
+            open_period = excluded.open_period,
+            followers = excluded.followers,
+            media_count = excluded.media_count,
+            recent_30d_posts = excluded.recent_30d_posts,
+            recent_30d_reels = excluded.recent_30d_reels,
+            consistency = excluded.consistency,
+            status = excluded.status,
+            message = excluded.message,
+            diagnosed_at = excluded.diagnosed_at
+    """, rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+# ==================== 일괄 진단 ====================
+
+async def diagnose_accounts(
+    accounts: List[Tuple[str, str]],
+    access_token: str,
+    user_id: str,
+    calls_per_hour: int = CALLS_PER_HOUR,
+    max_calls: Optional[int] = None,
+    concurrency: int = CONCURRENCY,
+    media_limit: int = DEFAULT_MEDIA_LIMIT,
+    db_file: Optional[str] = DB_FILE
+) -> List[Dict]:
+    """
+    계정 목록 일괄 진단
+
+    Args:
+        accounts: [(ig_username, open_period), ...]
+        calls_per_hour: 모든 계정이 나눠 쓰는 Graph API 호출 속도
+        max_calls: 이번 실행 호출 상한 (넘으면 남은 계정은 'skipped')
+        db_file: None이면 저장 안 함
+    """
+    periods = {}
+    for username, open_period in accounts:
+        periods.setdefault(username.lower().lstrip('@'), open_period)
+
+    limiter = AdaptiveRateLimiter(calls_per_hour / 3600, capacity=BURST, min_rate=calls_per_hour / 3600 / 8)
+    client = InstagramGraphClient(access_token, user_id, limiter=limiter)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(username):
+        async with semaphore:
+            if max_calls is not None and client.calls >= max_calls:
+                return username, None, 'skipped', "호출 예산 소진"
+            try:
+                account = await client.get_account_data(username, media_limit)
+            except Exception as e:
+                return username, None, 'error', str(e)
+            if not account:
+                return username, None, 'error', "계정 없음 (비즈니스/크리에이터 계정이 아님)"
+            return username, account, None, None
+
+    print(f"📱 {len(periods)}개 계정 진단 시작 (시간당 {calls_per_hour}회, 동시 {concurrency}개)")
+    started = datetime.now()
+    fetched = await asyncio.gather(*[fetch(u) for u in periods])
+
+    # 🔥 지표는 전 계정 한 번에 (numpy)
+    extracted = extract_batch({u: a for u, a, _, _ in fetched if a})
+
+    results = []
+    for username, _, status, error in fetched:
+        row = {'username': username, 'open_period': periods[username]}
+        data = extracted.get(username)
+        if data:
+            diagnosis = diagnose_instagram(data, periods[username])
+            row.update({k: v for k, v in data.items() if k != 'post_dates'})
+            row.update(status=diagnosis['status'], message=diagnosis['message'].strip())
+        else:
+            row.update(status=status, message=error)
+        results.append(row)
+
+    elapsed = (datetime.now() - started).total_seconds()
+    ok = sum(1 for r in results if r['status'] in ('success', 'insufficient_data'))
+    print(f"✅ 완료: {ok}/{len(results)}개 ({elapsed:.1f}초, API {client.calls}회, {client.cache.stats_text()})")
+
+    if db_file:
+        save_results(results, db_file)
+        print(f"💾 instagram_diagnoses 저장: {len(results)}개")
+
+    return results
+
+
+def load_account_list(path: str, default_period: str) -> List[Tuple[str, str]]:
+    """계정 목록 파일: 한 줄에 `username` 또는 `username,open_period` (#은 주석)"""
+    accounts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = [p.strip() for p in line.split(',')]
+            accounts.append((parts[0], parts[1] if len(parts) > 1 and parts[1] else default_period))
+    return accounts
+
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Instagram 계정 일괄 진단")
+    parser.add_argument('accounts', help="계정 목록 파일 (username[,open_period] 한 줄씩)")
+    parser.add_argument('--period', default='6-24', help="기본 오픈 기간 (0-6 / 6-24 / 24+)")
+    parser.add_argument('--calls-per-hour', type=int, default=CALLS_PER_HOUR)
+    parser.add_argument('--max-calls', type=int, default=None, help="이번 실행 API 호출 상한")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--media-limit', type=int, default=DEFAULT_MEDIA_LIMIT)
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--log-level', default=LOG_LEVEL, help="DEBUG면 계정/호출별 로그까지")
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    access_token = os.getenv("INSTAGRAM_ACCESS_TOKEN", "")
+    user_id = os.getenv("INSTAGRAM_USER_ID", "")
+    if not access_token or not user_id:
+        print("❌ .env 파일에 Instagram API 키 필요")
+        return
+
+    accounts = load_account_list(args.accounts, args.period)
+
+    async def run():
+        try:
+            return await diagnose_accounts(
+                accounts, access_token, user_id,
+                calls_per_hour=args.calls_per_hour, max_calls=args.max_calls,
+                concurrency=args.concurrency, media_limit=args.media_limit, db_file=args.db
+            )
+        finally:
+            await close_graph_session()
+
+    results = asyncio.run(run())
+
+    statuses = {}
+    for r in results:
+        statuses[r['status']] = statuses.get(r['status'], 0) + 1
+    print("📊 " + " / ".join(f"{k} {v}" for k, v in sorted(statuses.items())))
+
+
+if __name__ == "__main__":
+    main()
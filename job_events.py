@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# job_events.py - 분석 작업 진행 이벤트 (단계/퍼센트/경과 시간/중간 결과를 SSE로 푸시)
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+
+MAX_JOBS = 500              # 이벤트 기록을 들고 있을 최근 작업 수
+HEARTBEAT_SECONDS = 15      # 프록시가 연결을 끊지 않도록 보내는 주석 줄 주기
+TERMINAL = ('completed', 'failed')
+
+# 단계 → (진행률, 안내 문구)
+STAGES = {
+    'queued':      (0,   '대기 중...'),
+    'crawl':       (10,  '🕷️ 리뷰 크롤링 중... (1-2분 소요)'),
+    'insight':     (35,  '🤖 AI 인사이트 생성 중...'),
+    'analyzed':    (50,  '🏪 경쟁사 비교 + AI 인사이트 생성 완료'),
+    'report':      (55,  '📊 HTML 리포트 생성 중...'),
+    'personalize': (60,  '🎯 후킹/인사이트/마케팅/전략 동시 생성 중...'),
+    'hook':        (60,  '🎯 스티브 잡스 톤 후킹 문장 생성 중...'),
+    'insights':    (65,  '🔍 리뷰 교차 분석 인사이트 생성 중...'),
+    'marketing':   (70,  '📊 현재 마케팅 활동 분석 중... (가중치 50%)'),
+    'instagram':   (75,  '📱 인스타그램 계정 진단 중...'),
+    'strategy':    (80,  '🎯 WHY-WHAT-HOW 전략 생성 중...'),
+    'dashboard':   (90,  '📄 KILLER 대시보드 생성 중...'),
+    'email':       (95,  '📧 이메일 전송 중...'),
+    'completed':   (100, '완료! 이메일을 확인하세요.'),
+    'failed':      (100, '분석 실패'),
+}
+
+
+def format_sse(event):
+    """이벤트 dict → SSE 프레임 (id로 재연결 시 이어받기)"""
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"id: {event['seq']}\nevent: {event['status']}\ndata: {data}\n\n"
+
+
+class _JobChannel:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.history = []
+        self.subscribers = set()
+
+
+class JobEventBus:
+    """
+    작업별 진행 이벤트 채널
+
+    - publish: 이벤트를 기록하고 구독 중인 큐에 바로 넣음 (이벤트 루프 안에서 호출)
+    - subscribe: 지난 이벤트부터 다시 보내고 이후 이벤트를 기다림, 작업이 끝나면 종료
+    """
+
+    def __init__(self, max_jobs=MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._channels = OrderedDict()
+
+    def _channel(self, job_id):
+        channel = self._channels.get(job_id)
+        if channel is None:
+            channel = self._channels[job_id] = _JobChannel()
+            while len(self._channels) > self.max_jobs:
+                self._channels.popitem(last=False)
+        return channel
+
+    def __contains__(self, job_id):
+        return job_id in self._channels
+
+    def publish(self, job_id, stage, status='processing', message=None, percent=None, data=None):
+        """
+        단계 이벤트 발행
+
+        Args:
+            stage: STAGES 키 (없는 단계면 percent/message 직접 지정)
+            data: 중간 결과 (리뷰 수, 후킹 문장 등) - JSON으로 보낼 수 있는 값만
+        """
+        channel = self._channel(job_id)
+        default_percent, default_message = STAGES.get(stage, (None, stage))
+        event = {
+            'seq': len(channel.history) + 1,
+            'job_id': job_id,
+            'stage': stage,
+            'status': status,
+            'percent': percent if percent is not None else default_percent,
+            'message': message or default_message,
+            'elapsed': round(time.monotonic() - channel.started, 2),
+            'data': data or {},
+        }
+        channel.history.append(event)
+        for queue in list(channel.subscribers):
+            queue.put_nowait(event)
+        return event
+
+    def history(self, job_id):
+        channel = self._channels.get(job_id)
+        return list(channel.history) if channel else []
+
+    async def subscribe(self, job_id, last_seq=0, heartbeat=None):
+        """
+        이벤트 async generator (last_seq 이후부터)
+
+        heartbeat초 동안 새 이벤트가 없으면 None을 넘김 (연결 유지용)
+        """
+        channel = self._channel(job_id)
+        queue = asyncio.Queue()
+        channel.subscribers.add(queue)
+        getter = None
+        try:
+            for event in list(channel.history[last_seq:]):
+                last_seq = event['seq']
+                yield event
+                if event['status'] in TERMINAL:
+                    return
+            while True:
+                # wait_for 대신 wait - 시간 초과해도 get을 취소하지 않고 다음 바퀴에 이어서 기다림
+                if getter is None:
+                    getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter}, timeout=heartbeat)
+                if not done:
+                    yield None
+                    continue
+                event, getter = getter.result(), None
+                if event['seq'] <= last_seq:
+                    continue    # 지난 이벤트를 보내는 동안 큐에도 들어온 것
+                last_seq = event['seq']
+                yield event
+                if event['status'] in TERMINAL:
+                    return
+        finally:
+            if getter is not None:
+                getter.cancel()
+            channel.subscribers.discard(queue)
+
+    async def stream(self, job_id, last_seq=0, heartbeat=HEARTBEAT_SECONDS):
+        """SSE 본문 generator (이벤트 사이가 길면 주석 줄로 연결 유지)"""
+        async for event in self.subscribe(job_id, last_seq, heartbeat):
+            yield format_sse(event) if event else ": keep-alive\n\n"
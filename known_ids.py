@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# known_ids.py - 기존 place_id 인덱스 (정렬된 uint64 배열 + mmap + 이진 탐색)
+
+import array
+import bisect
+import heapq
+import mmap
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+DB_FILE = 'seoul_industry_reviews.db'
+INDEX_FILE = 'known_place_ids.bin'   # 정렬된 uint64 배열
+MERGE_EVERY = 10000                  # 추가분이 이만큼 쌓이면 인덱스에 병합
+
+
+class KnownPlaceIds:
+    """
+    크롤러가 이미 수집한 place_id 집합
+
+    - 본체: 정렬된 uint64 배열 파일을 mmap (프로세스 간 페이지 캐시 공유, 로딩 ≈ 0ms)
+    - 추가분: 작은 set + .delta 파일 append (save_to_db 커밋마다 add)
+    - set과 같은 인터페이스 (in / add / len) 라서 기존 existing_ids 자리에 그대로 사용
+    - 가게 수 수백만 기준 Python set(수백 MB) 대신 8바이트 × N
+    - 여러 샤드 프로세스가 같이 씀 → 재생성/병합/추가는 .lock 파일 잠금 안에서
+    """
+
+    def __init__(self, index_file=INDEX_FILE, delta_file=None, db_file=DB_FILE,
+                 merge_every=MERGE_EVERY):
+        self.index_file = Path(index_file)
+        self.delta_file = Path(delta_file or f"{index_file}.delta")
+        self.lock_file = Path(f"{index_file}.lock")
+        self.db_file = db_file
+        self.merge_every = merge_every
+
+        self._fh = None
+        self._mm = None
+        self._view = ()
+        self._delta = set()     # 숫자 ID (int)
+        self._others = set()    # 숫자가 아닌 ID (str, 거의 없음)
+        self._delta_fh = None
+
+    # ==================== 열기 / 닫기 ====================
+
+    def open(self):
+        """
+        인덱스 mmap + 추가분 로드 (인덱스가 없거나 DB보다 작으면 재생성)
+
+        샤드 N개가 동시에 열어도 재생성은 한 번만 (잠금 잡은 뒤 다시 확인)
+        """
+        with self._locked():
+            if not self.index_file.exists():
+                self._rebuild_from_db()
+            self._map()
+            self._load_delta()
+
+            db_count = self._db_store_count()
+            if db_count is not None and db_count > len(self):
+                print(f"   ⚠️  인덱스({len(self):,}) < DB({db_count:,}) → 재생성")
+                self._rebuild_from_db()
+
+        return self
+
+    @contextmanager
+    def _locked(self):
+        """프로세스 간 배타 잠금 (.lock 파일, 블로킹)"""
+        with open(self.lock_file, 'a+b') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        lock.seek(0)
+                        msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:     # LK_LOCK은 10초 재시도 후 포기
+                        time.sleep(0.1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock.seek(0)
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _map(self):
+        self._unmap()
+        self._fh = open(self.index_file, 'rb')
+        if os.fstat(self._fh.fileno()).st_size == 0:
+            self._view = ()
+            return
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm).cast('Q')
+
+    def _unmap(self):
+        if isinstance(self._view, memoryview):
+            self._view.release()
+        self._view = ()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def _load_delta(self):
+        self._delta = set()
+        self._others = set()
+        if self.delta_file.exists():
+            with open(self.delta_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._remember(line.strip())
+
+    def close(self):
+        if self._delta_fh is not None:
+            self._delta_fh.close()
+            self._delta_fh = None
+        self._unmap()
+
+    # ==================== 조회 / 추가 ====================
+
+    @staticmethod
+    def _as_int(place_id):
+        place_id = str(place_id)
+        return int(place_id) if place_id.isdigit() and len(place_id) < 20 else None
+
+    def _remember(self, place_id):
+        if not place_id:
+            return
+        value = self._as_int(place_id)
+        if value is None:
+            self._others.add(str(place_id))
+        else:
+            self._delta.add(value)
+
+    def _in_index(self, value):
+        i = bisect.bisect_left(self._view, value)
+        return i < len(self._view) and self._view[i] == value
+
+    def __contains__(self, place_id):
+        value = self._as_int(place_id)
+        if value is None:
+            return str(place_id) in self._others
+        return value in self._delta or self._in_index(value)
+
+    def __len__(self):
+        return len(self._view) + len(self._delta) + len(self._others)
+
+    def add(self, place_id):
+        """save_to_db 커밋 직후 호출"""
+        if place_id in self:
+            return
+        self._remember(place_id)
+
+        # 병합이 .delta를 비우는 중간에 끼어들면 줄이 사라짐 → 추가도 잠금 안에서
+        with self._locked():
+            if self._delta_fh is None:
+                self._delta_fh = open(self.delta_file, 'a', encoding='utf-8')
+            self._delta_fh.write(f"{place_id}\n")
+            self._delta_fh.flush()
+
+        if len(self._delta) >= self.merge_every:
+            self.merge()
+
+    # ==================== 병합 / 재생성 ====================
+
+    def _write_index(self, sorted_ids):
+        tmp_file = self.index_file.with_name(f"{self.index_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'wb') as f:
+            if not isinstance(sorted_ids, array.array):
+                sorted_ids = array.array('Q', sorted_ids)
+            sorted_ids.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        self._unmap()  # Windows는 매핑된 파일을 교체할 수 없음
+        os.replace(tmp_file, self.index_file)
+
+    def merge(self):
+        """
+        추가분을 정렬 배열에 병합 (다른 프로세스가 쓴 .delta 줄까지 포함)
+
+        잠금 안에서 디스크의 최신 인덱스를 다시 매핑한 뒤 병합
+        (다른 샤드가 먼저 병합했으면 내 mmap은 옛 파일 → 그대로 쓰면 그쪽 ID가 빠짐)
+        """
+        with self._locked():
+            return self._merge()
+
+    def _merge(self):
+        if self._delta_fh is not None:
+            self._delta_fh.close()
+            self._delta_fh = None
+        self._map()
+        self._load_delta()
+        if not self._delta:
+            return False
+
+        # 정렬된 두 열을 선형 병합 (전체를 set으로 풀지 않음)
+        merged = array.array('Q')
+        last = None
+        for value in heapq.merge(self._view, sorted(self._delta)):
+            if value != last:
+                merged.append(value)
+                last = value
+
+        try:
+            self._write_index(merged)
+        except OSError as e:
+            print(f"   ⚠️  인덱스 병합 실패 (추가분 유지): {e}")
+            self._map()
+            return False
+
+        self._map()
+        self._delta = set()
+        # 제자리 truncate (교체하면 다른 샤드가 열어둔 append 핸들이 옛 파일에 씀)
+        with open(self.delta_file, 'w', encoding='utf-8') as f:
+            for place_id in self._others:
+                f.write(f"{place_id}\n")
+        return True
+
+    def rebuild_from_db(self):
+        """stores 테이블에서 인덱스 전체 재생성 (최초 1회 또는 불일치 시)"""
+        with self._locked():
+            return self._rebuild_from_db()
+
+    def _rebuild_from_db(self):
+        ids = set()
+        others = set()
+        try:
+            conn = sqlite3.connect(self.db_file)
+            for (place_id,) in conn.execute("SELECT place_id FROM stores"):
+                value = self._as_int(place_id)
+                if value is None:
+                    others.add(str(place_id))
+                else:
+                    ids.add(value)
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"   ⚠️  DB 읽기 실패 (빈 인덱스로 시작): {e}")
+
+        if self._delta_fh is not None:
+            self._delta_fh.close()
+            self._delta_fh = None
+
+        self._write_index(sorted(ids))
+        with open(self.delta_file, 'w', encoding='utf-8') as f:
+            for place_id in others:
+                f.write(f"{place_id}\n")
+
+        self._map()
+        self._delta = set()
+        self._others = others
+        return len(self)
+
+    def _db_store_count(self):
+        try:
+            conn = sqlite3.connect(self.db_file)
+            count = conn.execute("SELECT COUNT(*) FROM stores").fetchone()[0]
+            conn.close()
+            return count
+        except sqlite3.Error:
+            return None
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+# llm_batch.py - LLM 배치 API 경로 (OpenAI Batch / Anthropic Message Batches, 단계별로 모아서 제출 → 폴링 → 결과 배분)
+
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+OPENAI_BASE_URL = os.getenv('OPENAI_BATCH_BASE_URL', 'https://api.openai.com')
+ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BATCH_BASE_URL', 'https://api.anthropic.com')
+ANTHROPIC_VERSION = '2023-06-01'
+OPENAI_ENDPOINT = '/v1/chat/completions'
+
+SETTLE_SECONDS = 3.0        # 이 시간 동안 새 요청이 없으면 지금까지 모인 요청으로 배치 제출
+POLL_SECONDS = float(os.getenv('LLM_BATCH_POLL_SECONDS', '30'))
+MAX_BATCH_REQUESTS = {'openai': 50000, 'anthropic': 100000}  # 배치 1개당 요청 수 한도
+HTTP_TIMEOUT = 120
+MAX_POLL_ERRORS = 8         # 상태/결과 조회가 연속으로 이만큼 실패해야 포기 (간격은 매번 2배, 최대 POLL_BACKOFF_MAX)
+POLL_BACKOFF_MAX = 600
+BATCH_DIR = 'llm_batches'   # 제출한 배치 파일 보관 (재현/디버깅용)
+
+OPENAI_DONE = ('completed', 'failed', 'expired', 'cancelled')
+
+
+class BatchError(Exception):
+    """배치 제출/조회 실패"""
+
+
+class BatchRequestError(Exception):
+    """배치 안의 요청 하나가 실패 (호출한 파이프라인 쪽으로 던짐)"""
+
+
+def to_response(data):
+    """배치 결과 JSON → SDK 응답처럼 속성으로 읽는 객체 (response.choices[0].message.content 등)"""
+    if isinstance(data, dict):
+        return SimpleNamespace(**{key: to_response(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return [to_response(value) for value in data]
+    return data
+
+
+def request_body(kwargs):
+    """gateway 호출 kwargs → 배치 요청 body (extra_body는 펼침)"""
+    body = dict(kwargs)
+    body.update(body.pop('extra_body', None) or {})
+    return body
+
+
+# ==================== HTTP ====================
+
+def _http(method, url, headers, body=None, content_type='application/json'):
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    headers = dict(headers)
+    if body is not None:
+        headers['Content-Type'] = content_type
+    request = urllib.request.Request(url, data=body, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        raise BatchError(f"{method} {url} → {e.code}: {e.read()[:300].decode('utf-8', 'replace')}") from e
+    except urllib.error.URLError as e:
+        raise BatchError(f"{method} {url} → {e.reason}") from e
+
+
+def _jsonl(lines):
+    return ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines).encode('utf-8')
+
+
+def _parse_jsonl(raw):
+    return [json.loads(line) for line in raw.decode('utf-8').splitlines() if line.strip()]
+
+
+class OpenAIBatchClient:
+    """OpenAI Batch API (파일 업로드 → 배치 생성 → 상태 조회 → 결과 파일)"""
+
+    provider = 'openai'
+
+    def __init__(self, base_url=OPENAI_BASE_URL, api_key=None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Authorization': f"Bearer {api_key or os.getenv('OPENAI_API_KEY', '')}"}
+
+    def build_file(self, entries):
+        return _jsonl({
+            'custom_id': entry['custom_id'],
+            'method': 'POST',
+            'url': OPENAI_ENDPOINT,
+            'body': entry['body'],
+        } for entry in entries)
+
+    def submit(self, content, name):
+        boundary = uuid.uuid4().hex
+        multipart = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="purpose"\r\n\r\nbatch\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            f'Content-Type: application/jsonl\r\n\r\n'
+        ).encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        uploaded = json.loads(_http('POST', f'{self.base_url}/v1/files', self.headers, multipart,
+                                    content_type=f'multipart/form-data; boundary={boundary}'))
+        batch = json.loads(_http('POST', f'{self.base_url}/v1/batches', self.headers, {
+            'input_file_id': uploaded['id'],
+            'endpoint': OPENAI_ENDPOINT,
+            'completion_window': '24h',
+        }))
+        return batch['id']
+
+    def poll(self, batch_id):
+        """→ (끝났는지, 상태 dict)"""
+        batch = json.loads(_http('GET', f'{self.base_url}/v1/batches/{batch_id}', self.headers))
+        return batch['status'] in OPENAI_DONE, batch
+
+    def results(self, batch):
+        """→ {custom_id: (응답 body, 에러 문자열)}"""
+        results = {}
+        for key in ('output_file_id', 'error_file_id'):
+            if not batch.get(key):
+                continue
+            raw = _http('GET', f"{self.base_url}/v1/files/{batch[key]}/content", self.headers)
+            for line in _parse_jsonl(raw):
+                response = line.get('response') or {}
+                if response.get('status_code') == 200 and not line.get('error'):
+                    results[line['custom_id']] = (response.get('body'), None)
+                else:
+                    error = line.get('error') or (response.get('body') or {}).get('error') or response
+                    results[line['custom_id']] = (None, json.dumps(error, ensure_ascii=False))
+        return results
+
+
+class AnthropicBatchClient:
+    """Anthropic Message Batches API (요청 목록 제출 → 상태 조회 → results_url JSONL)"""
+
+    provider = 'anthropic'
+
+    def __init__(self, base_url=ANTHROPIC_BASE_URL, api_key=None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {
+            'x-api-key': api_key or os.getenv('ANTHROPIC_API_KEY', ''),
+            'anthropic-version': ANTHROPIC_VERSION,
+        }
+
+    def build_file(self, entries):
+        return _jsonl({'custom_id': entry['custom_id'], 'params': entry['body']} for entry in entries)
+
+    def submit(self, content, name):
+        requests = _parse_jsonl(content)
+        batch = json.loads(_http('POST', f'{self.base_url}/v1/messages/batches', self.headers,
+                                 {'requests': requests}))
+        return batch['id']
+
+    def poll(self, batch_id):
+        batch = json.loads(_http('GET', f'{self.base_url}/v1/messages/batches/{batch_id}', self.headers))
+        return batch['processing_status'] == 'ended', batch
+
+    def results(self, batch):
+        results = {}
+        if not batch.get('results_url'):
+            return results
+        for line in _parse_jsonl(_http('GET', batch['results_url'], self.headers)):
+            result = line.get('result') or {}
+            if result.get('type') == 'succeeded':
+                results[line['custom_id']] = (result.get('message'), None)
+            else:
+                error = result.get('error') or {'type': result.get('type')}
+                results[line['custom_id']] = (None, json.dumps(error, ensure_ascii=False))
+        return results
+
+
+# ==================== 배치 경로 (gateway.batch_mode) ====================
+
+class BatchRoute:
+    """
+    파이프라인 여러 개의 LLM 호출을 단계별로 모아 배치로 보내는 경로
+
+    - call(): gateway가 부르는 자리 - 요청을 대기열에 넣고 결과가 올 때까지 호출 스레드를 멈춤
+    - serve(): 조정 스레드 - SETTLE_SECONDS 동안 새 요청이 없으면(= 모든 가게가 같은 단계에서 멈춤)
+      모인 요청을 provider별 배치 파일로 써서 제출 → 폴링 → 결과를 각 호출로 돌려줌
+      → 가게 파이프라인들이 다음 단계 요청을 보내면 다음 라운드
+
+    파이프라인 코드는 그대로 - 대화형 호출 대신 배치 결과를 받을 뿐
+    """
+
+    def __init__(self, clients=None, batch_dir=BATCH_DIR, settle=SETTLE_SECONDS, poll_interval=POLL_SECONDS):
+        clients = clients or [OpenAIBatchClient(), AnthropicBatchClient()]
+        self.clients = {client.provider: client for client in clients}
+        self.batch_dir = batch_dir
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.rounds = []        # [{'round', 'stages', 'requests', 'failed', 'seconds', 'batches'}]
+        self._pending = []
+        self._last_submit = 0.0
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def call(self, provider, stage, kwargs):
+        """배치 결과가 올 때까지 블로킹 → SDK 응답처럼 읽히는 객체"""
+        entry = {
+            'custom_id': re.sub(r'[^A-Za-z0-9_-]', '_', f"r{next(self._ids)}-{stage}")[:64],
+            'provider': provider,
+            'stage': stage,
+            'body': request_body(kwargs),
+            'done': threading.Event(),
+            'response': None,
+            'error': None,
+        }
+        with self._cond:
+            if self._stopped:
+                raise BatchRequestError("배치 경로가 이미 종료됨")
+            self._pending.append(entry)
+            self._last_submit = time.monotonic()
+            self._cond.notify_all()
+        entry['done'].wait()
+        if entry['error']:
+            raise BatchRequestError(f"{stage}: {entry['error']}")
+        return to_response(entry['response'])
+
+    def stop(self):
+        """남은 요청까지 보낸 뒤 serve() 종료"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def serve(self):
+        """조정 루프 (별도 스레드에서 실행)"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                idle = time.monotonic() - self._last_submit
+                if idle < self.settle and not self._stopped:
+                    self._cond.wait(self.settle - idle)
+                    continue
+                entries, self._pending = self._pending, []
+            self._run_round(entries)
+
+    def _run_round(self, entries):
+        number = len(self.rounds) + 1
+        started = time.monotonic()
+        stages = sorted({entry['stage'] for entry in entries})
+        logger.info(f"📦 배치 라운드 {number}: 요청 {len(entries)}개 ({', '.join(stages)})")
+
+        submitted = []  # [(client, batch_id, entries)]
+        os.makedirs(self.batch_dir, exist_ok=True)
+        for provider, client in self.clients.items():
+            group = [entry for entry in entries if entry['provider'] == provider]
+            limit = MAX_BATCH_REQUESTS[provider]
+            for part, offset in enumerate(range(0, len(group), limit)):
+                chunk = group[offset:offset + limit]
+                name = f"round{number:03d}_{provider}_{part + 1}_{int(time.time())}.jsonl"
+                content = client.build_file(chunk)
+                with open(os.path.join(self.batch_dir, name), 'wb') as f:
+                    f.write(content)
+                try:
+                    batch_id = client.submit(content, name)
+                except BatchError as e:
+                    logger.error(f"   ❌ {provider} 배치 제출 실패: {e}")
+                    self._finish(chunk, {}, str(e))
+                    continue
+                logger.debug(f"   📤 {provider}: {len(chunk)}개 → {batch_id} ({name})")
+                submitted.append((client, batch_id, chunk))
+
+        # 조회 실패(일시적 5xx/네트워크)는 간격을 늘려 재시도 - 배치는 서버에서 계속 돌고 있음
+        # 요청 실패 처리는 배치가 끝난 상태(completed/failed/expired/ended)이거나 연속 실패가 한도를 넘을 때만
+        failed = 0
+        waiting = [{'client': client, 'batch_id': batch_id, 'chunk': chunk, 'errors': 0,
+                    'next_at': time.monotonic() + self.poll_interval}
+                   for client, batch_id, chunk in submitted]
+        while waiting:
+            time.sleep(max(0.0, min(item['next_at'] for item in waiting) - time.monotonic()))
+            still = []
+            for item in waiting:
+                if item['next_at'] > time.monotonic():
+                    still.append(item)
+                    continue
+                batch_id, chunk = item['batch_id'], item['chunk']
+                try:
+                    done, batch = item['client'].poll(batch_id)
+                    if not done:
+                        item['errors'] = 0
+                        item['next_at'] = time.monotonic() + self.poll_interval
+                        still.append(item)
+                        continue
+                    results = item['client'].results(batch)
+                except BatchError as e:
+                    item['errors'] += 1
+                    if item['errors'] >= MAX_POLL_ERRORS:
+                        logger.error(f"   ❌ {batch_id} 조회 {item['errors']}회 연속 실패 - 포기: {e}")
+                        failed += self._finish(chunk, {}, str(e))
+                        continue
+                    delay = min(POLL_BACKOFF_MAX, self.poll_interval * 2 ** item['errors'])
+                    logger.warning(f"   ⚠️  {batch_id} 조회 실패 ({item['errors']}/{MAX_POLL_ERRORS}) → {delay:.0f}초 후 재시도: {e}")
+                    item['next_at'] = time.monotonic() + delay
+                    still.append(item)
+                    continue
+                failed += self._finish(chunk, results, f"결과 없음 (배치 상태 {batch.get('status') or batch.get('processing_status')})")
+                logger.debug(f"   📥 {batch_id}: {len(chunk)}개 완료")
+            waiting = still
+
+        elapsed = time.monotonic() - started
+        self.rounds.append({
+            'round': number, 'stages': stages, 'requests': len(entries),
+            'failed': failed, 'seconds': round(elapsed, 1), 'batches': len(submitted),
+        })
+        logger.info(f"   ✅ 라운드 {number} 완료 ({elapsed:.0f}초, 실패 {failed}개)")
+
+    def _finish(self, entries, results, missing_error):
+        """결과 배분 → 실패 개수"""
+        failed = 0
+        for entry in entries:
+            response, error = results.get(entry['custom_id'], (None, missing_error))
+            entry['response'], entry['error'] = response, error
+            failed += 1 if error else 0
+            entry['done'].set()
+        return failed
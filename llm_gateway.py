@@ -0,0 +1,489 @@
+# -*- coding: utf-8 -*-
+# llm_gateway.py - 프로세스 공용 LLM 게이트웨이 (클라이언트 풀 + 모델별 RPM/TPM 토큰 버킷 + 우선순위 대기열 + 429 적응형 감속)
+
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from incremental_json import IncompleteJSON, StreamingJSONParser
+from llm_usage import count_tokens, record_usage
+from rate_limiter import AdaptiveRateLimiter
+from record_replay import encode_stream, recorder, replay_stream
+from tracing import annotate, span
+
+logger = logging.getLogger(__name__)
+
+# 우선순위 (숫자가 작을수록 먼저 들어감)
+PRIORITY_HIGH = 0       # 작업 마무리 단계 (후킹/전략 - 이메일 직전이라 먼저 끝내는 게 체감 대기 시간에 유리)
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9        # map-reduce 청크처럼 한 번에 쏟아지는 호출
+
+# 모델 → (분당 요청 수, 분당 토큰 수, 동시 호출 수) - 기본값은 Tier 2 기준, 계정 티어에 맞춰 LLM_LIMITS로 덮어씀
+# (Tier 1 값(gpt-4o 30K TPM)이면 35K prefix 전략 호출 1번이 한도를 넘어 호출마다 1분 넘게 대기)
+DEFAULT_LIMITS = {
+    'gpt-4o':                     (5000, 450000, 32),
+    'gpt-4o-mini':                (5000, 2000000, 32),
+    'claude-sonnet-4-5-20250929': (1000, 450000, 8),
+}
+FALLBACK_LIMITS = (500, 200000, 8)
+BURST_SECONDS = 10          # 버킷 용량 = 이 시간 동안 쓸 수 있는 양 (1분치를 한꺼번에 쏘면 초 단위 제한에 걸림)
+MIN_BURST_TOKENS = 64000    # 토큰 버킷 최소 용량 - 가장 큰 단일 요청(35K prefix 전략 호출, map-reduce 청크)이 빈 lane에서 바로 나가게
+MAX_THROTTLE_RETRIES = 4    # 429 재시도 한도 (호출 1개당)
+DEFAULT_MAX_TOKENS = 4096   # max_tokens 없을 때 출력 토큰 예상치
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '180'))
+THROTTLE_STATUS = (429, 529)    # 529: Anthropic overloaded
+MAX_CONTINUATIONS = 1       # 잘린 JSON 응답 이어받기 횟수
+
+# batch_mode() 범위 안이면 대화형 호출 대신 배치 경로로 (llm_batch.BatchRoute)
+_batch_route = contextvars.ContextVar('llm_batch_route', default=None)
+
+CONTINUE_PROMPT = """응답이 길이 제한으로 중간에 잘렸습니다.
+위 JSON에 이미 완성된 필드({keys})는 다시 쓰지 말고, 나머지 필드만 같은 형식의 JSON 객체로 출력하세요."""
+
+
+def parse_limits(text):
+    """
+    'gpt-4o=5000/800000/64,claude-sonnet-4-5-20250929=1000/400000' → {모델: (rpm, tpm, 동시)}
+
+    동시 호출 수를 빼면 기본값 유지
+    """
+    limits = {}
+    for item in (text or '').split(','):
+        if '=' not in item:
+            continue
+        model, values = item.split('=', 1)
+        numbers = [int(v) for v in values.split('/') if v.strip()]
+        base = DEFAULT_LIMITS.get(model.strip(), FALLBACK_LIMITS)
+        limits[model.strip()] = tuple(numbers[:3]) + base[len(numbers[:3]):]
+    return limits
+
+
+def _text_of(content):
+    """메시지 content (문자열 또는 블록 목록) → 텍스트"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return '\n'.join(block.get('text', '') for block in content if isinstance(block, dict))
+    return ''
+
+
+def _input_tokens(model, kwargs):
+    texts = [_text_of(kwargs.get('system'))]
+    texts += [_text_of(message.get('content')) for message in kwargs.get('messages', [])]
+    return count_tokens('\n'.join(texts), model)
+
+
+def estimate_tokens(model, kwargs):
+    """요청 1건 예상 토큰 (입력 + max_tokens) - 응답 후 실제 사용량으로 정산"""
+    return _input_tokens(model, kwargs) + (kwargs.get('max_tokens') or DEFAULT_MAX_TOKENS)
+
+
+def _partial_usage(provider, kwargs, text):
+    """
+    중간에 끊긴 스트림의 사용량 추정 (provider는 입력 전체 + 그때까지 생성한 출력을 과금)
+
+    record_usage가 읽는 provider별 usage 모양으로
+    """
+    input_tokens = _input_tokens(kwargs['model'], kwargs)
+    output_tokens = count_tokens(text, kwargs['model']) if text else 0
+    if provider == 'openai':
+        return SimpleNamespace(prompt_tokens=input_tokens, completion_tokens=output_tokens)
+    return SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens)
+
+
+def _throttle_info(error):
+    """
+    429/529 에러면 (Retry-After 초, 어느 한도인지) - 아니면 None
+
+    'insufficient_quota'(크레딧 소진)는 기다려도 안 풀리므로 재시도 대상 아님
+    """
+    if getattr(error, 'status_code', None) not in THROTTLE_STATUS:
+        return None
+    if getattr(error, 'code', None) == 'insufficient_quota':
+        return None
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        retry_after = float(headers.get('retry-after')) if headers.get('retry-after') else None
+    except (TypeError, ValueError):
+        retry_after = None
+    message = str(error).lower()
+    if 'tokens per min' in message or 'input tokens' in message or 'output tokens' in message:
+        kind = 'tokens'
+    elif 'requests per min' in message:
+        kind = 'requests'
+    else:
+        kind = 'both'
+    return retry_after, kind
+
+
+class StreamedResponse:
+    """스트리밍 응답을 끝까지 읽은 결과 (record_usage가 읽는 usage/model 포함)"""
+
+    def __init__(self, model):
+        self.model = model
+        self.text = ''
+        self.usage = None
+        self.truncated = False  # max_tokens에 걸려 잘림
+
+
+def _batch_streamed(provider, response):
+    """배치 결과 (완성 응답) → StreamedResponse (스트리밍 호출자에게 같은 모양으로)"""
+    streamed = StreamedResponse(response.model)
+    streamed.usage = response.usage
+    if provider == 'openai':
+        choice = response.choices[0]
+        streamed.text = choice.message.content or ''
+        streamed.truncated = choice.finish_reason == 'length'
+    else:
+        streamed.text = ''.join(getattr(block, 'text', '') for block in response.content)
+        streamed.truncated = response.stop_reason == 'max_tokens'
+    return streamed
+
+
+@contextmanager
+def batch_mode(route):
+    """
+    이 범위 안의 gateway 호출을 배치 API로 보냄 (route: llm_batch.BatchRoute)
+
+    contextvar라 asyncio.to_thread / copy_context()로 넘긴 스레드까지 적용
+    """
+    token = _batch_route.set(route)
+    try:
+        yield route
+    finally:
+        _batch_route.reset(token)
+
+
+def batch_active():
+    """지금 batch_mode() 범위 안인지 (동시 호출 수 제한을 풀어 한 라운드에 다 모으는 용도)"""
+    return _batch_route.get() is not None
+
+
+class _Lane:
+    """
+    (provider, model) 하나의 입장 관리
+
+    - 요청 버킷(RPM) + 토큰 버킷(TPM) 둘 다 통과해야 호출
+    - 대기열은 (우선순위, 도착 순) 힙 - 맨 앞 하나만 버킷을 예약하고 기다림
+      → 뒤늦게 온 높은 우선순위 호출이 이미 줄 선 낮은 우선순위 호출을 앞지름
+    - 동시 호출 수 제한 (응답 대기 중인 호출 포함)
+    """
+
+    def __init__(self, provider, model, rpm, tpm, concurrency):
+        self.provider = provider
+        self.model = model
+        self.concurrency = concurrency
+        self.requests = AdaptiveRateLimiter(rpm / 60, min_rate=rpm / 600,
+                                            capacity=max(1.0, rpm * BURST_SECONDS / 60))
+        self.tokens = AdaptiveRateLimiter(tpm / 60, min_rate=tpm / 600,
+                                          capacity=max(MIN_BURST_TOKENS, tpm * BURST_SECONDS / 60))
+        self.in_flight = 0
+        self.stats = {'calls': 0, 'throttled': 0, 'failed': 0, 'queued_seconds': 0.0}
+        self._waiting = []      # [(priority, ticket)]
+        self._gate_busy = False # 맨 앞 호출이 버킷 대기 중
+        self._cond = threading.Condition()
+        self._tickets = itertools.count()
+
+    def admit(self, priority, tokens):
+        """입장할 때까지 블로킹 → 대기한 시간(초)"""
+        started = time.monotonic()
+        ticket = next(self._tickets)
+        with self._cond:
+            heapq.heappush(self._waiting, (priority, ticket))
+            while (self._waiting[0][1] != ticket or self._gate_busy
+                   or self.in_flight >= self.concurrency):
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._gate_busy = True
+            self.in_flight += 1
+        try:
+            # 용량보다 큰 요청은 영원히 못 모이므로 용량을 요청 크기까지 키움
+            if tokens > self.tokens.capacity:
+                self.tokens.set_rate(self.tokens.rate, capacity=tokens)
+            wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+            while wait > 0:
+                seen = (self.requests.throttled, self.tokens.throttled)
+                time.sleep(wait)
+                # 기다리는 사이 429 → 그 버킷은 비워졌지만 내 예약(음수 잔고)은 남아 있음
+                # → 돌려받고 다시 비운 뒤 새 속도로 다시 예약 (안 그러면 빚이 두 배로 쌓여 뒤 호출까지 밀림)
+                wait = 0.0
+                if self.requests.throttled != seen[0]:
+                    wait = self._reserve_again(self.requests, 1)
+                if self.tokens.throttled != seen[1]:
+                    wait = max(wait, self._reserve_again(self.tokens, tokens))
+        finally:
+            with self._cond:
+                self._gate_busy = False
+                self._cond.notify_all()
+        queued = time.monotonic() - started
+        self.stats['queued_seconds'] += queued
+        return queued
+
+    @staticmethod
+    def _reserve_again(bucket, amount):
+        bucket.refund(amount)
+        bucket.drain()
+        return bucket.reserve(amount)
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def settle(self, reserved, used):
+        """예약한 토큰과 실제 사용량 차이 정산 (used=None이면 전부 환불)"""
+        if used is None or used < reserved:
+            self.tokens.refund(reserved - (used or 0))
+        elif used > reserved:
+            self.tokens.reserve(used - reserved)
+
+    def throttle(self, retry_after, kind):
+        """429 → 해당 버킷 감속 + 비우기 + Retry-After 동안 보충 중단 (대기열은 이후 새 속도 간격으로 입장)"""
+        self.stats['throttled'] += 1
+        if kind in ('requests', 'both'):
+            self.requests.on_throttle(retry_after)
+        if kind in ('tokens', 'both'):
+            self.tokens.on_throttle(retry_after)
+
+    def success(self):
+        self.stats['calls'] += 1
+        self.requests.on_success()
+        self.tokens.on_success()
+
+    def snapshot(self):
+        with self._cond:
+            waiting, in_flight = len(self._waiting), self.in_flight
+        return {
+            **self.stats,
+            'queued_seconds': round(self.stats['queued_seconds'], 1),
+            'waiting': waiting,
+            'in_flight': in_flight,
+            'rpm': round(self.requests.rate * 60),
+            'tpm': round(self.tokens.rate * 60),
+        }
+
+
+class LLMGateway:
+    """
+    프로세스 공용 LLM 호출 창구
+
+    - OpenAI / Anthropic 클라이언트를 하나씩만 만들어 연결 풀 공유 (SDK 자체 재시도는 끔 - 재시도는 여기서)
+    - 모델별 RPM/TPM 버킷 + 우선순위 대기열로 입장 → 여러 작업이 몰려도 한도 안에서 꽉 채워 씀
+    - 429면 해당 버킷 감속 (Retry-After 동안 일시정지) 후 같은 우선순위로 재입장
+    - 응답마다 llm_usage에 사용량 기록
+    - stream_json: JSON 응답을 스트리밍으로 받으며 최상위 필드 단위로 바로 넘겨줌
+
+    동기 API - 이벤트 루프에서는 asyncio.to_thread로 호출
+    """
+
+    def __init__(self, limits=None):
+        configured = {**parse_limits(os.getenv('LLM_LIMITS')), **(limits or {})}
+        self.limits = {**DEFAULT_LIMITS, **configured}
+        self._configured = set(configured)     # 기본값이 아니라 직접 지정한 모델
+        self._clients = {}
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    # ==================== 클라이언트 풀 ====================
+
+    def client(self, provider):
+        """provider별 공용 클라이언트 (처음 쓸 때 생성)"""
+        with self._lock:
+            client = self._clients.get(provider)
+            if client is None:
+                if provider == 'openai':
+                    from openai import OpenAI
+                    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0, timeout=LLM_TIMEOUT)
+                elif provider == 'anthropic':
+                    from anthropic import Anthropic
+                    client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'), max_retries=0, timeout=LLM_TIMEOUT)
+                else:
+                    raise ValueError(f"알 수 없는 provider: {provider}")
+                self._clients[provider] = client
+            return client
+
+    def lane(self, provider, model):
+        with self._lock:
+            lane = self._lanes.get((provider, model))
+            if lane is None:
+                rpm, tpm, concurrency = self.limits.get(model, FALLBACK_LIMITS)
+                if model not in self._configured:
+                    logger.warning(f"⚠️  LLM_LIMITS에 {model} 없음 - 기본 한도(분당 {rpm}회 / {tpm:,}토큰) 사용. "
+                                   f"계정 티어가 더 낮으면 429 감속으로 맞춰짐")
+                lane = self._lanes[(provider, model)] = _Lane(provider, model, rpm, tpm, concurrency)
+            return lane
+
+    # ==================== 호출 ====================
+
+    def chat(self, stage, priority=PRIORITY_NORMAL, **kwargs):
+        """OpenAI chat.completions.create (kwargs 그대로 전달)"""
+        return self._call('openai', stage, priority, kwargs)
+
+    def messages(self, stage, priority=PRIORITY_NORMAL, **kwargs):
+        """Anthropic messages.create (kwargs 그대로 전달)"""
+        return self._call('anthropic', stage, priority, kwargs)
+
+    def stream_json(self, stage, priority=PRIORITY_NORMAL, on_field=None,
+                    max_continuations=MAX_CONTINUATIONS, **kwargs):
+        """
+        JSON 응답을 스트리밍으로 받아 dict로 (OpenAI / Anthropic 모델명으로 구분)
+
+        - 최상위 필드가 닫힐 때마다 on_field(key, value) - 전체 응답을 기다리지 않고 후속 작업 시작
+        - JSON이 아닌 응답은 첫 조각에서 끊음 (출력 토큰 낭비 없음)
+        - 길이 제한으로 잘리면 완성된 필드는 두고 나머지 필드만 이어서 요청 (max_continuations회)
+
+        Raises:
+            IncompleteJSON: 이어받기까지 했는데도 객체가 안 닫힘 (.fields에 완성된 필드)
+        """
+        provider = 'anthropic' if kwargs['model'].startswith('claude') else 'openai'
+        base_messages = list(kwargs.pop('messages'))
+        messages = base_messages
+        fields = {}
+
+        for attempt in range(max_continuations + 1):
+            parser = StreamingJSONParser(on_field=on_field)
+            request = dict(kwargs, messages=messages)
+            response = self._call(provider, stage if attempt == 0 else f'{stage}_continue',
+                                  priority, request, on_text=parser.feed)
+            fields.update(parser.fields)
+            if parser.complete:
+                return fields
+            if not response.truncated:
+                break
+            logger.info(f"   ✂️  {stage}: 길이 제한으로 잘림 (완성 필드 {len(fields)}개) → 나머지 필드 이어서 요청")
+            messages = base_messages + [
+                {"role": "assistant", "content": json.dumps(fields, ensure_ascii=False)},
+                {"role": "user", "content": CONTINUE_PROMPT.format(keys=', '.join(fields) or '없음')}
+            ]
+
+        raise IncompleteJSON(f"{stage}: JSON 응답이 완성되지 않음 (완성 필드 {len(fields)}개)", fields)
+
+    def _create(self, provider, kwargs):
+        client = self.client(provider)
+        if provider == 'openai':
+            return client.chat.completions.create(**kwargs)
+        return client.messages.create(**kwargs)
+
+    def _stream(self, provider, kwargs, on_text):
+        """
+        스트리밍 호출 - 조각마다 on_text(text)
+
+        on_text가 예외를 던지면 연결을 닫아 생성을 멈춤
+        """
+        client = self.client(provider)
+        streamed = StreamedResponse(kwargs['model'])
+        parts = []
+        try:
+            if provider == 'openai':
+                stream = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs)
+                try:
+                    for chunk in stream:
+                        if chunk.usage:
+                            streamed.usage = chunk.usage
+                            streamed.model = chunk.model or streamed.model
+                        for choice in chunk.choices:
+                            if choice.delta.content:
+                                parts.append(choice.delta.content)
+                                on_text(choice.delta.content)
+                            if choice.finish_reason == 'length':
+                                streamed.truncated = True
+                finally:
+                    stream.close()
+            else:
+                with client.messages.stream(**kwargs) as stream:
+                    for text in stream.text_stream:
+                        parts.append(text)
+                        on_text(text)
+                    final = stream.get_final_message()
+                streamed.usage = final.usage
+                streamed.model = final.model
+                streamed.truncated = final.stop_reason == 'max_tokens'
+        except Exception as e:
+            # 연결 후 끊김(on_text 중단, 네트워크) → 그때까지의 응답을 붙여서 올림 (호출자가 부분 사용량 기록)
+            if parts or streamed.usage is not None:
+                streamed.text = ''.join(parts)
+                streamed.usage = streamed.usage or _partial_usage(provider, kwargs, streamed.text)
+                e.partial_response = streamed
+            raise
+        streamed.text = ''.join(parts)
+        return streamed
+
+    def _call(self, provider, stage, priority, kwargs, on_text=None):
+        # 호출 하나 = span 하나 (토큰 수는 record_usage가 span에 붙임)
+        with span(f'llm.{stage}', provider=provider, model=kwargs['model']):
+            route = _batch_route.get()
+            if route is not None:
+                return self._call_batch(route, provider, stage, kwargs, on_text)
+            return self._call_live(provider, stage, priority, kwargs, on_text)
+
+    def _call_live(self, provider, stage, priority, kwargs, on_text):
+        lane = self.lane(provider, kwargs['model'])
+        reserved = estimate_tokens(kwargs['model'], kwargs)
+
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            queued = lane.admit(priority, reserved)
+            annotate(queued_seconds=round(queued, 3), attempts=attempt + 1)
+            if queued >= 1:
+                logger.debug(f"   ⏳ {stage}: {provider}/{lane.model} 대기 {queued:.1f}초")
+            started = time.perf_counter()
+            try:
+                # 녹화/재생 (RECORD_REPLAY) - 재생이면 네트워크 없이 픽스처 응답
+                if on_text is None:
+                    response = recorder.call(f'llm_{provider}', kwargs,
+                                             lambda: self._create(provider, kwargs), route=stage)
+                else:
+                    response = recorder.call(
+                        f'llm_{provider}', dict(kwargs, stream=True),
+                        lambda: self._stream(provider, kwargs, on_text), encode=encode_stream,
+                        decode=lambda payload: replay_stream(payload, StreamedResponse(kwargs['model']), on_text),
+                        route=stage
+                    )
+            except Exception as e:
+                # 끊긴 스트림은 입력 + 받은 출력만큼 과금됨 → 기록하고 그만큼만 정산, 나머지(안 쓴 출력)는 환불
+                partial = getattr(e, 'partial_response', None)
+                row = record_usage(partial, stage, started) if partial is not None else None
+                lane.settle(reserved, row['input_tokens'] + row['output_tokens'] if row else None)
+                throttle = _throttle_info(e)
+                if throttle is None or attempt == MAX_THROTTLE_RETRIES:
+                    lane.stats['failed'] += 1
+                    raise
+                lane.throttle(*throttle)
+                logger.warning(f"   🐢 {stage}: {getattr(e, 'status_code', 429)} → "
+                               f"분당 {lane.requests.rate * 60:.0f}회 / {lane.tokens.rate * 60:,.0f}토큰으로 감속 후 재시도")
+                continue
+            finally:
+                lane.release()
+
+            lane.success()
+            row = record_usage(response, stage, started)
+            lane.settle(reserved, row['input_tokens'] + row['output_tokens'] if row else reserved)
+            return response
+
+    def _call_batch(self, route, provider, stage, kwargs, on_text):
+        """배치 경로 - 결과가 올 때까지 블로킹 (레이트 리밋은 배치 API 쪽 한도라 lane을 거치지 않음)"""
+        started = time.perf_counter()
+        response = route.call(provider, stage, kwargs)
+        record_usage(response, f'{stage}@batch', started, batch=True)
+        if on_text is None:
+            return response
+        streamed = _batch_streamed(provider, response)
+        if streamed.text:
+            on_text(streamed.text)
+        return streamed
+
+    def stats(self):
+        """(provider/model) → 호출/429/대기열 현황"""
+        with self._lock:
+            lanes = list(self._lanes.values())
+        return {f"{lane.provider}/{lane.model}": lane.snapshot() for lane in lanes}
+
+
+gateway = LLMGateway()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# llm_usage.py - LLM 호출 토큰 사용량 기록 (캐시 적중 입력 토큰 / 일반 입력 / 출력 / 추정 비용)
+
+import contextvars
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from tracing import annotate, metrics
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = 'seoul_industry_reviews.db'
+
+# 모델별 가격 (USD / 100만 토큰): (입력, 캐시 적중 입력, 캐시 쓰기 입력, 출력)
+PRICES = {
+    'gpt-4o':                     (2.50, 1.25, 2.50, 10.00),
+    'gpt-4o-mini':                (0.15, 0.075, 0.15, 0.60),
+    'claude-sonnet-4-5-20250929': (3.00, 0.30, 3.75, 15.00),
+}
+BATCH_DISCOUNT = 0.5    # 배치 API 요금 배율 (OpenAI Batch / Anthropic Message Batches 모두 50%)
+
+# collect_usage() 범위 안의 호출 기록 목록 (asyncio.to_thread는 컨텍스트를 복사하므로 스레드 호출도 잡힘)
+_collected_rows = contextvars.ContextVar('llm_usage_rows', default=None)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+def count_tokens(text, model='gpt-4o'):
+    """토큰 수 (tiktoken 없으면 한국어 기준 대략 글자 수 / 1.5)"""
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding('o200k_base')
+        return len(encoding.encode(text))
+    return int(len(text) / 1.5) + 1
+
+
+def _usage_numbers(response):
+    """OpenAI / Anthropic 응답 → (provider, model, 입력, 캐시 적중, 캐시 쓰기, 출력)"""
+    usage = getattr(response, 'usage', None)
+    model = getattr(response, 'model', '') or ''
+    if usage is None:
+        return None
+
+    if hasattr(usage, 'prompt_tokens'):
+        # OpenAI: prompt_tokens에 캐시 적중분이 포함됨
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', 0) or 0
+        return ('openai', model, usage.prompt_tokens or 0, cached, 0, usage.completion_tokens or 0)
+
+    # Anthropic: input_tokens는 캐시 밖 부분만
+    cached = getattr(usage, 'cache_read_input_tokens', 0) or 0
+    written = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+    total_input = (usage.input_tokens or 0) + cached + written
+    return ('anthropic', model, total_input, cached, written, usage.output_tokens or 0)
+
+
+def estimate_cost(model, input_tokens, cached_tokens, cache_write_tokens, output_tokens):
+    """추정 비용 (USD) - 응답의 모델명은 'gpt-4o-2024-08-06'처럼 날짜가 붙으므로 가장 긴 접두어로 찾음"""
+    matches = [name for name in PRICES if model.startswith(name)]
+    if not matches:
+        return None
+    p_in, p_cached, p_write, p_out = PRICES[max(matches, key=len)]
+    plain = max(input_tokens - cached_tokens - cache_write_tokens, 0)
+    return (plain * p_in + cached_tokens * p_cached + cache_write_tokens * p_write
+            + output_tokens * p_out) / 1_000_000
+
+
+class UsageLedger:
+    """
+    프로세스 전체 LLM 사용량 집계 (+ DB llm_usage 테이블에 호출별 기록)
+
+    스레드 안전 - 동기 LLM 호출을 asyncio.to_thread로 돌려도 됨
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.totals = {}    # stage → dict
+        self._lock = threading.Lock()
+        self._table_ready = False
+
+    def _init_table(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                provider TEXT,
+                model TEXT,
+                input_tokens INTEGER,
+                cached_tokens INTEGER,
+                cache_write_tokens INTEGER,
+                output_tokens INTEGER,
+                latency_ms INTEGER,
+                cost_usd REAL
+            )
+        """)
+        self._table_ready = True
+
+    def record(self, response, stage, latency=None, batch=False):
+        """
+        응답 하나의 사용량 기록 (batch: 배치 API 결과 - 비용에 BATCH_DISCOUNT 적용)
+
+        Returns:
+            기록한 dict (usage 없는 응답이면 None)
+        """
+        numbers = _usage_numbers(response)
+        if numbers is None:
+            return None
+        provider, model, input_tokens, cached, written, output_tokens = numbers
+        cost = estimate_cost(model, input_tokens, cached, written, output_tokens)
+        if cost is not None and batch:
+            cost *= BATCH_DISCOUNT
+        row = {
+            'stage': stage, 'provider': provider, 'model': model,
+            'input_tokens': input_tokens, 'cached_tokens': cached,
+            'cache_write_tokens': written, 'output_tokens': output_tokens,
+            'latency_ms': int(latency * 1000) if latency is not None else None,
+            'cost_usd': cost,
+        }
+
+        with self._lock:
+            total = self.totals.setdefault(stage, {
+                'calls': 0, 'input_tokens': 0, 'cached_tokens': 0,
+                'cache_write_tokens': 0, 'output_tokens': 0, 'cost_usd': 0.0
+            })
+            total['calls'] += 1
+            for key in ('input_tokens', 'cached_tokens', 'cache_write_tokens', 'output_tokens'):
+                total[key] += row[key]
+            total['cost_usd'] += cost or 0.0
+
+        if self.db_file:
+            try:
+                conn = sqlite3.connect(self.db_file, timeout=30)
+                if not self._table_ready:
+                    self._init_table(conn)
+                conn.execute("""
+                    INSERT INTO llm_usage
+                    (created_at, stage, provider, model, input_tokens, cached_tokens,
+                     cache_write_tokens, output_tokens, latency_ms, cost_usd)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (datetime.now().isoformat(), stage, provider, model, input_tokens, cached,
+                      written, output_tokens, row['latency_ms'], cost))
+                conn.commit()
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️  LLM 사용량 저장 실패: {e}")
+
+        collected = _collected_rows.get()
+        if collected is not None:
+            collected.append(row)
+
+        # 🔥 현재 span(LLM 호출)에 토큰 기록 + /metrics 카운터
+        annotate(input_tokens=input_tokens, cached_tokens=cached, output_tokens=output_tokens, cost_usd=cost)
+        metrics.inc('llm_calls_total', stage=stage, provider=provider)
+        metrics.inc('llm_tokens_total', input_tokens, stage=stage, kind='input')
+        metrics.inc('llm_tokens_total', output_tokens, stage=stage, kind='output')
+        if cost:
+            metrics.inc('llm_cost_usd_total', cost, stage=stage)
+
+        rate = cached / input_tokens * 100 if input_tokens else 0
+        cost_text = f", ${cost:.4f}" if cost is not None else ""
+        logger.debug(f"   🧾 {stage}: 입력 {input_tokens:,} (캐시 {rate:.0f}%) / 출력 {output_tokens:,}{cost_text}")
+        return row
+
+    def summary(self):
+        with self._lock:
+            return {stage: dict(total) for stage, total in self.totals.items()}
+
+
+usage_ledger = UsageLedger()
+
+
+def record_usage(response, stage, started=None, batch=False):
+    """usage_ledger.record 단축 (started: time.perf_counter() 호출 시각)"""
+    latency = time.perf_counter() - started if started is not None else None
+    return usage_ledger.record(response, stage, latency, batch=batch)
+
+
+@contextmanager
+def collect_usage():
+    """
+    이 범위 안에서 기록된 사용량 row 목록 (작업/단계별 토큰 집계용)
+
+    with collect_usage() as rows:
+        await asyncio.to_thread(llm_helper)
+    sum(r['output_tokens'] for r in rows)
+    """
+    rows = []
+    token = _collected_rows.set(rows)
+    try:
+        yield rows
+    finally:
+        _collected_rows.reset(token)
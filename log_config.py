@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# log_config.py - 로깅 설정 (레벨 + 큐 핸들러로 출력은 별도 스레드 + 작업별 컨텍스트 필드 + JSON 출력)
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')      # 운영: WARNING / 디버깅: DEBUG (기존 print 전부)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')    # text / json
+LOG_FILE = os.getenv('LOG_FILE')                # 없으면 stderr
+
+# 작업별 컨텍스트 (job_id, store 등) - asyncio 태스크/to_thread 스레드까지 따라감
+_log_context = contextvars.ContextVar('log_context', default={})
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """
+    로그 레코드에 현재 컨텍스트 필드 붙이기
+
+    QueueHandler에 달아서 호출한 스레드/태스크에서 실행됨 (출력 스레드에서는 컨텍스트를 모름)
+    """
+
+    def filter(self, record):
+        record.context = _log_context.get()
+        return True
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    큐에 넣기 전 처리 (호출한 스레드에서)
+
+    메시지 인자는 지금 값으로 합치고, 예외는 traceback 텍스트로만 넘김
+    (기본 QueueHandler는 traceback을 message에 붙여버려서 JSON의 exc 필드로 못 나눔)
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """예전 print 모양 그대로 + 앞에 시각/레벨/모듈, 컨텍스트 있으면 job_id=... | """
+
+    def __init__(self):
+        super().__init__('%(asctime)s [%(levelname)s] %(name)s: %(context_text)s%(message)s', datefmt='%H:%M:%S')
+
+    def format(self, record):
+        context = getattr(record, 'context', None)
+        record.context_text = ''.join(f'{key}={value} ' for key, value in context.items()) + '| ' if context else ''
+        return super().format(record)
+
+
+class JSONFormatter(logging.Formatter):
+    """한 줄에 JSON 하나 (ts, level, logger, message + 컨텍스트 필드 + exc)"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **(getattr(record, 'context', None) or {}),
+        }
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level=None, fmt=None, filename=None):
+    """
+    루트 로거 설정 (여러 번 불러도 한 번만)
+
+    - 호출한 쪽은 큐에 넣기만 하고, 포맷/쓰기는 QueueListener 스레드에서
+      → 이벤트 루프가 stdout/파일 쓰기에 막히지 않음
+    - 레벨 아래 로그는 로거에서 바로 버려짐 (WARNING이면 debug/info 호출 비용 거의 없음)
+    """
+    global _listener
+    level = (level or LOG_LEVEL).upper()
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return _listener
+
+    output = logging.FileHandler(filename or LOG_FILE, encoding='utf-8') if (filename or LOG_FILE) \
+        else logging.StreamHandler(sys.stderr)
+    output.setFormatter(JSONFormatter() if (fmt or LOG_FORMAT) == 'json' else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    # 외부 라이브러리 요청 로그는 한 단계 위로
+    for noisy in ('httpx', 'httpcore', 'urllib3', 'openai', 'anthropic'):
+        logging.getLogger(noisy).setLevel(max(logging.getLevelName(level), logging.WARNING))
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(flush_logging)
+    return _listener
+
+
+def flush_logging():
+    """큐에 남은 로그 다 쓰고 출력 스레드 종료 (종료 시 자동 호출)"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+@contextmanager
+def log_context(**fields):
+    """이 범위의 로그에 필드 추가 (with log_context(job_id=..., store=...):)"""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
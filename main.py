@@ -7,12 +7,14 @@ import asyncio
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import asyncio
 import uuid
+import time
 from datetime import datetime
 import smtplib
 from email.mime.multipart import MIMEMultipart
@@ -23,9 +25,24 @@ import os
 from pathlib import Path
 import urllib.request
 import json
-
-from master_analyzer import run_master_analysis
-from instagram_analyzer import InstagramSelfDiagnosis, run_instagram_diagnosis  # 🔥 추가
+import logging
+import re
+import unicodedata
+import aiohttp
+
+from async_cache import TTLCache
+from job_events import JobEventBus
+from llm_gateway import gateway, PRIORITY_HIGH
+from llm_usage import collect_usage
+from log_config import log_context, setup_logging
+from record_replay import recorder
+from tracing import load_trace, metrics, save_trace, span, start_trace
+from store_autocomplete import StoreAutocomplete
+from master_analyzer import run_master_analysis_shared
+from instagram_analyzer import run_instagram_diagnosis, close_graph_session  # 🔥 추가
+
+setup_logging()  # 🔥 LOG_LEVEL (운영 WARNING / 디버깅 DEBUG), LOG_FORMAT=json
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Review Intelligence API")
 
@@ -40,6 +57,43 @@ app.add_middleware(
 
 # 작업 상태 저장소
 jobs: Dict[str, Dict[str, Any]] = {}
+job_events = JobEventBus()  # 🔥 진행 이벤트 (SSE)
+
+
+def set_stage(job_id: str, stage: str, status: str = 'processing', message: Optional[str] = None,
+              percent: Optional[int] = None, **data):
+    """작업 단계 갱신 - jobs 상태(폴링용)와 SSE 이벤트를 같이 씀"""
+    event = job_events.publish(job_id, stage, status=status, message=message, percent=percent, data=data)
+    jobs[job_id]['status'] = status
+    if status in ('completed', 'failed'):
+        metrics.inc('jobs_total', status=status)
+    if status == 'failed':
+        jobs[job_id]['error'] = event['message']
+    else:
+        jobs[job_id]['progress'] = event['message']
+
+
+# 🔥 가게 이름 자동완성 색인 (stores 테이블)
+store_index = StoreAutocomplete()
+_index_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def load_store_index():
+    """자동완성 색인 로드 + 새 가게 반영 작업 시작"""
+    global _index_task
+    await asyncio.to_thread(store_index.load)
+    _index_task = asyncio.create_task(store_index.follow())
+
+
+@app.on_event("shutdown")
+async def close_http_sessions():
+    """공유 HTTP 세션 정리"""
+    if _index_task is not None:
+        _index_task.cancel()
+    await close_graph_session()
+    if _search_session is not None and not _search_session.closed:
+        await _search_session.close()
 
 # 환경변수
 SMTP_SERVER = "smtp.gmail.com"
@@ -50,7 +104,7 @@ SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "nqgpfqlpfuijioua")
 # 네이버 API 키
 try:
     from naver_blog_crawler import NAVER_CLIENT_ID, NAVER_CLIENT_SECRET
-    print("✅ 블로그 크롤러 API 키 import 성공!")
+    logger.debug("✅ 블로그 크롤러 API 키 import 성공!")
 except:
     NAVER_CLIENT_ID = os.getenv("NAVER_CLIENT_ID", "ZLPHHehmKYVHcF2hUGhQ")
     NAVER_CLIENT_SECRET = os.getenv("NAVER_CLIENT_SECRET", "NrVaQLeDfV")
@@ -90,53 +144,128 @@ class AnalyzeRequest(BaseModel):
 
 # ==================== 네이버 검색 API ====================
 
+NAVER_LOCAL_SEARCH_URL = os.getenv("NAVER_LOCAL_SEARCH_URL", "https://openapi.naver.com/v1/search/local.json")
+SEARCH_CACHE_TTL = 300      # 검색어 결과 5분 캐시 (자동완성은 같은 검색어가 몰림)
+SEARCH_TIMEOUT = 3          # 초
+
+# 🔥 정규화 검색어 → 결과 (동시에 같은 검색어가 오면 업스트림 1번만 호출)
+search_cache = TTLCache(maxsize=5000, ttl=SEARCH_CACHE_TTL)
+_search_session: Optional[aiohttp.ClientSession] = None
+
+
+def normalize_search_query(query: str) -> str:
+    """캐시 키용 검색어 정규화 (전각/공백/대소문자)"""
+    query = unicodedata.normalize('NFKC', query or '')
+    return re.sub(r'\s+', ' ', query).strip().lower()
+
+
+def _parse_local_items(data: Dict) -> List[Dict[str, str]]:
+    """네이버 지역 검색 응답 → 결과 목록"""
+    results = []
+    for item in data.get('items', []):
+        name = item['title'].replace('<b>', '').replace('</b>', '')
+        address = item.get('roadAddress', item.get('address', ''))
+        category = item.get('category', '음식점')
+        
+        if '>' in category:
+            category = category.split('>')[-1]
+        
+        results.append({
+            "name": name,
+            "address": address,
+            "category": category
+        })
+    return results
+
+
 def search_naver_places_api(query: str, display: int = 10) -> List[Dict[str, str]]:
-    """네이버 검색 API 사용"""
+    """네이버 검색 API 사용 (동기 - 스크립트용, 서버에서는 search_naver_places_async)"""
     try:
         if NAVER_CLIENT_ID == "YOUR_CLIENT_ID":
-            print("⚠️  네이버 API 키가 설정되지 않았습니다!")
+            logger.warning("⚠️  네이버 API 키가 설정되지 않았습니다!")
             return []
         
         encText = urllib.parse.quote(query)
-        url = f"https://openapi.naver.com/v1/search/local.json?query={encText}&display={display}&start=1&sort=random"
+        url = f"{NAVER_LOCAL_SEARCH_URL}?query={encText}&display={display}&start=1&sort=random"
         
         request = urllib.request.Request(url)
         request.add_header("X-Naver-Client-Id", NAVER_CLIENT_ID)
         request.add_header("X-Naver-Client-Secret", NAVER_CLIENT_SECRET)
         
-        response = urllib.request.urlopen(request)
+        response = urllib.request.urlopen(request, timeout=SEARCH_TIMEOUT)
         rescode = response.getcode()
         
         if rescode == 200:
             response_body = response.read()
             data = json.loads(response_body.decode('utf-8'))
             
-            results = []
-            for item in data.get('items', []):
-                name = item['title'].replace('<b>', '').replace('</b>', '')
-                address = item.get('roadAddress', item.get('address', ''))
-                category = item.get('category', '음식점')
-                
-                if '>' in category:
-                    category = category.split('>')[-1]
-                
-                results.append({
-                    "name": name,
-                    "address": address,
-                    "category": category
-                })
-            
-            print(f"✅ 네이버 API 검색 성공: {len(results)}개")
+            results = _parse_local_items(data)
+            logger.debug(f"✅ 네이버 API 검색 성공: {len(results)}개")
             return results
         else:
-            print(f"❌ API 오류 코드: {rescode}")
+            logger.error(f"❌ API 오류 코드: {rescode}")
             return []
     
     except Exception as e:
-        print(f"❌ 네이버 API 오류: {e}")
+        logger.error(f"❌ 네이버 API 오류: {e}")
         return []
 
 
+def get_search_session() -> aiohttp.ClientSession:
+    """네이버 검색용 공유 세션 (keep-alive 커넥션 풀)"""
+    global _search_session
+    if _search_session is None or _search_session.closed:
+        _search_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=SEARCH_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300),
+            headers={
+                "X-Naver-Client-Id": NAVER_CLIENT_ID,
+                "X-Naver-Client-Secret": NAVER_CLIENT_SECRET
+            }
+        )
+    return _search_session
+
+
+async def _fetch_naver_places(query: str, display: int) -> Optional[List[Dict[str, str]]]:
+    """업스트림 호출 (실패하면 None → 캐시하지 않음)"""
+    try:
+        params = {"query": query, "display": display, "start": 1, "sort": "random"}
+        session = recorder.session('naver_local_search', get_search_session())
+        async with session.get(NAVER_LOCAL_SEARCH_URL, params=params) as response:
+            if response.status != 200:
+                logger.error(f"❌ API 오류 코드: {response.status}")
+                return None
+            data = await response.json(content_type=None)
+        
+        results = _parse_local_items(data)
+        logger.debug(f"✅ 네이버 API 검색 성공: {len(results)}개")
+        return results
+    
+    except Exception as e:
+        logger.error(f"❌ 네이버 API 오류: {e}")
+        return None
+
+
+async def search_naver_places_async(query: str, display: int = 10) -> List[Dict[str, str]]:
+    """
+    네이버 검색 (비동기)
+    
+    - 이벤트 루프를 막지 않음 (공유 aiohttp 세션)
+    - 정규화 검색어 기준 TTL 캐시
+    - 같은 검색어 동시 요청은 업스트림 1번으로 합침 (single-flight)
+    """
+    if NAVER_CLIENT_ID == "YOUR_CLIENT_ID":
+        logger.warning("⚠️  네이버 API 키가 설정되지 않았습니다!")
+        return []
+    
+    key = (normalize_search_query(query), display)
+    if not key[0]:
+        return []
+    
+    results, _ = await search_cache.get_or_load(key, lambda: _fetch_naver_places(key[0], display))
+    return results or []
+
+
 # ==================== 🔥 후킹 문장 생성 (스티브 잡스 톤) ====================
 
 def generate_hook_sentence(
@@ -156,8 +285,6 @@ def generate_hook_sentence(
     5. 선택 강요: "두 가지 길이 있습니다. {A} 아니면 {B}. 선택하십시오."
     """
     try:
-        from openai import OpenAI
-        
         # 가장 큰 격차 찾기
         biggest_strength = None
         biggest_weakness = None
@@ -195,9 +322,6 @@ def generate_hook_sentence(
         has_instagram = 'instagram' in current_marketing
         has_nothing = 'none' in current_marketing or len(current_marketing) == 0
         
-        # GPT-4o로 후킹 문장 생성
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        
         prompt = f"""
 당신은 스티브 잡스입니다. 짧고 강렬하게 핵심을 찌릅니다.
 
@@ -235,7 +359,9 @@ def generate_hook_sentence(
 가장 적합한 패턴을 선택하여 3문장으로 작성하세요.
 """
         
-        response = client.chat.completions.create(
+        response = gateway.chat(
+            stage='hook',
+            priority=PRIORITY_HIGH,
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "당신은 스티브 잡스입니다. 짧고 강렬하게 핵심을 찌릅니다."},
@@ -246,11 +372,11 @@ def generate_hook_sentence(
         )
         
         hook = response.choices[0].message.content.strip()
-        print(f"✅ 후킹 문장 생성: {hook[:50]}...")
+        logger.debug(f"✅ 후킹 문장 생성: {hook[:50]}...")
         return hook
         
     except Exception as e:
-        print(f"⚠️ 후킹 문장 생성 실패: {e}")
+        logger.warning(f"⚠️ 후킹 문장 생성 실패: {e}")
         return "당신의 가게는 잠재력이 있습니다.\n지금이 기회입니다.\n시작하십시오."
 
 
@@ -276,8 +402,6 @@ def generate_review_insights(
     10. 재방문율 낮음 → "특별함이 없습니다"
     """
     try:
-        from openai import OpenAI
-        
         # 키워드 통계 정리
         keyword_stats = review_data.get('keyword_stats', {})
         
@@ -294,9 +418,6 @@ def generate_review_insights(
                 weaknesses = list(statistical_comparison['우리의_약점'].items())[:3]
                 weaknesses_text = ", ".join([topic for topic, _ in weaknesses])
         
-        # GPT-4o로 인사이트 생성
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        
         prompt = f"""
 당신은 리뷰 분석 전문가입니다. 스티브 잡스의 톤으로 직설적으로 말합니다.
 
@@ -328,7 +449,9 @@ def generate_review_insights(
 - 이모지 없음
 """
         
-        response = client.chat.completions.create(
+        response = gateway.chat(
+            stage='review_insights',
+            priority=PRIORITY_HIGH,
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "스티브 잡스 톤. 본질을 찌릅니다."},
@@ -339,11 +462,11 @@ def generate_review_insights(
         )
         
         insights = response.choices[0].message.content.strip()
-        print(f"✅ 리뷰 교차 분석 인사이트 생성 완료")
+        logger.info(f"✅ 리뷰 교차 분석 인사이트 생성 완료")
         return insights
         
     except Exception as e:
-        print(f"⚠️ 리뷰 인사이트 생성 실패: {e}")
+        logger.warning(f"⚠️ 리뷰 인사이트 생성 실패: {e}")
         return ""
 
 
@@ -358,8 +481,6 @@ def analyze_current_marketing(
     현재 마케팅 활동 분석 (스티브 잡스 톤)
     """
     try:
-        from openai import OpenAI
-        
         if not current_marketing or 'none' in current_marketing:
             return """
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -375,9 +496,6 @@ def analyze_current_marketing(
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 """
         
-        # GPT-4o로 분석
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        
         channels_info = []
         for channel_id in current_marketing:
             details = marketing_details.get(channel_id, {})
@@ -416,7 +534,9 @@ Instagram (팔로워 50명, 릴스 없음)
 이런 형식으로 각 채널을 분석하세요.
 """
         
-        response = client.chat.completions.create(
+        response = gateway.chat(
+            stage='marketing_analysis',
+            priority=PRIORITY_HIGH,
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "스티브 잡스 톤. 직설적이고 강렬하게."},
@@ -427,11 +547,11 @@ Instagram (팔로워 50명, 릴스 없음)
         )
         
         analysis = response.choices[0].message.content.strip()
-        print(f"✅ 13번째 질문 분석 완료")
+        logger.info(f"✅ 13번째 질문 분석 완료")
         return analysis
         
     except Exception as e:
-        print(f"⚠️ 13번째 질문 분석 실패: {e}")
+        logger.warning(f"⚠️ 13번째 질문 분석 실패: {e}")
         return ""
 
 
@@ -449,9 +569,7 @@ def generate_why_what_how_strategy(
     WHY-WHAT-HOW 구조의 전략 제시
     """
     try:
-        from prompt_generator import generate_full_prompt
-        from openai import OpenAI
-        
+        from prompt_generator import generate_full_prompt, prefix_info
         # 리뷰 분석 결과
         total_reviews = review_data.get('total_reviews', 0)
         keyword_stats = review_data.get('keyword_stats', {})
@@ -485,25 +603,26 @@ def generate_why_what_how_strategy(
         )
         
         # GPT-4o 호출 (🔥 prompt_generator에서 WHY-WHAT-HOW 구조 포함됨)
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        response = client.chat.completions.create(
+        # 🔥 system_prompt는 매번 같은 prefix → OpenAI 자동 프롬프트 캐시 (cache key로 같은 서버로 라우팅)
+        response = gateway.chat(
+            stage='strategy',
+            priority=PRIORITY_HIGH,
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.7,
-            max_tokens=4000
+            max_tokens=4000,
+            extra_body={"prompt_cache_key": prefix_info()['cache_key']}
         )
         
         strategy = response.choices[0].message.content
-        print("✅ WHY-WHAT-HOW 전략 생성 완료")
+        logger.info("✅ WHY-WHAT-HOW 전략 생성 완료")
         return strategy
         
     except Exception as e:
-        print(f"⚠️ 전략 생성 실패: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"⚠️ 전략 생성 실패: {e}")
         return "전략 생성에 실패했습니다."
 
 
@@ -589,108 +708,15 @@ def create_professional_dashboard(
         # 🔥 인스타그램 섹션 (있을 경우만)
         instagram_section = ""
         if instagram_result:
-            scores = instagram_result['scores']
-            metrics = instagram_result['metrics']
-            priorities = instagram_result['priorities']
-            account = instagram_result['account']
-            hashtags = instagram_result['hashtags']
-            
-            # 점수에 따른 등급
-            overall_score = scores['overall']
-            if overall_score >= 80:
-                grade = "🏆 우수"
-                grade_color = "#10b981"
-            elif overall_score >= 60:
-                grade = "✅ 양호"
-                grade_color = "#3b82f6"
-            elif overall_score >= 40:
-                grade = "⚠️ 개선 필요"
-                grade_color = "#f59e0b"
-            else:
-                grade = "🔴 위험"
-                grade_color = "#ef4444"
-            
-            # 우선순위 HTML
-            priorities_html = ""
-            for i, priority in enumerate(priorities, 1):
-                priorities_html += f"""
-                <div style="background: #f8fafc; padding: 20px; margin: 15px 0; border-left: 4px solid #667eea; border-radius: 8px;">
-                    <div style="font-size: 18px; font-weight: 600; color: #1e293b; margin-bottom: 10px;">
-                        {i}순위: {priority['title']}
-                    </div>
-                    <div style="font-size: 14px; color: #64748b; margin-bottom: 12px;">
-                        💡 {priority['reason']}
-                    </div>
-                    <div style="font-size: 14px; line-height: 1.8; color: #334155; white-space: pre-wrap;">
-                        <strong>실행 방법:</strong><br>
-                        {priority['action']}
-                    </div>
-                    <div style="margin-top: 12px; padding: 10px; background: #e0e7ff; border-radius: 6px; color: #4338ca; font-size: 13px; font-weight: 500;">
-                        📈 예상 효과: {priority['impact']}
-                    </div>
-                </div>
-                """
-            
+            # run_instagram_diagnosis → {'status': 'success' / 'insufficient_data', 'message': 진단 문구}
+            status_label = "진단 완료" if instagram_result['status'] == 'success' else "데이터 부족"
             instagram_section = f"""
         <div id="instagram-diagnosis" class="section" style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 40px; margin: 20px 0; border-radius: 15px; box-shadow: 0 10px 30px rgba(102,126,234,0.3);">
             <h2 style="color: white; border-bottom: 3px solid white; padding-bottom: 15px; margin-bottom: 30px;">
-                📱 Instagram 자가진단
+                📱 Instagram 자가진단 ({status_label})
             </h2>
-            
-            <!-- 계정 요약 -->
-            <div style="background: rgba(255,255,255,0.15); backdrop-filter: blur(10px); padding: 25px; border-radius: 12px; margin-bottom: 25px; border: 1px solid rgba(255,255,255,0.2);">
-                <div style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 20px;">
-                    <div>
-                        <div style="font-size: 16px; color: rgba(255,255,255,0.9); margin-bottom: 8px;">계정명</div>
-                        <div style="font-size: 24px; font-weight: 700; color: white;">@{account['username']}</div>
-                    </div>
-                    <div>
-                        <div style="font-size: 16px; color: rgba(255,255,255,0.9); margin-bottom: 8px;">팔로워</div>
-                        <div style="font-size: 24px; font-weight: 700; color: white;">{account['followers']:,}명</div>
-                    </div>
-                    <div>
-                        <div style="font-size: 16px; color: rgba(255,255,255,0.9); margin-bottom: 8px;">게시물</div>
-                        <div style="font-size: 24px; font-weight: 700; color: white;">{account['media_count']}개</div>
-                    </div>
-                    <div>
-                        <div style="font-size: 16px; color: rgba(255,255,255,0.9); margin-bottom: 8px;">종합 등급</div>
-                        <div style="font-size: 24px; font-weight: 700; color: {grade_color}; background: white; padding: 8px 16px; border-radius: 8px;">
-                            {grade} ({overall_score}점)
-                        </div>
-                    </div>
-                </div>
-            </div>
-            
-            <!-- 세부 점수 -->
-            <div style="background: white; padding: 30px; border-radius: 12px; margin-bottom: 25px;">
-                <h3 style="color: #1e293b; margin-bottom: 20px; font-size: 18px;">📊 세부 점수</h3>
-                <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px;">
-                    <div style="padding: 15px; background: #f8fafc; border-radius: 8px; border-left: 4px solid #3b82f6;">
-                        <div style="font-size: 13px; color: #64748b; margin-bottom: 5px;">팔로워</div>
-                        <div style="font-size: 24px; font-weight: 700; color: #1e293b;">{scores['followers']}<span style="font-size: 16px; color: #64748b;">/100</span></div>
-                    </div>
-                    <div style="padding: 15px; background: #f8fafc; border-radius: 8px; border-left: 4px solid #10b981;">
-                        <div style="font-size: 13px; color: #64748b; margin-bottom: 5px;">인게이지먼트</div>
-                        <div style="font-size: 24px; font-weight: 700; color: #1e293b;">{scores['engagement']}<span style="font-size: 16px; color: #64748b;">/100</span></div>
-                        <div style="font-size: 12px; color: #64748b; margin-top: 5px;">현재 {metrics['engagement_rate']:.2f}%</div>
-                    </div>
-                    <div style="padding: 15px; background: #f8fafc; border-radius: 8px; border-left: 4px solid #f59e0b;">
-                        <div style="font-size: 13px; color: #64748b; margin-bottom: 5px;">게시 빈도</div>
-                        <div style="font-size: 24px; font-weight: 700; color: #1e293b;">{scores['frequency']}<span style="font-size: 16px; color: #64748b;">/100</span></div>
-                        <div style="font-size: 12px; color: #64748b; margin-top: 5px;">주 {metrics['posts_per_week']:.1f}회</div>
-                    </div>
-                    <div style="padding: 15px; background: #f8fafc; border-radius: 8px; border-left: 4px solid #8b5cf6;">
-                        <div style="font-size: 13px; color: #64748b; margin-bottom: 5px;">해시태그</div>
-                        <div style="font-size: 24px; font-weight: 700; color: #1e293b;">{scores['hashtags']}<span style="font-size: 16px; color: #64748b;">/100</span></div>
-                        <div style="font-size: 12px; color: #64748b; margin-top: 5px;">평균 {hashtags['avg_per_post']:.0f}개</div>
-                    </div>
-                </div>
-            </div>
-            
-            <!-- 개선 우선순위 -->
-            <div style="background: white; padding: 30px; border-radius: 12px;">
-                <h3 style="color: #1e293b; margin-bottom: 20px; font-size: 18px;">🎯 개선 우선순위 TOP 3</h3>
-                {priorities_html}
+            <div style="background: white; padding: 30px; border-radius: 12px; font-size: 15px; line-height: 1.9; color: #2d3748; white-space: pre-wrap; font-family: 'Segoe UI', sans-serif;">
+{instagram_result['message'].strip()}
             </div>
         </div>
         """
@@ -739,11 +765,11 @@ def create_professional_dashboard(
         with open(integrated_file, 'w', encoding='utf-8') as f:
             f.write(integrated)
         
-        print(f"✅ KILLER 대시보드 생성: {integrated_file}")
+        logger.info(f"✅ KILLER 대시보드 생성: {integrated_file}")
         return integrated_file
         
     except Exception as e:
-        print(f"⚠️ 대시보드 생성 실패: {e}")
+        logger.warning(f"⚠️ 대시보드 생성 실패: {e}")
         return html_file
 
 
@@ -796,22 +822,110 @@ KILLER 팀
                 )
                 msg.attach(part)
         
-        # 전송
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_EMAIL, SMTP_PASSWORD)
-            server.send_message(msg)
+        # 전송 (RECORD_REPLAY=replay면 실제로 보내지 않음)
+        def send():
+            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+                server.starttls()
+                server.login(SMTP_EMAIL, SMTP_PASSWORD)
+                server.send_message(msg)
+            return {'sent': True}
         
-        print(f"✅ 이메일 전송 완료: {to_email}")
+        recorder.call('smtp', {'to': to_email, 'subject': msg['Subject']}, send,
+                      decode=lambda payload: payload, route='send_message')
+        
+        logger.info(f"✅ 이메일 전송 완료: {to_email}")
         return True
     
     except Exception as e:
-        print(f"❌ 이메일 전송 실패: {e}")
+        logger.error(f"❌ 이메일 전송 실패: {e}")
         return False
 
 
 # ==================== Background Task ====================
 
+# 🔥 개인화 단계 (서로 독립 → 동시 실행): 이름 → (안내 문구, 시간 제한 초, 실패/시간 초과 시 기본값)
+PERSONALIZATION_STEPS = {
+    'hook':      ('후킹 문장', 40, "당신의 가게는 잠재력이 있습니다.\n지금이 기회입니다.\n시작하십시오."),
+    'insights':  ('리뷰 교차 분석', 60, ""),
+    'marketing': ('마케팅 활동 분석', 60, ""),
+    'strategy':  ('WHY-WHAT-HOW 전략', 120, "전략 생성에 실패했습니다."),
+}
+PERSONALIZATION_PERCENT = (60, 85)  # 개인화 단계 진행률 구간 (끝난 개수만큼 채움)
+
+
+async def run_personalization_step(job_id: str, name: str, func, *args, progress=None):
+    """
+    개인화 LLM 단계 하나 (스레드 + 시간 제한 + 실패하면 기본값)
+
+    소요 시간/토큰은 jobs[job_id]['timings'][name]에 기록
+    시간 초과된 스레드는 끝까지 돌지만 (LLM_TIMEOUT으로 끊김) 결과는 버림
+    """
+    label, timeout, fallback = PERSONALIZATION_STEPS[name]
+    started = time.perf_counter()
+    status = 'ok'
+    with collect_usage() as rows, span(f'personalize.{name}') as current:
+        try:
+            value = await asyncio.wait_for(asyncio.to_thread(func, *args), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {label} 시간 초과 ({timeout}초) - 기본값으로 진행")
+            status, value = 'timeout', fallback
+        except Exception as e:
+            logger.warning(f"⚠️ {label} 실패: {e}")
+            status, value = 'error', fallback
+        current.status = status
+
+    elapsed = time.perf_counter() - started
+    timing = {
+        'status': status,
+        'seconds': round(elapsed, 2),
+        'calls': len(rows),
+        'input_tokens': sum(row['input_tokens'] for row in rows),
+        'output_tokens': sum(row['output_tokens'] for row in rows),
+    }
+    jobs[job_id].setdefault('timings', {})[name] = timing
+
+    if progress is not None:
+        progress['done'] += 1
+        low, high = PERSONALIZATION_PERCENT
+        percent = low + (high - low) * progress['done'] // progress['total']
+        mark = '✅' if status == 'ok' else '⚠️'
+        set_stage(job_id, name, message=f"{mark} {label} 완료 ({elapsed:.1f}초)", percent=percent, **timing)
+    return value
+
+
+async def diagnose_instagram(job_id: str, instagram_username: Optional[str], questions: Dict[str, str]):
+    """인스타그램 자가진단 (선택적 - 계정/API 키 없으면 None)"""
+    if not instagram_username:
+        return None
+    if not (INSTAGRAM_ACCESS_TOKEN and INSTAGRAM_USER_ID):
+        logger.warning(f"⚠️  인스타그램 API 키가 설정되지 않음 - 진단 스킵")
+        return None
+
+    set_stage(job_id, 'instagram', username=instagram_username, percent=PERSONALIZATION_PERCENT[0])
+    logger.info(f"📱 STEP 6-2: 인스타그램 자가진단")
+    
+    open_period = questions.get('age') or '6-24'  # 오픈 기간 (0-6 / 6-24 / 24+)
+    
+    try:
+        with span('personalize.instagram'):
+            instagram_result = await run_instagram_diagnosis(
+                ig_username=instagram_username,
+                open_period=open_period,
+                access_token=INSTAGRAM_ACCESS_TOKEN,
+                user_id=INSTAGRAM_USER_ID
+            )
+        
+        if instagram_result:
+            logger.info(f"   ✅ 인스타그램 진단 완료! ({instagram_result['status']})")
+        else:
+            logger.warning(f"   ⚠️  진단 실패 (비공개 계정 또는 권한 문제)")
+        return instagram_result
+    
+    except Exception as e:
+        logger.warning(f"   ⚠️  인스타그램 진단 오류: {e}")
+        return None
+
+
 async def analyze_and_send(
     job_id: str,
     store_name: str,
@@ -821,47 +935,66 @@ async def analyze_and_send(
     marketing_details: Dict[str, Dict[str, str]],
     instagram_username: Optional[str] = None  # 🔥 추가
 ):
-    """백그라운드 분석 작업 (13번째 질문 + 인스타그램)"""
+    """백그라운드 분석 작업 (13번째 질문 + 인스타그램) - 단계별 span은 job_traces에 저장, 로그에는 job_id/store 필드"""
+    with log_context(job_id=job_id, store=store_name):
+        with start_trace(job_id) as trace:
+            jobs[job_id]['trace'] = trace
+            with span('job', store=store_name):
+                await _analyze_and_send(job_id, store_name, email, questions, current_marketing,
+                                        marketing_details, instagram_username)
+        
+        saved = await asyncio.to_thread(save_trace, trace)
+        slowest = ", ".join(f"{name} {seconds:.1f}초" for name, (_, seconds) in list(trace.summary().items())[:5])
+        logger.info(f"🔎 트레이스 {saved}개 span 저장 (상위: {slowest})")
+
+
+async def _analyze_and_send(job_id, store_name, email, questions, current_marketing,
+                            marketing_details, instagram_username):
     try:
-        print(f"\n{'='*70}")
-        print(f"🚀 KILLER 분석 시작")
-        print(f"{'='*70}")
-        print(f"   가게명: {store_name}")
-        print(f"   이메일: {email}")
-        print(f"   예산: {questions.get('budget', '미입력')}")
-        print(f"   현재 마케팅: {', '.join(current_marketing) if current_marketing else '없음'}")
-        print(f"   인스타그램: @{instagram_username if instagram_username else '없음'}")
-        print(f"{'='*70}\n")
-        
-        jobs[job_id]['status'] = 'processing'
-        jobs[job_id]['progress'] = '🔍 네이버 플레이스에서 가게 검색 중...'
-        
-        # 1. 리뷰 분석 실행
-        jobs[job_id]['progress'] = '🕷️ 리뷰 크롤링 중... (1-2분 소요)'
-        result = await run_master_analysis(store_name, store_name)
+        logger.info(f"🚀 KILLER 분석 시작 (예산: {questions.get('budget', '미입력')}, "
+                    f"현재 마케팅: {', '.join(current_marketing) if current_marketing else '없음'}, "
+                    f"인스타그램: @{instagram_username if instagram_username else '없음'})")
+        
+        # 1. 리뷰 분석 실행 (가게 검색 + 크롤링 + 경쟁사 비교 + AI 인사이트)
+        # (같은 가게 분석이 진행 중이면 합류, 최근 결과가 있으면 재사용 → 아래 개인화 단계만 새로)
+        set_stage(job_id, 'crawl')
+        loop = asyncio.get_running_loop()
+        
+        def on_progress(message, **data):
+            # 🔥 LLM 스트리밍 중 필드가 닫힐 때마다 (작업 스레드 → 이벤트 루프로 넘김)
+            loop.call_soon_threadsafe(lambda: set_stage(job_id, 'insight', message=message, **data))
+        
+        with span('master_analysis') as current:
+            result, reuse = await run_master_analysis_shared(store_name, store_name, on_progress=on_progress)
+            current.attrs['reuse'] = reuse
         
         if not result:
-            jobs[job_id]['status'] = 'failed'
-            jobs[job_id]['error'] = f'"{store_name}" 가게를 찾을 수 없습니다.'
-            print(f"❌ 가게를 찾을 수 없음: {store_name}")
+            set_stage(job_id, 'failed', status='failed', message=f'"{store_name}" 가게를 찾을 수 없습니다.')
+            logger.error(f"❌ 가게를 찾을 수 없음: {store_name}")
             return
         
-        jobs[job_id]['progress'] = '🏪 경쟁사 분석 중...'
-        await asyncio.sleep(1)
-        
-        jobs[job_id]['progress'] = '🤖 AI 인사이트 생성 중... (GPT + Claude)'
-        await asyncio.sleep(1)
+        set_stage(
+            job_id, 'analyzed',
+            total_reviews=len(result.get('reviews', [])),
+            has_comparison=bool(result.get('statistical_comparison')),
+            reuse=reuse
+        )
         
         # 2. HTML 리포트 찾기
-        jobs[job_id]['progress'] = '📊 HTML 리포트 생성 중...'
+        set_stage(job_id, 'report')
         
         timestamp = datetime.now().strftime('%Y%m%d')
         store_name_clean = store_name.replace(' ', '_')
         
+        # (report_* 만 - killer_report_*는 이전 작업이 만든 대시보드라 재사용 시 섞이면 안 됨)
         patterns = [
-            f'*{store_name_clean}*{timestamp}*.html',
-            f'*{store_name_clean}*.html'
+            f'report_*{store_name_clean}*{timestamp}*.html',
+            f'report_*{store_name_clean}*.html'
         ]
+        # 재사용한 결과는 다른 이름으로 요청된 실행이 만든 리포트일 수 있음
+        target_name = (result.get('target_store') or {}).get('name', '')
+        if target_name and target_name.replace(' ', '_') != store_name_clean:
+            patterns.append(f"report_{target_name.replace(' ', '_')}_*.html")
         
         html_file = None
         for pattern in patterns:
@@ -872,13 +1005,12 @@ async def analyze_and_send(
             )
             if files:
                 html_file = str(files[0])
-                print(f"✅ HTML 리포트 발견: {html_file}")
+                logger.debug(f"✅ HTML 리포트 발견: {html_file}")
                 break
         
         if not html_file:
-            jobs[job_id]['status'] = 'failed'
-            jobs[job_id]['error'] = 'HTML 리포트 생성에 실패했습니다.'
-            print(f"❌ HTML 파일을 찾을 수 없음")
+            set_stage(job_id, 'failed', status='failed', message='HTML 리포트 생성에 실패했습니다.')
+            logger.error(f"❌ HTML 파일을 찾을 수 없음")
             return
         
         # 3. 데이터 준비
@@ -888,96 +1020,67 @@ async def analyze_and_send(
         }
         statistical_comparison = result.get('statistical_comparison', None) if result else None
         
-        # 🔥 4. 후킹 문장 생성
-        jobs[job_id]['progress'] = '🎯 스티브 잡스 톤 후킹 문장 생성 중...'
-        hook_sentence = generate_hook_sentence(
-            review_data, statistical_comparison, questions, current_marketing
-        )
-        
-        # 🔥 5. 리뷰 교차 분석 인사이트
-        jobs[job_id]['progress'] = '🔍 리뷰 교차 분석 인사이트 생성 중...'
-        review_insights = generate_review_insights(review_data, statistical_comparison)
-        
-        # 🔥 6. 13번째 질문 분석
-        jobs[job_id]['progress'] = '📊 현재 마케팅 활동 분석 중... (가중치 50%)'
-        marketing_analysis = analyze_current_marketing(
-            current_marketing, marketing_details, questions
-        )
-        
-        # 🔥 6-2. 인스타그램 자가진단 (선택적)
-        instagram_result = None
-        if instagram_username and INSTAGRAM_ACCESS_TOKEN and INSTAGRAM_USER_ID:
-            jobs[job_id]['progress'] = '📱 인스타그램 계정 진단 중...'
-            print(f"\n{'='*70}")
-            print(f"📱 STEP 6-2: 인스타그램 자가진단")
-            print(f"{'='*70}")
-            
-            industry = questions.get('industry', '카페')
-            
-            try:
-                instagram_result = await run_instagram_diagnosis(
-                    ig_username=instagram_username,
-                    industry=industry,
-                    access_token=INSTAGRAM_ACCESS_TOKEN,
-                    user_id=INSTAGRAM_USER_ID
-                )
-                
-                if instagram_result:
-                    print(f"   ✅ 인스타그램 진단 완료!")
-                    print(f"   종합 점수: {instagram_result['scores']['overall']}/100점")
-                else:
-                    print(f"   ⚠️  진단 실패 (비공개 계정 또는 권한 문제)")
-            
-            except Exception as e:
-                print(f"   ⚠️  인스타그램 진단 오류: {e}")
-                instagram_result = None
-        elif instagram_username:
-            print(f"⚠️  인스타그램 API 키가 설정되지 않음 - 진단 스킵")
-        
-        # 🔥 7. WHY-WHAT-HOW 전략 생성
-        jobs[job_id]['progress'] = '🎯 WHY-WHAT-HOW 전략 생성 중...'
-        strategy = generate_why_what_how_strategy(
-            questions, store_name, review_data, statistical_comparison,
-            current_marketing, marketing_details
+        # 🔥 4~7. 후킹 / 리뷰 교차 분석 / 13번째 질문 / WHY-WHAT-HOW 전략 + 인스타그램 진단 (동시 실행)
+        # 서로 입력이 독립이라 순서대로 돌릴 이유가 없음 → 가장 느린 호출 하나만큼만 걸림
+        set_stage(job_id, 'personalize', report=os.path.basename(html_file))
+        progress = {'done': 0, 'total': len(PERSONALIZATION_STEPS)}
+        started = time.perf_counter()
+        hook_sentence, review_insights, marketing_analysis, strategy, instagram_result = await asyncio.gather(
+            run_personalization_step(
+                job_id, 'hook', generate_hook_sentence,
+                review_data, statistical_comparison, questions, current_marketing, progress=progress
+            ),
+            run_personalization_step(
+                job_id, 'insights', generate_review_insights,
+                review_data, statistical_comparison, progress=progress
+            ),
+            run_personalization_step(
+                job_id, 'marketing', analyze_current_marketing,
+                current_marketing, marketing_details, questions, progress=progress
+            ),
+            run_personalization_step(
+                job_id, 'strategy', generate_why_what_how_strategy,
+                questions, store_name, review_data, statistical_comparison,
+                current_marketing, marketing_details, progress=progress
+            ),
+            diagnose_instagram(job_id, instagram_username, questions)
         )
+        timings = jobs[job_id].get('timings', {})
+        logger.info(f"⏱️  개인화 단계 {time.perf_counter() - started:.1f}초 (순차였다면 "
+                    f"{sum(t['seconds'] for t in timings.values()):.1f}초): "
+                    + ", ".join(f"{name} {t['seconds']}초/{t['output_tokens']}토큰" for name, t in timings.items()))
         
         # 🔥 8. 통합 대시보드 생성
-        jobs[job_id]['progress'] = '📄 KILLER 대시보드 생성 중...'
-        final_html = create_professional_dashboard(
-            html_file, hook_sentence, review_insights,
-            marketing_analysis, strategy, store_name,
-            current_marketing, marketing_details,
-            instagram_result  # 🔥 인스타그램 결과 전달
-        )
+        set_stage(job_id, 'dashboard')
+        with span('dashboard'):
+            final_html = await asyncio.to_thread(
+                create_professional_dashboard,
+                html_file, hook_sentence, review_insights,
+                marketing_analysis, strategy, store_name,
+                current_marketing, marketing_details,
+                instagram_result  # 🔥 인스타그램 결과 전달
+            )
         
         # 9. 이메일 전송
-        jobs[job_id]['progress'] = '📧 이메일 전송 중...'
-        success = send_email_with_report(email, store_name, final_html)
+        set_stage(job_id, 'email', dashboard=os.path.basename(final_html) if final_html else None)
+        with span('smtp'):
+            success = await asyncio.to_thread(send_email_with_report, email, store_name, final_html)
         
         if success:
-            jobs[job_id]['status'] = 'completed'
-            jobs[job_id]['progress'] = '완료! 이메일을 확인하세요.'
             jobs[job_id]['result'] = {
                 'email': email,
                 'html_file': final_html,
                 'message': f'{email}로 KILLER 리포트를 전송했습니다!'
             }
-            print(f"\n{'='*70}")
-            print(f"✅ KILLER 프로세스 완료!")
-            print(f"{'='*70}\n")
+            set_stage(job_id, 'completed', status='completed', email=email, dashboard=os.path.basename(final_html))
+            logger.info(f"✅ KILLER 프로세스 완료!")
         else:
-            jobs[job_id]['status'] = 'failed'
-            jobs[job_id]['error'] = '리포트는 생성되었으나 이메일 전송에 실패했습니다.'
+            set_stage(job_id, 'failed', status='failed', message='리포트는 생성되었으나 이메일 전송에 실패했습니다.')
     
     except Exception as e:
-        print(f"\n{'='*70}")
-        print(f"❌ 오류 발생: {e}")
-        print(f"{'='*70}\n")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ 오류 발생: {e}")
         
-        jobs[job_id]['status'] = 'failed'
-        jobs[job_id]['error'] = f'분석 중 오류 발생: {str(e)}'
+        set_stage(job_id, 'failed', status='failed', message=f'분석 중 오류 발생: {str(e)}')
 
 
 # ==================== API Endpoints ====================
@@ -1006,7 +1109,7 @@ async def root():
 
 @app.get("/api/search-stores")
 async def search_stores(q: str):
-    """네이버 검색 API"""
+    """가게 검색 (로컬 자동완성 색인 → 없으면 네이버 검색 API)"""
     if not q or len(q) < 2:
         return {
             "query": q,
@@ -1019,21 +1122,28 @@ async def search_stores(q: str):
         import time
         start_time = time.time()
         
-        print(f"🔍 네이버 API 검색: {q}")
-        results = search_naver_places_api(q, display=10)
+        results = store_index.search(q, limit=10)
+        source = "local"
+        if not results:
+            results = await search_naver_places_async(q, display=10)
+            source = "naver"
         elapsed = time.time() - start_time
         
-        print(f"✅ 검색 완료: {len(results)}개 ({elapsed:.2f}초)")
+        if source == "local":
+            logger.debug(f"🔍 검색: {q} → {len(results)}개 (색인, {elapsed * 1000:.2f}ms)")
+        else:
+            logger.debug(f"🔍 검색: {q} → {len(results)}개 ({elapsed * 1000:.0f}ms, {search_cache.stats_text()})")
         
         return {
             "query": q,
             "count": len(results),
             "results": results,
+            "source": source,
             "elapsed": f"{elapsed:.2f}초"
         }
     
     except Exception as e:
-        print(f"❌ 검색 실패: {e}")
+        logger.error(f"❌ 검색 실패: {e}")
         return {
             "query": q,
             "count": 0,
@@ -1080,12 +1190,9 @@ async def analyze(request: AnalyzeRequest, background_tasks: BackgroundTasks):
         "current_marketing": current_marketing,
         "instagram_username": instagram_username
     }
+    job_events.publish(job_id, 'queued', status='queued')
     
-    print(f"\n📝 새로운 KILLER 분석 요청")
-    print(f"   Job ID: {job_id}")
-    print(f"   가게: {request.store_name}")
-    print(f"   현재 마케팅: {', '.join(current_marketing) if current_marketing else '없음'}")
-    print(f"   인스타그램: @{instagram_username if instagram_username else '없음'}\n")
+    logger.info(f"📝 새로운 KILLER 분석 요청: {job_id} ({request.store_name})")
     
     background_tasks.add_task(
         analyze_and_send,
@@ -1115,15 +1222,72 @@ async def get_job_status(job_id: str):
         }
     
     job = jobs[job_id]
+    events = job_events.history(job_id)
     return {
         "job_id": job_id,
         "status": job['status'],
         "progress": job.get('progress', ''),
+        "percent": events[-1]['percent'] if events else None,
         "error": job.get('error'),
-        "result": job.get('result')
+        "result": job.get('result'),
+        "timings": job.get('timings')
     }
 
 
+@app.get("/api/job/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    🔥 작업 진행 이벤트 스트림 (Server-Sent Events)
+
+    event: processing / completed / failed
+    data: {"seq", "stage", "status", "percent", "message", "elapsed", "data"}
+    재연결하면 브라우저가 보내는 Last-Event-ID 이후부터 이어서 보냄
+    """
+    if job_id not in jobs or job_id not in job_events:
+        return {
+            "error": "작업을 찾을 수 없습니다.",
+            "job_id": job_id
+        }
+    
+    last_id = request.headers.get('last-event-id', '0')
+    last_seq = int(last_id) if last_id.isdigit() else 0
+    
+    return StreamingResponse(
+        job_events.stream(job_id, last_seq),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/job/{job_id}/trace")
+async def get_job_trace(job_id: str):
+    """
+    작업 트레이스 (span 목록: id, parent_id, name, started_at, duration_ms, status, attrs)
+
+    진행 중이면 메모리에서, 끝났거나 서버가 재시작됐으면 job_traces 테이블에서
+    """
+    trace = jobs.get(job_id, {}).get('trace')
+    spans = trace.to_list() if trace is not None else await asyncio.to_thread(load_trace, job_id)
+    if not spans:
+        return {
+            "error": "트레이스를 찾을 수 없습니다.",
+            "job_id": job_id
+        }
+    return {"job_id": job_id, "spans": spans}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """🔥 Prometheus 지표 (단계별 지연 히스토그램 + LLM 호출/토큰 카운터 + LLM 대기열)"""
+    gauges = []
+    for lane, snapshot in gateway.stats().items():
+        for key in ('waiting', 'in_flight', 'rpm', 'tpm'):
+            gauges.append((f'llm_gateway_{key}', {'lane': lane}, snapshot[key]))
+    running = sum(1 for job in jobs.values() if job['status'] in ('queued', 'processing'))
+    gauges.append(('jobs_in_progress', {}, running))
+    return PlainTextResponse(metrics.render(gauges), media_type='text/plain; version=0.0.4')
+
+
 @app.get("/api/jobs")
 async def get_all_jobs():
     """모든 작업 목록"""
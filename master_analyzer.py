@@ -2,6 +2,10 @@
 # master_analyzer.py - 블로그 + DB + 경쟁사 통합 분석 시스템 (하이브리드 버전)
 
 import asyncio
+import logging
+import os
+import re
+import unicodedata
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -19,6 +23,18 @@ from review_preprocessor import (
 )
 # 🔥 하이브리드 엔진 임포트 (변경!)
 from hybrid_insight_engine import generate_hybrid_report
+from async_cache import TTLCache, SingleFlight
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 🔥 같은 가게 분석 재사용 (크롤링 + 경쟁사 + LLM은 비싸므로)
+ANALYSIS_FRESH_SECONDS = int(os.getenv('ANALYSIS_FRESH_SECONDS', str(6 * 3600)))
+analysis_results = TTLCache(maxsize=256, ttl=ANALYSIS_FRESH_SECONDS)    # place_id → 분석 결과
+analysis_aliases = TTLCache(maxsize=2048, ttl=ANALYSIS_FRESH_SECONDS)   # 입력 이름 → place_id
+_name_flight = SingleFlight()   # 같은 이름으로 동시에 들어온 분석
+_place_runs = {}                # place_id → Future (이름은 달라도 같은 가게로 확인된 실행)
+_progress_listeners = {}        # 이름 키 → 진행 콜백 목록 (합류한 작업들도 같이 받음)
 
 # ==================== 체크리스트 생성 ====================
 
@@ -259,165 +275,158 @@ HTML 리포트가 생성되었습니다.
 
 # ==================== 메인 실행 함수 ====================
 
-async def run_master_analysis(store_name: str, address: str):
+async def run_master_analysis(store_name: str, address: str, on_place_resolved=None, on_progress=None):
     """
     통합 분석 실행 (블로그 + 플레이스 + 경쟁사 + 하이브리드 AI)
+
+    Args:
+        on_place_resolved: async (target_store) → 결과 or None
+            플레이스 크롤링으로 place_id가 확정되면 호출, 결과를 돌려주면 나머지 단계 생략
+        on_progress: (message, **data) → None, AI 인사이트 단계/필드가 끝날 때마다 (작업 스레드에서 호출될 수 있음)
     """
-    print("""
-╔══════════════════════════════════════════════════════════════╗
-║         🚀 통합 분석 시스템 v2.0 (하이브리드)                ║
-║         블로그 + 플레이스 + 경쟁사 + GPT + Claude           ║
-╚══════════════════════════════════════════════════════════════╝
-    """)
-    
-    print(f"\n📋 분석 대상:")
-    print(f"   가게명: {store_name}")
-    print(f"   주소: {address}")
+    logger.info(f"🚀 통합 분석 시작: {store_name} ({address})")
     
     # ==================== STEP 1: 블로그 분석 ====================
     
-    print(f"\n{'='*60}")
-    print("📱 STEP 1: 네이버 블로그 분석 (500개)")
-    print(f"{'='*60}")
+    with span('master.blog'):
+        logger.info("📱 STEP 1: 네이버 블로그 분석 (500개)")
     
-    blog_profile = None
-    try:
-        blog_profile = analyze_store_from_blog(store_name)
-    except Exception as e:
-        print(f"⚠️  블로그 분석 실패: {e}")
-        print("   (계속 진행합니다...)")
+        blog_profile = None
+        try:
+            blog_profile = analyze_store_from_blog(store_name)
+        except Exception as e:
+            logger.warning(f"⚠️  블로그 분석 실패 (계속 진행합니다...): {e}")
     
     # ==================== STEP 2: 플레이스 크롤링 ====================
     
-    print(f"\n{'='*60}")
-    print("⭐ STEP 2: 네이버 플레이스 크롤링 (200개)")
-    print(f"{'='*60}")
+    with span('master.crawl'):
+        logger.info("⭐ STEP 2: 네이버 플레이스 크롤링 (200개)")
     
-    region_extracted = extract_dong_from_address(address)
-    print(f"   추출된 지역: {region_extracted}")
+        region_extracted = extract_dong_from_address(address)
+        logger.debug(f"   추출된 지역: {region_extracted}")
     
-    store_data = await crawl_store_info(store_name, region_hint=region_extracted)
+        store_data = await crawl_store_info(store_name, region_hint=region_extracted)
     
-    if not store_data:
-        print("\n❌ 플레이스 크롤링 실패")
-        return False
+        if not store_data:
+            logger.error("❌ 플레이스 크롤링 실패")
+            return False
     
-    target_store = {
-        'place_id': store_data['place_id'],
-        'name': store_data['name'],
-        'district': region_extracted,
-        'industry': store_data['industry']
-    }
+        target_store = {
+            'place_id': store_data['place_id'],
+            'name': store_data['name'],
+            'district': region_extracted,
+            'industry': store_data['industry']
+        }
+    
+        target_reviews = store_data['reviews']
     
-    target_reviews = store_data['reviews']
+        if not target_reviews:
+            logger.warning("⚠️  리뷰 없음")
+            return False
     
-    if not target_reviews:
-        print("\n⚠️  리뷰 없음")
-        return False
+        if on_place_resolved is not None:
+            existing = await on_place_resolved(target_store)
+            if existing:
+                logger.info(f"♻️  같은 가게(place_id {target_store['place_id']}) 분석 결과 재사용 - 나머지 단계 생략")
+                return existing
     
-    # 리뷰 형식 통일
-    unified_reviews = []
-    for r in target_reviews:
-        unified_reviews.append({
-            'date': r.get('날짜', '날짜없음'),
-            'content': r.get('리뷰', '')
-        })
+        # 리뷰 형식 통일
+        unified_reviews = []
+        for r in target_reviews:
+            unified_reviews.append({
+                'date': r.get('날짜', '날짜없음'),
+                'content': r.get('리뷰', '')
+            })
     
     # ==================== STEP 3: 경쟁사 검색 ====================
     
-    print(f"\n{'='*60}")
-    print("🏪 STEP 3: 경쟁사 검색 (DB)")
-    print(f"{'='*60}")
-    
-    # 전략 선택 (균형 기본값)
-    beta, alpha = 1.8, 0.9
-    strategy_name = "균형"
-    
-    competitors = find_competitors_smart(
-        db_path='seoul_industry_reviews.db',
-        user_area=region_extracted,
-        user_industry=store_data['industry'],
-        limit=5,
-        beta=beta,
-        alpha=alpha
-    )
-    
-    competitor_reviews = {}
-    if competitors:
-        print(f"\n   경쟁사 리뷰 로딩...")
-        for comp in competitors:
-            reviews = get_reviews_from_db(comp.place_id)
-            competitor_reviews[comp.place_id] = reviews
-            print(f"   ✅ {comp.name}: {len(reviews)}개")
+    with span('master.competitors'):
+        logger.info("🏪 STEP 3: 경쟁사 검색 (DB)")
+    
+        # 전략 선택 (균형 기본값)
+        beta, alpha = 1.8, 0.9
+        strategy_name = "균형"
+    
+        competitors = find_competitors_smart(
+            db_path='seoul_industry_reviews.db',
+            user_area=region_extracted,
+            user_industry=store_data['industry'],
+            limit=5,
+            beta=beta,
+            alpha=alpha
+        )
+    
+        competitor_reviews = {}
+        if competitors:
+            logger.debug(f"   경쟁사 리뷰 로딩...")
+            for comp in competitors:
+                reviews = get_reviews_from_db(comp.place_id)
+                competitor_reviews[comp.place_id] = reviews
+                logger.debug(f"   ✅ {comp.name}: {len(reviews)}개")
     
     # ==================== STEP 4: 통계 분석 ====================
     
-    print(f"\n{'='*60}")
-    print("📊 STEP 4: 통계 분석 및 비교")
-    print(f"{'='*60}")
+    with span('master.stats'):
+        logger.info("📊 STEP 4: 통계 분석 및 비교")
     
-    our_stats = generate_review_stats(unified_reviews, target_store['name'])
-    print(f"   ✅ 우리 가게 통계 생성 완료")
+        our_stats = generate_review_stats(unified_reviews, target_store['name'])
+        logger.debug(f"   ✅ 우리 가게 통계 생성 완료")
     
-    comp_stats_list = []
-    if competitors:
-        for comp in competitors:
-            comp_revs = competitor_reviews.get(comp.place_id, [])
-            if comp_revs:
-                comp_stat = generate_review_stats(comp_revs, comp.name)
-                comp_stats_list.append(comp_stat)
-        print(f"   ✅ 경쟁사 통계 생성 완료")
+        comp_stats_list = []
+        if competitors:
+            for comp in competitors:
+                comp_revs = competitor_reviews.get(comp.place_id, [])
+                if comp_revs:
+                    comp_stat = generate_review_stats(comp_revs, comp.name)
+                    comp_stats_list.append(comp_stat)
+            logger.debug(f"   ✅ 경쟁사 통계 생성 완료")
     
-    comparison_result = None
-    if comp_stats_list:
-        comparison_result = compare_review_stats(our_stats, comp_stats_list)
-        print(f"   ✅ 통계 비교 완료")
+        comparison_result = None
+        if comp_stats_list:
+            comparison_result = compare_review_stats(our_stats, comp_stats_list)
+            logger.debug(f"   ✅ 통계 비교 완료")
     
     # ==================== STEP 5: 하이브리드 인사이트 (GPT + Claude) ====================
     
-    print(f"\n{'='*60}")
-    print("🤖 STEP 5: 하이브리드 AI 인사이트 (GPT + Claude)")
-    print(f"{'='*60}")
+    with span('master.insight'):
+        logger.info("🤖 STEP 5: 하이브리드 AI 인사이트 (GPT + Claude)")
     
-    # 🔥 async 함수 직접 호출!
-    insight_html = await generate_hybrid_report(
-        target_store=target_store,
-        target_reviews=unified_reviews,
-        competitors=competitors,
-        competitor_reviews=competitor_reviews,
-        statistical_comparison=comparison_result
-    )
+        # 🔥 async 함수 직접 호출!
+        insight_html = await generate_hybrid_report(
+            target_store=target_store,
+            target_reviews=unified_reviews,
+            competitors=competitors,
+            competitor_reviews=competitor_reviews,
+            statistical_comparison=comparison_result,
+            on_progress=on_progress
+        )
     
     # ==================== STEP 6: 체크리스트 생성 ====================
     
-    print(f"\n{'='*60}")
-    print("✅ STEP 6: 실행 체크리스트 생성")
-    print(f"{'='*60}")
+    with span('master.checklist'):
+        logger.info("✅ STEP 6: 실행 체크리스트 생성")
     
-    checklist = generate_action_checklist(
-        blog_profile=blog_profile,
-        insight_html=insight_html,
-        comparison_result=comparison_result
-    )
+        checklist = generate_action_checklist(
+            blog_profile=blog_profile,
+            insight_html=insight_html,
+            comparison_result=comparison_result
+        )
     
     # ==================== STEP 7: 통합 리포트 ====================
     
-    print(f"\n{'='*60}")
-    print("📄 STEP 7: 통합 리포트 생성")
-    print(f"{'='*60}")
+    with span('master.report'):
+        logger.info("📄 STEP 7: 통합 리포트 생성")
     
-    unified_report = generate_unified_report(
-        store_name=store_name,
-        blog_profile=blog_profile,
-        target_store=target_store,
-        insight_html=insight_html,
-        checklist=checklist
-    )
+        unified_report = generate_unified_report(
+            store_name=store_name,
+            blog_profile=blog_profile,
+            target_store=target_store,
+            insight_html=insight_html,
+            checklist=checklist
+        )
     
-    # 출력
-    print("\n" + "="*60)
-    print(unified_report)
-    print("="*60)
+    # 출력 (전체 리포트는 디버그에서만)
+    logger.debug(f"통합 리포트:\n{unified_report}")
     
     # 파일 저장
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -426,16 +435,11 @@ async def run_master_analysis(store_name: str, address: str):
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             f.write(unified_report)
-        print(f"\n💾 리포트 저장: {filename}")
+        logger.info(f"💾 리포트 저장: {filename}")
     except Exception as e:
-        print(f"⚠️  파일 저장 실패: {e}")
+        logger.warning(f"⚠️  파일 저장 실패: {e}")
     
-    print("""
-╔══════════════════════════════════════════════════════════════╗
-║                  ✅ 분석 완료!                               ║
-║                  📊 HTML 파일을 브라우저로 여세요!           ║
-╚══════════════════════════════════════════════════════════════╝
-    """)
+    logger.info(f"✅ 분석 완료: {target_store['name']}")
 
     return {
         'reviews': unified_reviews,
@@ -444,6 +448,86 @@ async def run_master_analysis(store_name: str, address: str):
         'target_store': target_store,
         'competitors': competitors
     }
+
+# ==================== 분석 재사용 (single-flight) ====================
+
+def analysis_key(store_name: str) -> str:
+    """입력 가게 이름 → 캐시 키 (공백/대소문자/전각 차이 무시)"""
+    text = unicodedata.normalize('NFKC', store_name or '').lower()
+    return re.sub(r'\s+', '', text)
+
+
+async def _run_and_share(store_name: str, address: str, key: str):
+    """실제 분석 실행 + place_id 기준으로 결과 공유"""
+    owned = []
+
+    def on_progress(message, **data):
+        # 같은 이름으로 합류한 작업들 모두에게
+        for listener in list(_progress_listeners.get(key, ())):
+            listener(message, **data)
+
+    async def on_place_resolved(target_store):
+        place_id = target_store['place_id']
+        analysis_aliases.set(key, place_id)
+        cached = analysis_results.get(place_id)
+        if cached:
+            return cached
+        running = _place_runs.get(place_id)
+        if running is not None:
+            return await asyncio.shield(running)   # 실패했으면 None → 직접 계속 진행
+        _place_runs[place_id] = asyncio.get_running_loop().create_future()
+        owned.append(place_id)
+        return None
+
+    result = None
+    try:
+        result = await run_master_analysis(store_name, address, on_place_resolved=on_place_resolved,
+                                           on_progress=on_progress)
+        if result and owned:
+            analysis_results.set(owned[0], result)
+        return result
+    finally:
+        if owned:
+            future = _place_runs.pop(owned[0])
+            if not future.done():
+                future.set_result(result or None)
+
+
+async def run_master_analysis_shared(store_name: str, address: str, on_progress=None):
+    """
+    run_master_analysis + 중복 제거
+
+    - 신선한 결과(ANALYSIS_FRESH_SECONDS 이내)가 있으면 그대로 재사용
+    - 같은 이름으로 진행 중인 분석이 있으면 거기에 합류 (on_progress도 같이 받음)
+    - 이름이 달라도 place_id가 같은 분석이 진행 중/완료면 크롤링 이후 단계는 합류/재사용
+
+    Returns:
+        (result, reuse) - reuse는 'cached' / 'joined' / None(새로 실행)
+    """
+    key = analysis_key(store_name)
+    place_id = analysis_aliases.get(key)
+    if place_id:
+        cached = analysis_results.get(place_id)
+        if cached:
+            logger.info(f"♻️  '{store_name}' 분석 결과 재사용 (place_id {place_id})")
+            return cached, 'cached'
+
+    joined = key in _name_flight
+    if joined:
+        logger.info(f"🔗 '{store_name}' 진행 중인 분석에 합류")
+    listeners = _progress_listeners.setdefault(key, [])
+    if on_progress is not None:
+        listeners.append(on_progress)
+    try:
+        result = await _name_flight.do(key, lambda: _run_and_share(store_name, address, key))
+    finally:
+        if on_progress is not None:
+            listeners.remove(on_progress)
+        if not listeners:
+            _progress_listeners.pop(key, None)
+    return result, 'joined' if joined else None
+
+
 # ==================== CLI 실행 ====================
 
 async def main():
@@ -470,4 +554,6 @@ async def main():
 
 
 if __name__ == "__main__":
+    from log_config import setup_logging
+    setup_logging()
     asyncio.run(main())
\ No newline at end of file
@@ -2,6 +2,7 @@
 # mvp_analyzer.py - 실시간 크롤링 (블랙리스트만 + 첫번째 선택)
 
 import asyncio
+import logging
 import sqlite3
 import re
 from datetime import datetime, timedelta
@@ -14,6 +15,11 @@ from review_preprocessor import (
     format_comparison_for_gpt
 )
 from competitor_search import find_competitors_smart, normalize_area
+from review_extractor import ReviewResponseCapture, extract_reviews, count_review_items
+from record_replay import recorder
+from tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 DB_FILE = 'seoul_industry_reviews.db'
 TARGET_REVIEWS = 150
@@ -63,7 +69,7 @@ async def select_best_store(store_items, user_input, debug=True):
         return None, None
     
     if debug:
-        print(f"\n   🔍 가게 선택 중... (블랙리스트 필터링)")
+        logger.debug(f"   🔍 가게 선택 중... (블랙리스트 필터링)")
     
     for idx, item in enumerate(store_items[:10], 1):
         try:
@@ -80,23 +86,23 @@ async def select_best_store(store_items, user_input, debug=True):
             # 블랙리스트 체크
             if is_blacklisted(store_name):
                 if debug:
-                    print(f"      [{idx}] ❌ 블랙리스트: {store_name}")
+                    logger.debug(f"      [{idx}] ❌ 블랙리스트: {store_name}")
                 continue
             
             # 🔥 첫 번째 유효한 가게 선택!
             if debug:
-                print(f"      [{idx}] ✅ 선택: {store_name}")
+                logger.debug(f"      [{idx}] ✅ 선택: {store_name}")
             
             return item, store_name
         
         except Exception as e:
             if debug:
-                print(f"      [{idx}] ⚠️  파싱 실패: {e}")
+                logger.debug(f"      [{idx}] ⚠️  파싱 실패: {e}")
             continue
     
     # 모든 가게가 블랙리스트면 None
     if debug:
-        print(f"      ❌ 유효한 가게를 찾지 못했습니다")
+        logger.debug(f"      ❌ 유효한 가게를 찾지 못했습니다")
     
     return None, None
 
@@ -164,12 +170,12 @@ async def extract_category_from_page(page, store_name):
     """
     try:
         # 🔥 최우선: 가게명에서 직접 추출
-        print(f"   🔍 업종 추출 시도: 가게명='{store_name}'")
+        logger.debug(f"   🔍 업종 추출 시도: 가게명='{store_name}'")
         
         if store_name:
             result = extract_category_from_text(store_name, store_name)
             if result != "음식점":
-                print(f"   ✅ 가게명에서 추출: {result}")
+                logger.debug(f"   ✅ 가게명에서 추출: {result}")
                 return result
         
         # 🔥 전략 1: span.lnJFt CSS 셀렉터
@@ -180,7 +186,7 @@ async def extract_category_from_page(page, store_name):
                 if text and text != store_name:
                     result = extract_category_from_text(text, store_name)
                     if result != "음식점":
-                        print(f"   ✅ CSS 셀렉터에서 추출: {result}")
+                        logger.debug(f"   ✅ CSS 셀렉터에서 추출: {result}")
                         return result
         except:
             pass
@@ -196,7 +202,7 @@ async def extract_category_from_page(page, store_name):
                     if remainder and len(remainder) < 30:
                         result = extract_category_from_text(remainder, store_name)
                         if result != "음식점":
-                            print(f"   ✅ 텍스트 패턴에서 추출: {result} (from: '{line[:50]}...')")
+                            logger.debug(f"   ✅ 텍스트 패턴에서 추출: {result} (from: '{line[:50]}...')")
                             return result
         except:
             pass
@@ -205,16 +211,16 @@ async def extract_category_from_page(page, store_name):
         try:
             body_text = await page.inner_text('body', timeout=3000)
             result = extract_category_from_text(body_text[:2000], store_name)
-            print(f"   ⚠️  페이지 전체 검색: {result}")
+            logger.debug(f"   ⚠️  페이지 전체 검색: {result}")
             return result
         except:
             pass
         
-        print(f"   ⚠️  업종 추출 실패, 기본값 사용: 음식점")
+        logger.warning(f"   ⚠️  업종 추출 실패, 기본값 사용: 음식점")
         return "음식점"
         
     except:
-        print(f"   ❌ 업종 추출 오류, 기본값 사용: 음식점")
+        logger.warning(f"   ❌ 업종 추출 오류, 기본값 사용: 음식점")
         return "음식점"
 
 
@@ -412,22 +418,23 @@ async def expand_reviews(page):
 
 async def crawl_store_info(store_name, region_hint=None, headless=False):
     """네이버 플레이스 크롤링 (블랙리스트 + 첫번째 선택)"""
-    print(f"\n{'='*60}")
-    print(f"🔍 STEP 1: '{store_name}' 실시간 크롤링")
-    print(f"{'='*60}")
+    logger.info(f"🔍 STEP 1: '{store_name}' 실시간 크롤링")
     
     if region_hint:
-        print(f"   💡 사용자 입력 지역: {region_hint}")
+        logger.info(f"   💡 사용자 입력 지역: {region_hint}")
     
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(
             headless=headless,
             args=['--disable-blink-features=AutomationControlled']
         )
+        # RECORD_REPLAY: record면 HAR 녹화, replay면 HAR로만 응답 (네트워크 없음)
         context = await browser.new_context(
             viewport={"width": 1920, "height": 1080},
-            locale="ko-KR"
+            locale="ko-KR",
+            **recorder.context_options('naver_place', store_name)
         )
+        await recorder.route_context('naver_place', store_name, context)
         await context.add_init_script(
             "Object.defineProperty(navigator, 'webdriver', { get: () => undefined });"
         )
@@ -436,7 +443,8 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
         try:
             # 1. 네이버 지도 검색
             search_url = f"https://map.naver.com/v5/search/{store_name}"
-            await page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
+            with span('crawl.goto', page='search'):
+                await page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
             await asyncio.sleep(3)
             
             # 2. 검색 프레임 찾기
@@ -451,7 +459,7 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                 await asyncio.sleep(1)
             
             if not search_frame:
-                print("   ❌ 검색 결과를 찾을 수 없습니다.")
+                logger.error("   ❌ 검색 결과를 찾을 수 없습니다.")
                 await context.close()
                 await browser.close()
                 return None
@@ -477,7 +485,7 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                     if not items:
                         continue
                     
-                    print(f"   🔍 셀렉터 '{sel}': {len(items)}개 발견")
+                    logger.debug(f"   🔍 셀렉터 '{sel}': {len(items)}개 발견")
                     
                     valid_items = []
                     for item in items[:10]:
@@ -490,14 +498,14 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                     
                     if len(valid_items) >= 1:
                         store_items = valid_items
-                        print(f"   ✅ {len(valid_items)}개 유효 항목 발견")
+                        logger.debug(f"   ✅ {len(valid_items)}개 유효 항목 발견")
                         break
                 except Exception as e:
-                    print(f"   ⚠️  셀렉터 '{sel}' 실패: {e}")
+                    logger.debug(f"   ⚠️  셀렉터 '{sel}' 실패: {e}")
                     pass
             
             if not store_items:
-                print("   ❌ 가게를 찾을 수 없습니다.")
+                logger.error("   ❌ 가게를 찾을 수 없습니다.")
                 await context.close()
                 await browser.close()
                 return None
@@ -510,7 +518,7 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
             )
             
             if not best_store:
-                print("   ❌ 적합한 가게를 찾을 수 없습니다.")
+                logger.error("   ❌ 적합한 가게를 찾을 수 없습니다.")
                 await context.close()
                 await browser.close()
                 return None
@@ -518,23 +526,23 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
             # 🔥 첫 번째 클릭
             await asyncio.sleep(1)
             await best_store.click(timeout=3000)
-            print("   🖱️  첫 번째 클릭 완료")
+            logger.debug("   🖱️  첫 번째 클릭 완료")
             await asyncio.sleep(2)
             
             # 🔥 두 번째 클릭 (상세 페이지로 진입)
             await best_store.click(timeout=3000)
-            print("   🖱️  두 번째 클릭 완료")
+            logger.debug("   🖱️  두 번째 클릭 완료")
             await asyncio.sleep(5)
             
             # 4. place_id 추출
             place_id = None
             # 🔥🔥🔥 디버깅 시작 🔥🔥🔥
-            print(f"\n   🔍 === 프레임 URL 디버깅 ===")
-            print(f"   📄 메인 페이지 URL: {page.url}")
-            print(f"   📊 총 프레임 수: {len(page.frames)}")
+            logger.debug(f"   🔍 === 프레임 URL 디버깅 ===")
+            logger.debug(f"   📄 메인 페이지 URL: {page.url}")
+            logger.debug(f"   📊 총 프레임 수: {len(page.frames)}")
             for i, frame in enumerate(page.frames):
-                print(f"   Frame [{i}]: {frame.url[:150]}")  # 처음 150자만
-            print(f"   🔍 === 디버깅 끝 ===\n")
+                logger.debug(f"   Frame [{i}]: {frame.url[:150]}")  # 처음 150자만
+            logger.debug(f"   🔍 === 디버깅 끝 ===")
             # 🔥🔥🔥 디버깅 끝 🔥🔥🔥
                         
             # 🔥 수정: 다양한 패턴 시도
@@ -545,26 +553,26 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                 match = re.search(r'place[/=](\d+)', url)
                 if match:
                     place_id = match.group(1)
-                    print(f"   ✅ place_id 발견 (place/): {place_id}")
+                    logger.debug(f"   ✅ place_id 발견 (place/): {place_id}")
                     break
                 
                 # 패턴 2: id=숫자
                 match = re.search(r'[?&]id=(\d+)', url)
                 if match:
                     place_id = match.group(1)
-                    print(f"   ✅ place_id 발견 (id=): {place_id}")
+                    logger.debug(f"   ✅ place_id 발견 (id=): {place_id}")
                     break
                 
                 # 패턴 3: restaurant/숫자
                 match = re.search(r'restaurant[/=](\d+)', url)
                 if match:
                     place_id = match.group(1)
-                    print(f"   ✅ place_id 발견 (restaurant/): {place_id}")
+                    logger.debug(f"   ✅ place_id 발견 (restaurant/): {place_id}")
                     break
 
             # 🔥 추가: 못 찾으면 재시도
             if not place_id:
-                print("   ⏳ place_id 못찾음, 5초 더 대기 후 재시도...")
+                logger.debug("   ⏳ place_id 못찾음, 5초 더 대기 후 재시도...")
                 await asyncio.sleep(5)
                 
                 for frame in page.frames:
@@ -572,24 +580,25 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                     match = re.search(r'place[/=](\d+)|[?&]id=(\d+)|restaurant[/=](\d+)', url)
                     if match:
                         place_id = match.group(1) or match.group(2) or match.group(3)
-                        print(f"   ✅ place_id 발견 (재시도): {place_id}")
+                        logger.debug(f"   ✅ place_id 발견 (재시도): {place_id}")
                         break
 
             if not place_id:
-                print("   ❌ place_id를 찾을 수 없습니다.")
+                logger.error("   ❌ place_id를 찾을 수 없습니다.")
                 await context.close()
                 await browser.close()
                 return None
 
-            print(f"   ✅ Place ID: {place_id}")
+            logger.info(f"   ✅ Place ID: {place_id}")
             # 5. 상세 페이지로 이동
             detail_url = f"https://m.place.naver.com/restaurant/{place_id}/home"
-            await page.goto(detail_url, wait_until="domcontentloaded", timeout=30000)
+            with span('crawl.goto', page='detail'):
+                await page.goto(detail_url, wait_until="domcontentloaded", timeout=30000)
             await asyncio.sleep(2)
             total_review_count = 0
             blog_review_count = 0
 
-            print(f"\n   📊 리뷰/블로그 개수 추출 중...")
+            logger.debug(f"   📊 리뷰/블로그 개수 추출 중...")
 
             try:
                 # 메타 태그 가져오기
@@ -600,7 +609,7 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                 )
                 
                 if meta_content:
-                    print(f"   🔍 메타 태그: {meta_content}")
+                    logger.debug(f"   🔍 메타 태그: {meta_content}")
                     
                     import re
                     
@@ -608,21 +617,21 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                     visitor_match = re.search(r'방문자리뷰\s*(\d+)', meta_content)
                     if visitor_match:
                         total_review_count = int(visitor_match.group(1))
-                        print(f"   ✅ 네이버 플레이스 리뷰: {total_review_count}개")
+                        logger.debug(f"   ✅ 네이버 플레이스 리뷰: {total_review_count}개")
                     
                     blog_match = re.search(r'블로그리뷰\s*(\d+)', meta_content)
                     if blog_match:
                         blog_review_count = int(blog_match.group(1))
-                        print(f"   ✅ 블로그 리뷰: {blog_review_count}개")
+                        logger.debug(f"   ✅ 블로그 리뷰: {blog_review_count}개")
                 else:
-                    print(f"   ⚠️  메타 태그를 찾지 못했습니다")
+                    logger.warning(f"   ⚠️  메타 태그를 찾지 못했습니다")
 
             except Exception as e:
-                print(f"   ⚠️  개수 추출 실패: {e}")
+                logger.warning(f"   ⚠️  개수 추출 실패: {e}")
             # 지역 추출
             if region_hint:
                 region = region_hint
-                print(f"   ✅ 지역: {region} (사용자 입력)")
+                logger.info(f"   ✅ 지역: {region} (사용자 입력)")
             else:
                 region = "알 수 없음"
                 try:
@@ -634,39 +643,39 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                         gu_match = re.search(r'서울특?별?시?\s+([가-힣]+구)', page_text)
                         if gu_match:
                             region = gu_match.group(1)
-                    print(f"   ✅ 지역: {region} (크롤링 추출)")
+                    logger.info(f"   ✅ 지역: {region} (크롤링 추출)")
                 except:
-                    print(f"   ⚠️  지역: {region}")
+                    logger.warning(f"   ⚠️  지역: {region}")
             
             # 🔥 업종 추출 (개선!)
             industry = await extract_category_from_page(page, store_name_found)
-            print(f"   ✅ 업종: {industry}")
+            logger.info(f"   ✅ 업종: {industry}")
             
             # 6. 리뷰 페이지로 이동
-            print(f"\n{'='*60}")
-            print(f"📥 STEP 2: 리뷰 수집 (목표: {TARGET_REVIEWS}개)")
-            print(f"{'='*60}")
+            logger.info(f"📥 STEP 2: 리뷰 수집 (목표: {TARGET_REVIEWS}개)")
             
             review_url = f"https://m.place.naver.com/restaurant/{place_id}/review/visitor"
-            await page.goto(review_url, wait_until="domcontentloaded", timeout=30000)
+            capture = ReviewResponseCapture(page)  # 🔥 리뷰 API 응답 캡처 (goto 전에!)
+            with span('crawl.goto', page='review'):
+                await page.goto(review_url, wait_until="domcontentloaded", timeout=30000)
             await asyncio.sleep(2)
             
             # 최신순 정렬
-            print("   🔄 최신순 정렬 중...")
+            logger.debug("   🔄 최신순 정렬 중...")
             try:
                 for selector in ["button:has-text('최신순')", "a:has-text('최신순')"]:
                     try:
                         await page.click(selector, timeout=3000)
-                        print("   ✅ 최신순 정렬 완료")
+                        logger.debug("   ✅ 최신순 정렬 완료")
                         await asyncio.sleep(2)
                         break
                     except:
                         continue
             except:
-                print("   ⚠️  최신순 버튼을 찾지 못했습니다.")
+                logger.warning("   ⚠️  최신순 버튼을 찾지 못했습니다.")
             
             # 🔥 7. 스크롤 & 리뷰 수집 (개선된 로직!)
-            print("   ⏬ 스크롤 중...")
+            logger.debug("   ⏬ 스크롤 중...")
             
             max_scrolls = 40  # 30 → 40 증가
             scroll_patience = 3  # 3번 연속 증가 없으면 중단
@@ -686,94 +695,44 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
                 
                 # 5번마다 체크 (10번 → 5번, 더 자주 체크)
                 if i % 5 == 0:
-                    count = 0
-                    for sel in ["li.place_apply_pui", "li.pui__X35jYm"]:
-                        try:
-                            count = await page.locator(sel).count()
-                            if count > 0:
-                                break
-                        except:
-                            pass
+                    # 🔥 네트워크로 받은 리뷰 수와 DOM 개수 중 큰 값
+                    count = max(capture.count, await count_review_items(page))
                     
                     # 진행 상황 출력
                     if count > last_count:
-                        print(f"      [{i:2d}회] {count}개 발견 (+{count - last_count})")
+                        logger.debug(f"      [{i:2d}회] {count}개 발견 (+{count - last_count})")
                         no_increase_streak = 0  # 리셋
                     else:
                         no_increase_streak += 1
-                        print(f"      [{i:2d}회] {count}개 (증가 없음 {no_increase_streak}/{scroll_patience})")
+                        logger.debug(f"      [{i:2d}회] {count}개 (증가 없음 {no_increase_streak}/{scroll_patience})")
                     
                     last_count = count
                     
                     # 목표 달성하고 + 여유분 20개 더
                     if count >= TARGET_REVIEWS + 20:
-                        print(f"   ✅ {count}개 발견 (목표+여유), 수집 중단")
+                        logger.info(f"   ✅ {count}개 발견 (목표+여유), 수집 중단")
                         break
                     
                     # 연속으로 증가 없으면 중단 (끝까지 스크롤함)
                     if no_increase_streak >= scroll_patience:
-                        print(f"   ⚠️  더 이상 리뷰가 없습니다 (최종: {count}개)")
+                        logger.info(f"   ⚠️  더 이상 리뷰가 없습니다 (최종: {count}개)")
                         break
             
-            print(f"   📊 DOM에서 발견된 리뷰: {last_count}개")
-            
-            # 8. 리뷰 파싱
-            reviews = []
-            review_items = []
-            for sel in ["li.place_apply_pui", "li.pui__X35jYm", "li.EjjAW"]:
-                try:
-                    items = await page.locator(sel).all()
-                    if items:
-                        review_items = items
-                        break
-                except:
-                    pass
-            
-            print(f"   📝 파싱 중... (발견: {len(review_items)}개)")
+            logger.debug(f"   📊 발견된 리뷰: {last_count}개")
             
-            for item in review_items[:TARGET_REVIEWS + 20]:
-                try:
-                    full_text = await item.inner_text(timeout=500)
-                    if len(full_text) < 50:
-                        continue
-                    
-                    review = {"별점": None, "날짜": None, "리뷰": ""}
-                    
-                    if '★' in full_text:
-                        review["별점"] = float(min(full_text.count('★'), 5))
-                    
-                    date_patterns = [
-                        r'(\d{4}[./-]\d{1,2}[./-]\d{1,2})',
-                        r'(\d{1,2}[./-]\d{1,2})',
-                        r'(\d+일\s*전)',
-                    ]
-                    
-                    for pattern in date_patterns:
-                        date_match = re.search(pattern, full_text)
-                        if date_match:
-                            review["날짜"] = date_match.group(1)
-                            break
-                    
-                    lines = [ln.strip() for ln in full_text.split('\n') if len(ln.strip()) >= 20]
-                    if lines:
-                        review["리뷰"] = max(lines, key=len)
-                    
-                    if review["리뷰"] and not is_owner_reply(review["리뷰"]):
-                        reviews.append(review)
-                    
-                    if len(reviews) >= TARGET_REVIEWS:
-                        break
-                        
-                except:
-                    pass
+            # 8. 리뷰 파싱 (🔥 네트워크 응답 우선, 부족하면 DOM 일괄 덤프)
+            reviews, _ = await extract_reviews(
+                page, capture, TARGET_REVIEWS,
+                is_owner_reply=is_owner_reply
+            )
+            capture.detach()
             
-            print(f"   ✅ 수집된 리뷰: {len(reviews)}개")
+            logger.info(f"   ✅ 수집된 리뷰: {len(reviews)}개")
             
             # 🔥 수집 개수 확인!
             if len(reviews) < TARGET_REVIEWS:
-                print(f"   ⚠️  목표({TARGET_REVIEWS}개)보다 적습니다!")
-                print(f"      원인: 사장님 답글, 짧은 리뷰, 파싱 실패 등")
-                print(f"      대책: 있는 만큼만 분석 진행")
+                logger.warning(f"   ⚠️  목표({TARGET_REVIEWS}개)보다 적습니다! "
+                               f"(사장님 답글, 짧은 리뷰, 파싱 실패 등) → 있는 만큼만 분석 진행")
             
             await context.close()
             await browser.close()
@@ -789,7 +748,7 @@ async def crawl_store_info(store_name, region_hint=None, headless=False):
             }
             
         except Exception as e:
-            print(f"   ❌ 크롤링 실패: {e}")
+            logger.error(f"   ❌ 크롤링 실패: {e}")
             await context.close()
             await browser.close()
             return None
@@ -824,6 +783,7 @@ def is_recent_review(date_str, months=6):
     return review_date >= cutoff_date
 
 
+@traced('db.get_reviews')
 def get_reviews_from_db(place_id, filter_recent=True):
     """DB에서 리뷰 가져오기"""
     conn = sqlite3.connect(DB_FILE)
@@ -1030,4 +990,6 @@ async def main():
 
 
 if __name__ == "__main__":
+    from log_config import setup_logging
+    setup_logging()
     asyncio.run(main())
\ No newline at end of file
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 # naver_blog_crawler.py - 네이버 블로그 크롤링 + 가게 분석 (500개 수집)
 
-import requests
 import json
+import logging
 import time
 from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
@@ -11,6 +11,10 @@ from collections import Counter
 import re
 from datetime import datetime
 
+from record_replay import recorder
+
+logger = logging.getLogger(__name__)
+
 # ==================== 네이버 API 설정 ====================
 
 NAVER_CLIENT_ID = "ZLPHHehmKYVHcF2hUGhQ"  # 네이버 개발자센터에서 발급
@@ -94,24 +98,24 @@ def search_naver_blog(query: str, total_count: int = 500) -> List[Dict]:
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = recorder.requests_get('naver_blog_search', url, headers=headers, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
         available_total = data.get("total", 0)
         
-        print(f"   📊 검색 결과: 총 {available_total:,}개 블로그 발견")
+        logger.debug(f"   📊 검색 결과: 총 {available_total:,}개 블로그 발견")
         
         # 실제 가져올 개수 결정 (최소값)
         actual_count = min(total_count, available_total)
         
         if actual_count == 0:
-            print("   ❌ 검색 결과 없음")
+            logger.warning("   ❌ 검색 결과 없음")
             return []
         
-        print(f"   📥 수집 목표: {actual_count}개")
+        logger.debug(f"   📥 수집 목표: {actual_count}개")
         
     except Exception as e:
-        print(f"❌ 초기 검색 실패: {e}")
+        logger.error(f"❌ 초기 검색 실패: {e}")
         return []
     
     # 2단계: 100개씩 나눠서 요청
@@ -137,9 +141,9 @@ def search_naver_blog(query: str, total_count: int = 500) -> List[Dict]:
         }
         
         try:
-            print(f"   ⏳ 요청 {page + 1}/{requests_needed}: start={start}, display={display}")
+            logger.debug(f"   ⏳ 요청 {page + 1}/{requests_needed}: start={start}, display={display}")
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = recorder.requests_get('naver_blog_search', url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             items = data.get("items", [])
@@ -157,7 +161,7 @@ def search_naver_blog(query: str, total_count: int = 500) -> List[Dict]:
                     if len(all_blogs) >= actual_count:
                         break
             
-            print(f"      ✅ 수집: {new_count}개 (누적: {len(all_blogs)}/{actual_count}개)")
+            logger.debug(f"      ✅ 수집: {new_count}개 (누적: {len(all_blogs)}/{actual_count}개)")
             
             # 목표 개수 도달하면 루프 종료
             if len(all_blogs) >= actual_count:
@@ -168,10 +172,10 @@ def search_naver_blog(query: str, total_count: int = 500) -> List[Dict]:
                 time.sleep(0.1)
                 
         except Exception as e:
-            print(f"   ⚠️  요청 {page + 1} 실패: {e}")
+            logger.warning(f"   ⚠️  요청 {page + 1} 실패: {e}")
             continue
     
-    print(f"   ✅ 최종 수집: {len(all_blogs)}개 (중복 제거 완료)")
+    logger.info(f"   ✅ 최종 수집: {len(all_blogs)}개 (중복 제거 완료)")
     return all_blogs
 
 
@@ -193,7 +197,7 @@ def crawl_blog_content(blog_url: str) -> str:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
         
-        response = requests.get(blog_url, headers=headers, timeout=10)
+        response = recorder.requests_get('naver_blog_page', blog_url, headers=headers, timeout=10)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.content, 'html.parser')
@@ -204,7 +208,7 @@ def crawl_blog_content(blog_url: str) -> str:
         
         return content
     except Exception as e:
-        print(f"⚠️  크롤링 실패 ({blog_url}): {e}")
+        logger.debug(f"⚠️  크롤링 실패 ({blog_url}): {e}")
         return ""
 
 
@@ -280,9 +284,7 @@ def analyze_store_from_blog(store_name: str, max_blogs: int = 500) -> StoreProfi
     Returns:
         StoreProfile 객체
     """
-    print(f"\n{'='*60}")
-    print(f"📱 블로그 분석 시작: {store_name}")
-    print(f"{'='*60}")
+    logger.info(f"📱 블로그 분석 시작: {store_name}")
     
     # 블로그 검색
     blogs = search_naver_blog(store_name, total_count=max_blogs)
@@ -290,7 +292,7 @@ def analyze_store_from_blog(store_name: str, max_blogs: int = 500) -> StoreProfi
     if not blogs:
         raise Exception("블로그 검색 결과 없음")
     
-    print(f"\n   🔍 총 {len(blogs)}개 블로그 분석 중...")
+    logger.debug(f"   🔍 총 {len(blogs)}개 블로그 분석 중...")
     
     # 키워드 카운터
     all_keywords = []
@@ -377,10 +379,8 @@ def analyze_store_from_blog(store_name: str, max_blogs: int = 500) -> StoreProfi
         avg_rating=avg_rating
     )
     
-    print(f"   ✅ 분석 완료!")
-    print(f"      업종: {profile.industry}")
-    print(f"      컨셉: {profile.concept}")
-    print(f"      긍정 비율: {profile.positive_ratio:.1%}")
+    logger.info(f"   ✅ 분석 완료! (업종: {profile.industry}, 컨셉: {profile.concept}, "
+                f"긍정 비율: {profile.positive_ratio:.1%})")
     
     return profile
 
@@ -388,6 +388,9 @@ def analyze_store_from_blog(store_name: str, max_blogs: int = 500) -> StoreProfi
 # ==================== 메인 실행 ====================
 
 if __name__ == "__main__":
+    from log_config import setup_logging
+    setup_logging()
+
     # 테스트
     store_name = input("가게 이름을 입력하세요: ").strip()
     
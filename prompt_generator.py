@@ -3,8 +3,12 @@
 prompt_generator.py - 13번째 질문 통합 (35K 토큰 원본 유지)
 """
 
+import hashlib
+from functools import lru_cache
 from typing import Dict, Any, List
 
+from llm_usage import count_tokens
+
 # 🔥 스티브 잡스 톤 브랜드 철학 추가
 BRAND_PHILOSOPHY = """
 
@@ -677,6 +681,135 @@ MARKETING_REPORT_SYSTEM_PROMPT = """
 """
 
 
+# 🔥 출력 구조/규칙 (가게마다 같음 → 시스템 프롬프트 쪽으로 옮겨 캐시 prefix에 포함)
+STRATEGY_OUTPUT_GUIDE = """
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# 🎯 맞춤형 마케팅 전략 요청 (스티브 잡스 톤)
+
+위 가이드를 참고하여, **우리 가게에 딱 맞는 전략만** 추천해주세요.
+
+## 필수 출력 구조 (WHY-WHAT-HOW)
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+📌 당신의 상황
+- [오픈 기간 요약]
+- [예산 요약]
+- [현재 마케팅 요약]
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+🎯 해야 할 것 (우선순위)
+
+1위. [채널명]
+
+    WHY: [왜 이 채널을 해야 하는가]
+    WHAT: [구체적으로 무엇을 할 것인가]
+    HOW: [어떻게 할 것인가 - 시간/비용]
+    
+    이것도 귀찮다면:
+    [강렬한 한 문장]
+
+2위. [채널명]
+
+    WHY: [이유]
+    WHAT: [무엇을]
+    HOW: [어떻게]
+    
+    주의:
+    [경고/조언]
+
+3위. [채널명]
+
+    WHY: [이유]
+    WHAT: [무엇을]
+    
+    하지만:
+    [우선순위 조언]
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+📅 2주 액션 플랜
+
+Day 1-3:
+- [ ] [구체적 액션]
+
+Day 4-7:
+- [ ] [구체적 액션]
+
+Day 8-14:
+- [ ] [구체적 액션]
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+💰 예산 배분 (사장님 월 예산 기준)
+
+1위 채널: [X만원] ([Y%])
+2위 채널: [X만원] ([Y%])
+3위 채널: [X만원] ([Y%])
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+## 중요 규칙 (반드시 지키기)
+
+1. **현재 하고 있는 마케팅 (13번째 질문) 분석 우선**
+   - 하고 있는 것의 문제점 지적
+   - 개선 방향 명확히
+   - "할 수 있냐" 질문으로 찌르기
+
+2. **스티브 잡스 톤 엄수**
+   - 짧은 문장 (10단어 이내)
+   - 질문으로 찌르기
+   - 이모지 제거
+   - 본질을 꿰뚫기
+
+3. **실행 가능성 우선**
+   - 예산 0원 → 유료 광고 제외
+   - 시간 없음 → 매일 관리 제외
+   - 초보 → 복잡한 것 제외
+
+4. **우선순위 3개만**
+   - 최대 3개 채널
+   - 80/20 법칙
+   - Quick Win 우선
+
+5. **한국 시장 최적화**
+   - Naver Place 최우선
+   - 배달앱 활용
+   - K-food 트렌드
+"""
+
+# 🔥 캐시 prefix: 매 호출 바이트 단위로 같아야 provider 프롬프트 캐시가 적중함
+# (여기에 가게별 값을 절대 넣지 말 것 - 가게별 내용은 generate_user_prompt로)
+SYSTEM_PREFIX = MARKETING_REPORT_SYSTEM_PROMPT + BRAND_PHILOSOPHY + STRATEGY_OUTPUT_GUIDE
+
+
+@lru_cache(maxsize=1)
+def prefix_info() -> Dict[str, Any]:
+    """캐시 prefix 해시/길이/토큰 수 (프로세스당 1번 계산)"""
+    encoded = SYSTEM_PREFIX.encode('utf-8')
+    digest = hashlib.sha256(encoded).hexdigest()
+    return {
+        'sha256': digest,
+        'bytes': len(encoded),
+        'tokens': count_tokens(SYSTEM_PREFIX),
+        'cache_key': f"marketing-strategy-{digest[:16]}",
+    }
+
+
+def anthropic_system_blocks(prefix: str = SYSTEM_PREFIX) -> List[Dict[str, Any]]:
+    """
+    Claude용 시스템 블록 (prefix에 cache_control 표시)
+
+    Anthropic은 cache_control 블록까지를 캐시 - prefix가 1024토큰 미만이면 캐시되지 않음
+    (hybrid_insight_engine.analyze_with_claude가 CLAUDE_STRATEGY_SYSTEM으로 사용)
+    """
+    return [{
+        "type": "text",
+        "text": prefix,
+        "cache_control": {"type": "ephemeral"}
+    }]
+
 def generate_owner_profile_text(
     answers: Dict[str, str],
     current_marketing: List[str] = None,
@@ -869,99 +1002,11 @@ def generate_user_prompt(
 
 ---
 
-# 🎯 맞춤형 마케팅 전략 요청 (스티브 잡스 톤)
-
-위 가이드를 참고하여, **우리 가게에 딱 맞는 전략만** 추천해주세요.
-
-## 필수 출력 구조 (WHY-WHAT-HOW)
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-📌 당신의 상황
-- [오픈 기간 요약]
-- [예산 요약]
-- [현재 마케팅 요약]
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-🎯 해야 할 것 (우선순위)
-
-1위. [채널명]
-
-    WHY: [왜 이 채널을 해야 하는가]
-    WHAT: [구체적으로 무엇을 할 것인가]
-    HOW: [어떻게 할 것인가 - 시간/비용]
-    
-    이것도 귀찮다면:
-    [강렬한 한 문장]
-
-2위. [채널명]
-
-    WHY: [이유]
-    WHAT: [무엇을]
-    HOW: [어떻게]
-    
-    주의:
-    [경고/조언]
-
-3위. [채널명]
-
-    WHY: [이유]
-    WHAT: [무엇을]
-    
-    하지만:
-    [우선순위 조언]
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-📅 2주 액션 플랜
-
-Day 1-3:
-- [ ] [구체적 액션]
-
-Day 4-7:
-- [ ] [구체적 액션]
-
-Day 8-14:
-- [ ] [구체적 액션]
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-💰 예산 배분 (월 {monthly_budget})
-
-1위 채널: [X만원] ([Y%])
-2위 채널: [X만원] ([Y%])
-3위 채널: [X만원] ([Y%])
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-## 중요 규칙 (반드시 지키기)
-
-1. **현재 하고 있는 마케팅 (13번째 질문) 분석 우선**
-   - 하고 있는 것의 문제점 지적
-   - 개선 방향 명확히
-   - "할 수 있냐" 질문으로 찌르기
-
-2. **스티브 잡스 톤 엄수**
-   - 짧은 문장 (10단어 이내)
-   - 질문으로 찌르기
-   - 이모지 제거
-   - 본질을 꿰뚫기
-
-3. **실행 가능성 우선**
-   - 예산 0원 → 유료 광고 제외
-   - 시간 없음 → 매일 관리 제외
-   - 초보 → 복잡한 것 제외
+# 🎯 요청
 
-4. **우선순위 3개만**
-   - 최대 3개 채널
-   - 80/20 법칙
-   - Quick Win 우선
+월 예산: {monthly_budget}
 
-5. **한국 시장 최적화**
-   - Naver Place 최우선
-   - 배달앱 활용
-   - K-food 트렌드
+위 상황에 맞춰 시스템 지침의 출력 구조(WHY-WHAT-HOW) 그대로 작성해주세요.
 """
     
     return user_prompt
@@ -1003,7 +1048,7 @@ def generate_full_prompt(
         budget_text
     )
     
-    # 🔥 스티브 잡스 톤 시스템 프롬프트 (35K 토큰 + 브랜드 철학)
-    system_prompt_with_tone = MARKETING_REPORT_SYSTEM_PROMPT + BRAND_PHILOSOPHY
+    # 🔥 스티브 잡스 톤 시스템 프롬프트 (35K 토큰 + 브랜드 철학 + 출력 구조) - 매번 같은 객체
+    system_prompt_with_tone = SYSTEM_PREFIX
     
     return system_prompt_with_tone, user_prompt
\ No newline at end of file
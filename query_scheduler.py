@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# query_scheduler.py - 신규 가게 수확량 기반 쿼리 스케줄러 (지역 × 업종 셀)
+
+import random
+import sqlite3
+import time
+
+DB_FILE = 'seoul_industry_reviews.db'
+
+YIELD_ALPHA = 0.5          # 수확량 EWMA 가중치 (최근 실행 반영 비율)
+PRIOR_STRENGTH = 2.0       # 셀 데이터가 적을 때 지역/업종 평균에 기대는 정도
+EXPLORE_BONUS = 3.0        # 한 번도 안 돈 셀 가산점
+BASE_REFRESH_HOURS = 24 * 7     # 수확 있는 셀 재방문 주기 (1주)
+MAX_REFRESH_HOURS = 24 * 90     # 고갈 셀 최대 재방문 주기 (90일)
+
+
+class CellStats:
+    """셀(지역 × 업종) 수확 통계"""
+
+    __slots__ = ('area', 'industry', 'runs', 'total_new', 'yield_ewma',
+                 'empty_streak', 'last_crawled_at', 'refresh_hours')
+
+    def __init__(self, area, industry, runs=0, total_new=0, yield_ewma=0.0,
+                 empty_streak=0, last_crawled_at=0.0, refresh_hours=None):
+        self.area = area
+        self.industry = industry
+        self.runs = runs
+        self.total_new = total_new
+        self.yield_ewma = yield_ewma
+        self.empty_streak = empty_streak
+        self.last_crawled_at = last_crawled_at
+        self.refresh_hours = refresh_hours  # 수동 지정 주기 (None이면 자동)
+
+    def refresh_interval(self):
+        """재방문 주기 (초) - 연속으로 빈 셀일수록 지수적으로 늘어남"""
+        if self.refresh_hours is not None:
+            hours = self.refresh_hours
+        else:
+            hours = min(BASE_REFRESH_HOURS * (2 ** self.empty_streak), MAX_REFRESH_HOURS)
+        return hours * 3600
+
+    def is_due(self, now):
+        return now - self.last_crawled_at >= self.refresh_interval()
+
+
+class QueryScheduler:
+    """
+    수확량 적응형 쿼리 스케줄러
+
+    - collect_place_ids가 찾은 신규 가게 수를 셀/지역/업종별로 누적
+    - 고갈된 셀은 재방문 주기를 늘려 뒤로 미룸
+    - next_query()마다 최신 통계로 전체 셀을 다시 순위 매김 (셀 ≤ 수천 개라 선형 탐색으로 충분)
+    - 통계는 DB(crawl_cell_stats)에 저장되어 다음 실행에도 이어짐
+    """
+
+    def __init__(self, areas, industries, db_file=DB_FILE, max_queries=None):
+        self.db_file = db_file
+        self.max_queries = max_queries
+        self.cells = {
+            (area, industry): CellStats(area, industry)
+            for area in areas for industry in industries
+        }
+        self.in_flight = set()
+        self.failed = set()  # 이번 실행에서 예외로 실패한 셀 (재시도 폭주 방지)
+        self.issued = 0
+
+    # ==================== 저장소 ====================
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_cell_stats (
+                area TEXT NOT NULL,
+                industry TEXT NOT NULL,
+                runs INTEGER NOT NULL DEFAULT 0,
+                total_new INTEGER NOT NULL DEFAULT 0,
+                yield_ewma REAL NOT NULL DEFAULT 0,
+                empty_streak INTEGER NOT NULL DEFAULT 0,
+                last_crawled_at REAL NOT NULL DEFAULT 0,
+                refresh_hours REAL,
+                PRIMARY KEY (area, industry)
+            )
+        """)
+        return conn
+
+    def load(self):
+        """DB에서 셀 통계 로드"""
+        conn = self._connect()
+        rows = conn.execute("""
+            SELECT area, industry, runs, total_new, yield_ewma,
+                   empty_streak, last_crawled_at, refresh_hours
+            FROM crawl_cell_stats
+        """).fetchall()
+        conn.close()
+
+        for row in rows:
+            cell = self.cells.get((row[0], row[1]))
+            if cell:
+                (cell.runs, cell.total_new, cell.yield_ewma,
+                 cell.empty_streak, cell.last_crawled_at, cell.refresh_hours) = row[2:]
+        return len(rows)
+
+    def seed_completed(self, completed_queries, crawled_at):
+        """
+        통계 도입 전 저널에 완료로 남은 쿼리는 crawled_at에 돈 것으로 간주
+
+        수확량은 모르므로 runs는 0으로 두고 재방문 시각만 미룸
+        """
+        seeded = 0
+        for cell in self.cells.values():
+            if cell.last_crawled_at == 0 and f"{cell.area} {cell.industry}" in completed_queries:
+                cell.last_crawled_at = crawled_at
+                self._save(cell)
+                seeded += 1
+        return seeded
+
+    def _save(self, cell):
+        conn = self._connect()
+        conn.execute("""
+            INSERT INTO crawl_cell_stats
+            (area, industry, runs, total_new, yield_ewma, empty_streak, last_crawled_at, refresh_hours)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(area, industry) DO UPDATE SET
+                runs = excluded.runs,
+                total_new = excluded.total_new,
+                yield_ewma = excluded.yield_ewma,
+                empty_streak = excluded.empty_streak,
+                last_crawled_at = excluded.last_crawled_at,
+                refresh_hours = excluded.refresh_hours
+        """, (cell.area, cell.industry, cell.runs, cell.total_new, cell.yield_ewma,
+              cell.empty_streak, cell.last_crawled_at, cell.refresh_hours))
+        conn.commit()
+        conn.close()
+
+    def set_refresh_hours(self, area, industry, hours):
+        """셀별 재방문 주기 수동 지정 (None이면 자동)"""
+        cell = self.cells[(area, industry)]
+        cell.refresh_hours = hours
+        self._save(cell)
+
+    # ==================== 순위 ====================
+
+    def _group_rates(self):
+        """지역별/업종별 평균 수확량 (사전 분포)"""
+        area_sum, area_n, ind_sum, ind_n = {}, {}, {}, {}
+        for cell in self.cells.values():
+            if cell.runs == 0:
+                continue
+            area_sum[cell.area] = area_sum.get(cell.area, 0) + cell.yield_ewma
+            area_n[cell.area] = area_n.get(cell.area, 0) + 1
+            ind_sum[cell.industry] = ind_sum.get(cell.industry, 0) + cell.yield_ewma
+            ind_n[cell.industry] = ind_n.get(cell.industry, 0) + 1
+
+        crawled = [c.yield_ewma for c in self.cells.values() if c.runs > 0]
+        global_rate = sum(crawled) / len(crawled) if crawled else EXPLORE_BONUS
+
+        area_rate = {a: area_sum[a] / area_n[a] for a in area_sum}
+        ind_rate = {i: ind_sum[i] / ind_n[i] for i in ind_sum}
+        return area_rate, ind_rate, global_rate
+
+    def priority(self, cell, area_rate, ind_rate, global_rate):
+        """예상 신규 가게 수 (셀 EWMA를 지역/업종 평균 쪽으로 수축)"""
+        prior = (area_rate.get(cell.area, global_rate) + ind_rate.get(cell.industry, global_rate)) / 2
+        weight = min(cell.runs, 5)
+        estimate = (weight * cell.yield_ewma + PRIOR_STRENGTH * prior) / (weight + PRIOR_STRENGTH)
+        if cell.runs == 0:
+            estimate += EXPLORE_BONUS
+        return estimate
+
+    def ranked(self, now=None):
+        """실행 가능한 셀을 우선순위 내림차순으로"""
+        now = now or time.time()
+        area_rate, ind_rate, global_rate = self._group_rates()
+        due = [
+            (self.priority(cell, area_rate, ind_rate, global_rate), key)
+            for key, cell in self.cells.items()
+            if key not in self.in_flight and key not in self.failed and cell.is_due(now)
+        ]
+        due.sort(reverse=True)
+        return due
+
+    def pending_count(self, now=None):
+        now = now or time.time()
+        return sum(1 for key, cell in self.cells.items()
+                   if key not in self.in_flight and key not in self.failed and cell.is_due(now))
+
+    # ==================== 워커 API ====================
+
+    def next_query(self):
+        """다음 쿼리 (없으면 None) - 매번 최신 통계로 재순위"""
+        if self.max_queries is not None and self.issued >= self.max_queries:
+            return None
+
+        ranked = self.ranked()
+        if not ranked:
+            return None
+
+        # 🔥 상위권 안에서 약간 섞기 (같은 순서 반복 = 봇 패턴)
+        top = ranked[:3]
+        _, key = random.choice(top) if top[0][0] > 0 else top[0]
+
+        self.in_flight.add(key)
+        self.issued += 1
+        area, industry = key
+        return {'query': f"{area} {industry}", 'area': area, 'industry': industry}
+
+    def report(self, query_data, new_stores):
+        """collect_place_ids 결과(신규 가게 수) 반영"""
+        key = (query_data['area'], query_data['industry'])
+        self.in_flight.discard(key)
+
+        cell = self.cells[key]
+        cell.yield_ewma = new_stores if cell.runs == 0 else \
+            YIELD_ALPHA * new_stores + (1 - YIELD_ALPHA) * cell.yield_ewma
+        cell.runs += 1
+        cell.total_new += new_stores
+        cell.empty_streak = cell.empty_streak + 1 if new_stores == 0 else 0
+        cell.last_crawled_at = time.time()
+        self._save(cell)
+
+    def release(self, query_data):
+        """예외로 실패한 쿼리 반납 (통계는 그대로, 이번 실행에서는 제외)"""
+        key = (query_data['area'], query_data['industry'])
+        self.in_flight.discard(key)
+        self.failed.add(key)
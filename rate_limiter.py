@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# rate_limiter.py - 토큰 버킷 레이트 리미터 (스레드 안전, asyncio/동기 겸용, 429 적응형)
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    토큰 버킷
+
+    - rate: 초당 토큰 보충량, capacity: 순간 최대 허용량
+    - reserve()는 토큰을 미리 잡고 기다려야 할 시간(초)을 돌려줌
+      → 대기 중인 호출자끼리 순서대로 간격이 벌어져 몰림(thundering herd) 없음
+    - 잠금은 threading.Lock 이라 여러 스레드/이벤트 루프에서 같이 써도 안전
+    - clock: 테스트에서 가짜 시계를 넣을 수 있게 (기본 time.monotonic)
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()     # 보충 기준 시각 (drain 후에는 미래일 수 있음 - 그때까지 보충 없음)
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def reserve(self, tokens=1):
+        """토큰 예약 → 기다려야 할 시간(초)"""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._tokens -= tokens
+            # 보충 재개 시각(일시정지 끝) + 모자란 토큰이 채워질 때까지
+            wait = max(0.0, self._updated - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+
+    def refund(self, tokens):
+        """예약했다가 덜 쓴 토큰 돌려주기 (capacity는 넘지 않음)"""
+        with self._lock:
+            self._refill(self.clock())
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def drain(self, pause=0.0):
+        """
+        쌓인 버스트 비우고 pause초 동안 보충 중단
+
+        일시정지만 하면 끝나는 순간 쌓여 있던 capacity만큼 한꺼번에 나감 (429 → 또 429)
+        → 비워두면 대기 중인 호출이 일시정지 후에도 1/rate 간격으로 나감
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, now + pause)
+
+    def set_rate(self, rate, capacity=None):
+        with self._lock:
+            self._refill(self.clock())
+            self.rate = float(rate)
+            if capacity is not None:
+                self.capacity = float(capacity)
+                self._tokens = min(self._tokens, self.capacity)
+
+    async def acquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    429를 받으면 속도를 줄이고, 한동안 성공이 이어지면 다시 올리는 토큰 버킷 (AIMD)
+
+    - on_throttle(retry_after): 속도 × backoff, 버킷을 비우고 Retry-After 동안 보충 중단
+      (일시정지가 끝나도 몰려서 나가지 않고 새 속도 간격으로 나감)
+    - on_success(): recover_after번 연속 성공마다 속도 × recover (max_rate까지)
+    """
+
+    def __init__(self, rate, min_rate=0.5, max_rate=None, capacity=None,
+                 backoff=0.5, recover=1.1, recover_after=20, clock=time.monotonic):
+        super().__init__(rate, capacity, clock)
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.backoff = backoff
+        self.recover = recover
+        self.recover_after = recover_after
+        self.throttled = 0
+        self._successes = 0
+
+    def on_success(self):
+        with self._lock:
+            self._successes += 1
+            if self._successes < self.recover_after or self.rate >= self.max_rate:
+                return
+            self._successes = 0
+            new_rate = min(self.max_rate, self.rate * self.recover)
+        self.set_rate(new_rate)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.throttled += 1
+            self._successes = 0
+            new_rate = max(self.min_rate, self.rate * self.backoff)
+            pause = retry_after if retry_after else 1.0 / new_rate
+        self.set_rate(new_rate)
+        self.drain(pause)
+        return new_rate
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+# record_replay.py - 외부 호출 녹화/재생 (LLM / 네이버 / 카카오 / Instagram / 플레이스 크롤링 → 픽스처 파일, 네트워크 없이 벤치마크)
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from llm_batch import to_response
+
+logger = logging.getLogger(__name__)
+
+# off: 그대로 / record: 실제 호출 + 픽스처 저장 / replay: 픽스처로 응답 (네트워크 없음)
+MODE = os.getenv('RECORD_REPLAY', 'off')
+FIXTURE_DIR = os.getenv('RECORD_REPLAY_DIR', 'fixtures')
+# 재생 지연: none / recorded[:배율] / fixed:ms / lognormal:중앙값ms,sigma
+LATENCY = os.getenv('RECORD_REPLAY_LATENCY', 'none')
+SEED = int(os.getenv('RECORD_REPLAY_SEED', '0'))
+
+SECRET_PARAMS = {'access_token', 'client_secret', 'client_id', 'key', 'api_key'}
+KEPT_HEADERS = ('Content-Type', 'Retry-After')
+STREAM_PIECE_CHARS = 24     # 스트리밍 재생 시 조각 크기
+
+
+class FixtureMissing(LookupError):
+    """재생할 픽스처 없음 (녹화 때와 다른 요청)"""
+
+
+def _plain(obj):
+    """SDK 응답 객체 → JSON으로 저장할 수 있는 값"""
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(mode='json')
+    if isinstance(obj, dict):
+        return {key: _plain(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(value) for value in obj]
+    if hasattr(obj, '__dict__'):
+        return {key: _plain(value) for key, value in vars(obj).items() if not key.startswith('_')}
+    return obj
+
+
+def _redact(params):
+    return {key: ('***' if key in SECRET_PARAMS else value) for key, value in (params or {}).items()}
+
+
+def parse_latency(spec):
+    """'lognormal:300,0.5' → ('lognormal', [300.0, 0.5])"""
+    kind, _, args = (spec or 'none').partition(':')
+    return kind, [float(a) for a in args.split(',') if a.strip()]
+
+
+# ==================== 응답 대역 (HTTP) ====================
+
+class RecordedResponse:
+    """녹화된 HTTP 응답 (requests.Response에서 쓰는 속성만)"""
+
+    def __init__(self, status, body, headers=None, url=''):
+        self.status = self.status_code = status
+        self.text = body
+        self.headers = headers or {}
+        self.url = url
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status} Error: {self.url}", response=self)
+
+
+class AsyncRecordedResponse(RecordedResponse):
+    """녹화된 HTTP 응답 (aiohttp 스타일 - json/read가 코루틴)"""
+
+    async def json(self, content_type=None, **kwargs):
+        return json.loads(self.text)
+
+    async def read(self):
+        return self.content
+
+
+class _RequestContext:
+    def __init__(self, recorder, service, session, method, url, params, kwargs):
+        self._args = (recorder, service, session, method, url, params, kwargs)
+        self._response = None
+
+    async def __aenter__(self):
+        recorder, service, session, method, url, params, kwargs = self._args
+
+        async def live():
+            async with session.request(method, url, params=params, **kwargs) as response:
+                body = await response.read()
+                return AsyncRecordedResponse(
+                    response.status, body.decode('utf-8', 'replace'),
+                    {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers}, str(response.url)
+                )
+
+        request = {'method': method, 'url': url, 'params': _redact(params)}
+        self._response = await recorder.acall(
+            service, request, live, encode=_encode_http,
+            decode=lambda payload: _decode_http(payload, AsyncRecordedResponse), route=_route(method, url)
+        )
+        return self._response
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class RecordingSession:
+    """aiohttp 세션 대역 - session.get(...)을 녹화/재생 경로로"""
+
+    def __init__(self, recorder, service, session):
+        self._recorder = recorder
+        self._service = service
+        self._session = session
+
+    def get(self, url, params=None, **kwargs):
+        return _RequestContext(self._recorder, self._service, self._session, 'GET', url, params, kwargs)
+
+    @property
+    def closed(self):
+        return self._session is None or self._session.closed
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+def _encode_http(response):
+    return {'status': response.status, 'body': response.text, 'headers': response.headers, 'url': response.url}
+
+
+def _decode_http(payload, cls=RecordedResponse):
+    return cls(payload['status'], payload['body'], payload.get('headers'), payload.get('url', ''))
+
+
+def _route(method, url):
+    parts = urlsplit(url)
+    return f"{method} {parts.netloc}{parts.path}"
+
+
+# ==================== 녹화/재생 ====================
+
+class Recorder:
+    """
+    외부 호출 녹화/재생
+
+    - 픽스처: FIXTURE_DIR/{service}.jsonl 한 줄 = {key, route, request(비밀값 가림), response, latency_ms}
+    - key = 요청 정규화 JSON의 sha1 → 같은 요청이 여러 번이면 녹화 순서대로 재생 (다 쓰면 마지막 것 반복)
+    - 정확히 같은 요청이 없으면 route(LLM 단계명 / HTTP 경로) 순서로 대신 재생
+      (프롬프트에 날짜가 들어가는 등 요청이 조금 달라도 파이프라인이 끝까지 돌게)
+    - 재생 지연은 (key, 순번, seed)로 정해지는 난수라 실행마다 같음
+    """
+
+    def __init__(self, mode=MODE, fixture_dir=FIXTURE_DIR, latency=LATENCY, seed=SEED):
+        self.configure(mode, fixture_dir, latency, seed)
+
+    def configure(self, mode=None, fixture_dir=None, latency=None, seed=None):
+        """모드 변경 (모듈 전역 recorder를 그대로 쓰는 곳들도 바로 적용)"""
+        self.mode = mode or getattr(self, 'mode', 'off')
+        if self.mode not in ('off', 'record', 'replay'):
+            raise ValueError(f"RECORD_REPLAY 값 오류: {self.mode}")
+        self.fixture_dir = fixture_dir or getattr(self, 'fixture_dir', FIXTURE_DIR)
+        self.latency_spec = latency or getattr(self, 'latency_spec', 'none')
+        self.latency = parse_latency(self.latency_spec)
+        self.seed = seed if seed is not None else getattr(self, 'seed', SEED)
+        self._fixtures = {}     # service → {'keys': {key: [...]}, 'routes': {route: [...]}}
+        self._served = {}       # (service, 'key'|'route', 값) → 재생한 횟수
+        self._lock = threading.Lock()
+        return self
+
+    @property
+    def active(self):
+        return self.mode != 'off'
+
+    @staticmethod
+    def key(service, request):
+        canonical = json.dumps([service, _plain(request)], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    # ---------- 픽스처 파일 ----------
+
+    def _path(self, service):
+        return os.path.join(self.fixture_dir, f'{service}.jsonl')
+
+    def _store(self, service, request, route, payload, latency):
+        line = {
+            'key': self.key(service, request), 'route': route, 'request': _plain(request),
+            'response': payload, 'latency_ms': int(latency * 1000),
+        }
+        with self._lock:
+            os.makedirs(self.fixture_dir, exist_ok=True)
+            with open(self._path(service), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(line, ensure_ascii=False, default=str) + '\n')
+
+    def _load(self, service):
+        fixtures = self._fixtures.get(service)
+        if fixtures is None:
+            fixtures = {'keys': {}, 'routes': {}}
+            path = self._path(service)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    for raw in f:
+                        if raw.strip():
+                            line = json.loads(raw)
+                            fixtures['keys'].setdefault(line['key'], []).append(line)
+                            fixtures['routes'].setdefault(line.get('route'), []).append(line)
+            self._fixtures[service] = fixtures
+        return fixtures
+
+    def _lookup(self, service, request, route):
+        """재생할 (응답, 지연 초)"""
+        key = self.key(service, request)
+        with self._lock:
+            fixtures = self._load(service)
+            for kind, value in (('keys', key), ('routes', route)):
+                lines = fixtures[kind].get(value)
+                if not lines:
+                    continue
+                counter = (service, kind, value)
+                index = self._served.get(counter, 0)
+                self._served[counter] = index + 1
+                if kind == 'routes':
+                    logger.debug(f"   🎞️  {service}: 같은 요청 없음 → '{route}' {index + 1}번째 녹화로 재생")
+                line = lines[min(index, len(lines) - 1)]
+                return line['response'], self._delay(key, index, line['latency_ms'] / 1000)
+        raise FixtureMissing(f"{service}: 재생할 픽스처 없음 (route={route}, key={key[:12]}) - record 모드로 먼저 녹화하세요")
+
+    def _delay(self, key, index, recorded):
+        kind, args = self.latency
+        if kind == 'recorded':
+            return recorded * (args[0] if args else 1.0)
+        if kind == 'fixed':
+            return args[0] / 1000
+        if kind == 'lognormal':
+            rng = random.Random(f'{self.seed}:{key}:{index}')
+            median, sigma = args[0], (args[1] if len(args) > 1 else 0.5)
+            return median * math.exp(sigma * rng.gauss(0, 1)) / 1000
+        return 0.0
+
+    # ---------- 호출 ----------
+
+    def call(self, service, request, live, encode=_plain, decode=to_response, route=None):
+        """
+        동기 호출 녹화/재생
+
+        Args:
+            request: 요청을 구분하는 값 (비밀값은 미리 빼서 넘김)
+            live: 실제 호출 () → 응답
+            encode / decode: 응답 ↔ 픽스처 JSON
+            route: 요청이 조금 달라도 대신 쓸 수 있는 묶음 이름 (LLM 단계명 등)
+        """
+        if self.mode == 'off':
+            return live()
+        if self.mode == 'replay':
+            payload, delay = self._lookup(service, request, route)
+            if delay > 0:
+                time.sleep(delay)
+            return decode(payload)
+        started = time.perf_counter()
+        response = live()
+        self._store(service, request, route, encode(response), time.perf_counter() - started)
+        return response
+
+    async def acall(self, service, request, live, encode=_plain, decode=to_response, route=None):
+        """비동기 호출 녹화/재생 (live: 코루틴 함수)"""
+        if self.mode == 'off':
+            return await live()
+        if self.mode == 'replay':
+            payload, delay = self._lookup(service, request, route)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return decode(payload)
+        started = time.perf_counter()
+        response = await live()
+        self._store(service, request, route, encode(response), time.perf_counter() - started)
+        return response
+
+    def session(self, service, session):
+        """aiohttp 세션 감싸기 (off면 원래 세션 그대로)"""
+        if self.mode == 'off':
+            return session
+        return RecordingSession(self, service, session)
+
+    def requests_get(self, service, url, params=None, **kwargs):
+        """requests.get 녹화/재생 (off면 진짜 requests.Response)"""
+        import requests
+        if self.mode == 'off':
+            return requests.get(url, params=params, **kwargs)
+
+        def live():
+            response = requests.get(url, params=params, **kwargs)
+            return RecordedResponse(response.status_code, response.text,
+                                    {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+                                    response.url)
+
+        request = {'method': 'GET', 'url': url, 'params': _redact(params)}
+        return self.call(service, request, live, encode=_encode_http, decode=_decode_http, route=_route('GET', url))
+
+    # ---------- Playwright (HAR) ----------
+
+    def har_path(self, service, name):
+        digest = hashlib.sha1(str(name).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.fixture_dir, 'har', f'{service}_{digest}.har')
+
+    def context_options(self, service, name):
+        """browser.new_context()에 더할 인자 (record면 HAR 녹화 - context.close() 때 저장됨)"""
+        if self.mode != 'record':
+            return {}
+        path = self.har_path(service, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return {'record_har_path': path, 'record_har_content': 'embed'}
+
+    async def route_context(self, service, name, context):
+        """replay면 브라우저 컨텍스트의 모든 요청을 HAR에서 응답 (없는 요청은 abort)"""
+        if self.mode != 'replay':
+            return
+        path = self.har_path(service, name)
+        if not os.path.exists(path):
+            raise FixtureMissing(f"{service}: HAR 없음 ({name}) - record 모드로 먼저 녹화하세요")
+        await context.route_from_har(path, not_found='abort')
+
+
+recorder = Recorder()
+
+
+# ==================== LLM 스트리밍 ====================
+
+def replay_stream(payload, streamed, on_text):
+    """녹화된 스트리밍 응답 → streamed 채우고 조각 단위로 on_text (실제 스트림처럼 중간에 끊길 수 있음)"""
+    streamed.model = payload['model']
+    streamed.usage = to_response(payload['usage'])
+    streamed.truncated = payload['truncated']
+    text = payload['text']
+    for start in range(0, len(text), STREAM_PIECE_CHARS):
+        on_text(text[start:start + STREAM_PIECE_CHARS])
+    streamed.text = text
+    return streamed
+
+
+def encode_stream(streamed):
+    return {'model': streamed.model, 'text': streamed.text,
+            'usage': _plain(streamed.usage), 'truncated': streamed.truncated}
+
+
+# ==================== CLI ====================
+
+def summarize(fixture_dir=FIXTURE_DIR):
+    """서비스별 녹화 개수 / 지연 분포 (lognormal 인자 고를 때 참고)"""
+    summary = {}
+    if not os.path.isdir(fixture_dir):
+        return summary
+    for filename in sorted(os.listdir(fixture_dir)):
+        if not filename.endswith('.jsonl'):
+            continue
+        with open(os.path.join(fixture_dir, filename), 'r', encoding='utf-8') as f:
+            latencies = sorted(json.loads(raw)['latency_ms'] for raw in f if raw.strip())
+        if not latencies:
+            continue
+        pick = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+        summary[filename[:-len('.jsonl')]] = {
+            'calls': len(latencies), 'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'max_ms': latencies[-1],
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="녹화한 픽스처 요약")
+    parser.add_argument('--dir', default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    summary = summarize(args.dir)
+    if not summary:
+        print(f"❌ 픽스처 없음: {args.dir}")
+        return
+    print(f"🎞️  {args.dir}")
+    for service, row in summary.items():
+        print(f"   {service:<20} {row['calls']:>5}회  p50 {row['p50_ms']:>6}ms  "
+              f"p95 {row['p95_ms']:>6}ms  max {row['max_ms']:>6}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+# review_extractor.py - 리뷰 추출 (네트워크 응답 캡처 + DOM 일괄 덤프 폴백)
+
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 리뷰 목록 셀렉터 (turbo_crawler / mvp_analyzer 공통)
+REVIEW_ITEM_SELECTORS = ["li.place_apply_pui", "li.pui__X35jYm", "li.EjjAW"]
+
+# 리뷰 데이터를 실어 나르는 API 응답 URL 힌트
+REVIEW_RESPONSE_HINTS = ('graphql', 'review')
+
+DATE_PATTERNS = [
+    r'(\d{4}[./-]\d{1,2}[./-]\d{1,2})',
+    r'(\d{1,2}[./-]\d{1,2})',
+    r'(\d+일\s*전)',
+]
+
+
+# ==================== 날짜 정규화 ====================
+
+def normalize_visit_date(value, today=None):
+    """
+    API 날짜 문자열 정규화
+
+    "24.10.5.토" → "2024.10.05"
+    "10.5.화"    → "2024.10.05" (올해 기준, 미래면 작년)
+    "2024-10-05T12:00:00" → "2024.10.05"
+    """
+    if not value or not isinstance(value, str):
+        return None
+
+    numbers = [int(n) for n in re.findall(r'\d+', value)]
+    today = today or datetime.now()
+
+    try:
+        if len(numbers) >= 3 and numbers[0] >= 1000:
+            year, month, day = numbers[0], numbers[1], numbers[2]
+        elif len(numbers) >= 3:
+            year, month, day = 2000 + numbers[0], numbers[1], numbers[2]
+        elif len(numbers) == 2:
+            month, day = numbers
+            year = today.year
+            if (month, day) > (today.month, today.day):
+                year -= 1
+        else:
+            return None
+
+        return datetime(year, month, day).strftime('%Y.%m.%d')
+    except ValueError:
+        return None
+
+
+# ==================== JSON 응답 파싱 ====================
+
+def _looks_like_review(item):
+    """방문자 리뷰 객체인지 판단 (body + 방문/작성일 or 별점)"""
+    if not isinstance(item, dict):
+        return False
+    if not isinstance(item.get('body'), str):
+        return False
+    return any(k in item for k in ('visited', 'created', 'rating', 'visitCount'))
+
+
+def iter_review_items(payload):
+    """GraphQL/JSON 응답 전체를 순회하며 리뷰 객체만 뽑아냄"""
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if _looks_like_review(node):
+                yield node
+                continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def review_from_item(item):
+    """API 리뷰 객체 → 크롤러 리뷰 레코드"""
+    rating = item.get('rating')
+    try:
+        rating = float(rating) if rating is not None else None
+    except (TypeError, ValueError):
+        rating = None
+
+    return {
+        "별점": rating,
+        "날짜": normalize_visit_date(item.get('visited') or item.get('created')),
+        "리뷰": (item.get('body') or '').strip(),
+        "id": item.get('id'),
+    }
+
+
+class ReviewResponseCapture:
+    """
+    페이지가 스스로 받아오는 리뷰 JSON 응답을 가로채 구조화된 레코드로 보관
+
+    page.goto() 전에 붙여야 첫 페이지 응답까지 잡힙니다.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.records = {}
+        self.responses = 0
+        self._pending = set()
+        page.on("response", self._on_response)
+
+    @property
+    def count(self):
+        return len(self.records)
+
+    def reset(self):
+        self.records = {}
+        self.responses = 0
+
+    def detach(self):
+        try:
+            self.page.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+
+    def _on_response(self, response):
+        url = response.url
+        if not any(hint in url for hint in REVIEW_RESPONSE_HINTS):
+            return
+        try:
+            if response.request.resource_type not in ('xhr', 'fetch'):
+                return
+        except Exception:
+            return
+
+        task = asyncio.ensure_future(self._read(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _read(self, response):
+        try:
+            if 'json' not in (response.headers.get('content-type') or ''):
+                return
+            payload = await response.json()
+        except Exception:
+            return
+
+        self.responses += 1
+        self.add_payload(payload)
+
+    def add_payload(self, payload):
+        """JSON 응답 하나를 레코드에 반영 (id 기준 중복 제거)"""
+        added = 0
+        for item in iter_review_items(payload):
+            record = review_from_item(item)
+            if not record["리뷰"]:
+                continue
+            key = record["id"] or record["리뷰"]
+            if key not in self.records:
+                self.records[key] = record
+                added += 1
+        return added
+
+    async def drain(self):
+        """아직 읽는 중인 응답 본문 대기"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    def reviews(self):
+        """날짜 최신순 레코드 (날짜 없는 건 뒤로)"""
+        records = list(self.records.values())
+        records.sort(key=lambda r: r["날짜"] or '', reverse=True)
+        return records
+
+
+# ==================== DOM 일괄 덤프 (폴백) ====================
+
+async def dump_review_texts(page, selectors=None):
+    """리뷰 li 텍스트를 page.evaluate 한 번으로 전부 가져오기"""
+    try:
+        return await page.evaluate("""
+            (selectors) => {
+                for (const sel of selectors) {
+                    const items = document.querySelectorAll(sel);
+                    if (items.length) return Array.from(items, el => el.innerText || '');
+                }
+                return [];
+            }
+        """, selectors or REVIEW_ITEM_SELECTORS)
+    except Exception:
+        return []
+
+
+async def count_review_items(page, selectors=None):
+    """DOM 리뷰 개수 (셀렉터 순회 1회 왕복)"""
+    try:
+        return await page.evaluate("""
+            (selectors) => {
+                for (const sel of selectors) {
+                    const n = document.querySelectorAll(sel).length;
+                    if (n) return n;
+                }
+                return 0;
+            }
+        """, selectors or REVIEW_ITEM_SELECTORS)
+    except Exception:
+        return 0
+
+
+def parse_review_text(full_text):
+    """리뷰 li 텍스트 → 레코드 (정규식 + 가장 긴 줄 휴리스틱)"""
+    if len(full_text) < 50 or '키워드·별점' in full_text:
+        return None
+
+    review = {"별점": None, "날짜": None, "리뷰": ""}
+
+    if '★' in full_text:
+        review["별점"] = float(min(full_text.count('★'), 5))
+
+    for pattern in DATE_PATTERNS:
+        date_match = re.search(pattern, full_text)
+        if date_match:
+            review["날짜"] = date_match.group(1)
+            break
+
+    lines = [ln.strip() for ln in full_text.split('\n') if len(ln.strip()) >= 20]
+    lines = [ln for ln in lines if not re.search(r'\d{4}[./-]', ln)]
+    if lines:
+        review["리뷰"] = max(lines, key=len)
+
+    return review
+
+
+# ==================== 통합 추출 ====================
+
+def _accept(review, min_length, is_owner_reply):
+    text = review.get("리뷰") or ''
+    if not text or len(text) < min_length:
+        return False
+    if is_owner_reply and is_owner_reply(text):
+        return False
+    return True
+
+
+async def extract_reviews(page, capture, limit, is_owner_reply=None, min_length=0):
+    """
+    리뷰 추출 (네트워크 캡처 우선 → 부족하면 DOM 일괄 덤프)
+
+    Returns:
+        (reviews, source) - source는 'network' / 'dom'
+    """
+    started = time.perf_counter()
+
+    network_reviews = []
+    if capture is not None:
+        await capture.drain()
+        for r in capture.reviews():
+            if _accept(r, min_length, is_owner_reply):
+                network_reviews.append({"별점": r["별점"], "날짜": r["날짜"], "리뷰": r["리뷰"]})
+            if len(network_reviews) >= limit:
+                break
+
+    reviews, source = network_reviews, 'network'
+
+    if len(network_reviews) < limit:
+        dom_reviews = []
+        for text in await dump_review_texts(page):
+            review = parse_review_text(text)
+            if review and _accept(review, min_length, is_owner_reply):
+                dom_reviews.append(review)
+            if len(dom_reviews) >= limit:
+                break
+
+        if len(dom_reviews) > len(network_reviews):
+            reviews, source = dom_reviews, 'dom'
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.debug(f"   ⚡ 리뷰 파싱: {len(reviews)}개 ({source}, {elapsed_ms:.0f}ms)")
+
+    return reviews, source
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# review_sampler.py - 토큰 예산 안에서 정보량 많은 리뷰 고르기 (감정/별점/주제/최신순 층화 + 유사 리뷰 제거)
+
+import logging
+import re
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from llm_usage import count_tokens
+from review_preprocessor import KEYWORD_DICT_BASE
+
+logger = logging.getLogger(__name__)
+
+# 감정별 예산 비율 (부정 신호를 놓치지 않는 게 우선이라 부정 비중을 높게)
+SENTIMENT_SHARES = {'부정': 0.45, '긍정': 0.40, '중립': 0.15}
+DEFAULT_MAX_CHARS = 200
+DUPLICATE_JACCARD = 0.8     # 글자 3-gram 겹침이 이 이상이면 거의 같은 리뷰
+_MINHASH_MASKS = [zlib.crc32(f'minhash-{i}'.encode()) for i in range(8)]
+
+# 키워드 사전에 없는 완곡한 불만 표현 (1단계 분류 프롬프트 기준)
+NEGATIVE_HINTS = ['아쉽', '아쉬', '후회', '최악', '비추', '미지근', '식어', '그나마', '그럭저럭',
+                  '나쁘진않', '해주세요ㅠ', '해주세요ㅜ', '신경써주세요', '다른데가']
+
+# 주제 = 키워드 사전 그룹 앞부분 ('맛_긍정' → '맛')
+_TOPIC_KEYWORDS = {}
+for _group, _words in KEYWORD_DICT_BASE.items():
+    _TOPIC_KEYWORDS.setdefault(_group.split('_')[0], []).extend(_words)
+
+_DATE_FULL = re.compile(r'(\d{2,4})[.\-/]\s*(\d{1,2})[.\-/]\s*(\d{1,2})')
+_DATE_SHORT = re.compile(r'^(\d{1,2})\.(\d{1,2})')
+
+
+# ==================== 리뷰 특징 ====================
+
+def _squash(text):
+    return re.sub(r'\s+', '', text)
+
+
+def review_sentiment(text, rating=None):
+    """'부정' / '긍정' / '중립' (별점이 있으면 별점 우선, 긍부정 섞이면 부정)"""
+    try:
+        rating = float(rating) if rating else None    # '4.5' 같은 소수 별점도 있음
+    except (TypeError, ValueError):
+        rating = None                                   # 못 읽는 별점은 본문으로만 판단
+    if rating and rating <= 3:
+        return '부정'
+    squashed = _squash(text)
+    negative = any(w in squashed for g, ws in KEYWORD_DICT_BASE.items() if g.endswith('_부정') for w in ws)
+    negative = negative or any(w in squashed for w in NEGATIVE_HINTS)
+    if negative:
+        return '부정'
+    positive = any(w in squashed for g, ws in KEYWORD_DICT_BASE.items() if g.endswith('_긍정') for w in ws)
+    if positive or (rating and rating >= 4):
+        return '긍정'
+    return '중립'
+
+
+def review_topics(text):
+    """언급한 주제 목록 (맛/양/가성비/서비스/...)"""
+    squashed = _squash(text)
+    return [topic for topic, words in _TOPIC_KEYWORDS.items() if any(w in squashed for w in words)]
+
+
+def parse_date(date_str):
+    """'2024.10.5' / '24.10.5.토' / '10.5.토'(올해) → date (못 읽으면 None)"""
+    if not date_str:
+        return None
+    date_str = str(date_str).strip()
+    try:
+        match = _DATE_FULL.search(date_str)
+        if match:
+            year, month, day = (int(g) for g in match.groups())
+            return datetime(year + 2000 if year < 100 else year, month, day).date()
+        match = _DATE_SHORT.match(date_str)
+        if match:
+            return datetime(datetime.now().year, int(match.group(1)), int(match.group(2))).date()
+    except ValueError:
+        return None
+    return None
+
+
+def shingles(text):
+    """글자 3-gram 해시 집합 (crc32 - 프로세스가 달라도 같은 값)"""
+    squashed = _squash(text)
+    return {zlib.crc32(squashed[i:i + 3].encode('utf-8')) for i in range(max(len(squashed) - 2, 1))}
+
+
+def _minhash(grams):
+    return tuple(min(g ^ mask for g in grams) for mask in _MINHASH_MASKS)
+
+
+def _near_duplicates(gram_sets, threshold=DUPLICATE_JACCARD):
+    """
+    거의 같은 리뷰 인덱스 집합 (먼저 나온 것만 남김)
+
+    MinHash 2개씩 묶은 밴드가 하나라도 같은 것끼리만 실제 Jaccard 비교
+    """
+    buckets = {}
+    duplicates = set()
+    for idx, grams in enumerate(gram_sets):
+        if not grams:
+            continue
+        signature = _minhash(grams)
+        bands = [(b, signature[2 * b:2 * b + 2]) for b in range(len(signature) // 2)]
+        candidates = {j for band in bands for j in buckets.get(band, ())}
+        if any(len(grams & gram_sets[j]) / len(grams | gram_sets[j]) >= threshold for j in candidates):
+            duplicates.add(idx)
+            continue
+        for band in bands:
+            buckets.setdefault(band, []).append(idx)
+    return duplicates
+
+
+# ==================== 샘플링 ====================
+
+def select_reviews(
+    reviews: List[Dict],
+    token_budget: int,
+    max_chars: int = DEFAULT_MAX_CHARS,
+    shares: Optional[Dict[str, float]] = None,
+    model: str = 'gpt-4o',
+    label: str = '리뷰'
+) -> List[Dict]:
+    """
+    토큰 예산 안에서 리뷰 고르기
+
+    1. 빈 리뷰 / 거의 같은 리뷰 제거 (MinHash + Jaccard)
+    2. 감정별 예산 나눔 (shares, 남는 예산은 다른 감정으로)
+    3. 감정 안에서는 (주제, 별점) 묶음을 돌아가며 하나씩 - 묶음 안은 최신 + 키워드 많은 순
+    4. 프롬프트 한 줄 토큰 수(실제 토크나이저)로 예산 계산
+
+    Args:
+        reviews: [{'content', 'date'?, 'rating'?}, ...]
+        max_chars: 리뷰 하나 최대 글자 수 (넘으면 자름)
+
+    Returns:
+        고른 리뷰 (원래 순서 유지, content는 잘린 본문, sentiment/topics 추가)
+    """
+    shares = shares or SENTIMENT_SHARES
+
+    items = []
+    for idx, review in enumerate(reviews):
+        content = (review.get('content') or '').strip()
+        if not content:
+            continue
+        text = content[:max_chars]
+        items.append({
+            'idx': idx,
+            'review': review,
+            'text': text,
+            'sentiment': review_sentiment(content, review.get('rating')),
+            'topics': review_topics(content),
+            'date': parse_date(review.get('date')),
+        })
+
+    duplicates = _near_duplicates([shingles(item['text']) for item in items])
+    items = [item for i, item in enumerate(items) if i not in duplicates]
+
+    # 최신순 점수 (날짜 없으면 크롤링 순서 = 최신순으로 간주)
+    dated = sorted(items, key=lambda it: (it['date'] is None, -(it['date'].toordinal() if it['date'] else 0), it['idx']))
+    for rank, item in enumerate(dated):
+        item['recency'] = 1 - rank / max(len(dated), 1)
+        item['tokens'] = count_tokens(f"[리뷰#000] {item['text']}\n", model)
+
+    strata = {}
+    for item in items:
+        strata.setdefault(item['sentiment'], []).append(item)
+
+    selected = []
+    remaining = token_budget
+    # 적은 비율 감정부터 채우고 남은 예산은 뒤 감정으로 넘김
+    order = sorted(strata, key=lambda s: shares.get(s, 0))
+    total_share = sum(shares.get(s, 0) for s in order) or 1
+    for n, sentiment in enumerate(order):
+        share_left = sum(shares.get(s, 0) for s in order[n:]) or total_share
+        budget = remaining if n == len(order) - 1 else int(remaining * shares.get(sentiment, 0) / share_left)
+        picked, used = _round_robin(strata[sentiment], budget)
+        selected.extend(picked)
+        remaining -= used
+
+    selected.sort(key=lambda it: it['idx'])
+    counts = {s: sum(1 for it in selected if it['sentiment'] == s) for s in ('부정', '긍정', '중립')}
+    logger.debug(f"   🎯 {label} 샘플: {len(selected)}/{len(reviews)}개 "
+                 f"(부정 {counts['부정']} / 긍정 {counts['긍정']} / 중립 {counts['중립']}, "
+                 f"유사 제거 {len(duplicates)}, 약 {token_budget - remaining:,}/{token_budget:,} 토큰)")
+
+    return [
+        {**item['review'], 'content': item['text'], 'sentiment': item['sentiment'], 'topics': item['topics']}
+        for item in selected
+    ]
+
+
+def _round_robin(items, budget):
+    """(주제, 별점) 묶음을 돌아가며 하나씩 뽑기 → (뽑은 목록, 사용 토큰)"""
+    groups = {}
+    for item in items:
+        key = (item['topics'][0] if item['topics'] else '기타', item['review'].get('rating'))
+        groups.setdefault(key, []).append(item)
+    for group in groups.values():
+        group.sort(key=lambda it: (-(len(it['topics']) * 0.5 + it['recency']), it['idx']))
+
+    queues = sorted(groups.values(), key=lambda g: -len(g))
+    picked, used = [], 0
+    while queues:
+        next_round = []
+        for group in queues:
+            item = group.pop(0)
+            if used + item['tokens'] <= budget:
+                picked.append(item)
+                used += item['tokens']
+            if group:
+                next_round.append(group)
+        if used >= budget or not next_round:
+            break
+        queues = next_round
+    return picked, used
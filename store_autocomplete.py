@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+# store_autocomplete.py - stores 테이블 기반 가게 이름 자동완성 (바이그램 색인 + 초성 검색)
+
+import asyncio
+import re
+import sqlite3
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from change_feed import ChangeFeed, KIND_STORE
+
+DB_FILE = 'seoul_industry_reviews.db'
+CANDIDATE_FACTOR = 5    # 상위 N개를 고르기 위해 검증할 후보 배수
+REFRESH_INTERVAL = 5.0  # 새 가게 반영 주기 (초)
+
+# 한글 초성 19자 (가 = U+AC00, 초성 하나당 588자)
+CHOSUNG = ['ㄱ', 'ㄲ', 'ㄴ', 'ㄷ', 'ㄸ', 'ㄹ', 'ㅁ', 'ㅂ', 'ㅃ', 'ㅅ',
+           'ㅆ', 'ㅇ', 'ㅈ', 'ㅉ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+_CHOSUNG_SET = set(CHOSUNG)
+
+
+def normalize_name(text):
+    """색인/검색 공통 정규화 (전각→반각, 소문자, 공백 제거)"""
+    text = text or ''
+    if has_chosung(text):
+        # NFKC는 'ㅅ'(호환 자모)을 조합용 자모로 바꿔버리므로 자모는 그대로 둠
+        text = ''.join(ch if ch in _CHOSUNG_SET else unicodedata.normalize('NFKC', ch) for ch in text)
+    else:
+        text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', '', text.lower())
+
+
+def to_chosung(text):
+    """'스타벅스' → 'ㅅㅌㅂㅅ' (한글 외 문자는 그대로)"""
+    out = []
+    for ch in text:
+        code = ord(ch) - 0xAC00
+        out.append(CHOSUNG[code // 588] if 0 <= code < 11172 else ch)
+    return ''.join(out)
+
+
+def has_chosung(text):
+    return any(ch in _CHOSUNG_SET for ch in text)
+
+
+def _grams(text):
+    """바이그램 (1글자면 그 글자)"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _iter_intersection(postings):
+    """
+    정렬된 posting 목록들의 교집합을 앞에서부터 하나씩 (leapfrog - 이분 탐색으로 건너뛰기)
+
+    문서 번호가 인기순이라 필요한 만큼만 꺼내고 멈출 수 있음
+    """
+    postings = sorted(postings, key=len)
+    cursors = [0] * len(postings)
+    target = 0
+    while True:
+        matched = True
+        for k, plist in enumerate(postings):
+            pos = bisect_left(plist, target, cursors[k])
+            if pos == len(plist):
+                return
+            cursors[k] = pos
+            if plist[pos] != target:
+                target = plist[pos]     # 가장 뒤처진 목록 기준으로 건너뜀
+                matched = False
+                break
+        if matched:
+            yield target
+            target += 1
+
+
+def _chosung_match_at(name, query):
+    """초성 섞인 검색어 일치 위치 (-1이면 없음) - 'ㅅ'은 '스'/'사'… 모두와, '스'는 '스'와만"""
+    for start in range(len(name) - len(query) + 1):
+        for k, q in enumerate(query):
+            ch = name[start + k]
+            if q in _CHOSUNG_SET:
+                if to_chosung(ch) != q:
+                    break
+            elif ch != q:
+                break
+        else:
+            return start
+    return -1
+
+
+class StoreAutocomplete:
+    """
+    가게 이름 자동완성 색인
+
+    - 문서 번호를 review_count 내림차순으로 매김 → posting 앞쪽일수록 인기 가게
+    - 이름 바이그램 색인 + 초성 바이그램 색인 (ㅅㅌㅂ → 스타벅스)
+    - 검색: posting 교집합을 인기순으로 훑으며 부분 문자열 검증 → 후보가 차면 멈춤 → 접두 일치 우선
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.docs = []          # [(place_id, name, district, industry, review_count, address)]
+        self.names = []         # 정규화 이름
+        self.name_index = {}    # 바이그램 → array('I')
+        self.chosung_index = {}
+        self.place_ids = set()
+        self.feed = None        # 'autocomplete' 변경 피드 소비자 (load에서 등록)
+
+    def __len__(self):
+        return len(self.docs)
+
+    # ==================== 색인 ====================
+
+    def _add(self, row):
+        doc_id = len(self.docs)
+        name = normalize_name(row[1])
+        chosung = to_chosung(name)
+        self.docs.append(row)
+        self.names.append(name)
+        self.place_ids.add(row[0])
+        for gram in _grams(name):
+            self.name_index.setdefault(gram, array('I')).append(doc_id)
+        for gram in _grams(chosung):
+            self.chosung_index.setdefault(gram, array('I')).append(doc_id)
+
+    def _select_stores(self, conn, where="", params=()):
+        return conn.execute(f"""
+            SELECT place_id, name, district, industry, COALESCE(review_count, 0), address
+            FROM stores
+            WHERE name IS NOT NULL AND name != '' {where}
+            ORDER BY review_count DESC
+        """, params).fetchall()
+
+    def load(self):
+        """stores 전체 색인 (서버 시작 시 1회)"""
+        started = time.perf_counter()
+        self.__init__(self.db_file)
+        try:
+            # 커서를 change_cursors에 등록해야 prune이 아직 안 읽은 변경을 지우지 않음
+            # 피드 위치를 먼저 잡아야 로드 도중 들어온 가게도 refresh에서 잡힘
+            self.feed = ChangeFeed('autocomplete', self.db_file, kinds=[KIND_STORE])
+            self.feed.skip_to_head()
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            rows = self._select_stores(conn)
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️  자동완성 색인 실패: {e}")
+            return 0
+
+        for row in rows:
+            self._add(row)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"✅ 자동완성 색인: {len(self.docs):,}개 가게 ({elapsed:.0f}ms)")
+        return len(self.docs)
+
+    def add_stores(self, place_ids):
+        """새 가게 추가 (변경 피드) - 뒤에 붙으므로 인기순은 다음 load 때 정리"""
+        new_ids = [p for p in place_ids if p not in self.place_ids]
+        if not new_ids:
+            return 0
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        rows = self._select_stores(conn, f"AND place_id IN ({','.join('?' * len(new_ids))})", new_ids)
+        conn.close()
+        for row in rows:
+            self._add(row)
+        return len(rows)
+
+    # ==================== 검색 ====================
+
+    def _candidates(self, index, query):
+        postings = [index.get(gram) for gram in _grams(query)]
+        if not postings or any(p is None for p in postings):
+            return iter(())
+        return _iter_intersection(postings)
+
+    def search(self, query, limit=10):
+        """
+        자동완성 검색
+
+        Returns:
+            [{'place_id', 'name', 'address', 'category', 'district', 'review_count'}, ...]
+        """
+        q = normalize_name(query)
+        if not q:
+            return []
+
+        chosung_mode = has_chosung(q)
+        if chosung_mode:
+            candidates = self._candidates(self.chosung_index, to_chosung(q))
+        else:
+            candidates = self._candidates(self.name_index, q)
+
+        wanted = limit * CANDIDATE_FACTOR
+        hits = []
+        for doc_id in candidates:
+            name = self.names[doc_id]
+            pos = _chosung_match_at(name, q) if chosung_mode else name.find(q)
+            if pos < 0:
+                continue
+            hits.append((pos != 0, -self.docs[doc_id][4], doc_id))
+            if len(hits) >= wanted:
+                break
+
+        hits.sort()
+        results = []
+        for _, _, doc_id in hits[:limit]:
+            place_id, name, district, industry, review_count, address = self.docs[doc_id]
+            results.append({
+                "place_id": place_id,
+                "name": name,
+                "address": address or district or '',
+                "category": industry or '음식점',
+                "district": district,
+                "review_count": review_count
+            })
+        return results
+
+    # ==================== 새 가게 반영 ====================
+
+    def refresh(self, limit=1000):
+        """
+        store_changes의 새 가게를 색인에 추가
+
+        재시작하면 load()가 전체를 다시 읽고 커서를 끝으로 옮김 (그 사이 변경은 전체 로드에 포함)
+        """
+        if self.feed is None:
+            return 0
+        rows = self.feed.poll(limit)
+        if not rows:
+            return 0
+        added = self.add_stores(list(dict.fromkeys(place_id for _, place_id, _ in rows)))
+        self.feed.commit(rows[-1][0])
+        return added
+
+    async def follow(self, interval=REFRESH_INTERVAL):
+        """서버 백그라운드 작업 - 주기적으로 refresh"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                added = await asyncio.to_thread(self.refresh)
+                if added:
+                    print(f"🔄 자동완성 색인 +{added}개 (총 {len(self):,}개)")
+            except sqlite3.Error as e:
+                print(f"⚠️  자동완성 갱신 실패: {e}")
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# test_rate_limiter.py - 토큰 버킷 간격 테스트 (가짜 시계 - 실제로 기다리지 않음)
+
+import unittest
+from unittest import mock
+
+from llm_gateway import _Lane
+from rate_limiter import AdaptiveRateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def fire_times(bucket, count):
+    """지금 한꺼번에 count명이 예약했을 때 각자 실제로 나가는 시각 (지금 기준 초)"""
+    return [round(bucket.reserve(1), 3) for _ in range(count)]
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_spacing(self):
+        clock = FakeClock()
+        bucket = TokenBucket(5, capacity=2, clock=clock)
+        self.assertEqual(fire_times(bucket, 4), [0.0, 0.0, 0.2, 0.4])
+
+    def test_drain_pauses_then_spaces(self):
+        clock = FakeClock()
+        bucket = TokenBucket(5, capacity=10, clock=clock)
+        bucket.drain(2.0)
+        self.assertEqual(fire_times(bucket, 3), [2.2, 2.4, 2.6])
+
+    def test_refill_resumes_after_pause(self):
+        clock = FakeClock()
+        bucket = TokenBucket(5, capacity=10, clock=clock)
+        bucket.drain(2.0)
+        clock.now += 3.0    # 일시정지 끝나고 1초 → 5개만 쌓임
+        waits = fire_times(bucket, 6)
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertEqual(waits[5], 0.2)
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+    def test_throttle_does_not_release_burst(self):
+        """429 후 대기자가 일시정지 끝에 한꺼번에 나가지 않고 새 속도 간격으로"""
+        clock = FakeClock()
+        limiter = AdaptiveRateLimiter(5, capacity=10, clock=clock)
+        new_rate = limiter.on_throttle(2.0)
+        self.assertEqual(new_rate, 2.5)
+
+        waits = fire_times(limiter, 12)
+        self.assertGreater(waits[0], 2.0)
+        gaps = [round(b - a, 3) for a, b in zip(waits, waits[1:])]
+        self.assertEqual(set(gaps), {round(1 / new_rate, 3)})
+        self.assertEqual(sum(1 for w in waits if w <= 2.0 + 1e-9), 0)
+
+    def test_throttle_without_retry_after(self):
+        clock = FakeClock()
+        limiter = AdaptiveRateLimiter(4, capacity=4, clock=clock)
+        limiter.on_throttle()
+        self.assertEqual(fire_times(limiter, 2), [1.0, 1.5])
+
+    def test_recovers_after_successes(self):
+        clock = FakeClock()
+        limiter = AdaptiveRateLimiter(4, recover_after=2, clock=clock)
+        limiter.on_throttle()
+        for _ in range(2):
+            limiter.on_success()
+        self.assertAlmostEqual(limiter.rate, 2.2)
+
+
+class LaneThrottleTest(unittest.TestCase):
+    """게이트웨이 입장: 429 후 대기열이 Retry-After 끝에 한꺼번에 들어가지 않음"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.lane = _Lane('openai', 'm', 600, 1e9, 32)
+        self.lane.requests.clock = self.lane.tokens.clock = self.clock
+        self.lane.requests._updated = self.lane.tokens._updated = self.clock.now
+
+    def admit_times(self, count, on_sleep=None):
+        start, times = self.clock.now, []
+
+        def sleep(seconds):
+            self.clock.now += seconds
+            if on_sleep:
+                on_sleep()
+
+        with mock.patch('llm_gateway.time.sleep', sleep):
+            for _ in range(count):
+                self.lane.admit(5, 10)
+                self.lane.release()
+                times.append(round(self.clock.now - start, 3))
+        return times
+
+    def test_queued_admits_spaced_after_throttle(self):
+        self.lane.throttle(2.0, 'requests')
+        times = self.admit_times(20)
+        self.assertEqual(times, [round(2.2 + 0.2 * i, 3) for i in range(20)])
+
+    def test_throttle_while_waiting_reschedules(self):
+        self.lane.requests.drain(0.5)
+        fired = []
+
+        def throttle_once():
+            if not fired:
+                fired.append(True)
+                self.lane.throttle(1.0, 'requests')
+
+        self.assertEqual(self.admit_times(1, throttle_once), [round(0.6 + 1.0 + 0.2, 3)])
+
+    def test_throttle_mid_wait_does_not_double_reservation(self):
+        """큰 요청이 기다리는 중간에 429 → 첫 예약은 돌려받고 새 속도로 한 번만 다시 예약"""
+        lane = _Lane('openai', 'm', 600, 60000, 32)    # 토큰 1000/초
+        lane.requests.clock = lane.tokens.clock = self.clock
+        lane.requests._updated = lane.tokens._updated = self.clock.now
+        reserve = lane.tokens.capacity + 30000          # 버스트 다 쓰고 30초 대기
+        start, slept = self.clock.now, []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            self.clock.now += seconds / 2
+            if len(slept) == 1:
+                lane.throttle(5.0, 'tokens')            # 대기 중간(15초)에 429 → 500/초
+            self.clock.now += seconds / 2
+
+        with mock.patch('llm_gateway.time.sleep', sleep):
+            lane.admit(5, reserve)
+        # 첫 대기(30초)가 끝난 뒤 예약 전체를 새 속도로 한 번만 (남은 빚까지 얹으면 +20초)
+        self.assertAlmostEqual(self.clock.now - start, 30 + reserve / 500, places=3)
+        self.assertAlmostEqual(lane.tokens._tokens, -reserve, places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
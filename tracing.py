@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+# tracing.py - 파이프라인 단계별 span 추적 (작업별 트레이스 DB 저장 + 지연 히스토그램/카운터 → /metrics)
+
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = 'seoul_industry_reviews.db'
+
+# 히스토그램 구간 (초) - DB 쿼리(ms)부터 Claude 호출(수 분)까지
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+MAX_SPANS_PER_TRACE = 5000  # 리뷰 많은 가게 map-reduce 등에서 트레이스가 끝없이 커지지 않게
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+_current_span = contextvars.ContextVar('span', default=None)
+_span_ids = itertools.count(1)
+
+
+# ==================== 지표 ====================
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """
+    프로세스 전체 지연 히스토그램 + 카운터 (스레드 안전)
+
+    render()는 Prometheus 텍스트 형식
+    """
+
+    def __init__(self):
+        self.histograms = {}    # (이름, 라벨 튜플) → Histogram
+        self.counters = {}      # (이름, 라벨 튜플) → 값
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        items = list(labels) + list(extra)
+        if not items:
+            return ''
+        escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"')
+        return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in items) + '}'
+
+    def render(self, gauges=()):
+        """gauges: 지금 값만 의미 있는 지표 [(이름, 라벨 dict, 값), ...] (대기열 길이 등)"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        typed = set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f'# TYPE {name} histogram')
+                typed.add(name)
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {histogram.count}')
+            lines.append(f'{name}_sum{self._labels(labels)} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{self._labels(labels)} {histogram.count}')
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f'# TYPE {name} counter')
+                typed.add(name)
+            lines.append(f'{name}{self._labels(labels)} {value:g}')
+        for name, labels, value in gauges:
+            if name not in typed:
+                lines.append(f'# TYPE {name} gauge')
+                typed.add(name)
+            lines.append(f'{name}{self._labels(sorted(labels.items()))} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+# ==================== span / 트레이스 ====================
+
+class Span:
+    __slots__ = ('id', 'parent_id', 'name', 'attrs', 'started_at', 'duration', 'status', '_t0')
+
+    def __init__(self, name, parent_id=None, attrs=None):
+        self.id = next(_span_ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs or {}
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self.duration = None
+        self.status = 'ok'
+        self._t0 = time.perf_counter()
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'parent_id': self.parent_id, 'name': self.name,
+            'started_at': self.started_at, 'duration_ms': round((self.duration or 0) * 1000, 1),
+            'status': self.status, 'attrs': self.attrs,
+        }
+
+
+class Trace:
+    """작업 하나의 span 목록 (여러 스레드에서 추가됨)"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS_PER_TRACE:
+                self.dropped += 1
+                return
+            self.spans.append(span)
+
+    def to_list(self):
+        with self._lock:
+            return [span.to_dict() for span in self.spans]
+
+    def summary(self):
+        """span 이름별 (횟수, 합계 초) - 느린 순"""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                count, seconds = totals.get(span.name, (0, 0.0))
+                totals[span.name] = (count + 1, seconds + (span.duration or 0))
+        return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+
+@contextmanager
+def start_trace(job_id):
+    """이 범위(와 여기서 띄운 태스크/스레드)의 span을 job_id 트레이스로 모음"""
+    trace = Trace(job_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    단계 하나 측정 (중첩 가능 - 부모는 contextvar라 asyncio.to_thread로 넘긴 스레드까지 이어짐)
+
+    끝나면 pipeline_span_seconds{span=name} 히스토그램 + 현재 트레이스에 기록
+    """
+    parent = _current_span.get()
+    current = Span(name, parent.id if parent else None, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.attrs['error'] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current._t0
+        metrics.observe('pipeline_span_seconds', current.duration, span=name)
+        if current.status != 'ok':
+            metrics.inc('pipeline_span_errors_total', span=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current)
+
+
+def annotate(**attrs):
+    """현재 span에 속성 추가 (span 밖이면 무시)"""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def traced(name):
+    """함수 전체를 span으로 (동기/async 둘 다)"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ==================== 저장 ====================
+
+def _init_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_traces (
+            job_id TEXT NOT NULL,
+            span_id INTEGER NOT NULL,
+            parent_id INTEGER,
+            name TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            duration_ms REAL,
+            status TEXT,
+            attrs TEXT,
+            PRIMARY KEY (job_id, span_id)
+        )
+    """)
+
+
+def save_trace(trace, db_file=DB_FILE):
+    """트레이스 span 일괄 저장 (같은 작업을 다시 저장하면 덮어씀)"""
+    rows = [
+        (trace.job_id, s['id'], s['parent_id'], s['name'], s['started_at'], s['duration_ms'],
+         s['status'], json.dumps(s['attrs'], ensure_ascii=False, default=str))
+        for s in trace.to_list()
+    ]
+    try:
+        conn = sqlite3.connect(db_file, timeout=30)
+        _init_table(conn)
+        conn.executemany("INSERT OR REPLACE INTO job_traces VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️  트레이스 저장 실패 ({trace.job_id}): {e}")
+        return 0
+    return len(rows)
+
+
+def load_trace(job_id, db_file=DB_FILE):
+    """저장된 트레이스 (시작 순)"""
+    try:
+        conn = sqlite3.connect(db_file, timeout=30)
+        _init_table(conn)
+        rows = conn.execute("""
+            SELECT span_id, parent_id, name, started_at, duration_ms, status, attrs
+            FROM job_traces WHERE job_id = ? ORDER BY started_at, span_id
+        """, (job_id,)).fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️  트레이스 조회 실패 ({job_id}): {e}")
+        return []
+    return [
+        {'id': r[0], 'parent_id': r[1], 'name': r[2], 'started_at': r[3],
+         'duration_ms': r[4], 'status': r[5], 'attrs': json.loads(r[6] or '{}')}
+        for r in rows
+    ]
@@ -2,15 +2,24 @@
 # turbo_crawler.py - 봇 탐지 우회 + headless=False
 
 import asyncio
+import inspect
+import os
+import socket
 import sqlite3
 import re
-import json
 import time
 from datetime import datetime
 from pathlib import Path
 from playwright.async_api import async_playwright
 import random
 
+from review_extractor import ReviewResponseCapture, extract_reviews, count_review_items
+from crawl_journal import CrawlJournal
+from query_scheduler import QueryScheduler
+from known_ids import KnownPlaceIds
+from work_ledger import WorkLedger, LedgerShard, LEDGER_FILE
+from change_feed import install_change_feed
+
 DB_FILE = 'seoul_industry_reviews.db'
 PROGRESS_FILE = "turbo_progress.json"
 PARALLEL_WORKERS = 5  # 🔥 5개 워커 (속도 UP)
@@ -49,27 +58,45 @@ INDUSTRIES = [
 # ==================== DB 관련 ====================
 
 def get_existing_place_ids():
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT place_id FROM stores")
-        existing = set(row[0] for row in cursor.fetchall())
-        conn.close()
-        print(f"✅ 기존 가게: {len(existing):,}개")
-        return existing
-    except:
-        return set()
+    """기존 place_id 인덱스 (mmap 정렬 배열, set과 같은 in/add 인터페이스)"""
+    started = time.perf_counter()
+    existing = KnownPlaceIds(db_file=DB_FILE).open()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"✅ 기존 가게: {len(existing):,}개 ({elapsed_ms:.0f}ms)")
+    return existing
 
-def save_to_db(place_id, store_name, region, industry, reviews):
+def ensure_store_columns(db_file=DB_FILE):
+    """
+    stores.total_review_count 추가 (없을 때만)
+
+    review_count는 수집한 리뷰 수라 TARGET_REVIEWS에서 잘림 → 네이버 실제 방문자 리뷰 수는 따로 보관
+    """
+    conn = sqlite3.connect(db_file, timeout=30)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(stores)")}
+    if columns and 'total_review_count' not in columns:
+        conn.execute("ALTER TABLE stores ADD COLUMN total_review_count INTEGER")
+        conn.commit()
+    conn.close()
+
+def save_to_db(place_id, store_name, region, industry, reviews, total_review_count=None):
     try:
         conn = sqlite3.connect(DB_FILE, timeout=30)
         cursor = conn.cursor()
         
+        # 🔥 UPSERT: 주소/좌표 등 다른 컬럼은 보존 (REPLACE는 행을 지우고 새로 넣음)
         cursor.execute("""
-            INSERT OR REPLACE INTO stores 
-            (place_id, name, district, industry, review_count, crawled_at) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (place_id, store_name, region, industry, len(reviews), datetime.now().isoformat()))
+            INSERT INTO stores 
+            (place_id, name, district, industry, review_count, total_review_count, crawled_at) 
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(place_id) DO UPDATE SET
+                name = excluded.name,
+                district = excluded.district,
+                industry = excluded.industry,
+                review_count = excluded.review_count,
+                total_review_count = COALESCE(excluded.total_review_count, stores.total_review_count),
+                crawled_at = excluded.crawled_at
+        """, (place_id, store_name, region, industry, len(reviews), total_review_count,
+              datetime.now().isoformat()))
         
         for r in reviews:
             cursor.execute("""
@@ -84,14 +111,6 @@ def save_to_db(place_id, store_name, region, industry, reviews):
     except:
         return False
 
-def save_progress_safe(progress):
-    try:
-        with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
-        return True
-    except:
-        return False
-
 # ==================== 크롤링 ====================
 
 def is_owner_reply(review_text):
@@ -101,6 +120,15 @@ def is_owner_reply(review_text):
     return any(s in review_text for s in strong_signals) or \
            sum(1 for k in ['감사드립니다', '감사합니다'] if k in review_text) >= 2
 
+async def read_visitor_review_total(page):
+    """메타 태그의 네이버 방문자 리뷰 수 (수집 상한과 무관한 실제 총개수, 없으면 None)"""
+    try:
+        content = await page.get_attribute('meta[property="og:description"]', 'content', timeout=2000)
+    except:
+        return None
+    match = re.search(r'방문자\s*리뷰\s*([\d,]+)', content or '')
+    return int(match.group(1).replace(',', '')) if match else None
+
 async def expand_reviews(page):
     try:
         await page.evaluate("""
@@ -264,9 +292,9 @@ async def collect_place_ids(search_query, scroll_depth, max_stores, worker_id, e
             return []
 
 async def collect_reviews(place_id, store_name, region, industry, worker_id, existing_ids):
-    """리뷰 수집 - 봇 탐지 우회"""
+    """리뷰 수집 - 봇 탐지 우회 → (리뷰 목록, 네이버 방문자 리뷰 총개수)"""
     if place_id in existing_ids:
-        return None
+        return None, None
     
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(
@@ -291,6 +319,7 @@ async def collect_reviews(place_id, store_name, region, industry, worker_id, exi
         """)
         
         page = await context.new_page()
+        capture = ReviewResponseCapture(page)  # 🔥 리뷰 API 응답 캡처
         
         try:
             await asyncio.sleep(random.uniform(0.5, 1.5))
@@ -298,6 +327,7 @@ async def collect_reviews(place_id, store_name, region, industry, worker_id, exi
             review_url = f"https://m.place.naver.com/restaurant/{place_id}/review/visitor"
             await page.goto(review_url, wait_until="domcontentloaded", timeout=30000)
             await asyncio.sleep(random.uniform(1.5, 2.5))
+            total_review_count = await read_visitor_review_total(page)
             
             # 최신순 정렬
             try:
@@ -321,86 +351,45 @@ async def collect_reviews(place_id, store_name, region, industry, worker_id, exi
                 await asyncio.sleep(random.uniform(0.2, 0.4))
                 await expand_reviews(page)
                 
+                if capture.count >= TARGET_REVIEWS:
+                    break
+                
                 if i % 10 == 0:
-                    count = 0
-                    for sel in ["li.place_apply_pui", "li.pui__X35jYm"]:
-                        try:
-                            count = await page.locator(sel).count()
-                            if count >= TARGET_REVIEWS:
-                                break
-                        except:
-                            pass
-                    if count >= TARGET_REVIEWS:
-                        break
-            
-            reviews = []
-            review_items = []
-            for sel in ["li.place_apply_pui", "li.pui__X35jYm", "li.EjjAW"]:
-                try:
-                    items = await page.locator(sel).all()
-                    if items:
-                        review_items = items
+                    if await count_review_items(page) >= TARGET_REVIEWS:
                         break
-                except:
-                    pass
             
-            for item in review_items[:TARGET_REVIEWS + 20]:
-                try:
-                    full_text = await item.inner_text(timeout=500)
-                    if len(full_text) < 50 or '키워드·별점' in full_text:
-                        continue
-                    
-                    review = {"별점": None, "날짜": None, "리뷰": ""}
-                    
-                    if '★' in full_text:
-                        review["별점"] = float(min(full_text.count('★'), 5))
-                    
-                    date_patterns = [
-                        r'(\d{4}[./-]\d{1,2}[./-]\d{1,2})',
-                        r'(\d{1,2}[./-]\d{1,2})',
-                        r'(\d+일\s*전)',
-                    ]
-                    
-                    for pattern in date_patterns:
-                        date_match = re.search(pattern, full_text)
-                        if date_match:
-                            review["날짜"] = date_match.group(1)
-                            break
-                    
-                    lines = [ln.strip() for ln in full_text.split('\n') if len(ln.strip()) >= 20]
-                    lines = [ln for ln in lines if not re.search(r'\d{4}[./-]', ln)]
-                    if lines:
-                        review["리뷰"] = max(lines, key=len)
-                    
-                    if review["리뷰"] and len(review["리뷰"]) >= 20 and not is_owner_reply(review["리뷰"]):
-                        reviews.append(review)
-                    
-                    if len(reviews) >= TARGET_REVIEWS:
-                        break
-                        
-                except:
-                    pass
+            # 🔥 네트워크 응답 우선, 부족하면 DOM 일괄 덤프
+            reviews, _ = await extract_reviews(
+                page, capture, TARGET_REVIEWS,
+                is_owner_reply=is_owner_reply,
+                min_length=20
+            )
             
             await context.close()
             await browser.close()
-            return reviews
+            return reviews, total_review_count
             
         except:
             await context.close()
             await browser.close()
-            return []
+            return [], None
 
 # ==================== 워커 ====================
 
-async def worker(worker_id, query_queue, progress, existing_ids, stats_lock):
+async def _maybe_await(result):
+    """로컬 스케줄러/저널은 동기, 장부(LedgerShard)는 코루틴 → 둘 다 받기"""
+    return await result if inspect.isawaitable(result) else result
+
+async def worker(worker_id, scheduler, journal, existing_ids):
     print(f"[W{worker_id}] 🚀 워커 시작")
     
     while True:
+        # 🔥 매번 최신 수확량으로 재순위된 다음 쿼리
+        query_data = await _maybe_await(scheduler.next_query())
+        if query_data is None:
+            break
+        
         try:
-            query_data = await query_queue.get()
-            if query_data is None:
-                break
-            
             query = query_data['query']
             area = query_data['area']
             industry = query_data['industry']
@@ -411,41 +400,34 @@ async def worker(worker_id, query_queue, progress, existing_ids, stats_lock):
             await asyncio.sleep(random.uniform(0, 3))
             
             place_data = await collect_place_ids(query, SCROLL_DEPTH, 20, worker_id, existing_ids)
+            await _maybe_await(scheduler.report(query_data, len(place_data)))
             
             if not place_data:
                 print(f"[W{worker_id}] ⚠️  신규 없음")
-                async with stats_lock:
-                    progress["completed_queries"].append(query)
-                    save_progress_safe(progress)
-                query_queue.task_done()
+                await _maybe_await(journal.mark_query_done(query))
                 continue
             
             for i, store in enumerate(place_data, 1):
                 place_id = store['place_id']
                 store_name = store['name']
                 
-                reviews = await collect_reviews(place_id, store_name, area, industry, worker_id, existing_ids)
+                reviews, total_review_count = await collect_reviews(
+                    place_id, store_name, area, industry, worker_id, existing_ids
+                )
                 
-                if reviews:
-                    save_to_db(place_id, store_name, area, industry, reviews)
-                    existing_ids.add(place_id)
+                if reviews and save_to_db(place_id, store_name, area, industry, reviews, total_review_count):
+                    existing_ids.add(place_id)  # 🔥 커밋된 것만 인덱스에 반영
                     
-                    async with stats_lock:
-                        progress["new_stores_count"] = progress.get("new_stores_count", 0) + 1
-                        progress["total_reviews"] = progress.get("total_reviews", 0) + len(reviews)
-                        save_progress_safe(progress)
+                    # 🔥 저널 1줄 append (락/전체 재작성 없음)
+                    await _maybe_await(journal.record_store(place_id, len(reviews), query=query))
                     
                     print(f"[W{worker_id}] 💾 [{i}/{len(place_data)}] {store_name[:15]} - {len(reviews)}개")
             
-            async with stats_lock:
-                progress["completed_queries"].append(query)
-                save_progress_safe(progress)
-            
-            query_queue.task_done()
+            await _maybe_await(journal.mark_query_done(query))
             
         except Exception as e:
             print(f"[W{worker_id}] ❌ {e}")
-            query_queue.task_done()
+            await _maybe_await(scheduler.release(query_data))
 
 # ==================== 메인 ====================
 
@@ -457,60 +439,93 @@ async def main():
 ║   - headless=False (안전)                            ║
 ║   - 랜덤 User-Agent                                  ║
 ║   - 인간 시뮬레이션 (랜덤 대기)                      ║
-║   - 실시간 progress 저장                             ║
+║   - 실시간 progress 저널 (append-only)               ║
 ╚══════════════════════════════════════════════════════╝
     """)
     
     existing_ids = get_existing_place_ids()
+    ensure_store_columns()
+    install_change_feed(DB_FILE)  # 지오코딩/모니터링이 읽는 변경 피드 트리거
     
-    queries = []
-    for area in SEOUL_ALL_AREAS:
-        for industry in INDUSTRIES:
-            queries.append({'query': f"{area} {industry}", 'area': area, 'industry': industry})
-    random.shuffle(queries)
-    
-    print(f"📋 총 쿼리: {len(queries):,}개\n")
-    
-    progress = {"completed_queries": [], "new_stores_count": 0, "total_reviews": 0}
-    if Path(PROGRESS_FILE).exists():
-        try:
-            with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-                progress = json.load(f)
-            print(f"📂 이전 진행: {len(progress['completed_queries'])}개 완료")
-            print(f"   신규 가게: {progress.get('new_stores_count', 0)}개")
-            print(f"   신규 리뷰: {progress.get('total_reviews', 0):,}개\n")
-        except:
-            pass
+    # 🔥 스냅샷 + append-only 저널로 복구
+    journal = CrawlJournal(PROGRESS_FILE)
+    replayed = journal.load()
+    if journal.completed_queries or replayed:
+        print(f"📂 이전 진행: {len(journal.completed_queries)}개 완료 (저널 재생 {replayed}건)")
+        print(f"   신규 가게: {journal.new_stores_count}개")
+        print(f"   신규 리뷰: {journal.total_reviews:,}개\n")
     
-    query_queue = asyncio.Queue()
-    for q in queries:
-        if q['query'] not in progress["completed_queries"]:
-            await query_queue.put(q)
+    # 🔥 수확량 적응형 스케줄러 (지역 × 업종 셀)
+    scheduler = QueryScheduler(SEOUL_ALL_AREAS, INDUSTRIES, db_file=DB_FILE)
+    scheduler.load()
+    if journal.completed_queries and Path(PROGRESS_FILE).exists():
+        scheduler.seed_completed(journal.completed_queries, Path(PROGRESS_FILE).stat().st_mtime)
     
-    print(f"🎯 남은 쿼리: {query_queue.qsize():,}개\n")
+    print(f"📋 총 셀: {len(scheduler.cells):,}개")
+    print(f"🎯 실행 대상 셀: {scheduler.pending_count():,}개\n")
     
-    for _ in range(PARALLEL_WORKERS):
-        await query_queue.put(None)
-    
-    stats_lock = asyncio.Lock()
     workers = [
-        asyncio.create_task(worker(i, query_queue, progress, existing_ids, stats_lock)) 
+        asyncio.create_task(worker(i, scheduler, journal, existing_ids)) 
         for i in range(PARALLEL_WORKERS)
     ]
     
-    await query_queue.join()
     await asyncio.gather(*workers)
     
-    save_progress_safe(progress)
+    journal.close()
+    existing_ids.close()
     
     print(f"""
 ╔══════════════════════════════════════════════════════╗
 ║   ✅ 완료!                                           ║
-║   🆕 신규 가게: {progress['new_stores_count']:,}개
-║   📝 신규 리뷰: {progress.get('total_reviews', 0):,}개
-║   📊 완료 쿼리: {len(progress['completed_queries']):,}개
+║   🆕 신규 가게: {journal.new_stores_count:,}개
+║   📝 신규 리뷰: {journal.total_reviews:,}개
+║   📊 완료 쿼리: {len(journal.completed_queries):,}개
 ╚══════════════════════════════════════════════════════╝
     """)
 
+# ==================== 샤드 (crawl_supervisor.py용) ====================
+
+def seed_ledger(ledger_file=LEDGER_FILE):
+    """스케줄러가 고른 실행 대상 셀을 우선순위와 함께 작업 장부에 등록"""
+    scheduler = QueryScheduler(SEOUL_ALL_AREAS, INDUSTRIES, db_file=DB_FILE)
+    scheduler.load()
+    items = [
+        (f"{area} {industry}", area, industry, priority)
+        for priority, (area, industry) in scheduler.ranked()
+    ]
+    return WorkLedger(ledger_file).seed(items)
+
+
+async def run_shard(shard_id, ledger_file=LEDGER_FILE, workers=PARALLEL_WORKERS):
+    """
+    크롤러 프로세스 1개 (브라우저 풀 + 워커 코루틴)
+
+    쿼리는 공유 작업 장부에서 임대 → 여러 프로세스/서버가 같은 장부를 나눠 처리
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{shard_id}"
+    print(f"[S{shard_id}] 🚀 샤드 시작 ({owner}, 워커 {workers}개)")
+    
+    existing_ids = get_existing_place_ids()
+    ensure_store_columns()
+    install_change_feed(DB_FILE)
+    
+    # 수확량 통계는 셀 단위로 계속 누적 (장부가 셀을 나눠주므로 프로세스 간 충돌 없음)
+    scheduler = QueryScheduler(SEOUL_ALL_AREAS, INDUSTRIES, db_file=DB_FILE)
+    scheduler.load()
+    
+    shard = LedgerShard(WorkLedger(ledger_file), owner, scheduler)
+    heartbeat = asyncio.create_task(shard.heartbeat_loop())
+    
+    try:
+        await asyncio.gather(*[
+            worker(f"{shard_id}-{i}", shard, shard, existing_ids)
+            for i in range(workers)
+        ])
+    finally:
+        heartbeat.cancel()
+        existing_ids.close()
+    
+    print(f"[S{shard_id}] ✅ 샤드 종료")
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
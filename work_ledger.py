@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# work_ledger.py - 멀티 프로세스/멀티 서버 크롤링용 공유 작업 장부 (SQLite, 임대/만료)
+
+import asyncio
+import sqlite3
+import time
+
+LEDGER_FILE = 'crawl_ledger.db'
+LEASE_SECONDS = 30 * 60     # 쿼리 1개 임대 시간 (가게 20개 × 리뷰 수집 여유)
+HEARTBEAT_SECONDS = 60      # 임대 연장 주기
+IDLE_POLL_SECONDS = 20      # 가져갈 행은 없는데 다른 샤드가 임대 중일 때 다시 볼 간격
+MAX_ATTEMPTS = 3            # 이 횟수 넘게 실패하면 'failed'로 격리
+
+
+class WorkLedger:
+    """
+    공유 작업 장부
+
+    - 행 1개 = 쿼리 1개 (지역 × 업종)
+    - claim: 가장 우선순위 높은 pending(또는 임대 만료된) 행을 BEGIN IMMEDIATE로 원자적 임대
+    - 프로세스가 죽으면 임대가 만료되어 다른 프로세스가 가져감
+    - 여러 서버가 같은 파일을 가리키면 서버 간 분산도 가능 (단, 네트워크 파일시스템의
+      SQLite 잠금이 믿을 만한 환경이어야 함)
+    """
+
+    def __init__(self, ledger_file=LEDGER_FILE, lease_seconds=LEASE_SECONDS):
+        self.ledger_file = ledger_file
+        self.lease_seconds = lease_seconds
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_ledger (
+                query TEXT PRIMARY KEY,
+                area TEXT NOT NULL,
+                industry TEXT NOT NULL,
+                priority REAL NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                new_stores INTEGER NOT NULL DEFAULT 0,
+                reviews INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_crawl_ledger_claim
+            ON crawl_ledger (status, priority DESC)
+        """)
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.ledger_file, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 60000")
+        return conn
+
+    # ==================== 작업 등록 ====================
+
+    def seed(self, items):
+        """
+        (query, area, industry, priority) 목록 등록
+
+        이미 있는 행은 우선순위만 갱신, 끝난 행(done/failed)은 다시 pending으로
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("""
+            INSERT INTO crawl_ledger (query, area, industry, priority, status, updated_at)
+            VALUES (?, ?, ?, ?, 'pending', ?)
+            ON CONFLICT(query) DO UPDATE SET
+                priority = excluded.priority,
+                status = CASE WHEN status = 'leased' THEN 'leased' ELSE 'pending' END,
+                attempts = CASE WHEN status = 'leased' THEN attempts ELSE 0 END,
+                updated_at = excluded.updated_at
+        """, [(q, a, i, p, now) for q, a, i, p in items])
+        conn.execute("COMMIT")
+        conn.close()
+        return len(items)
+
+    # ==================== 임대 ====================
+
+    def claim(self, owner):
+        """다음 작업 임대 (없으면 None)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            # 재시도 한도를 넘긴 만료 임대는 격리
+            conn.execute("""
+                UPDATE crawl_ledger SET status = 'failed', owner = NULL, updated_at = ?
+                WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?
+            """, (now, now, MAX_ATTEMPTS))
+
+            row = conn.execute("""
+                SELECT query, area, industry FROM crawl_ledger
+                WHERE status = 'pending'
+                   OR (status = 'leased' AND lease_expires_at < ?)
+                ORDER BY priority DESC
+                LIMIT 1
+            """, (now,)).fetchone()
+
+            if not row:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute("""
+                UPDATE crawl_ledger
+                SET status = 'leased', owner = ?, lease_expires_at = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE query = ?
+            """, (owner, now + self.lease_seconds, now, row[0]))
+            conn.execute("COMMIT")
+            return {'query': row[0], 'area': row[1], 'industry': row[2]}
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def renew(self, owner):
+        """owner가 가진 모든 임대 연장 (heartbeat)"""
+        now = time.time()
+        conn = self._connect()
+        cursor = conn.execute("""
+            UPDATE crawl_ledger SET lease_expires_at = ?, updated_at = ?
+            WHERE status = 'leased' AND owner = ?
+        """, (now + self.lease_seconds, now, owner))
+        conn.close()
+        return cursor.rowcount
+
+    def add_progress(self, query, owner, new_stores=0, reviews=0):
+        """진행 수치 누적 + 해당 임대 연장"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("""
+            UPDATE crawl_ledger
+            SET new_stores = new_stores + ?, reviews = reviews + ?,
+                lease_expires_at = ?, updated_at = ?
+            WHERE query = ? AND owner = ? AND status = 'leased'
+        """, (new_stores, reviews, now + self.lease_seconds, now, query, owner))
+        conn.close()
+
+    def complete(self, query, owner):
+        conn = self._connect()
+        conn.execute("""
+            UPDATE crawl_ledger SET status = 'done', owner = NULL, updated_at = ?
+            WHERE query = ? AND owner = ?
+        """, (time.time(), query, owner))
+        conn.close()
+
+    def release(self, query, owner):
+        """실패한 작업 반납 (다른 프로세스가 재시도)"""
+        conn = self._connect()
+        conn.execute("""
+            UPDATE crawl_ledger
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                owner = NULL, updated_at = ?
+            WHERE query = ? AND owner = ?
+        """, (MAX_ATTEMPTS, time.time(), query, owner))
+        conn.close()
+
+    # ==================== 조회 ====================
+
+    def stats(self):
+        conn = self._connect()
+        rows = conn.execute("""
+            SELECT status, COUNT(*), SUM(new_stores), SUM(reviews)
+            FROM crawl_ledger GROUP BY status
+        """).fetchall()
+        conn.close()
+        return {
+            status: {'count': count, 'new_stores': new or 0, 'reviews': reviews or 0}
+            for status, count, new, reviews in rows
+        }
+
+    def has_open_work(self):
+        """pending 이거나 임대 중인 작업이 남았는지"""
+        conn = self._connect()
+        count = conn.execute("""
+            SELECT COUNT(*) FROM crawl_ledger WHERE status IN ('pending', 'leased')
+        """).fetchone()[0]
+        conn.close()
+        return count > 0
+
+
+class LedgerShard:
+    """
+    크롤러 프로세스 1개의 장부 창구
+
+    turbo_crawler.worker가 쓰는 스케줄러(next_query/report/release)와
+    저널(mark_query_done/record_store) 인터페이스를 둘 다 제공
+
+    - 장부 호출은 SQLite 잠금 대기(timeout)가 있어서 전부 asyncio.to_thread로
+      (이벤트 루프에서 직접 부르면 다른 워커의 브라우저 작업까지 멈춤)
+    - 메서드가 코루틴이라 worker 쪽에서 await
+    """
+
+    def __init__(self, ledger, owner, scheduler=None):
+        self.ledger = ledger
+        self.owner = owner
+        self.scheduler = scheduler  # 수확량 통계 공유 (crawl_cell_stats)
+
+    # 스케줄러 인터페이스
+    async def next_query(self):
+        """
+        다음 쿼리 임대 (장부가 완전히 끝났을 때만 None)
+
+        지금 가져갈 행이 없어도 다른 샤드가 임대 중이면 기다렸다가 다시 봄
+        (그 샤드가 죽거나 release하면 행이 다시 pending/만료로 돌아옴)
+        """
+        while True:
+            query_data = await asyncio.to_thread(self.ledger.claim, self.owner)
+            if query_data is not None:
+                return query_data
+            if not await asyncio.to_thread(self.ledger.has_open_work):
+                return None
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+
+    async def report(self, query_data, new_stores):
+        await asyncio.to_thread(self.ledger.add_progress, query_data['query'], self.owner)
+        if self.scheduler:
+            self.scheduler.report(query_data, new_stores)
+
+    async def release(self, query_data):
+        await asyncio.to_thread(self.ledger.release, query_data['query'], self.owner)
+
+    # 저널 인터페이스
+    async def record_store(self, place_id, review_count, query=None):
+        if query:
+            await asyncio.to_thread(self.ledger.add_progress, query, self.owner,
+                                    new_stores=1, reviews=review_count)
+
+    async def mark_query_done(self, query):
+        await asyncio.to_thread(self.ledger.complete, query, self.owner)
+
+    async def heartbeat_loop(self):
+        """임대 주기적 연장 (작업이 길어져도 다른 프로세스에 뺏기지 않게)"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await asyncio.to_thread(self.ledger.renew, self.owner)
+            except sqlite3.Error as e:
+                print(f"   ⚠️  임대 연장 실패: {e}")